@@ -0,0 +1,110 @@
+"""
+客户端断开检测模块
+
+浏览器标签页在请求进行中被关闭时，如果服务端不做处理，chain.ainvoke 会继续
+把整段回复生成完，白白占用GPU时间。该模块在请求处理期间轮询连接状态，
+一旦发现客户端断开，就取消正在执行的任务：
+
+    路由任务被取消 -> 链的 ainvoke/astream 收到 CancelledError
+    -> ChatOllama 的HTTP流被关闭 -> Ollama 停止解码
+
+取消会沿着 await 链自然传播，调度器、限流等调用守卫在 finally 中归还许可，
+记忆链也不会把未完成的回复写入历史。
+
+导出指标：
+- generations_cancelled_total: 因客户端断开而取消的生成次数
+"""
+
+import asyncio
+from typing import AsyncIterator, Optional
+
+from fastapi import Request
+
+from app.services.metrics import metrics
+
+GENERATIONS_CANCELLED = metrics.counter(
+    "generations_cancelled_total", "因客户端断开而取消的生成次数", ["route", "model"]
+)
+
+# 客户端断开时返回的状态码（nginx约定的 Client Closed Request），客户端实际上收不到
+CLIENT_CLOSED_REQUEST = 499
+
+
+class DisconnectWatcher:
+    """
+    客户端断开监视器
+
+    作为异步上下文管理器包裹请求处理过程。进入时记录当前任务并启动后台轮询，
+    检测到断开后取消当前任务；退出时吞掉由自己触发的取消，并计入指标。
+
+    Attributes:
+        cancelled: 处理过程是否因客户端断开而被取消
+
+    使用示例：
+        >>> async with DisconnectWatcher(request, "once", model_key) as watcher:
+        ...     return await chat_service.chat_once(chat_request, model_key)
+        >>> return Response(status_code=CLIENT_CLOSED_REQUEST)
+    """
+
+    def __init__(self, request: Request, route: str, model_key: str, poll_interval: float = 0.25):
+        self.request = request
+        self.route = route
+        self.model_key = model_key
+        self.poll_interval = poll_interval
+        self.cancelled = False
+        self._task: Optional[asyncio.Task] = None
+        self._watcher: Optional[asyncio.Task] = None
+
+    async def __aenter__(self) -> "DisconnectWatcher":
+        self._task = asyncio.current_task()
+        self._watcher = asyncio.create_task(self._watch())
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> bool:
+        self._watcher.cancel()
+        if exc_type is None:
+            return False
+
+        if issubclass(exc_type, (asyncio.CancelledError, GeneratorExit)):
+            # 由本监视器触发，或由服务器在断开时关闭流式响应
+            GENERATIONS_CANCELLED.inc(route=self.route, model=self.model_key)
+            if self.cancelled and issubclass(exc_type, asyncio.CancelledError):
+                # 取消是自己发起的：撤销取消请求，让处理流程正常结束
+                self._task.uncancel()
+                return True
+        return False
+
+    async def _watch(self) -> None:
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            if await self.request.is_disconnected():
+                self.cancelled = True
+                self._task.cancel()
+                return
+
+
+async def stream_until_disconnect(request: Request, stream: AsyncIterator[str],
+                                  route: str, model_key: str) -> AsyncIterator[str]:
+    """
+    包裹流式输出，客户端断开时取消上游生成
+
+    即使上游长时间没有产出（例如模型仍在推理），也能及时发现断开。
+
+    Args:
+        request (Request): 当前HTTP请求
+        stream (AsyncIterator[str]): 上游的文本片段流
+        route (str): 路由名称，用于指标标签
+        model_key (str): 模型标识符，用于指标标签
+
+    Yields:
+        str: 上游产出的文本片段
+    """
+    async with DisconnectWatcher(request, route, model_key):
+        try:
+            async for chunk in stream:
+                yield chunk
+        finally:
+            # 确保上游生成器及时关闭，释放HTTP连接
+            aclose = getattr(stream, "aclose", None)
+            if aclose is not None:
+                await aclose()
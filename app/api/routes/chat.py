@@ -10,18 +10,35 @@ API端点说明：
 3. GET /chat/models - 获取可用模型列表
 4. GET /chat/history/{chat_id} - 获取对话历史
 5. DELETE /chat/memory/{chat_id} - 清除对话记忆
+6. POST /chat/once/stream - 无记忆单次对话（流式）
+7. POST /chat/memory/stream - 带记忆的连续对话（流式）
+8. GET /chat/limits - 各模型的自适应并发上限和准入队列状态
+9. POST /chat/rag - 基于持久化向量索引的检索增强问答（流式，末尾附参考来源）
+10. POST /chat/rag/once - 检索增强问答（非流式，返回引用来源和分阶段耗时）
+11. POST /chat/graph - 基于LangGraph的带记忆对话，会话持久化在SQLite检查点中
+12. POST /chat/graph/stream - 基于LangGraph的带记忆对话（流式）
+13. GET /chat/graph/history/{chat_id} - 获取图对话会话的摘要和保留的消息
+14. DELETE /chat/graph/{chat_id} - 删除图对话会话
+15. POST /chat/memory/{chat_id}/fork - 从会话的第N条消息分出新会话（与原会话共享前缀）
+16. GET /chat/memory/{chat_id}/branches - 列出从会话分出的分支
+17. POST /chat/tool - 带工具调用的对话（模型和工具调用受截止时间约束）
 
 技术特点：
 - 自动数据验证：使用Pydantic模型确保请求数据正确性
 - 自动文档生成：FastAPI自动生成OpenAPI文档
 - 类型安全：完整的类型注解和响应模型定义
 - 错误处理：统一的异常处理和错误响应
+- 断开取消：客户端断开时取消正在进行的生成，避免浪费GPU时间
+- 截止时间：通过请求体的timeout字段或 X-Request-Timeout 请求头指定端到端超时，超时返回504
 """
 
-from fastapi import APIRouter, Query, HTTPException
-from app.models.chat_models import ChatRequest, ChatResponse, ModelListResponse
+from fastapi import APIRouter, Query, HTTPException, Request
+from fastapi.responses import StreamingResponse, Response
+from app.api.disconnect import DisconnectWatcher, stream_until_disconnect, CLIENT_CLOSED_REQUEST
+from app.models.chat_models import ChatRequest, ChatResponse, ForkRequest, ModelListResponse
 from app.services.chat_service import ChatService
-from app.services.test_service import TestService
+from app.services.admission import admission_controller
+from app.services.concurrency_limiter import adaptive_limiter
 
 # 创建聊天相关的路由器
 # prefix="/chat" 表示所有路由都以/chat开头
@@ -31,10 +48,23 @@ router = APIRouter(prefix="/chat", tags=["聊天"])
 # 创建聊天服务实例
 # 在模块级别创建单例，所有请求共享同一个服务实例
 chat_service = ChatService()
-test_service = TestService()
+
+# 指定端到端超时时间（秒）的请求头，请求体中的timeout字段优先
+TIMEOUT_HEADER = "X-Request-Timeout"
+
+
+def _apply_timeout_header(chat_request: ChatRequest, request: Request) -> None:
+    """请求体未指定timeout时，使用请求头中的超时时间"""
+    header = request.headers.get(TIMEOUT_HEADER)
+    if chat_request.timeout is not None or not header:
+        return
+    try:
+        chat_request.timeout = float(header)
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"{TIMEOUT_HEADER} 必须是秒数: {header}")
 
 @router.post("/once", response_model=ChatResponse)
-async def chat_once(chat_request: ChatRequest):
+async def chat_once(chat_request: ChatRequest, request: Request):
     """
     无记忆单次对话接口
 
@@ -45,6 +75,8 @@ async def chat_once(chat_request: ChatRequest):
         chat_request (ChatRequest): 聊天请求对象，包含：
             - message: 用户输入的消息内容（必填）
             - model_key: 指定使用的模型（可选）
+            - fast: 快速模式，关闭思考型模型的推理（可选）
+            - timeout: 端到端超时时间（秒），也可用 X-Request-Timeout 请求头指定（可选）
 
     Returns:
         ChatResponse: 聊天响应对象，包含：
@@ -55,6 +87,9 @@ async def chat_once(chat_request: ChatRequest):
     HTTP状态码：
         - 200: 成功处理请求
         - 422: 请求数据验证失败
+        - 429: 模型繁忙，请求被准入控制拒绝（带Retry-After头）
+        - 499: 客户端已断开，生成被取消（客户端不会收到）
+        - 504: 超过请求的截止时间，生成被取消
         - 500: 服务器内部错误
 
     示例请求：
@@ -71,9 +106,31 @@ async def chat_once(chat_request: ChatRequest):
             "has_memory": false
         }
     """
-    return await chat_service.chat_once(
-        chat_request,
-        model_key=chat_request.model_key or "qwen3:0.6b"  # 使用指定模型或默认模型
+    model_key = chat_request.model_key or "qwen3:0.6b"  # 使用指定模型或默认模型
+    _apply_timeout_header(chat_request, request)
+    async with DisconnectWatcher(request, "once", model_key):
+        return await chat_service.chat_once(chat_request, model_key=model_key)
+    return Response(status_code=CLIENT_CLOSED_REQUEST)
+
+
+@router.post("/once/stream")
+async def chat_once_stream(chat_request: ChatRequest, request: Request):
+    """
+    无记忆单次对话接口（流式）
+
+    与 /chat/once 参数相同，以纯文本分块的方式返回AI回复。
+    思考型模型的 <think> 推理块在服务端增量剥离，不会发送给客户端。
+    客户端断开后立即取消上游生成。
+
+    Returns:
+        StreamingResponse: text/plain 分块响应
+    """
+    model_key = chat_request.model_key or "qwen3:0.6b"
+    _apply_timeout_header(chat_request, request)
+    stream = chat_service.stream_once(chat_request, model_key=model_key)
+    return StreamingResponse(
+        stream_until_disconnect(request, stream, "once_stream", model_key),
+        media_type="text/plain; charset=utf-8"
     )
 
 
@@ -114,8 +171,23 @@ async def get_models():
     return ModelListResponse(models=models)
 
 
+@router.get("/limits")
+async def get_limits():
+    """
+    获取并发控制状态
+
+    Returns:
+        dict: adaptive为各(模型, 后端)当前的自适应并发上限、在途数和耗时统计，
+              admission为各模型准入控制的在途数和分优先级排队数
+    """
+    return {
+        "adaptive": adaptive_limiter.get_stats(),
+        "admission": admission_controller.get_stats(),
+    }
+
+
 @router.post("/memory", response_model=ChatResponse)
-async def chat_with_memory(chat_request: ChatRequest):
+async def chat_with_memory(chat_request: ChatRequest, request: Request):
     """
     带记忆的连续对话接口
 
@@ -128,6 +200,7 @@ async def chat_with_memory(chat_request: ChatRequest):
             - model_key: 指定使用的模型（可选）
             - chat_id: 会话标识符（可选，默认"default"）
             - memory_type: 记忆类型（可选，默认"buffer"）
+            - fast: 快速模式，关闭思考型模型的推理（可选）
 
     Returns:
         ChatResponse: 聊天响应对象，包含：
@@ -140,6 +213,7 @@ async def chat_with_memory(chat_request: ChatRequest):
     记忆类型说明：
         - "buffer": 保存完整对话历史，适合短对话
         - "summary": 智能摘要长对话，适合长期对话
+        - "retrieval": 召回相关历史轮次加最近几轮，提示长度不随对话增长，适合上千轮的会话
 
     示例请求：
         POST /chat/memory
@@ -159,15 +233,155 @@ async def chat_with_memory(chat_request: ChatRequest):
             "memory_type": "buffer"
         }
     """
-    return await chat_service.chat_with_memory(
-        chat_request,
-        model_key=chat_request.model_key or "qwen3:0.6b"  # 使用指定模型或默认模型
+    model_key = chat_request.model_key or "qwen3:0.6b"  # 使用指定模型或默认模型
+    _apply_timeout_header(chat_request, request)
+    # 客户端断开时取消生成，未完成的回复不会写入记忆
+    async with DisconnectWatcher(request, "memory", model_key):
+        return await chat_service.chat_with_memory(chat_request, model_key=model_key)
+    return Response(status_code=CLIENT_CLOSED_REQUEST)
+
+@router.post("/memory/stream")
+async def chat_with_memory_stream(chat_request: ChatRequest, request: Request):
+    """
+    带记忆的连续对话接口（流式）
+
+    与 /chat/memory 参数相同，以纯文本分块的方式返回AI回复。
+    完整回复生成结束后才写入会话记忆，写入的内容不含推理块；
+    客户端中途断开时取消生成，不写入记忆。
+
+    Returns:
+        StreamingResponse: text/plain 分块响应
+    """
+    model_key = chat_request.model_key or "qwen3:0.6b"
+    _apply_timeout_header(chat_request, request)
+    stream = chat_service.stream_with_memory(chat_request, model_key=model_key)
+    return StreamingResponse(
+        stream_until_disconnect(request, stream, "memory_stream", model_key),
+        media_type="text/plain; charset=utf-8"
+    )
+
+@router.post("/rag")
+async def chat_rag_stream(chat_request: ChatRequest, request: Request):
+    """
+    检索增强问答接口（流式）
+
+    从持久化的FAISS索引检索与问题相关的资料，模型依据资料作答并用 [n] 标注引用，
+    回答结束后追加"参考来源"列表。参数与 /chat/once 相同。
+
+    Returns:
+        StreamingResponse: text/plain 分块响应
+    """
+    model_key = chat_request.model_key or "qwen3:0.6b"
+    _apply_timeout_header(chat_request, request)
+    stream = chat_service.stream_rag(chat_request, model_key=model_key)
+    return StreamingResponse(
+        stream_until_disconnect(request, stream, "rag_stream", model_key),
+        media_type="text/plain; charset=utf-8"
+    )
+
+
+@router.post("/rag/once", response_model=ChatResponse)
+async def chat_rag_once(chat_request: ChatRequest, request: Request):
+    """
+    检索增强问答接口（非流式）
+
+    Returns:
+        ChatResponse: 聊天响应对象，除基本字段外包含：
+            - sources: 引用的资料片段（index、source、score、snippet）
+            - timings: retrieval_seconds（检索）和 generation_seconds（生成）
+            - context: 上下文打包统计（budget_tokens、candidate_tokens、used_tokens、saved_tokens等）
+
+    示例响应：
+        {
+            "response": "FAISS支持Flat、IVF和HNSW等索引 [1]。",
+            "model_used": "qwen3:0.6b",
+            "has_memory": false,
+            "sources": [{"index": 1, "source": "docs/faiss.md", "score": 0.82, "snippet": "..."}],
+            "timings": {"retrieval_seconds": 0.05, "generation_seconds": 1.8},
+            "context": {"budget_tokens": 1500, "candidate_tokens": 2100, "used_tokens": 1180, "saved_tokens": 920}
+        }
+    """
+    model_key = chat_request.model_key or "qwen3:0.6b"
+    _apply_timeout_header(chat_request, request)
+    async with DisconnectWatcher(request, "rag", model_key):
+        return await chat_service.chat_rag(chat_request, model_key=model_key)
+    return Response(status_code=CLIENT_CLOSED_REQUEST)
+
+
+@router.post("/graph", response_model=ChatResponse)
+async def chat_with_graph(chat_request: ChatRequest, request: Request):
+    """
+    基于LangGraph的带记忆对话接口
+
+    参数与 /chat/memory 相同（memory_type 不使用）。会话状态由SQLite检查点持久化，
+    以 chat_id 作为LangGraph的thread_id；消息数超过上限时，较早的消息在图的摘要节点中并入滚动摘要。
+
+    Returns:
+        ChatResponse: 聊天响应对象，memory_type 为 "graph"
+    """
+    model_key = chat_request.model_key or "qwen3:0.6b"
+    _apply_timeout_header(chat_request, request)
+    # 客户端断开时取消生成，本轮的用户消息从会话中删除
+    async with DisconnectWatcher(request, "graph", model_key):
+        return await chat_service.chat_with_graph(chat_request, model_key=model_key)
+    return Response(status_code=CLIENT_CLOSED_REQUEST)
+
+
+@router.post("/graph/stream")
+async def chat_with_graph_stream(chat_request: ChatRequest, request: Request):
+    """
+    基于LangGraph的带记忆对话接口（流式）
+
+    逐token返回模型节点的输出（已剥离推理块）；需要摘要时，摘要在回复结束后、响应关闭前完成。
+
+    Returns:
+        StreamingResponse: text/plain 分块响应
+    """
+    model_key = chat_request.model_key or "qwen3:0.6b"
+    _apply_timeout_header(chat_request, request)
+    stream = chat_service.stream_with_graph(chat_request, model_key=model_key)
+    return StreamingResponse(
+        stream_until_disconnect(request, stream, "graph_stream", model_key),
+        media_type="text/plain; charset=utf-8"
     )
 
+
+@router.get("/graph/history/{chat_id}", response_model=dict)
+async def get_graph_history(chat_id: str):
+    """
+    获取图对话会话的摘要和保留的消息
+
+    示例响应：
+        {
+            "chat_id": "user_123",
+            "summary": "用户叫张三，是一名程序员。",
+            "history": [{"role": "user", "content": "..."}, {"role": "assistant", "content": "..."}],
+            "total_messages": 2
+        }
+    """
+    state = await chat_service.get_graph_history(chat_id)
+    return {
+        "chat_id": chat_id,
+        "summary": state["summary"],
+        "history": state["history"],
+        "total_messages": len(state["history"])
+    }
+
+
+@router.delete("/graph/{chat_id}")
+async def clear_graph_memory(chat_id: str):
+    """删除图对话会话的全部检查点"""
+    success = await chat_service.clear_graph_memory(chat_id)
+    return {
+        "success": success,
+        "message": f"已删除图对话会话 {chat_id}" if success else "会话不存在"
+    }
+
+
 @router.get("/history/{chat_id}", response_model=dict)
 async def get_chat_history(
     chat_id: str,
-    memory_type: str = Query(default="buffer", description="记忆类型: buffer 或 summary")
+    memory_type: str = Query(default="buffer", description="记忆类型: buffer、summary 或 retrieval")
 ):
     """
     获取指定会话的对话历史接口
@@ -218,7 +432,7 @@ async def get_chat_history(
 @router.delete("/memory/{chat_id}")
 async def clear_chat_memory(
     chat_id: str,
-    memory_type: str = Query(default="buffer", description="记忆类型: buffer 或 summary")
+    memory_type: str = Query(default="buffer", description="记忆类型: buffer、summary 或 retrieval")
 ):
     """
     清除指定会话的记忆接口
@@ -259,6 +473,71 @@ async def clear_chat_memory(
         "message": f"已清除会话 {chat_id} 的 {memory_type} 记忆" if success else "记忆清除失败"
     }
 
+@router.post("/memory/{chat_id}/fork")
+async def fork_chat_session(chat_id: str, fork_request: ForkRequest):
+    """
+    会话分叉接口
+
+    从会话的第 fork_at 条消息处分出新会话，用于从任意一条消息重新生成或开启新的对话分支。
+    新会话与原会话共享前 fork_at 条消息而不复制，分叉的内存开销与历史长度无关。
+
+    HTTP状态码：
+        - 200: 分叉成功
+        - 400: 记忆类型不支持分叉、分叉位置越界或新会话已存在
+        - 404: 会话不存在
+
+    示例请求：
+        POST /chat/memory/user_123/fork
+        {
+            "fork_at": 2,
+            "new_chat_id": "user_123_branch_1"
+        }
+
+    示例响应：
+        {
+            "chat_id": "user_123_branch_1",
+            "parent_chat_id": "user_123",
+            "fork_at": 2,
+            "created_at": 1760000000.0
+        }
+    """
+    try:
+        return chat_service.fork_session(chat_id, fork_request.fork_at, fork_request.new_chat_id,
+                                         fork_request.memory_type)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"会话不存在: {chat_id}")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.get("/memory/{chat_id}/branches")
+async def list_chat_branches(
+    chat_id: str,
+    memory_type: str = Query(default="buffer", description="记忆类型，目前只有 buffer 支持分叉")
+):
+    """
+    列出从会话分出的分支
+
+    Returns:
+        dict: chat_id 和 branches（chat_id、parent_chat_id、fork_at、created_at，按创建顺序）
+    """
+    branches = chat_service.list_branches(chat_id, memory_type)
+    return {"chat_id": chat_id, "branches": branches, "total_branches": len(branches)}
+
+
 @router.post("/tool", response_model=ChatResponse)
-def chat_with_tool(chat_request: ChatRequest):
-    return test_service.test_tool(chat_request)
+async def chat_with_tool(chat_request: ChatRequest, request: Request):
+    """
+    带工具调用的对话接口
+
+    模型可以调用已注册的工具（计算器、天气、当前时间等）后再回答。模型调用和工具调用
+    都在请求的截止时间内执行，单次工具调用还受该工具配置的超时时间约束，超时返回504。
+
+    Returns:
+        ChatResponse: 聊天响应对象，has_memory 为 False
+    """
+    model_key = chat_request.model_key or "qwen3:4b"
+    _apply_timeout_header(chat_request, request)
+    async with DisconnectWatcher(request, "tool", model_key):
+        return await chat_service.chat_with_tool(chat_request, model_key=model_key)
+    return Response(status_code=CLIENT_CLOSED_REQUEST)
@@ -0,0 +1,71 @@
+"""
+文档入库API路由模块
+
+API端点说明：
+1. POST /ingest - 提交入库任务（后台运行，立即返回任务ID）
+2. GET /ingest/{job_id} - 查询入库任务的状态、进度和吞吐
+3. GET /ingest/cache/stats - 嵌入缓存的条目数和命中率
+"""
+
+from fastapi import APIRouter, HTTPException
+from app.models.ingest_models import IngestJobResponse, IngestRequest
+from app.retrieval.embeddings import embedding_cache_stats, get_embeddings
+from app.services.ingestion_service import IngestionInProgress, ingestion_service
+
+router = APIRouter(prefix="/ingest", tags=["入库"])
+
+
+@router.post("", response_model=IngestJobResponse, status_code=202)
+async def submit_ingest(ingest_request: IngestRequest):
+    """
+    提交入库任务
+
+    递归解析目录中的文件，并行切分、批量嵌入后写入FAISS索引。
+    默认增量入库：只处理新增和内容变化的文件，并移除已删除文件的片段；full为true时全量重建。
+
+    HTTP状态码：
+        - 202: 任务已提交
+        - 400: 目录不存在或不在入库根目录（RETRIEVAL_CONFIG.ingest_root）下
+        - 409: 目标索引已有任务在运行
+
+    示例请求：
+        POST /ingest
+        {
+            "directory": "manuals",
+            "workers": 8
+        }
+    """
+    try:
+        job = ingestion_service.submit(ingest_request)
+    except IngestionInProgress as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return job.to_response()
+
+
+@router.get("/cache/stats")
+async def get_embedding_cache_stats():
+    """
+    查询默认嵌入模型的缓存统计
+
+    Returns:
+        dict: entries、bytes、max_bytes、hits、misses、hit_rate；未启用缓存时enabled为false
+    """
+    stats = embedding_cache_stats(get_embeddings())
+    return {"enabled": stats is not None, **(stats or {})}
+
+
+@router.get("/{job_id}", response_model=IngestJobResponse)
+async def get_ingest_job(job_id: str):
+    """
+    查询入库任务
+
+    Returns:
+        IngestJobResponse: status为running/succeeded/failed，report包含
+            files、chunks、docs_per_sec、chunks_per_sec等统计
+    """
+    job = ingestion_service.get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"入库任务不存在: {job_id}")
+    return job.to_response()
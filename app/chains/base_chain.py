@@ -17,7 +17,7 @@
 """
 
 from abc import ABC, abstractmethod
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, AsyncIterator
 from ..models.chat_models import ChatRequest, ChatResponse
 
 
@@ -66,6 +66,27 @@ class BaseChain(ABC):
         """
         pass
 
+    async def astream(self, request: ChatRequest, model_key: str = "qwen3:0.6b", **kwargs) -> AsyncIterator[str]:
+        """
+        流式执行对话处理
+
+        逐块产出AI回复的文本片段，适用于需要尽快展示首字的场景。
+        不是所有链都支持流式输出，默认实现直接抛出异常。
+
+        Args:
+            request (ChatRequest): 用户的聊天请求
+            model_key (str, optional): 指定使用的模型标识符
+            **kwargs: 额外的关键字参数，与invoke保持一致
+
+        Yields:
+            str: AI回复的文本片段
+
+        Raises:
+            NotImplementedError: 链不支持流式输出时抛出
+        """
+        raise NotImplementedError(f"{self.get_chain_type()} 链不支持流式输出")
+        yield  # pragma: no cover  使该方法成为异步生成器
+
     @abstractmethod
     def get_chain_type(self) -> str:
         """
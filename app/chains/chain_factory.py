@@ -16,7 +16,7 @@
 4. 支持动态扩展新的链类型
 """
 
-from typing import Dict, Type, List
+from typing import Dict, Type, List, Optional
 from .base_chain import BaseChain
 from .memory_chain import MemoryChain
 from .stateless_chain import StatelessChain
@@ -49,7 +49,7 @@ class ChainFactory:
         "stateless": StatelessChain,   # 无记忆的对话链
         # 未来可以扩展更多链类型：
         "tool": ToolChain          # 支持工具调用的链
-        # "rag": RAGChain,            # 检索增强生成链
+        # "rag": RAGChain 在 rag_chain 模块中通过 register_chain 注册
         # "agent": AgentChain,        # 智能代理链
     }
 
@@ -100,6 +100,15 @@ class ChainFactory:
         # 返回缓存的实例
         return cls._instances[chain_type]
 
+    @classmethod
+    def get_instance(cls, chain_type: str) -> Optional[BaseChain]:
+        """
+        获取已创建的链实例，不存在时返回None（不会创建新实例）
+
+        主要用于关闭资源等只需要处理已创建实例的场景。
+        """
+        return cls._instances.get(chain_type)
+
     @classmethod
     def get_available_chains(cls) -> List[str]:
         """
@@ -0,0 +1,290 @@
+"""
+图对话链模块
+
+该模块基于 LangGraph 实现带记忆的对话链（参考 memoryChat/LangGraph_memory_chat.ipynb 中的摘要记忆模式）。
+与 MemoryChain 把会话保存在进程内存中不同，会话状态由 SQLite 检查点持久化，服务重启后对话可以继续。
+
+图结构：
+    START -> call_model -> (消息数超过 graph_max_messages 时) summarize -> END
+
+- call_model: 把摘要放入系统提示，连同最近的消息调用模型，回复写入状态时剥离推理块
+- summarize: 用快速模式把较早的消息并入滚动摘要，只保留最近 graph_keep_messages 条消息；
+  摘要长度有上限，失败时跳过本次摘要（下一轮再试），call_model 最多只读取 graph_max_messages 条消息，
+  因此提示长度在任何情况下都有界
+
+会话状态：
+- messages: 最近的消息（add_messages 合并，摘要节点用 RemoveMessage 删除已摘要的消息）
+- summary: 较早消息的滚动摘要
+
+编译后的图按模型（及快速模式）缓存，所有图共享同一个检查点连接，会话以 chat_id 作为 thread_id。
+流式输出以 "messages" 模式逐token产出 call_model 节点的模型输出。生成失败或被取消时，
+本轮写入的用户消息从状态中删除，未完成的对话不会留在会话中。
+
+导出指标：
+- graph_summaries_total: 摘要节点的执行次数，outcome为 success 或 error
+"""
+
+import asyncio
+import logging
+import os
+import uuid
+from typing import Annotated, Any, AsyncIterator, Dict, List, Optional
+
+import aiosqlite
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage, HumanMessage, RemoveMessage, SystemMessage
+from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+from langgraph.graph import END, START, StateGraph
+from langgraph.graph.message import add_messages
+from typing_extensions import TypedDict
+
+from .base_chain import BaseChain
+from .chain_factory import ChainFactory
+from .reasoning_parser import ReasoningStripper, strip_reasoning
+from ..config.memory_config import MEMORY_CONFIG
+from ..models.chat_models import ChatRequest, ChatResponse
+from ..services.metrics import metrics
+from ..services.model_factory import ModelFactory
+
+logger = logging.getLogger(__name__)
+
+GRAPH_SUMMARIES = metrics.counter(
+    "graph_summaries_total", "图对话链摘要节点执行次数", ["model", "outcome"]
+)
+
+GRAPH_SYSTEM_PROMPT = "你是一个友好的AI助手，能够记住对话历史并提供有用的回答。"
+
+SUMMARY_PROMPT = (
+    "下面是之前对话的摘要和随后的对话内容。请把它们合并为一段简洁的新摘要，"
+    "保留用户的个人信息、偏好和尚未解决的问题，只输出摘要本身。\n\n"
+    "之前的摘要：\n{summary}\n\n对话内容：\n{conversation}"
+)
+
+
+class GraphState(TypedDict):
+    """图对话链的会话状态"""
+    messages: Annotated[List[BaseMessage], add_messages]
+    summary: str
+
+
+class GraphChain(BaseChain):
+    """
+    基于LangGraph和SQLite检查点的对话链实现
+
+    内部结构：
+    - graphs: 缓存不同模型（及快速模式）编译后的图，键格式同 MemoryChain 的链缓存
+    - 检查点在第一次调用时创建（需要在事件循环中打开SQLite连接），所有图共享
+
+    使用示例：
+        >>> chain = ChainFactory.create_chain("graph")
+        >>> await chain.invoke(ChatRequest(message="我叫张三"), chat_id="user_123")
+        >>> await chain.aget_chat_history("user_123")
+    """
+
+    def __init__(self, checkpoint_path: str = MEMORY_CONFIG.graph_checkpoint_path):
+        self.checkpoint_path = checkpoint_path
+        self.graphs: Dict[str, Any] = {}
+        self._checkpointer: Optional[AsyncSqliteSaver] = None
+        self._init_lock = asyncio.Lock()
+
+    async def _get_checkpointer(self) -> AsyncSqliteSaver:
+        """打开SQLite连接并创建检查点表（只执行一次）"""
+        async with self._init_lock:
+            if self._checkpointer is None:
+                directory = os.path.dirname(self.checkpoint_path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                connection = await aiosqlite.connect(self.checkpoint_path)
+                checkpointer = AsyncSqliteSaver(connection)
+                await checkpointer.setup()
+                self._checkpointer = checkpointer
+        return self._checkpointer
+
+    def _build_graph(self, model_key: str, fast: bool, checkpointer: AsyncSqliteSaver):
+        """
+        构建并编译对话图
+
+        Args:
+            model_key (str): 模型标识符
+            fast (bool): 回答是否使用快速模式（摘要始终使用快速模式）
+            checkpointer (AsyncSqliteSaver): 会话状态的检查点
+
+        Returns:
+            CompiledStateGraph: 编译后的图
+        """
+        model = ModelFactory.create_model(model_key, fast=fast)
+        summarizer = ModelFactory.create_model(model_key, fast=True)
+        max_messages = MEMORY_CONFIG.graph_max_messages
+        keep_messages = MEMORY_CONFIG.graph_keep_messages
+
+        async def call_model(state: GraphState) -> Dict[str, Any]:
+            system = GRAPH_SYSTEM_PROMPT
+            if state.get("summary"):
+                system += f"\n\n之前对话的摘要：\n{state['summary']}"
+            # 摘要失败时消息会暂时超过上限，这里再截断一次，保证提示长度有界
+            messages = [SystemMessage(content=system)] + state["messages"][-max_messages:]
+            response = await model.ainvoke(messages)
+            return {"messages": [AIMessage(content=strip_reasoning(response.content), id=response.id)]}
+
+        async def summarize(state: GraphState) -> Dict[str, Any]:
+            earlier = state["messages"][:-keep_messages]
+            conversation = "\n".join(
+                f"{'用户' if isinstance(message, HumanMessage) else '助手'}：{message.content}"
+                for message in earlier
+            )
+            prompt = SUMMARY_PROMPT.format(summary=state.get("summary") or "（无）", conversation=conversation)
+            try:
+                result = await summarizer.ainvoke([HumanMessage(content=prompt)])
+            except Exception as e:
+                # 摘要失败不影响本轮回复，较早的消息保留到下一轮再摘要
+                GRAPH_SUMMARIES.inc(model=model_key, outcome="error")
+                logger.warning(f"图对话链摘要失败: {e}")
+                return {}
+            GRAPH_SUMMARIES.inc(model=model_key, outcome="success")
+            summary = strip_reasoning(result.content).strip()[:MEMORY_CONFIG.graph_summary_max_chars]
+            return {"summary": summary, "messages": [RemoveMessage(id=message.id) for message in earlier]}
+
+        def should_summarize(state: GraphState) -> str:
+            return "summarize" if len(state["messages"]) > max_messages else END
+
+        builder = StateGraph(GraphState)
+        builder.add_node("call_model", call_model)
+        builder.add_node("summarize", summarize)
+        builder.add_edge(START, "call_model")
+        builder.add_conditional_edges("call_model", should_summarize, ["summarize", END])
+        builder.add_edge("summarize", END)
+        return builder.compile(checkpointer=checkpointer)
+
+    async def _get_or_create_graph(self, model_key: str, fast: bool = False):
+        """获取或创建对应模型和快速模式组合的编译图"""
+        checkpointer = await self._get_checkpointer()
+        graph_key = f"{model_key}_fast" if fast else model_key
+        if graph_key not in self.graphs:
+            self.graphs[graph_key] = self._build_graph(model_key, fast, checkpointer)
+        return self.graphs[graph_key]
+
+    @staticmethod
+    def _config(chat_id: str) -> Dict[str, Any]:
+        return {"configurable": {"thread_id": chat_id}}
+
+    async def _discard_turn(self, graph, chat_id: str, message_id: str) -> None:
+        """回复没有完成时删除本轮写入的用户消息"""
+        try:
+            state = await graph.aget_state(self._config(chat_id))
+            messages = state.values.get("messages", [])
+            if messages and messages[-1].id == message_id:
+                await graph.aupdate_state(self._config(chat_id), {"messages": [RemoveMessage(id=message_id)]},
+                                          as_node="call_model")
+        except Exception as e:
+            logger.warning(f"会话 {chat_id} 未完成的用户消息删除失败: {e}")
+
+    async def invoke(self, request: ChatRequest, model_key: str = "qwen3:0.6b",
+                     chat_id: str = "default", **kwargs) -> ChatResponse:
+        """
+        执行一轮图对话
+
+        Args:
+            request (ChatRequest): 用户的聊天请求
+            model_key (str): 使用的模型标识符
+            chat_id (str): 会话标识符（LangGraph的thread_id）
+            **kwargs: 额外参数（memory_type 等，图对话链中不使用）
+
+        Returns:
+            ChatResponse: AI的回复，memory_type 固定为 "graph"
+        """
+        try:
+            fast = ModelFactory.resolve_fast_mode(model_key, request.fast)
+            graph = await self._get_or_create_graph(model_key, fast)
+            message = HumanMessage(content=request.message, id=str(uuid.uuid4()))
+            try:
+                state = await graph.ainvoke({"messages": [message]}, self._config(chat_id))
+            except BaseException:
+                await self._discard_turn(graph, chat_id, message.id)
+                raise
+            response = state["messages"][-1].content
+        except Exception as e:
+            response = f"处理请求时出现错误：{str(e)}"
+
+        return ChatResponse(
+            response=response,
+            model_used=model_key,
+            has_memory=True,
+            chat_id=chat_id,
+            memory_type="graph"
+        )
+
+    async def astream(self, request: ChatRequest, model_key: str = "qwen3:0.6b",
+                      chat_id: str = "default", **kwargs) -> AsyncIterator[str]:
+        """
+        流式执行一轮图对话
+
+        逐token产出 call_model 节点的模型输出（已剥离推理块）。回复结束后，
+        需要时在同一次图执行中完成摘要，流在摘要结束后关闭。
+
+        Yields:
+            str: AI回复的文本片段
+        """
+        fast = ModelFactory.resolve_fast_mode(model_key, request.fast)
+        graph = await self._get_or_create_graph(model_key, fast)
+        message = HumanMessage(content=request.message, id=str(uuid.uuid4()))
+        stripper = ReasoningStripper()
+        try:
+            async for chunk, metadata in graph.astream({"messages": [message]}, self._config(chat_id),
+                                                       stream_mode="messages"):
+                if metadata.get("langgraph_node") != "call_model" or not isinstance(chunk, AIMessageChunk):
+                    continue
+                text = stripper.feed(chunk.content)
+                if text:
+                    yield text
+        except BaseException:
+            await self._discard_turn(graph, chat_id, message.id)
+            raise
+        tail = stripper.flush()
+        if tail:
+            yield tail
+
+    async def aget_chat_history(self, chat_id: str) -> Dict[str, Any]:
+        """
+        获取会话的摘要和保留的消息
+
+        Returns:
+            Dict[str, Any]: summary（较早对话的摘要）和 history（role、content 列表）
+        """
+        checkpointer = await self._get_checkpointer()
+        checkpoint = await checkpointer.aget_tuple(self._config(chat_id))
+        values = checkpoint.checkpoint["channel_values"] if checkpoint is not None else {}
+        return {
+            "summary": values.get("summary", ""),
+            "history": [
+                {"role": "user" if isinstance(message, HumanMessage) else "assistant", "content": message.content}
+                for message in values.get("messages", [])
+            ],
+        }
+
+    async def aclear(self, chat_id: str) -> bool:
+        """删除会话的全部检查点，返回会话是否存在"""
+        checkpointer = await self._get_checkpointer()
+        if await checkpointer.aget_tuple(self._config(chat_id)) is None:
+            return False
+        await checkpointer.adelete_thread(chat_id)
+        return True
+
+    async def aclose(self) -> None:
+        """关闭检查点的SQLite连接（连接的工作线程不是守护线程，不关闭时进程无法退出）"""
+        async with self._init_lock:
+            if self._checkpointer is not None:
+                await self._checkpointer.conn.close()
+                self._checkpointer = None
+                self.graphs.clear()
+
+    def get_chain_type(self) -> str:
+        """
+        返回链类型标识符
+
+        Returns:
+            str: 固定返回"graph"，标识这是图对话链
+        """
+        return "graph"
+
+
+# 注册到链工厂
+ChainFactory.register_chain("graph", GraphChain)
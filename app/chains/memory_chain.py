@@ -7,13 +7,15 @@
 
 核心功能：
 1. 对话历史管理：保存用户和AI的完整对话记录
-2. 多种记忆类型：支持缓冲记忆和摘要记忆
+2. 多种记忆类型：支持缓冲记忆、摘要记忆和检索记忆
 3. 多会话支持：通过chat_id区分不同的对话会话
-4. 智能摘要：长对话自动摘要，节省token消耗
+4. 智能摘要：长对话自动摘要，节省token消耗；摘要在后台以低优先级执行
+5. 会话分叉：从缓冲记忆会话的任意一条消息分出新会话，与原会话共享前缀（写时复制，分叉开销O(1)）
 
 记忆类型说明：
 - Buffer Memory: 保存完整的对话历史，适合短对话
 - Summary Memory: 智能摘要长对话，适合长期对话
+- Retrieval Memory: 按相关性召回历史轮次加最近窗口，提示长度不随对话增长，适合上千轮的长期会话
 
 适用场景：
 - 连续对话
@@ -23,18 +25,52 @@
 - 项目讨论
 """
 
-from typing import Dict, List, Optional, Any
-from langchain_core.messages import HumanMessage, AIMessage, SystemMessage
+import asyncio
+import logging
+import time
+import uuid
+from dataclasses import asdict, dataclass
+from typing import Dict, List, Optional, Any, AsyncIterator, Set, Union
+from langchain_core.messages import HumanMessage, AIMessage, SystemMessage, BaseMessage
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
-from langchain_core.output_parsers import StrOutputParser
 from langchain_core.runnables import RunnablePassthrough, RunnableLambda
-from langchain.memory import ConversationBufferMemory, ConversationSummaryBufferMemory
+from langchain.memory import ConversationBufferMemory
 from langchain.schema import BaseMemory
 
 from .base_chain import BaseChain
+from .reasoning_parser import ReasoningStripParser
+from ..memory.forkable_history import ForkableChatMessageHistory
+from ..memory.retrieval_memory import RetrievalMemory
+from ..memory.summary_memory import SummaryBufferMemory
+from ..retrieval.embeddings import get_embeddings
 from ..services.model_factory import ModelFactory
+from ..services.admission import admission_controller, AdmissionRejected, Priority
+from ..services.deadline import deadline_scope
+from ..config.server_config import SERVER_CONFIG
 from ..models.chat_models import ChatRequest, ChatResponse
 
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class SessionBranch:
+    """
+    会话分支记录
+
+    Attributes:
+        chat_id: 分支会话的标识符
+        parent_chat_id: 被分叉的会话
+        fork_at: 分叉位置，分支包含原会话的前 fork_at 条消息
+        created_at: 创建时间（Unix时间戳）
+    """
+    chat_id: str
+    parent_chat_id: str
+    fork_at: int
+    created_at: float
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
 
 class MemoryChain(BaseChain):
     """
@@ -63,13 +99,21 @@ class MemoryChain(BaseChain):
         """
         # 记忆存储：存储所有会话的记忆实例
         # 键格式："{chat_id}_{memory_type}"，值：记忆实例
-        self.memory_storage: Dict[str, BaseMemory] = {}
+        self.memory_storage: Dict[str, Union[BaseMemory, RetrievalMemory, SummaryBufferMemory]] = {}
 
         # 链缓存：存储不同配置的LCEL链实例
-        # 键格式："{model_key}_{memory_type}"，值：LCEL链
+        # 键格式："{model_key}_{memory_type}"，快速模式追加"_fast"，值：LCEL链
         self.chains: Dict[str, Any] = {}
 
-    def _get_or_create_memory(self, chat_id: str, memory_type: str = "buffer", model_key: str = "qwen3:0.6b") -> BaseMemory:
+        # 摘要压缩和检索记忆的嵌入在后台任务中执行；摘要压缩每个会话同一时刻最多一个
+        self._prune_locks: Dict[str, asyncio.Lock] = {}
+        self._background_tasks: Set[asyncio.Task] = set()
+
+        # 分支记录：键为被分叉会话的记忆键，值为从它分出的分支
+        self.branches: Dict[str, List[SessionBranch]] = {}
+
+    def _get_or_create_memory(self, chat_id: str, memory_type: str = "buffer",
+                              model_key: str = "qwen3:0.6b") -> Union[BaseMemory, RetrievalMemory, SummaryBufferMemory]:
         """
         获取或创建记忆实例
 
@@ -78,22 +122,29 @@ class MemoryChain(BaseChain):
 
         Args:
             chat_id (str): 会话标识符，用于区分不同的对话会话
-            memory_type (str): 记忆类型，支持"buffer"和"summary"
+            memory_type (str): 记忆类型，支持"buffer"、"summary"和"retrieval"
             model_key (str): 模型标识符，摘要模式需要用于生成摘要
 
         Returns:
-            BaseMemory: 对应的记忆实例
+            Union[BaseMemory, RetrievalMemory, SummaryBufferMemory]: 对应的记忆实例
 
         记忆类型详解：
         1. Buffer Memory (缓冲记忆):
            - 保存完整的对话历史
            - 适合短对话或需要完整上下文的场景
            - 内存占用随对话长度线性增长
+           - 历史保存在可分叉的持久化链表中，分支与原会话共享前缀
 
         2. Summary Memory (摘要记忆):
            - 智能摘要长对话，保持固定的token限制
            - 适合长期对话或token预算有限的场景
            - 使用AI模型生成对话摘要，保留关键信息
+           - 每条消息只计数一次，缓冲区token总数增量维护，每轮开销与对话长度无关
+
+        3. Retrieval Memory (检索记忆):
+           - 每轮对话嵌入到会话自己的向量索引（有界的环形缓冲区）
+           - 提示中只放入与当前输入最相关的若干轮和最近窗口，长度与对话轮数无关
+           - 嵌入模型与检索链共用（带嵌入缓存），不调用对话模型
         """
         # 构造记忆键：结合会话ID和记忆类型
         memory_key = f"{chat_id}_{memory_type}"
@@ -102,26 +153,31 @@ class MemoryChain(BaseChain):
         if memory_key not in self.memory_storage:
             if memory_type == "buffer":
                 # 创建缓冲记忆：保存完整对话历史
-                self.memory_storage[memory_key] = ConversationBufferMemory(
-                    return_messages=True,      # 返回消息对象而非字符串
-                    memory_key="chat_history"  # 在提示模板中的变量名
-                )
+                self.memory_storage[memory_key] = self._create_buffer_memory(ForkableChatMessageHistory())
             elif memory_type == "summary":
                 # 创建摘要记忆：智能摘要长对话
-                model = ModelFactory.create_model(model_key)
-                self.memory_storage[memory_key] = ConversationSummaryBufferMemory(
-                    llm=model,                    # 用于生成摘要的模型
-                    return_messages=True,         # 返回消息对象
-                    memory_key="chat_history",    # 在提示模板中的变量名
-                    max_token_limit=1000         # 最大token限制，超过时触发摘要
-                )
+                # 摘要不需要推理过程，始终使用快速模式，避免 <think> 块混入摘要
+                model = ModelFactory.create_model(model_key, fast=True)
+                self.memory_storage[memory_key] = SummaryBufferMemory(model)
+            elif memory_type == "retrieval":
+                # 创建检索记忆：按相关性召回历史轮次
+                self.memory_storage[memory_key] = RetrievalMemory(get_embeddings())
             else:
                 # 不支持的记忆类型
-                raise ValueError(f"不支持的记忆类型: {memory_type}。支持的类型: ['buffer', 'summary']")
+                raise ValueError(f"不支持的记忆类型: {memory_type}。支持的类型: ['buffer', 'summary', 'retrieval']")
 
         return self.memory_storage[memory_key]
     
-    def _create_memory_chain(self, model_key: str):
+    @staticmethod
+    def _create_buffer_memory(history: ForkableChatMessageHistory) -> ConversationBufferMemory:
+        """创建以可分叉历史保存消息的缓冲记忆"""
+        return ConversationBufferMemory(
+            chat_memory=history,       # 可分叉的消息历史
+            return_messages=True,      # 返回消息对象而非字符串
+            memory_key="chat_history"  # 在提示模板中的变量名
+        )
+
+    def _create_memory_chain(self, model_key: str, fast: bool = False):
         """
         创建带记忆功能的LCEL链
 
@@ -130,15 +186,16 @@ class MemoryChain(BaseChain):
 
         Args:
             model_key (str): 模型标识符
+            fast (bool): 是否使用关闭思考的快速模式
 
         Returns:
             Runnable: 构建好的LCEL链实例
 
         链结构：
-            输入 -> RunnablePassthrough -> 提示模板(含历史) -> 模型 -> 字符串解析器 -> 输出
+            输入 -> RunnablePassthrough -> 提示模板(含历史) -> 模型 -> 推理剥离解析器 -> 输出
         """
         # 通过工厂创建模型实例
-        model = ModelFactory.create_model(model_key)
+        model = ModelFactory.create_model(model_key, fast=fast)
 
         # 创建包含记忆的聊天提示模板
         prompt = ChatPromptTemplate.from_messages([
@@ -155,11 +212,70 @@ class MemoryChain(BaseChain):
             RunnablePassthrough()    # 透传输入数据
             | prompt                 # 应用包含历史的提示模板
             | model                  # 调用AI模型
-            | StrOutputParser()      # 解析输出为字符串
+            | ReasoningStripParser() # 解析输出为字符串，剥离推理块后再写入记忆
         )
 
         return chain
+
+    def _get_or_create_chain(self, model_key: str, memory_type: str, fast: bool = False):
+        """获取或创建对应模型、记忆类型和快速模式组合的LCEL链"""
+        # 链的键包含模型、记忆类型和快速模式，确保不同配置使用不同的链
+        chain_key = f"{model_key}_{memory_type}_fast" if fast else f"{model_key}_{memory_type}"
+        if chain_key not in self.chains:
+            self.chains[chain_key] = self._create_memory_chain(model_key, fast)
+        return self.chains[chain_key]
     
+    @staticmethod
+    async def _load_history(memory: Union[BaseMemory, RetrievalMemory, SummaryBufferMemory],
+                            user_input: str) -> List[BaseMessage]:
+        """加载放入提示的历史消息：检索记忆按当前输入召回，摘要记忆包含摘要，缓冲记忆返回全部消息"""
+        if isinstance(memory, RetrievalMemory):
+            return await memory.aload_messages(user_input)
+        if isinstance(memory, SummaryBufferMemory):
+            return memory.prompt_messages
+        return memory.chat_memory.messages
+
+    def _run_in_background(self, coroutine) -> None:
+        task = asyncio.get_running_loop().create_task(coroutine)
+        self._background_tasks.add(task)
+        task.add_done_callback(self._background_tasks.discard)
+
+    def _save_turn(self, memory: Union[BaseMemory, RetrievalMemory, SummaryBufferMemory], chat_id: str, memory_type: str,
+                   model_key: str, user_input: str, output: str) -> None:
+        """
+        保存一轮对话
+
+        缓冲记忆直接写入。摘要记忆先写入消息（按缓存的计数累加token总数），超出token限制时的摘要压缩
+        放到后台任务中以后台优先级执行，不占用交互式请求的响应时间和并发许可。
+        检索记忆先写入文本（立即出现在最近窗口中），嵌入在后台增量完成。
+        """
+        if isinstance(memory, RetrievalMemory):
+            memory.add_turn(user_input, output)
+            self._run_in_background(memory.aindex_pending())
+            return
+        if not isinstance(memory, SummaryBufferMemory):
+            memory.save_context({"input": user_input}, {"output": output})
+            return
+
+        memory.add_messages([HumanMessage(content=user_input), AIMessage(content=output)])
+        if memory.needs_pruning:
+            self._run_in_background(self._prune_in_background(f"{chat_id}_{memory_type}", memory, model_key))
+
+    async def _prune_in_background(self, memory_key: str, memory: SummaryBufferMemory, model_key: str) -> None:
+        """在后台优先级的准入许可内压缩摘要记忆，超过摘要超时时间即取消"""
+        lock = self._prune_locks.setdefault(memory_key, asyncio.Lock())
+        async with lock:
+            try:
+                # 请求已经结束，摘要使用独立的时间预算而不是请求剩余的预算
+                async with deadline_scope(SERVER_CONFIG.summary_timeout, stage="summary", detached=True):
+                    async with admission_controller.admit(model_key, Priority.BACKGROUND):
+                        await memory.aprune()
+            except AdmissionRejected as e:
+                # 模型繁忙时跳过本次压缩，下一轮对话后会再次尝试
+                logger.info(f"会话 {memory_key} 的摘要压缩被推迟: {e}")
+            except Exception as e:
+                logger.warning(f"会话 {memory_key} 的摘要压缩失败: {e}")
+
     async def invoke(self, request: ChatRequest, model_key: str = "qwen3:0.6b",
                     chat_id: str = "default", memory_type: str = "buffer", **kwargs) -> ChatResponse:
         """
@@ -180,7 +296,7 @@ class MemoryChain(BaseChain):
             request (ChatRequest): 用户的聊天请求
             model_key (str): 使用的模型标识符
             chat_id (str): 会话标识符，用于区分不同对话
-            memory_type (str): 记忆类型，"buffer"或"summary"
+            memory_type (str): 记忆类型，"buffer"、"summary"或"retrieval"
             **kwargs: 额外参数
 
         Returns:
@@ -196,16 +312,12 @@ class MemoryChain(BaseChain):
             memory = self._get_or_create_memory(chat_id, memory_type, model_key)
 
             # 2. 获取或创建对应的LCEL链
-            # 链的键包含模型和记忆类型，确保不同配置使用不同的链
-            chain_key = f"{model_key}_{memory_type}"
-            if chain_key not in self.chains:
-                self.chains[chain_key] = self._create_memory_chain(model_key)
-
-            chain = self.chains[chain_key]
+            fast = ModelFactory.resolve_fast_mode(model_key, request.fast)
+            chain = self._get_or_create_chain(model_key, memory_type, fast)
 
             # 3. 加载历史对话记录
-            # chat_memory.messages包含了所有历史消息对象
-            chat_history = memory.chat_memory.messages
+            # 缓冲和摘要记忆使用全部历史消息，检索记忆只使用相关轮次和最近窗口
+            chat_history = await self._load_history(memory, request.message)
 
             # 4. 异步调用链处理输入
             # 传入当前用户输入和完整的对话历史
@@ -215,11 +327,8 @@ class MemoryChain(BaseChain):
             })
 
             # 5. 保存新的对话到记忆中
-            # save_context会自动将输入和输出转换为消息对象并保存
-            memory.save_context(
-                {"input": request.message},    # 用户输入
-                {"output": response}           # AI回复
-            )
+            # 摘要记忆的压缩在后台进行，不阻塞本次回复
+            self._save_turn(memory, chat_id, memory_type, model_key, request.message, response)
 
             # 6. 构造成功响应
             return ChatResponse(
@@ -240,6 +349,58 @@ class MemoryChain(BaseChain):
                 memory_type=memory_type
             )
     
+    async def astream(self, request: ChatRequest, model_key: str = "qwen3:0.6b",
+                      chat_id: str = "default", memory_type: str = "buffer", **kwargs) -> AsyncIterator[str]:
+        """
+        流式执行带记忆的对话处理
+
+        逐块产出已剥离推理块的回复片段；完整回复生成结束后才写入记忆，
+        中途失败或被取消的回复不会进入对话历史。
+
+        Args:
+            request (ChatRequest): 用户的聊天请求
+            model_key (str): 使用的模型标识符
+            chat_id (str): 会话标识符
+            memory_type (str): 记忆类型，"buffer"、"summary"或"retrieval"
+            **kwargs: 额外参数
+
+        Yields:
+            str: AI回复的文本片段
+        """
+        memory = self._get_or_create_memory(chat_id, memory_type, model_key)
+        fast = ModelFactory.resolve_fast_mode(model_key, request.fast)
+        chain = self._get_or_create_chain(model_key, memory_type, fast)
+
+        chunks = []
+        async for chunk in chain.astream({
+            "input": request.message,
+            "chat_history": await self._load_history(memory, request.message)
+        }):
+            chunks.append(chunk)
+            yield chunk
+
+        self._save_turn(memory, chat_id, memory_type, model_key, request.message, "".join(chunks))
+
+    def get_history_length(self, chat_id: str, memory_type: str = "buffer") -> int:
+        """
+        统计会话保留的消息数，不创建消息对象
+
+        Args:
+            chat_id (str): 会话标识符
+            memory_type (str): 记忆类型
+
+        Returns:
+            int: 消息数，与 get_chat_history 返回的条数相同；会话不存在时为0
+        """
+        memory = self.memory_storage.get(f"{chat_id}_{memory_type}")
+        if memory is None:
+            return 0
+        if isinstance(memory, RetrievalMemory):
+            return 2 * len(memory)  # 每轮一问一答
+        if isinstance(memory, SummaryBufferMemory):
+            return len(memory)
+        return len(memory.chat_memory)
+
     def get_chat_history(self, chat_id: str, memory_type: str = "buffer") -> List[Dict[str, str]]:
         """
         获取指定会话的对话历史
@@ -274,7 +435,10 @@ class MemoryChain(BaseChain):
 
         # 获取记忆实例和消息列表
         memory = self.memory_storage[memory_key]
-        messages = memory.chat_memory.messages
+        if isinstance(memory, (RetrievalMemory, SummaryBufferMemory)):
+            messages = memory.messages
+        else:
+            messages = memory.chat_memory.messages
 
         # 转换消息格式
         history = []
@@ -319,9 +483,64 @@ class MemoryChain(BaseChain):
         # 检查并删除记忆
         if memory_key in self.memory_storage:
             del self.memory_storage[memory_key]
+            self._prune_locks.pop(memory_key, None)
+            # 分支持有自己的历史，原会话被清除后分支不受影响
+            self.branches.pop(memory_key, None)
             return True  # 成功删除
         return False     # 记忆不存在
 
+    def fork_session(self, chat_id: str, fork_at: int, new_chat_id: Optional[str] = None,
+                     memory_type: str = "buffer") -> SessionBranch:
+        """
+        从会话的第 fork_at 条消息处分出新会话
+
+        新会话包含原会话的前 fork_at 条消息，与原会话共享这些消息而不复制，
+        之后两边的对话互不影响。例如重新生成第 n 条回复时，在 n 处分叉后重新发送对应的用户消息。
+
+        Args:
+            chat_id (str): 被分叉的会话
+            fork_at (int): 分叉位置，0 到原会话消息数之间
+            new_chat_id (str, optional): 新会话的标识符，不指定时自动生成
+            memory_type (str): 记忆类型，目前只有"buffer"支持分叉
+
+        Returns:
+            SessionBranch: 新会话的分支记录
+
+        Raises:
+            KeyError: 被分叉的会话不存在
+            ValueError: 记忆类型不支持分叉、分叉位置越界或新会话已存在
+        """
+        if memory_type != "buffer":
+            # 摘要记忆的较早消息已经并入摘要，检索记忆只保留有限轮次，按消息位置分叉没有明确含义
+            raise ValueError(f"记忆类型 {memory_type} 不支持分叉，只有 buffer 记忆支持")
+        memory_key = f"{chat_id}_{memory_type}"
+        if memory_key not in self.memory_storage:
+            raise KeyError(f"会话不存在: {chat_id}")
+        new_chat_id = new_chat_id or uuid.uuid4().hex
+        new_memory_key = f"{new_chat_id}_{memory_type}"
+        if new_memory_key in self.memory_storage:
+            raise ValueError(f"会话已存在: {new_chat_id}")
+
+        history = self.memory_storage[memory_key].chat_memory.fork(fork_at)
+        self.memory_storage[new_memory_key] = self._create_buffer_memory(history)
+        branch = SessionBranch(chat_id=new_chat_id, parent_chat_id=chat_id, fork_at=fork_at, created_at=time.time())
+        self.branches.setdefault(memory_key, []).append(branch)
+        return branch
+
+    def list_branches(self, chat_id: str, memory_type: str = "buffer") -> List[SessionBranch]:
+        """
+        列出从会话分出的分支（按创建顺序，不含分支再分出的分支）
+
+        Args:
+            chat_id (str): 会话标识符
+            memory_type (str): 记忆类型
+
+        Returns:
+            List[SessionBranch]: 分支记录；已被清除的分支不再列出
+        """
+        return [branch for branch in self.branches.get(f"{chat_id}_{memory_type}", [])
+                if f"{branch.chat_id}_{memory_type}" in self.memory_storage]
+
     def get_chain_type(self) -> str:
         """
         返回链类型标识符
@@ -0,0 +1,184 @@
+"""
+检索增强生成链模块
+
+该模块实现了基于持久化向量索引的问答链：先检索与问题相关的文档片段，
+在token预算内打包为带编号的上下文，再让模型依据上下文作答并标注引用。
+
+处理流程：
+1. 检索：从持久化的FAISS索引召回 fetch_k 个候选片段
+2. 打包：去重、合并同一来源的相邻片段，按相关性/token数贪心放入由模型上下文长度推算的token预算
+   （见 retrieval.packing），响应中的 context 字段报告本次节省的token数
+3. 生成：提示词中的片段按 [n] 编号，要求模型在回答中引用编号
+4. 引用：响应中返回被放入上下文的片段来源，流式输出末尾追加参考来源
+
+检索和生成的耗时分别统计，便于定位RAG请求的延迟瓶颈。
+
+导出指标：
+- rag_retrieval_seconds: 检索（含查询向量计算和上下文打包）耗时分布
+- rag_generation_seconds: 生成耗时分布（流式为完整输出耗时）
+"""
+
+import time
+from typing import Any, AsyncIterator, Dict, List, Tuple
+
+from langchain_core.prompts import ChatPromptTemplate
+
+from .base_chain import BaseChain
+from .chain_factory import ChainFactory
+from .reasoning_parser import ReasoningStripParser
+from ..config.retrieval_config import RETRIEVAL_CONFIG
+from ..models.chat_models import ChatRequest, ChatResponse
+from ..retrieval.packing import PackedContext, context_budget, format_context, pack_context
+from ..retrieval.retriever import RetrievedChunk, retriever
+from ..retrieval.tokens import count_tokens
+from ..services.metrics import metrics
+from ..services.model_factory import ModelFactory
+
+RAG_RETRIEVAL_SECONDS = metrics.histogram(
+    "rag_retrieval_seconds", "RAG检索阶段耗时（秒）", ["model"]
+)
+RAG_GENERATION_SECONDS = metrics.histogram(
+    "rag_generation_seconds", "RAG生成阶段耗时（秒）", ["model"]
+)
+
+RAG_SYSTEM_PROMPT = (
+    "你是一个基于资料回答问题的AI助手。请只依据下面给出的资料回答用户的问题，"
+    "并在引用资料的句子后用 [编号] 标注来源；资料中没有相关信息时，请直接说明无法从资料中找到答案。\n\n"
+    "资料：\n{context}"
+)
+
+
+class RAGChain(BaseChain):
+    """
+    检索增强生成链实现
+
+    内部结构：
+    - chains: 缓存不同模型（及快速模式）的LCEL链，结构为 提示模板 -> 模型 -> 推理剥离解析器
+    - 检索通过全局检索器完成，与模型无关
+
+    使用示例：
+        >>> chain = ChainFactory.create_chain("rag")
+        >>> response = await chain.invoke(ChatRequest(message="FAISS支持哪些索引类型？"))
+        >>> response.sources[0]["source"]
+    """
+
+    def __init__(self):
+        self.chains: Dict[str, Any] = {}
+
+    def _get_or_create_chain(self, model_key: str, fast: bool = False):
+        """获取或创建指定模型的LCEL链"""
+        chain_key = f"{model_key}_fast" if fast else model_key
+        if chain_key not in self.chains:
+            model = ModelFactory.create_model(model_key, fast=fast)
+            prompt = ChatPromptTemplate.from_messages([
+                ("system", RAG_SYSTEM_PROMPT),
+                ("human", "{input}")
+            ])
+            self.chains[chain_key] = prompt | model | ReasoningStripParser()
+        return self.chains[chain_key]
+
+    async def _retrieve(self, request: ChatRequest, model_key: str) -> Tuple[PackedContext, Dict[str, float]]:
+        """
+        检索并打包上下文
+
+        Returns:
+            Tuple[PackedContext, Dict[str, float]]:
+                (打包结果, 检索耗时，键为 retrieval_seconds、retrieval_<阶段>_seconds 和 packing_seconds)
+        """
+        started = time.perf_counter()
+        result = await retriever.aretrieve(request.message, RETRIEVAL_CONFIG.fetch_k, filter=request.filter)
+        packing_started = time.perf_counter()
+        prompt_tokens = count_tokens(RAG_SYSTEM_PROMPT.format(context="")) + count_tokens(request.message)
+        budget = context_budget(ModelFactory.get_model_info(model_key).context_window, prompt_tokens)
+        packed = pack_context(result.chunks, budget, RETRIEVAL_CONFIG.top_k)
+        finished = time.perf_counter()
+        RAG_RETRIEVAL_SECONDS.observe(finished - started, model=model_key)
+        timings = {"retrieval_seconds": round(finished - started, 4)}
+        timings.update({f"retrieval_{stage}_seconds": round(seconds, 4) for stage, seconds in result.timings.items()})
+        timings["packing_seconds"] = round(finished - packing_started, 4)
+        return packed, timings
+
+    @staticmethod
+    def _citations(chunks: List[RetrievedChunk]) -> List[Dict[str, Any]]:
+        return [chunk.to_citation(i) for i, chunk in enumerate(chunks, start=1)]
+
+    async def invoke(self, request: ChatRequest, model_key: str = "qwen3:0.6b", **kwargs) -> ChatResponse:
+        """
+        执行检索增强问答
+
+        Args:
+            request (ChatRequest): 用户的聊天请求，message为问题
+            model_key (str): 使用的模型标识符
+            **kwargs: 额外参数（RAG链中暂未使用）
+
+        Returns:
+            ChatResponse: 回复内容，sources为引用的片段，timings为检索（含各阶段）和生成耗时（秒），
+                context为上下文打包统计
+        """
+        try:
+            packed, timings = await self._retrieve(request, model_key)
+            chunks = packed.chunks
+
+            started = time.perf_counter()
+            fast = ModelFactory.resolve_fast_mode(model_key, request.fast)
+            chain = self._get_or_create_chain(model_key, fast)
+            response = await chain.ainvoke({"input": request.message, "context": format_context(chunks)})
+            generation_seconds = time.perf_counter() - started
+            RAG_GENERATION_SECONDS.observe(generation_seconds, model=model_key)
+
+            return ChatResponse(
+                response=response,
+                model_used=model_key,
+                has_memory=False,
+                sources=self._citations(chunks),
+                timings={**timings, "generation_seconds": round(generation_seconds, 4)},
+                context=packed.to_dict()
+            )
+
+        except Exception as e:
+            return ChatResponse(
+                response=f"处理请求时出现错误：{str(e)}",
+                model_used=model_key,
+                has_memory=False
+            )
+
+    async def astream(self, request: ChatRequest, model_key: str = "qwen3:0.6b", **kwargs) -> AsyncIterator[str]:
+        """
+        流式执行检索增强问答
+
+        先完成检索，再流式输出回答，回答结束后追加"参考来源"列表。
+
+        Args:
+            request (ChatRequest): 用户的聊天请求
+            model_key (str): 使用的模型标识符
+            **kwargs: 额外参数（RAG链中暂未使用）
+
+        Yields:
+            str: 回答的文本片段，最后一个片段为参考来源
+        """
+        packed, _ = await self._retrieve(request, model_key)
+        chunks = packed.chunks
+
+        started = time.perf_counter()
+        fast = ModelFactory.resolve_fast_mode(model_key, request.fast)
+        chain = self._get_or_create_chain(model_key, fast)
+        async for chunk in chain.astream({"input": request.message, "context": format_context(chunks)}):
+            yield chunk
+        RAG_GENERATION_SECONDS.observe(time.perf_counter() - started, model=model_key)
+
+        if chunks:
+            lines = [f"[{i}] {chunk.source}" for i, chunk in enumerate(chunks, start=1)]
+            yield "\n\n参考来源：\n" + "\n".join(lines)
+
+    def get_chain_type(self) -> str:
+        """
+        返回链类型标识符
+
+        Returns:
+            str: 固定返回"rag"，标识这是检索增强生成链
+        """
+        return "rag"
+
+
+# 注册到链工厂
+ChainFactory.register_chain("rag", RAGChain)
@@ -0,0 +1,156 @@
+"""
+推理内容过滤模块
+
+qwen3等"思考型"模型在默认模式下会在回复开头输出一段 <think>...</think> 推理内容。
+这部分内容对用户没有价值，却会被原样保存进对话记忆，并在之后的每一轮作为提示token
+重新发送给模型。该模块负责在输出解析阶段把推理块剥离掉。
+
+主要功能：
+1. strip_reasoning：一次性剥离完整文本中的推理块
+2. ReasoningStripper：增量剥离器，可以逐块处理流式输出，正确处理跨块的标签
+3. ReasoningStripParser：可直接替换StrOutputParser的LCEL输出解析器
+
+处理规则：
+- 推理块之后紧跟的空白字符一并去除
+- 未闭合的推理块（生成被截断）整体丢弃
+"""
+
+import re
+from typing import AsyncIterator, Iterator, Union
+
+from langchain_core.messages import BaseMessage
+from langchain_core.output_parsers import StrOutputParser
+
+THINK_OPEN = "<think>"
+THINK_CLOSE = "</think>"
+
+# 匹配完整的推理块及其后的空白；未闭合的推理块匹配到文本末尾
+_THINK_PATTERN = re.compile(r"<think>.*?(?:</think>\s*|$)", re.DOTALL)
+
+
+def strip_reasoning(text: str) -> str:
+    """
+    剥离文本中的全部推理块
+
+    Args:
+        text (str): 模型的完整回复
+
+    Returns:
+        str: 去除推理块后的回复
+
+    Example:
+        >>> strip_reasoning("<think>先想一想</think>\\n\\n答案是42")
+        '答案是42'
+    """
+    if THINK_OPEN not in text:
+        return text
+    return _THINK_PATTERN.sub("", text)
+
+
+def _partial_prefix_length(text: str, tag: str) -> int:
+    """返回text末尾与tag开头重合的最长长度，用于保留跨块的半个标签"""
+    for length in range(min(len(text), len(tag) - 1), 0, -1):
+        if text.endswith(tag[:length]):
+            return length
+    return 0
+
+
+class ReasoningStripper:
+    """
+    增量推理块剥离器
+
+    逐块喂入流式输出，立即返回可以安全输出的部分。只有可能是标签前缀的
+    少量尾部字符会被暂存，因此不会明显增加首字延迟。
+
+    使用示例：
+        >>> stripper = ReasoningStripper()
+        >>> stripper.feed("<thi") + stripper.feed("nk>嗯</think>你好") + stripper.flush()
+        '你好'
+    """
+
+    def __init__(self):
+        self._buffer = ""
+        self._in_reasoning = False
+        self._skip_whitespace = False
+
+    def feed(self, text: str) -> str:
+        """喂入一个新的文本块，返回可以输出的部分"""
+        self._buffer += text
+        output = []
+
+        while self._buffer:
+            if self._in_reasoning:
+                index = self._buffer.find(THINK_CLOSE)
+                if index == -1:
+                    # 推理内容直接丢弃，只保留可能是闭合标签开头的尾部
+                    keep = _partial_prefix_length(self._buffer, THINK_CLOSE)
+                    self._buffer = self._buffer[len(self._buffer) - keep:]
+                    break
+                self._buffer = self._buffer[index + len(THINK_CLOSE):]
+                self._in_reasoning = False
+                self._skip_whitespace = True
+            else:
+                index = self._buffer.find(THINK_OPEN)
+                if index == -1:
+                    keep = _partial_prefix_length(self._buffer, THINK_OPEN)
+                    output.append(self._buffer[:len(self._buffer) - keep])
+                    self._buffer = self._buffer[len(self._buffer) - keep:]
+                    break
+                output.append(self._buffer[:index])
+                self._buffer = self._buffer[index + len(THINK_OPEN):]
+                self._in_reasoning = True
+
+        return self._emit("".join(output))
+
+    def flush(self) -> str:
+        """流结束时调用，返回暂存的剩余文本"""
+        remaining = "" if self._in_reasoning else self._buffer
+        self._buffer = ""
+        self._in_reasoning = False
+        return self._emit(remaining)
+
+    def _emit(self, text: str) -> str:
+        if self._skip_whitespace and text:
+            text = text.lstrip()
+            # 只要输出了非空白内容，就不再需要跳过空白
+            self._skip_whitespace = not text
+        return text
+
+
+def _chunk_text(chunk: Union[str, BaseMessage]) -> str:
+    if isinstance(chunk, BaseMessage):
+        content = chunk.content
+        return content if isinstance(content, str) else str(content)
+    return chunk
+
+
+class ReasoningStripParser(StrOutputParser):
+    """
+    剥离推理块的字符串输出解析器
+
+    行为与StrOutputParser一致，额外去除 <think> 推理块。
+    invoke/ainvoke 走 parse 一次性处理，stream/astream 走增量剥离。
+    """
+
+    def parse(self, text: str) -> str:
+        return strip_reasoning(text)
+
+    def _transform(self, input: Iterator[Union[str, BaseMessage]]) -> Iterator[str]:
+        stripper = ReasoningStripper()
+        for chunk in input:
+            text = stripper.feed(_chunk_text(chunk))
+            if text:
+                yield text
+        tail = stripper.flush()
+        if tail:
+            yield tail
+
+    async def _atransform(self, input: AsyncIterator[Union[str, BaseMessage]]) -> AsyncIterator[str]:
+        stripper = ReasoningStripper()
+        async for chunk in input:
+            text = stripper.feed(_chunk_text(chunk))
+            if text:
+                yield text
+        tail = stripper.flush()
+        if tail:
+            yield tail
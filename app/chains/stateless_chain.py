@@ -18,14 +18,15 @@
 - 数学计算
 """
 
-from typing import Dict, Any
+from typing import Dict, Any, AsyncIterator, Optional
 from langchain_core.messages import HumanMessage, SystemMessage
 from langchain_core.prompts import ChatPromptTemplate
-from langchain_core.output_parsers import StrOutputParser
 from langchain_core.runnables import RunnablePassthrough
 
 from .base_chain import BaseChain
+from .reasoning_parser import ReasoningStripParser
 from ..services.model_factory import ModelFactory
+from ..services.hedging import request_hedger
 from ..models.chat_models import ChatRequest, ChatResponse
 
 
@@ -59,25 +60,30 @@ class StatelessChain(BaseChain):
         # 键：模型标识符，值：构建好的LCEL链
         self.chains: Dict[str, Any] = {}
 
-    def _get_or_create_chain(self, model_key: str):
+    def _get_or_create_chain(self, model_key: str, fast: bool = False, base_url: Optional[str] = None):
         """
         获取或创建指定模型的LCEL链
 
         使用缓存机制避免重复创建相同模型的链实例。
-        每个模型对应一个独立的LCEL链，包含提示模板、模型和输出解析器。
+        每个模型（及快速模式开关、副本地址）对应一个独立的LCEL链，包含提示模板、模型和输出解析器。
 
         Args:
             model_key (str): 模型标识符
+            fast (bool): 是否使用关闭思考的快速模式
+            base_url (str, optional): 副本地址，不指定时使用模型配置的主地址
 
         Returns:
             Runnable: 构建好的LCEL链实例
 
         LCEL链结构：
-            输入 -> RunnablePassthrough -> 提示模板 -> 模型 -> 字符串解析器 -> 输出
+            输入 -> RunnablePassthrough -> 提示模板 -> 模型 -> 推理剥离解析器 -> 输出
         """
-        if model_key not in self.chains:
+        chain_key = f"{model_key}_fast" if fast else model_key
+        if base_url:
+            chain_key = f"{chain_key}@{base_url}"
+        if chain_key not in self.chains:
             # 通过工厂创建模型实例
-            model = ModelFactory.create_model(model_key)
+            model = ModelFactory.create_model(model_key, fast=fast, base_url=base_url)
 
             # 创建聊天提示模板
             # 包含系统消息和用户消息两个部分
@@ -89,14 +95,22 @@ class StatelessChain(BaseChain):
             ])
 
             # 构建LCEL链：使用管道操作符(|)连接各个组件
-            self.chains[model_key] = (
+            self.chains[chain_key] = (
                 RunnablePassthrough()    # 透传输入数据，不做任何修改
                 | prompt                 # 应用提示模板，格式化输入
                 | model                  # 调用AI模型生成回复
-                | StrOutputParser()      # 解析模型输出为字符串
+                | ReasoningStripParser() # 解析为字符串并剥离 <think> 推理块
             )
 
-        return self.chains[model_key]
+        return self.chains[chain_key]
+
+    def _stream_factory(self, request: ChatRequest):
+        """返回按(模型键, 后端地址)创建流式调用的函数，供请求对冲使用"""
+        def factory(model_key: str, base_url: Optional[str]):
+            fast = ModelFactory.resolve_fast_mode(model_key, request.fast)
+            chain = self._get_or_create_chain(model_key, fast, base_url)
+            return chain.astream({"input": request.message})
+        return factory
 
     async def invoke(self, request: ChatRequest, model_key: str = "qwen3:0.6b", **kwargs) -> ChatResponse:
         """
@@ -107,8 +121,9 @@ class StatelessChain(BaseChain):
 
         处理流程：
         1. 获取或创建对应模型的LCEL链
-        2. 使用链处理用户输入
-        3. 构造并返回响应对象
+        2. 使用链处理用户输入；模型开启对冲时以流式方式竞速，
+           首token超时则向副本或备用模型发送重复请求
+        3. 构造并返回响应对象（model_used为实际胜出的模型）
         4. 异常处理：捕获并返回错误信息
 
         Args:
@@ -125,17 +140,24 @@ class StatelessChain(BaseChain):
             - 返回的响应明确标识为无记忆模式
         """
         try:
-            # 获取对应模型的处理链
-            chain = self._get_or_create_chain(model_key)
-
-            # 异步调用链处理用户输入
-            # ainvoke是LCEL链的异步调用方法
-            response = await chain.ainvoke({"input": request.message})
+            model_used = model_key
+            if request_hedger.is_enabled(model_key):
+                # 对冲模式：以流式方式竞速，胜出方的输出拼接为完整回复
+                model_used, stream = await request_hedger.race(model_key, self._stream_factory(request))
+                response = "".join([chunk async for chunk in stream])
+            else:
+                # 获取对应模型的处理链
+                fast = ModelFactory.resolve_fast_mode(model_key, request.fast)
+                chain = self._get_or_create_chain(model_key, fast)
+
+                # 异步调用链处理用户输入
+                # ainvoke是LCEL链的异步调用方法
+                response = await chain.ainvoke({"input": request.message})
 
             # 构造成功响应
             return ChatResponse(
                 response=response,        # AI生成的回复内容
-                model_used=model_key,     # 实际使用的模型
+                model_used=model_used,    # 实际使用的模型（对冲时可能是备用模型）
                 has_memory=False          # 明确标识为无记忆模式
             )
 
@@ -148,6 +170,25 @@ class StatelessChain(BaseChain):
                 has_memory=False
             )
 
+    async def astream(self, request: ChatRequest, model_key: str = "qwen3:0.6b", **kwargs) -> AsyncIterator[str]:
+        """
+        流式执行无记忆对话处理
+
+        与invoke使用同一条LCEL链，推理块在流式过程中被增量剥离，
+        因此客户端收到的第一个片段就是正式回复内容。
+
+        Args:
+            request (ChatRequest): 用户的聊天请求
+            model_key (str): 使用的模型标识符
+            **kwargs: 额外参数（无状态链中暂未使用）
+
+        Yields:
+            str: AI回复的文本片段
+        """
+        _, stream = await request_hedger.race(model_key, self._stream_factory(request))
+        async for chunk in stream:
+            yield chunk
+
     def get_chain_type(self) -> str:
         """
         返回链类型标识符
@@ -0,0 +1,41 @@
+"""
+记忆配置模块
+
+定义记忆对话链中各记忆类型的参数。
+"""
+
+from pydantic import BaseModel
+
+from .retrieval_config import PROJECT_ROOT
+
+
+class MemoryConfig(BaseModel):
+    """
+    记忆配置数据模型
+
+    Attributes:
+        retrieval_top_k: 检索记忆每次放入提示的相关历史轮数（不含最近窗口）
+        retrieval_window: 检索记忆总是放入提示的最近轮数
+        retrieval_max_turns: 检索记忆每个会话保留的最大轮数，超出后淘汰最早的轮次
+        retrieval_max_chars: 每轮对话参与嵌入的最大字符数，超出部分截断
+        graph_checkpoint_path: 图对话链的SQLite检查点文件路径
+        graph_max_messages: 图对话链会话状态中保留的最大消息数，超出后触发摘要节点
+        graph_keep_messages: 摘要后保留的最近消息数，其余消息并入摘要
+        graph_summary_max_chars: 摘要的最大字符数，超出部分截断
+        history_compress_min_chars: 缓冲记忆中压缩保存的最短消息长度（字符），0表示不压缩
+        summary_max_tokens: 摘要记忆缓冲区的token上限，超出后较早的消息并入摘要
+    """
+    retrieval_top_k: int = 4
+    retrieval_window: int = 3
+    retrieval_max_turns: int = 2000
+    retrieval_max_chars: int = 2000
+    graph_checkpoint_path: str = str(PROJECT_ROOT / ".cache" / "graph_checkpoints.sqlite")
+    graph_max_messages: int = 20
+    graph_keep_messages: int = 6
+    graph_summary_max_chars: int = 1000
+    history_compress_min_chars: int = 512
+    summary_max_tokens: int = 1000
+
+
+# 全局记忆配置
+MEMORY_CONFIG = MemoryConfig()
@@ -11,7 +11,7 @@
 """
 
 from enum import Enum
-from typing import Dict, Any
+from typing import Dict, Any, Optional, List
 from pydantic import BaseModel
 
 
@@ -45,8 +45,19 @@ class ModelConfig(BaseModel):
         api_key: API访问密钥（可选，本地模型不需要）
         temperature: 生成文本的随机性控制参数（0-1之间）
         max_tokens: 单次生成的最大token数量限制
+        context_window: 上下文长度（传给Ollama的num_ctx），检索增强模式据此计算检索片段的token预算
         supports_memory: 是否支持对话记忆功能
         description: 模型的描述信息，包含特性说明
+        keep_alive: 模型在Ollama中空闲驻留的时长，例如"10m"，None表示使用服务端默认值
+        supports_thinking: 是否为思考型模型（回复中带有 <think> 推理块）
+        fast_mode: 是否默认关闭思考，以更少的生成token换取更低的延迟
+        supports_tools: 是否支持工具调用
+        capability: 相对能力等级（1最弱），自动路由据此判断模型能否胜任请求
+        replica_urls: 部署了同一模型的其他Ollama地址，用于请求对冲
+        fallback_model: 对冲时可以使用的备用模型键
+        hedge: 是否启用请求对冲（首token超时后向副本或备用模型发送重复请求）
+        hedge_percentile: 对冲阈值取该模型首token延迟的第几百分位
+        max_concurrency: 准入控制允许的最大并发请求数，超出的请求进入有界队列
     """
     name: str                           # 模型名称
     provider: ModelProvider             # 提供商类型
@@ -55,32 +66,45 @@ class ModelConfig(BaseModel):
     api_key: str = None                # API密钥（可选）
     temperature: float = 0.7           # 温度参数，控制输出随机性
     max_tokens: int = 2000             # 最大输出token数
+    context_window: int = 4096         # 上下文长度（num_ctx）
     supports_memory: bool = True       # 是否支持记忆功能
     description: str = ""              # 模型描述
+    keep_alive: Optional[str] = "10m"  # 空闲驻留时长，减少模型反复加载
+    supports_thinking: bool = False    # 是否为思考型模型
+    fast_mode: bool = False            # 默认是否关闭思考（快速模式）
+    supports_tools: bool = True        # 是否支持工具调用
+    capability: int = 1                # 相对能力等级，用于自动路由
+    replica_urls: List[str] = []       # 同一模型的副本地址
+    fallback_model: Optional[str] = None  # 对冲用的备用模型
+    hedge: bool = False                # 是否启用请求对冲
+    hedge_percentile: float = 95.0     # 对冲阈值对应的首token延迟百分位
+    max_concurrency: int = 4           # 准入控制的并发上限
 
 
 # 全局模型配置字典
+# 系统支持的所有模型配置
+#
+# 键值对结构：
+# - key: 模型的唯一标识符，用于API调用时指定模型
+# - value: ModelConfig实例，包含该模型的完整配置信息
+#
+# 当前配置的模型都是基于Ollama本地部署的开源模型：
+# - qwen3:0.6b: 轻量级模型，支持工具调用和思维链
+# - gemma3:4b: Google Gemma模型，不支持工具调用
+# - qwen3:4b: 中等规模模型，支持工具调用和思维链
+# - qwen2.5:3b: 新版本模型，支持工具调用和思维链
+#
+# 注意：不能在字典字面量内部写文档字符串，否则会与第一个键拼接成一个键
 MODEL_CONFIGS: Dict[str, ModelConfig] = {
-    """
-    系统支持的所有模型配置
-
-    键值对结构：
-    - key: 模型的唯一标识符，用于API调用时指定模型
-    - value: ModelConfig实例，包含该模型的完整配置信息
-
-    当前配置的模型都是基于Ollama本地部署的开源模型：
-    - qwen3:0.6b: 轻量级模型，支持工具调用和思维链
-    - gemma3:4b: Google Gemma模型，不支持工具调用
-    - qwen3:4b: 中等规模模型，支持工具调用和思维链
-    - qwen2.5:3b: 新版本模型，支持工具调用和思维链
-    """
-
     "qwen3:0.6b": ModelConfig(
         name="qwen3:0.6b",                    # 模型显示名称
         provider=ModelProvider.OLLAMA,        # 使用Ollama提供商
         model_id="qwen3:0.6b",               # Ollama中的模型ID
         base_url="http://localhost:11434",    # Ollama默认服务地址
-        description="tool,thinking,轻量"      # 特性：支持工具调用、思维链推理、轻量级
+        description="tool,thinking,轻量",     # 特性：支持工具调用、思维链推理、轻量级
+        supports_thinking=True,               # 思考型模型
+        fast_mode=True,                       # 轻量模型默认追求低延迟，关闭思考
+        capability=1                          # 能力最弱、速度最快
     ),
 
     "gemma3:4b": ModelConfig(
@@ -88,7 +112,9 @@ MODEL_CONFIGS: Dict[str, ModelConfig] = {
         provider=ModelProvider.OLLAMA,        # 使用Ollama提供商
         model_id="gemma3:4b",                # Ollama中的模型ID
         base_url="http://localhost:11434",    # Ollama默认服务地址
-        description="no tool"                 # 特性：不支持工具调用
+        description="no tool",                # 特性：不支持工具调用
+        supports_tools=False,                 # 不支持工具调用
+        capability=2
     ),
 
     "qwen3:4b": ModelConfig(
@@ -96,7 +122,10 @@ MODEL_CONFIGS: Dict[str, ModelConfig] = {
         provider=ModelProvider.OLLAMA,        # 使用Ollama提供商
         model_id="qwen3:4b",                 # Ollama中的模型ID
         base_url="http://localhost:11434",    # Ollama默认服务地址
-        description="tool thinking"           # 特性：支持工具调用和思维链推理
+        description="tool thinking",          # 特性：支持工具调用和思维链推理
+        supports_thinking=True,               # 思考型模型
+        capability=3,                         # 当前配置中能力最强
+        max_concurrency=2                     # 较大的模型并发过高时整体变慢
     ),
 
     "qwen2.5:3b": ModelConfig(
@@ -104,6 +133,7 @@ MODEL_CONFIGS: Dict[str, ModelConfig] = {
         provider=ModelProvider.OLLAMA,        # 使用Ollama提供商
         model_id="qwen2.5:3b",               # Ollama中的模型ID
         base_url="http://localhost:11434",    # Ollama默认服务地址
-        description="tool thinking"           # 特性：支持工具调用和思维链推理
+        description="tool thinking",          # 特性：支持工具调用和思维链推理
+        capability=2
     )
 }
\ No newline at end of file
@@ -0,0 +1,94 @@
+"""
+检索配置模块
+
+定义检索增强生成（RAG）相关的参数：嵌入模型、持久化索引位置、
+召回数量、上下文的token预算、服务索引的选型，以及文档入库流水线的切分和并行参数。
+"""
+
+from pathlib import Path
+from typing import List, Optional
+from pydantic import BaseModel
+
+# 项目根目录（app的上一级），用于定位notebook中持久化的索引
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+
+
+class RetrievalConfig(BaseModel):
+    """
+    检索配置数据模型
+
+    Attributes:
+        embedding_model: Ollama中的嵌入模型ID
+        embedding_base_url: 嵌入模型服务地址
+        index_path: FAISS持久化索引目录（FAISS.save_local的输出）
+        top_k: 每次检索返回的片段数
+        fetch_k: 打包前召回的候选片段数，多于top_k以便在预算内挑选
+        context_tokens: 放入提示的检索片段总token预算上限，实际预算还受模型上下文长度限制
+        answer_reserve_tokens: 计算检索片段预算时为模型回答预留的token数
+        retrieval_mode: 检索模式，"vector"、"bm25" 或 "hybrid"（两路并发检索后RRF融合）
+        rrf_k: 倒数排名融合的平滑常数
+        hybrid_weights: 混合检索融合时向量检索和BM25检索的权重
+        mmr_enabled: 是否用MMR在融合结果中挑选内容多样的片段
+        mmr_lambda: MMR的相关性权重，越小越强调多样性
+        index_type: 服务索引类型，"auto" 按向量数和召回率目标选择，也可以指定 "flat"、"ivf"、"hnsw"
+        recall_target: 服务索引的召回率目标（recall@10），用于选型和校准搜索参数
+        flat_max_vectors: 自动选型时使用精确Flat索引的最大向量数
+        index_mmap: 是否以内存映射方式加载索引，多个worker进程共享页缓存
+        metadata_fields: 建立元数据过滤索引的字段
+        filter_exact_max: 过滤后候选向量数不超过该值时直接精确计算距离，否则交给FAISS按位图过滤
+        text_splitter: 入库时的切分方式，"token" 按token数在句子和标题边界切分，"recursive" 使用按字符数的
+            RecursiveCharacterTextSplitter
+        chunk_size: 入库时文本切分的片段长度（text_splitter为token时按token计，为recursive时按字符计）
+        chunk_overlap: 相邻片段的重叠长度（单位同chunk_size）
+        json_jq_schema: JSON文件的默认jq表达式，选出要入库的文本
+        pdf_layout: PDF是否需要版面保真，True时使用pdfplumber（未安装时退回pypdf），False时使用更快的pypdf
+        pdf_workers: 单个PDF按页并行提取的进程数；入库流水线已经按文件并行，默认在解析进程内逐页提取
+        pdf_cache_enabled: 是否按 (文件哈希, 页码, 提取器版本) 缓存PDF页面文本
+        pdf_cache_dir: PDF页面文本缓存目录
+        ingest_workers: 解析和切分文件的进程数，None表示使用CPU核数
+        ingest_files_per_task: 每个进程任务处理的文件数，摊薄小文件的进程通信开销
+        embed_batch_size: 每次嵌入请求的片段数
+        embed_concurrency: 同时进行的嵌入请求数
+        embedding_cache_enabled: 是否启用持久化的嵌入缓存（入库和查询共用）
+        embedding_cache_dir: 嵌入缓存目录，每个嵌入模型一个子目录
+        embedding_cache_max_bytes: 每个模型缓存向量的最大字节数，超出后淘汰最久未使用的条目
+        ingest_root: 入库接口允许读取的文档根目录，POST /ingest 只能入库该目录下的子目录
+    """
+    embedding_model: str = "nomic-embed-text:latest"
+    embedding_base_url: str = "http://localhost:11434"
+    index_path: str = str(PROJECT_ROOT / "langchain" / "dataConnection" / "faiss_index")
+    top_k: int = 4
+    fetch_k: int = 8
+    context_tokens: int = 1500
+    answer_reserve_tokens: int = 512
+    retrieval_mode: str = "hybrid"
+    rrf_k: int = 60
+    hybrid_weights: List[float] = [1.0, 1.0]
+    mmr_enabled: bool = False
+    mmr_lambda: float = 0.5
+    index_type: str = "auto"
+    recall_target: float = 0.95
+    flat_max_vectors: int = 20000
+    index_mmap: bool = True
+    metadata_fields: List[str] = ["source", "store", "date", "tags"]
+    filter_exact_max: int = 4096
+    text_splitter: str = "token"
+    chunk_size: int = 256
+    chunk_overlap: int = 32
+    json_jq_schema: str = "."
+    pdf_layout: bool = True
+    pdf_workers: int = 1
+    pdf_cache_enabled: bool = True
+    pdf_cache_dir: str = str(PROJECT_ROOT / ".cache" / "pdf_text")
+    ingest_workers: Optional[int] = None
+    ingest_files_per_task: int = 16
+    embed_batch_size: int = 64
+    embed_concurrency: int = 2
+    embedding_cache_enabled: bool = True
+    embedding_cache_dir: str = str(PROJECT_ROOT / ".cache" / "embeddings")
+    embedding_cache_max_bytes: int = 512 * 1024 * 1024
+    ingest_root: str = str(PROJECT_ROOT / "langchain" / "dataConnection" / "docs")
+
+
+# 全局检索配置
+RETRIEVAL_CONFIG = RetrievalConfig()
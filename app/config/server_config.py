@@ -0,0 +1,38 @@
+"""
+服务配置模块
+
+定义与具体模型无关的服务级参数，例如请求准入控制的队列容量和排队时限。
+"""
+
+from typing import Dict
+from pydantic import BaseModel
+
+
+class ServerConfig(BaseModel):
+    """
+    服务配置数据模型
+
+    Attributes:
+        admission_enabled: 是否启用请求准入控制
+        admission_max_queue: 每个模型的排队请求上限，队列满时拒绝（或挤掉更低优先级的请求）
+        admission_max_wait: 各优先级允许的最长排队时间（秒），预计等待超过该值时直接拒绝
+        admission_default_latency: 模型没有延迟样本时，估算排队时间使用的单次调用耗时（秒）
+        default_request_timeout: 请求未指定超时时间时使用的端到端截止时间（秒）
+        max_request_timeout: 请求可以指定的最长超时时间（秒），超过时截断
+        summary_timeout: 后台摘要压缩的超时时间（秒）
+    """
+    admission_enabled: bool = True
+    admission_max_queue: int = 32
+    admission_max_wait: Dict[str, float] = {
+        "interactive": 10.0,   # 交互式对话：用户在等，宁可快速失败
+        "batch": 60.0,         # 批处理任务
+        "background": 120.0,   # 后台任务，例如对话摘要
+    }
+    admission_default_latency: float = 2.0
+    default_request_timeout: float = 60.0
+    max_request_timeout: float = 300.0
+    summary_timeout: float = 60.0
+
+
+# 全局服务配置
+SERVER_CONFIG = ServerConfig()
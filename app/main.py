@@ -7,9 +7,11 @@ FastAPI主应用模块
 主要功能：
 1. 创建FastAPI应用实例
 2. 配置CORS中间件支持跨域请求
-3. 注册聊天相关的API路由
+3. 注册聊天和文档入库相关的API路由
 4. 提供基础的健康检查端点
-5. 配置开发服务器启动参数
+5. 导出Prometheus格式的运行指标
+6. 准入控制拒绝的请求统一返回 429 + Retry-After，超过截止时间的请求返回 504
+7. 配置开发服务器启动参数
 
 技术栈：
 - FastAPI: 现代高性能的Python Web框架
@@ -17,10 +19,16 @@ FastAPI主应用模块
 - CORS: 跨域资源共享支持
 """
 
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse, JSONResponse
 from api.routes.chat import router as chat_router
 from api.routes.test import router as test_router
+from api.routes.ingest import router as ingest_router
+from app.services.metrics import metrics
+from app.services.admission import AdmissionRejected
+from app.services.deadline import DeadlineExceeded
+from app.chains.chain_factory import ChainFactory
 
 # 创建FastAPI应用实例
 # title: 应用标题，显示在自动生成的API文档中
@@ -47,6 +55,34 @@ app.add_middleware(
 # chat_router包含所有/chat前缀的API端点
 app.include_router(chat_router)
 app.include_router(test_router)
+app.include_router(ingest_router)
+
+
+@app.on_event("shutdown")
+async def close_graph_checkpointer():
+    """关闭图对话链的SQLite检查点连接"""
+    graph_chain = ChainFactory.get_instance("graph")
+    if graph_chain is not None:
+        await graph_chain.aclose()
+
+
+@app.exception_handler(AdmissionRejected)
+async def admission_rejected_handler(request: Request, exc: AdmissionRejected):
+    """模型繁忙时快速失败，提示客户端稍后重试"""
+    return JSONResponse(
+        status_code=429,
+        content={"detail": str(exc), "reason": exc.reason},
+        headers={"Retry-After": str(exc.retry_after)}
+    )
+
+
+@app.exception_handler(DeadlineExceeded)
+async def deadline_exceeded_handler(request: Request, exc: DeadlineExceeded):
+    """请求超过截止时间，生成已被取消"""
+    return JSONResponse(
+        status_code=504,
+        content={"detail": str(exc), "stage": exc.stage}
+    )
 
 
 @app.get("/")
@@ -74,6 +110,12 @@ async def health_check():
     }
 
 
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """以Prometheus文本格式导出运行指标（模型切换次数、加载耗时等）"""
+    return metrics.render()
+
+
 # 应用启动配置
 # 只有在直接运行此文件时才会执行（python app/main.py）
 if __name__ == "__main__":
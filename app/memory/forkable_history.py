@@ -0,0 +1,153 @@
+"""
+可分叉的对话历史模块
+
+前端支持从任意一条消息重新生成或分出新的对话分支。如果把消息列表整个复制到新会话，
+每个分支的内存开销与历史长度成正比，一个长对话分出几百个分支就会复制几百份历史。
+
+该模块用持久化（不可变）单链表保存消息：每个节点保存一条消息和指向前一条消息的指针，
+会话只持有末尾节点。追加消息只创建新节点，不修改已有节点，因此：
+
+- 分叉：新会话直接指向原会话第 N 条消息的节点，共享前 N 条消息，内存开销 O(1)
+- 各分支之后追加的消息互不影响，原会话被清除后分支的历史仍然完整（节点由引用计数回收）
+- 读取全部消息需要从末尾向前遍历 O(n)，与缓冲记忆每轮把全部历史放入提示的开销相同
+
+紧凑存储：每条 HumanMessage/AIMessage 是带十几个字段的pydantic对象（空消息也约占1KB），
+十万个活跃会话时这部分开销占据了进程的大部分内存。节点因此不保存消息对象，只保存：
+
+- 角色：小整数（用户、助手、系统）
+- 内容：较短的内容用 sys.intern 驻留，"好的"之类重复出现的内容只保存一份；
+  不少于 history_compress_min_chars 个字符的内容用zlib压缩，压缩后更小时保存压缩结果
+
+读取 messages（即构建提示）时才按需创建消息对象。带有附加字段（工具调用、元数据、ID等）
+或其他类型的消息无法只用角色和内容还原，原样保存消息对象。
+
+使用示例：
+    >>> history = ForkableChatMessageHistory()
+    >>> history.add_messages([HumanMessage(content="你好"), AIMessage(content="你好！")])
+    >>> branch = history.fork(1)   # 只保留第一条消息
+    >>> branch.add_ai_message("换一种回答")
+"""
+
+import sys
+import zlib
+from typing import List, Optional, Sequence, Union
+
+from langchain_core.chat_history import BaseChatMessageHistory
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, SystemMessage
+
+from ..config.memory_config import MEMORY_CONFIG
+
+# 角色编码；_RAW 表示节点原样保存了消息对象
+_RAW = -1
+_ROLES = (HumanMessage, AIMessage, SystemMessage)
+_ROLE_CODES = {message_class: code for code, message_class in enumerate(_ROLES)}
+# 不超过该长度的内容驻留
+_INTERN_MAX_CHARS = 64
+
+
+def _is_plain(message: BaseMessage) -> bool:
+    """消息能否只用角色和文本内容还原"""
+    if type(message) not in _ROLE_CODES or not isinstance(message.content, str):
+        return False
+    if message.additional_kwargs or message.response_metadata or message.id is not None or message.name is not None:
+        return False
+    return not isinstance(message, AIMessage) or not (
+        message.tool_calls or message.invalid_tool_calls or message.usage_metadata
+    )
+
+
+def _pack(content: str) -> Union[str, bytes]:
+    """压缩或驻留消息内容"""
+    if len(content) <= _INTERN_MAX_CHARS:
+        return sys.intern(content)
+    min_chars = MEMORY_CONFIG.history_compress_min_chars
+    if min_chars and len(content) >= min_chars:
+        compressed = zlib.compress(content.encode("utf-8"), 1)
+        if sys.getsizeof(compressed) < sys.getsizeof(content):
+            return compressed
+    return content
+
+
+class _Node:
+    """
+    链表节点：一条消息的紧凑记录、前一条消息的节点和从会话开头到本节点的消息数
+
+    role 为角色编码时 content 是文本（str）或压缩后的UTF-8文本（bytes）；
+    role 为 _RAW 时 content 是原样保存的消息对象。
+    """
+
+    __slots__ = ("role", "content", "parent", "length")
+
+    def __init__(self, message: BaseMessage, parent: Optional["_Node"]):
+        if _is_plain(message):
+            self.role = _ROLE_CODES[type(message)]
+            self.content = _pack(message.content)
+        else:
+            self.role = _RAW
+            self.content = message
+        self.parent = parent
+        self.length = parent.length + 1 if parent is not None else 1
+
+    @property
+    def message(self) -> BaseMessage:
+        """创建消息对象"""
+        if self.role == _RAW:
+            return self.content
+        content = self.content
+        if isinstance(content, bytes):
+            content = zlib.decompress(content).decode("utf-8")
+        return _ROLES[self.role](content=content)
+
+
+class ForkableChatMessageHistory(BaseChatMessageHistory):
+    """
+    基于持久化单链表、支持O(1)分叉的紧凑对话历史
+
+    可以作为 ConversationBufferMemory 的 chat_memory 使用。
+    """
+
+    def __init__(self, tail: Optional[_Node] = None):
+        self._tail = tail
+
+    def __len__(self) -> int:
+        return self._tail.length if self._tail is not None else 0
+
+    @property
+    def messages(self) -> List[BaseMessage]:
+        """按时间顺序返回全部消息（每次读取都新建消息对象，修改它们不会影响历史）"""
+        nodes = []
+        node = self._tail
+        while node is not None:
+            nodes.append(node)
+            node = node.parent
+        return [node.message for node in reversed(nodes)]
+
+    def add_message(self, message: BaseMessage) -> None:
+        self._tail = _Node(message, self._tail)
+
+    def add_messages(self, messages: Sequence[BaseMessage]) -> None:
+        for message in messages:
+            self._tail = _Node(message, self._tail)
+
+    def clear(self) -> None:
+        self._tail = None
+
+    def fork(self, length: int) -> "ForkableChatMessageHistory":
+        """
+        创建只包含前 length 条消息的新历史，与本历史共享这些消息
+
+        Args:
+            length (int): 新历史保留的消息数，0 表示空历史
+
+        Returns:
+            ForkableChatMessageHistory: 新的历史，之后的追加与本历史互不影响
+
+        Raises:
+            ValueError: length 小于0或大于本历史的消息数
+        """
+        if not 0 <= length <= len(self):
+            raise ValueError(f"分叉位置必须在 0 到 {len(self)} 之间: {length}")
+        node = self._tail
+        while node is not None and node.length > length:
+            node = node.parent
+        return ForkableChatMessageHistory(node)
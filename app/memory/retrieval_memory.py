@@ -0,0 +1,196 @@
+"""
+检索式长期记忆模块
+
+缓冲记忆每轮都把全部历史放入提示，摘要记忆则会丢失细节。检索记忆把每轮对话（用户输入和回复）
+嵌入后放入会话自己的向量索引，构建提示时只放入：
+
+- 与当前输入最相关的 top_k 轮较早的对话（按时间顺序排列）
+- 最近 window 轮对话（保证上下文连贯，不依赖检索）
+
+提示长度只取决于 top_k + window，与对话总轮数无关。
+
+索引结构：每个会话一个最多 max_turns 轮的环形缓冲区，向量保存在 float32 矩阵中
+（已归一化，内积即余弦相似度）。缓冲区和矩阵从 _INITIAL_TURNS 轮开始按需倍增，
+达到 max_turns 后新一轮覆盖最早的一轮，内存与实际保留的轮数成正比且有上限。
+检索是一次矩阵-向量乘法加 argpartition。
+
+增量索引：每轮对话先以文本写入缓冲区（立即出现在最近窗口中），嵌入在后台批量完成；
+嵌入失败的轮次留在待索引列表中，下一轮一起重试。
+
+使用示例：
+    >>> memory = RetrievalMemory(get_embeddings(), top_k=4, window=3)
+    >>> memory.add_turn("我养了一只叫豆豆的猫", "豆豆这个名字很可爱！")
+    >>> await memory.aindex_pending()
+    >>> messages = await memory.aload_messages("我的猫叫什么？")
+"""
+
+import asyncio
+import logging
+from typing import List, Optional, Tuple
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage
+
+from ..config.memory_config import MEMORY_CONFIG
+
+logger = logging.getLogger(__name__)
+
+# 缓冲区的初始容量（轮），之后按需倍增到 max_turns
+_INITIAL_TURNS = 16
+
+
+class RetrievalMemory:
+    """
+    按相关性召回历史轮次的会话记忆
+
+    Attributes:
+        embeddings: 嵌入模型（与检索使用同一个，带嵌入缓存）
+        top_k: 每次召回的相关历史轮数
+        window: 总是放入提示的最近轮数
+        max_turns: 保留的最大轮数
+        max_chars: 每轮参与嵌入的最大字符数
+    """
+
+    def __init__(self, embeddings: Embeddings, top_k: int = MEMORY_CONFIG.retrieval_top_k,
+                 window: int = MEMORY_CONFIG.retrieval_window,
+                 max_turns: int = MEMORY_CONFIG.retrieval_max_turns,
+                 max_chars: int = MEMORY_CONFIG.retrieval_max_chars):
+        self.embeddings = embeddings
+        self.top_k = top_k
+        self.window = window
+        self.max_turns = max(1, max_turns)
+        self.max_chars = max_chars
+
+        self._index_lock = asyncio.Lock()
+        self._reset()
+
+    def _reset(self) -> None:
+        # 环形缓冲区：槽位 i 保存轮次号 turn 满足 turn % max_turns == i 的对话；
+        # 容量达到 max_turns 之前轮次号小于容量，槽位就是轮次号
+        capacity = min(_INITIAL_TURNS, self.max_turns)
+        self._turns: List[Optional[Tuple[str, str]]] = [None] * capacity
+        self._turn_ids = np.full(capacity, -1, dtype=np.int64)
+        self._indexed = np.zeros(capacity, dtype=bool)
+        self._vectors: Optional[np.ndarray] = None
+        self._total = 0
+        self._pending: List[int] = []
+
+    def _grow(self) -> None:
+        """缓冲区容量倍增（不超过 max_turns）；向量矩阵在下一次索引时扩容"""
+        capacity = len(self._turn_ids)
+        extra = min(capacity * 2, self.max_turns) - capacity
+        self._turns.extend([None] * extra)
+        self._turn_ids = np.concatenate([self._turn_ids, np.full(extra, -1, dtype=np.int64)])
+        self._indexed = np.concatenate([self._indexed, np.zeros(extra, dtype=bool)])
+
+    def __len__(self) -> int:
+        """当前保留的轮数"""
+        return min(self._total, self.max_turns)
+
+    def _text(self, turn: Tuple[str, str]) -> str:
+        user, assistant = turn
+        return f"{user}\n{assistant}"[:self.max_chars]
+
+    def add_turn(self, user: str, assistant: str) -> int:
+        """
+        写入一轮对话（不嵌入），返回轮次号
+
+        写满后覆盖最早的一轮，被覆盖轮次的向量同时失效。
+        """
+        turn_id = self._total
+        if turn_id == len(self._turn_ids) < self.max_turns:
+            self._grow()
+        slot = turn_id % self.max_turns
+        self._turns[slot] = (user, assistant)
+        self._turn_ids[slot] = turn_id
+        self._indexed[slot] = False
+        self._pending.append(turn_id)
+        self._total += 1
+        return turn_id
+
+    async def aindex_pending(self) -> int:
+        """
+        批量嵌入尚未索引的轮次
+
+        Returns:
+            int: 本次索引的轮数；嵌入失败时为0，待索引的轮次保留到下一次
+        """
+        async with self._index_lock:
+            oldest = self._total - self.max_turns
+            turn_ids = [turn_id for turn_id in self._pending if turn_id >= oldest]
+            if not turn_ids:
+                self._pending = []
+                return 0
+            texts = [self._text(self._turns[turn_id % self.max_turns]) for turn_id in turn_ids]
+            try:
+                vectors = np.asarray(await self.embeddings.aembed_documents(texts), dtype=np.float32)
+            except Exception as e:
+                logger.warning(f"记忆嵌入失败，{len(turn_ids)} 轮对话留待下次索引: {e}")
+                return 0
+            capacity = len(self._turn_ids)
+            if self._vectors is None:
+                self._vectors = np.zeros((capacity, vectors.shape[1]), dtype=np.float32)
+            elif len(self._vectors) < capacity:
+                grown = np.zeros((capacity, self._vectors.shape[1]), dtype=np.float32)
+                grown[:len(self._vectors)] = self._vectors
+                self._vectors = grown
+            vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+
+            indexed = set()
+            for turn_id, vector in zip(turn_ids, vectors):
+                slot = turn_id % self.max_turns
+                # 嵌入期间槽位可能已被更新的轮次覆盖，或者会话已被清除
+                if slot < len(self._turn_ids) and self._turn_ids[slot] == turn_id:
+                    self._vectors[slot] = vector
+                    self._indexed[slot] = True
+                indexed.add(turn_id)
+            self._pending = [turn_id for turn_id in self._pending if turn_id not in indexed]
+            return len(indexed)
+
+    def _recent_ids(self) -> List[int]:
+        return list(range(max(self._total - self.window, self._total - self.max_turns, 0), self._total))
+
+    def _messages(self, turn_ids: List[int]) -> List[BaseMessage]:
+        messages: List[BaseMessage] = []
+        for turn_id in turn_ids:
+            user, assistant = self._turns[turn_id % self.max_turns]
+            messages.append(HumanMessage(content=user))
+            messages.append(AIMessage(content=assistant))
+        return messages
+
+    async def aload_messages(self, query: str) -> List[BaseMessage]:
+        """
+        构建提示使用的历史消息：相关的较早轮次加最近窗口，按时间顺序排列
+
+        Args:
+            query (str): 当前用户输入
+
+        Returns:
+            List[BaseMessage]: 历史消息，最多 2 × (top_k + window) 条
+        """
+        recent = self._recent_ids()
+        relevant: List[int] = []
+        # 最近窗口之外、已经完成嵌入的轮次参与检索
+        candidates = np.flatnonzero(self._indexed & (self._turn_ids >= 0)
+                                    & (self._turn_ids < (recent[0] if recent else self._total)))
+        if self.top_k > 0 and len(candidates) and self._vectors is not None:
+            try:
+                query_vector = np.asarray(await self.embeddings.aembed_query(query[:self.max_chars]),
+                                          dtype=np.float32)
+            except Exception as e:
+                logger.warning(f"记忆检索的查询嵌入失败，只使用最近窗口: {e}")
+            else:
+                scores = self._vectors[candidates] @ query_vector
+                k = min(self.top_k, len(candidates))
+                best = candidates[np.argpartition(-scores, k - 1)[:k]]
+                relevant = sorted(int(turn_id) for turn_id in self._turn_ids[best])
+        return self._messages(relevant + recent)
+
+    @property
+    def messages(self) -> List[BaseMessage]:
+        """保留的全部轮次（按时间顺序），用于查看会话历史"""
+        return self._messages(list(range(max(0, self._total - self.max_turns), self._total)))
+
+    def clear(self) -> None:
+        self._reset()
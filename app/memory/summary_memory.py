@@ -0,0 +1,129 @@
+"""
+增量计数的摘要记忆模块
+
+ConversationSummaryBufferMemory 每次保存对话后都用模型的分词器重新计数整个缓冲区的token，
+超出上限时每移出一条消息又重新计数一遍剩余的缓冲区，单轮开销随缓冲区长度增长，
+而且这一步在 MemoryChain 的请求处理路径上执行。该模块的摘要记忆：
+
+1. 每条消息写入时用本地分词器（tiktoken，不可用时按字符估算，见 retrieval.tokens）计数一次并缓存
+2. 维护缓冲区的token总数，写入时累加、移出时扣减，判断是否需要摘要是 O(1) 的
+3. 摘要时从最早的消息开始按缓存的计数移出，直到总数不超过上限，只处理被移出的消息
+4. 被移出的消息在摘要成功后才从缓冲区删除，摘要失败时消息保留，下一轮再试
+
+构建提示时，已有的摘要作为一条系统消息放在缓冲区消息之前。
+
+使用示例：
+    >>> memory = SummaryBufferMemory(ModelFactory.create_model("qwen3:0.6b", fast=True), max_token_limit=1000)
+    >>> memory.add_messages([HumanMessage(content="你好"), AIMessage(content="你好！")])
+    >>> if memory.needs_pruning:
+    ...     await memory.aprune()
+    >>> messages = memory.prompt_messages
+"""
+
+from collections import deque
+from typing import Deque, List, Sequence
+
+from langchain.memory.prompt import SUMMARY_PROMPT
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import BaseMessage, SystemMessage, get_buffer_string
+
+from ..chains.reasoning_parser import strip_reasoning
+from ..config.memory_config import MEMORY_CONFIG
+from ..retrieval.tokens import count_tokens_batch
+
+# 每条消息除内容外的token数（角色前缀和分隔符）
+_MESSAGE_OVERHEAD = 4
+
+
+class SummaryBufferMemory:
+    """
+    按缓存的token计数维护缓冲区、超出上限时把较早消息并入摘要的记忆
+
+    Attributes:
+        llm: 生成摘要的模型
+        max_token_limit: 缓冲区的token上限
+        summary: 较早消息的滚动摘要
+    """
+
+    def __init__(self, llm: BaseChatModel, max_token_limit: int = MEMORY_CONFIG.summary_max_tokens):
+        self.llm = llm
+        self.max_token_limit = max_token_limit
+        self.summary = ""
+        self._messages: Deque[BaseMessage] = deque()
+        self._counts: Deque[int] = deque()
+        self._buffer_tokens = 0
+        # clear() 时递增，摘要期间会话被清除时丢弃摘要结果
+        self._generation = 0
+
+    def __len__(self) -> int:
+        """缓冲区中的消息数"""
+        return len(self._messages)
+
+    @property
+    def buffer_tokens(self) -> int:
+        """缓冲区消息的token总数"""
+        return self._buffer_tokens
+
+    @property
+    def needs_pruning(self) -> bool:
+        return self._buffer_tokens > self.max_token_limit
+
+    @property
+    def messages(self) -> List[BaseMessage]:
+        """缓冲区中的消息（不含摘要）"""
+        return list(self._messages)
+
+    @property
+    def prompt_messages(self) -> List[BaseMessage]:
+        """构建提示使用的历史消息：有摘要时以系统消息形式放在最前"""
+        if not self.summary:
+            return list(self._messages)
+        return [SystemMessage(content=f"之前对话的摘要：\n{self.summary}")] + list(self._messages)
+
+    def add_messages(self, messages: Sequence[BaseMessage]) -> None:
+        """写入消息，每条消息计数一次"""
+        counts = count_tokens_batch([get_buffer_string([message]) for message in messages])
+        for message, count in zip(messages, counts):
+            count += _MESSAGE_OVERHEAD
+            self._messages.append(message)
+            self._counts.append(count)
+            self._buffer_tokens += count
+
+    async def aprune(self) -> bool:
+        """
+        缓冲区超出上限时，把最早的消息并入摘要
+
+        调用方需要保证同一记忆同一时刻只有一个摘要在执行（MemoryChain 按会话加锁）。
+
+        Returns:
+            bool: 是否更新了摘要；缓冲区未超出上限或会话在摘要期间被清除时为False
+
+        Raises:
+            Exception: 摘要模型调用失败，缓冲区保持不变
+        """
+        if not self.needs_pruning:
+            return False
+        # 按缓存的计数确定要移出的消息，移出后总数不超过上限
+        remaining, pruned = self._buffer_tokens, 0
+        while remaining > self.max_token_limit and pruned < len(self._counts):
+            remaining -= self._counts[pruned]
+            pruned += 1
+
+        generation = self._generation
+        new_lines = get_buffer_string([self._messages[i] for i in range(pruned)])
+        result = await self.llm.ainvoke(SUMMARY_PROMPT.format(summary=self.summary, new_lines=new_lines))
+        if generation != self._generation:
+            return False
+
+        self.summary = strip_reasoning(result.content).strip()
+        for _ in range(pruned):
+            self._messages.popleft()
+            self._buffer_tokens -= self._counts.popleft()
+        return True
+
+    def clear(self) -> None:
+        self.summary = ""
+        self._messages.clear()
+        self._counts.clear()
+        self._buffer_tokens = 0
+        self._generation += 1
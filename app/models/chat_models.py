@@ -17,7 +17,7 @@
 """
 
 from pydantic import BaseModel, Field
-from typing import Optional
+from typing import Any, Dict, List, Literal, Optional
 
 
 class ChatRequest(BaseModel):
@@ -31,7 +31,11 @@ class ChatRequest(BaseModel):
         message: 用户输入的消息内容，必填字段
         model_key: 指定使用的模型，可选，默认使用系统默认模型
         chat_id: 会话标识符，用于记忆模式下区分不同对话
-        memory_type: 记忆类型，支持"buffer"和"summary"两种模式
+        memory_type: 记忆类型，支持"buffer"、"summary"和"retrieval"三种模式
+        fast: 快速模式开关，仅对思考型模型生效
+        priority: 请求优先级，交互式请求优先于批处理请求获得执行许可
+        timeout: 端到端超时时间（秒），也可通过 X-Request-Timeout 请求头指定
+        filter: 检索增强模式下的元数据过滤条件，只在满足条件的资料片段中检索
 
     Example:
         >>> request = ChatRequest(
@@ -49,7 +53,7 @@ class ChatRequest(BaseModel):
 
     model_key: Optional[str] = Field(
         None,
-        description="指定使用的模型键，如果不指定则使用默认模型",
+        description="指定使用的模型键，如果不指定则使用默认模型；'auto'表示根据请求特征和负载自动选择",
         example="qwen3:0.6b"
     )
 
@@ -61,10 +65,35 @@ class ChatRequest(BaseModel):
 
     memory_type: Optional[str] = Field(
         "buffer",
-        description="记忆类型：'buffer'保存完整历史，'summary'智能摘要长对话",
+        description="记忆类型：'buffer'保存完整历史，'summary'智能摘要长对话，'retrieval'按相关性召回历史轮次",
         example="buffer"
     )
 
+    fast: Optional[bool] = Field(
+        None,
+        description="快速模式：关闭思考型模型的推理过程以降低延迟，不指定时使用模型的默认设置",
+        example=True
+    )
+
+    priority: Literal["interactive", "batch"] = Field(
+        "interactive",
+        description="请求优先级：'interactive'为用户实时对话，'batch'为批处理任务，繁忙时先排队或被拒绝",
+        example="interactive"
+    )
+
+    timeout: Optional[float] = Field(
+        None,
+        gt=0,
+        description="端到端超时时间（秒），超时后取消生成并返回504；不指定时使用服务默认值，超过服务上限时截断",
+        example=30
+    )
+
+    filter: Optional[Dict[str, Any]] = Field(
+        None,
+        description="元数据过滤条件（仅检索增强模式），例如 {\"store\": \"store1\", \"date\": {\"$gte\": \"2024-01-01\"}}",
+        example={"tags": {"$all": ["faq"]}}
+    )
+
 
 class ChatResponse(BaseModel):
     """
@@ -79,6 +108,10 @@ class ChatResponse(BaseModel):
         has_memory: 是否使用了记忆功能
         chat_id: 会话标识符（记忆模式下返回）
         memory_type: 使用的记忆类型（记忆模式下返回）
+        sources: 回答引用的资料片段（检索增强模式下返回）
+        timings: 各阶段耗时，单位秒（检索增强模式下返回）
+        context: 上下文打包统计（检索增强模式下返回），包括预算、候选片段原样拼接的token数、
+            实际放入的token数和节省的token数
 
     Example:
         >>> response = ChatResponse(
@@ -119,6 +152,56 @@ class ChatResponse(BaseModel):
         example="buffer"
     )
 
+    sources: Optional[List[Dict[str, Any]]] = Field(
+        None,
+        description="回答引用的资料片段，检索增强模式下返回，index与回答中的[n]标记对应",
+        example=[{"index": 1, "source": "docs/faiss.md", "score": 0.82, "snippet": "FAISS是..."}]
+    )
+
+    timings: Optional[Dict[str, float]] = Field(
+        None,
+        description="各阶段耗时（秒），检索增强模式下返回检索和生成耗时",
+        example={"retrieval_seconds": 0.05, "generation_seconds": 1.8}
+    )
+
+    context: Optional[Dict[str, int]] = Field(
+        None,
+        description="上下文打包统计，检索增强模式下返回",
+        example={"budget_tokens": 1500, "candidate_tokens": 2100, "used_tokens": 1180, "saved_tokens": 920}
+    )
+
+
+class ForkRequest(BaseModel):
+    """
+    会话分叉请求数据模型
+
+    Attributes:
+        fork_at: 分叉位置，新会话包含原会话的前 fork_at 条消息
+        new_chat_id: 新会话的标识符，不指定时自动生成
+        memory_type: 记忆类型，目前只有"buffer"支持分叉
+
+    Example:
+        >>> request = ForkRequest(fork_at=4, new_chat_id="user_123_branch_1")
+    """
+    fork_at: int = Field(
+        ...,
+        ge=0,
+        description="分叉位置，新会话包含原会话的前 fork_at 条消息（消息从0开始编号）",
+        example=4
+    )
+
+    new_chat_id: Optional[str] = Field(
+        None,
+        description="新会话的标识符，不指定时自动生成",
+        example="user_123_branch_1"
+    )
+
+    memory_type: Optional[str] = Field(
+        "buffer",
+        description="记忆类型，目前只有'buffer'支持分叉",
+        example="buffer"
+    )
+
 
 class ModelListResponse(BaseModel):
     """
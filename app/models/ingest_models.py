@@ -0,0 +1,46 @@
+"""
+文档入库数据模型模块
+
+定义入库任务的请求和状态响应结构。
+"""
+
+from typing import Any, Dict, Optional
+
+from pydantic import BaseModel, Field
+
+
+class IngestRequest(BaseModel):
+    """
+    入库请求数据模型
+
+    Attributes:
+        directory: 文档目录，必须位于 RETRIEVAL_CONFIG.ingest_root 下（相对路径相对于该目录），
+            递归遍历其中的 txt/md/csv/json/jsonl/pdf 文件；索引写入检索使用的默认索引
+        workers: 解析进程数，不指定时使用CPU核数
+        jq_schema: JSON文件的jq表达式
+        full: 忽略索引清单全量重建；默认只处理新增、变化和删除的文件
+    """
+    directory: str = Field(..., description="入库根目录下的文档目录", example="manuals")
+    workers: Optional[int] = Field(None, gt=0, description="解析进程数，默认为CPU核数")
+    jq_schema: Optional[str] = Field(None, description="JSON文件的jq表达式", example=".[].content")
+    full: bool = Field(False, description="全量重建索引；默认按清单增量入库")
+
+
+class IngestJobResponse(BaseModel):
+    """
+    入库任务状态响应
+
+    Attributes:
+        job_id: 任务ID
+        status: running / succeeded / failed
+        directory: 文档目录
+        index_path: 索引输出目录
+        report: 进度和吞吐统计（files、chunks、docs_per_sec、chunks_per_sec等）
+        error: 任务失败时的错误信息
+    """
+    job_id: str
+    status: str
+    directory: str
+    index_path: str
+    report: Dict[str, Any] = Field(default_factory=dict)
+    error: Optional[str] = None
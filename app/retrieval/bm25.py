@@ -0,0 +1,320 @@
+"""
+向量化BM25模块
+
+Retrievers.ipynb 中的 BM25Retriever 基于 rank_bm25：每个查询词都要在Python循环里
+遍历全部文档的词频字典，片段数到几万时单次查询就需要数百毫秒。该模块把语料保存为
+按词组织的CSR矩阵（倒排索引），查询时只取出查询词的倒排列表，用NumPy一次算出
+所有命中文档的分数，再用 argpartition 取前k个：
+
+- indptr[t]:indptr[t+1] 是词t的倒排列表，indices 为文档序号，data 为词频
+- 打分公式与 rank_bm25.BM25Okapi 完全一致（k1、b、epsilon下限的idf），
+  同样的分词函数下分数相同
+- 增量添加：新文档先追加到待合并区，下次查询前与主矩阵合并（一次排序）
+- 删除：文档标记为失效，合并时从倒排列表中移除，文档频率和平均长度只统计有效文档；
+  保存时压缩，有效文档重新编号，去掉已删除文档的占位和不再出现的词，反复增量入库时索引不会无限增长
+- 保存/加载：CSR数组保存为 .npy，加载时使用内存映射，不需要重新分词
+- 预过滤：可以传入允许的文档掩码，倒排项在计算贡献之前就按掩码筛掉
+
+只返回至少命中一个查询词的文档。语料很小时（文档数不到常用词文档频率的两倍）idf可能为负，
+此时命中的文档分数也可能为负，但仍按分数排序返回，与 BM25Retriever 的排序一致。
+"""
+
+import json
+import os
+import re
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+BM25_DIR = "bm25"
+
+_NO_DOCS = np.zeros(0, dtype=np.int64)
+
+# 拉丁字母/数字组成的词，或单个中日韩字符
+_TOKEN_PATTERN = re.compile(r"[0-9a-z_]+|[぀-ヿ㐀-䶿一-鿿豈-﫿]")
+_CJK = re.compile(r"[぀-ヿ㐀-䶿一-鿿豈-﫿]")
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    默认分词：英文按词切分并转小写，中文按单字切分并附加相邻两字的组合
+
+    单字保证召回，双字组合近似词语，提升"机器学习"这类查询的排序质量。
+    """
+    tokens = _TOKEN_PATTERN.findall(text.lower())
+    bigrams = [a + b for a, b in zip(tokens, tokens[1:]) if _CJK.fullmatch(a) and _CJK.fullmatch(b)]
+    return tokens + bigrams
+
+
+class BM25Index:
+    """
+    基于CSR倒排矩阵的BM25索引
+
+    Attributes:
+        k1, b, epsilon: BM25Okapi参数，默认值与 rank_bm25 相同
+        ids: 文档序号到外部ID（例如向量索引中的片段ID）的映射，已删除的文档保留占位直到 compact
+
+    使用示例：
+        >>> index = BM25Index()
+        >>> index.add(["c1", "c2"], ["机器学习是人工智能的分支", "深度学习使用神经网络"])
+        >>> index.search("机器学习", k=1)
+        [('c1', 2.13)]
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75, epsilon: float = 0.25,
+                 tokenizer: Callable[[str], List[str]] = tokenize):
+        self.k1 = k1
+        self.b = b
+        self.epsilon = epsilon
+        self.tokenizer = tokenizer
+
+        self.vocab: Dict[str, int] = {}
+        self.ids: List[str] = []
+        self._id_to_doc: Dict[str, int] = {}
+
+        # 主矩阵（按词组织的CSR）
+        self._indptr = np.zeros(1, dtype=np.int64)
+        self._indices = np.zeros(0, dtype=np.int32)
+        self._data = np.zeros(0, dtype=np.float32)
+        self._doc_len = np.zeros(0, dtype=np.float32)
+        self._alive = np.zeros(0, dtype=bool)
+
+        # 待合并的新增文档（COO三元组）和待移除的失效文档
+        self._pending_terms: List[np.ndarray] = []
+        self._pending_docs: List[np.ndarray] = []
+        self._pending_tfs: List[np.ndarray] = []
+        self._has_dead_postings = False
+
+        # 由有效文档计算的统计量
+        self._idf = np.zeros(0, dtype=np.float64)
+        self._avgdl = 0.0
+        self._dirty = False
+
+    def __len__(self) -> int:
+        return len(self._id_to_doc)
+
+    # ---- 写入 ----
+
+    def add(self, ids: Sequence[str], texts: Sequence[str]) -> None:
+        """
+        添加文档；ID已存在时先删除旧文档（与向量索引的片段替换保持一致）
+
+        Args:
+            ids (Sequence[str]): 文档ID
+            texts (Sequence[str]): 文档文本
+        """
+        self.delete([doc_id for doc_id in ids if doc_id in self._id_to_doc])
+        terms, docs, tfs, lengths = [], [], [], []
+        for doc_id, text in zip(ids, texts):
+            doc = len(self.ids)
+            self.ids.append(doc_id)
+            self._id_to_doc[doc_id] = doc
+            tokens = self.tokenizer(text)
+            lengths.append(len(tokens))
+            counts: Dict[int, int] = {}
+            for token in tokens:
+                term = self.vocab.setdefault(token, len(self.vocab))
+                counts[term] = counts.get(term, 0) + 1
+            terms.extend(counts)
+            tfs.extend(counts.values())
+            docs.extend([doc] * len(counts))
+
+        self._pending_terms.append(np.asarray(terms, dtype=np.int64))
+        self._pending_docs.append(np.asarray(docs, dtype=np.int32))
+        self._pending_tfs.append(np.asarray(tfs, dtype=np.float32))
+        self._doc_len = np.concatenate([self._doc_len, np.asarray(lengths, dtype=np.float32)])
+        self._alive = np.concatenate([self._alive, np.ones(len(lengths), dtype=bool)])
+        self._dirty = True
+
+    def delete(self, ids: Sequence[str]) -> int:
+        """标记文档失效，返回实际删除的文档数"""
+        docs = [self._id_to_doc.pop(doc_id) for doc_id in ids if doc_id in self._id_to_doc]
+        if docs:
+            self._alive[docs] = False
+            self._has_dead_postings = True
+            self._dirty = True
+        return len(docs)
+
+    def _build(self) -> None:
+        """合并待添加的文档、移除失效文档的倒排项，并重新计算idf和平均长度"""
+        if not self._dirty:
+            return
+        vocab_size = len(self.vocab)
+        if self._pending_terms or self._has_dead_postings:
+            counts = np.diff(self._indptr)
+            terms = np.concatenate([np.repeat(np.arange(len(counts)), counts)] + self._pending_terms)
+            docs = np.concatenate([self._indices] + self._pending_docs)
+            tfs = np.concatenate([self._data] + self._pending_tfs)
+            keep = self._alive[docs]
+            terms, docs, tfs = terms[keep], docs[keep], tfs[keep]
+            # 按词稳定排序，同一词内文档序号保持递增
+            order = np.argsort(terms, kind="stable")
+            terms, self._indices, self._data = terms[order], docs[order], tfs[order]
+            self._indptr = np.zeros(vocab_size + 1, dtype=np.int64)
+            np.cumsum(np.bincount(terms, minlength=vocab_size), out=self._indptr[1:])
+            self._pending_terms, self._pending_docs, self._pending_tfs = [], [], []
+            self._has_dead_postings = False
+
+        df = np.diff(self._indptr).astype(np.float64)
+        n = float(len(self._id_to_doc))
+        self._avgdl = float(self._doc_len[self._alive].sum()) / n if n else 0.0
+        idf = np.log(n - df + 0.5) - np.log(df + 0.5)
+        present = df > 0
+        average_idf = idf[present].mean() if present.any() else 0.0
+        # 与rank_bm25一致：出现在一半以上文档中的词idf为负，改为平均idf的epsilon倍
+        idf[present & (idf < 0)] = self.epsilon * average_idf
+        self._idf = idf
+        self._dirty = False
+
+    def compact(self) -> None:
+        """
+        重新编号有效文档，去掉已删除文档的占位和不再出现在任何文档中的词
+
+        文档序号和词表序号会改变，之前通过 doc_numbers 得到的序号随之失效。
+        """
+        self._build()
+        counts = np.diff(self._indptr)
+        present = counts > 0
+        if self._alive.all() and present.all():
+            return
+        alive = np.flatnonzero(self._alive)
+        remap = np.full(len(self.ids), -1, dtype=np.int64)
+        remap[alive] = np.arange(len(alive))
+        # 合并后倒排列表中只有有效文档，重新编号保持同一词内的递增顺序
+        self._indices = remap[self._indices].astype(np.int32)
+        self._doc_len = self._doc_len[alive]
+        self._alive = np.ones(len(alive), dtype=bool)
+        self.ids = [self.ids[doc] for doc in alive.tolist()]
+        self._id_to_doc = {doc_id: doc for doc, doc_id in enumerate(self.ids)}
+
+        tokens = list(self.vocab)
+        self.vocab = {tokens[term]: new for new, term in enumerate(np.flatnonzero(present).tolist())}
+        self._indptr = np.zeros(len(self.vocab) + 1, dtype=np.int64)
+        np.cumsum(counts[present], out=self._indptr[1:])
+        self._idf = self._idf[present]
+
+    # ---- 查询 ----
+
+    def _query_terms(self, query: str) -> Tuple[np.ndarray, np.ndarray]:
+        """查询词的词表序号和出现次数（重复的查询词按次数加权，与rank_bm25一致）"""
+        counts: Dict[int, int] = {}
+        for token in self.tokenizer(query):
+            term = self.vocab.get(token)
+            if term is not None:
+                counts[term] = counts.get(term, 0) + 1
+        return np.fromiter(counts, dtype=np.int64, count=len(counts)), \
+            np.fromiter(counts.values(), dtype=np.float64, count=len(counts))
+
+    def doc_numbers(self, ids: Sequence[Optional[str]]) -> np.ndarray:
+        """外部ID转换为文档序号，不存在（或已删除）的ID为-1"""
+        return np.fromiter((self._id_to_doc.get(doc_id, -1) for doc_id in ids), dtype=np.int64, count=len(ids))
+
+    def _score(self, query: str, allowed: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """计算BM25分数，同时返回命中了至少一个查询词的文档序号"""
+        self._build()
+        scores = np.zeros(len(self.ids), dtype=np.float64)
+        terms, weights = self._query_terms(query)
+        if len(terms) == 0:
+            return scores, _NO_DOCS
+        starts, ends = self._indptr[terms], self._indptr[terms + 1]
+        lengths = ends - starts
+        if not lengths.sum():
+            return scores, _NO_DOCS
+        # 拼接所有查询词的倒排列表，逐项计算贡献后按文档累加
+        postings = np.concatenate([np.arange(s, e) for s, e in zip(starts, ends)])
+        docs = self._indices[postings]
+        term_weight = np.repeat(self._idf[terms] * weights, lengths)
+        if allowed is not None:
+            keep = allowed[docs]
+            postings, docs, term_weight = postings[keep], docs[keep], term_weight[keep]
+        tf = self._data[postings].astype(np.float64)
+        norm = self.k1 * (1 - self.b + self.b * self._doc_len[docs] / self._avgdl)
+        contributions = term_weight * (tf * (self.k1 + 1) / (tf + norm))
+        scores += np.bincount(docs, weights=contributions, minlength=len(self.ids))
+        matched = np.flatnonzero(np.bincount(docs, minlength=len(self.ids)))
+        return scores, matched
+
+    def get_scores(self, query: str, allowed: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        计算查询对所有文档的BM25分数
+
+        Args:
+            query (str): 查询文本
+            allowed (np.ndarray, optional): 长度为文档序号总数的布尔掩码，只为其中为True的文档打分
+
+        Returns:
+            np.ndarray: 长度为文档序号总数的分数数组，已删除的文档分数为0
+        """
+        return self._score(query, allowed)[0]
+
+    def search_indices(self, query: str, k: int,
+                       allowed: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        返回得分最高的k个文档序号和分数（分数相同时序号小的在前）
+        """
+        scores, candidates = self._score(query, allowed)
+        if len(candidates) > k:
+            # 先用argpartition取出前k个（O(n)），再只对这k个排序
+            top = np.argpartition(-scores[candidates], k - 1)[:k]
+            candidates = candidates[top]
+        order = np.lexsort((candidates, -scores[candidates]))
+        candidates = candidates[order]
+        return candidates, scores[candidates]
+
+    def search(self, query: str, k: int = 4, allowed: Optional[np.ndarray] = None) -> List[Tuple[str, float]]:
+        """
+        检索得分最高的k个文档
+
+        Args:
+            query (str): 查询文本
+            k (int): 返回数量
+            allowed (np.ndarray, optional): 允许的文档掩码，见 get_scores
+
+        Returns:
+            List[Tuple[str, float]]: (文档ID, BM25分数)，按分数从高到低排列
+        """
+        docs, scores = self.search_indices(query, k, allowed)
+        return [(self.ids[doc], float(score)) for doc, score in zip(docs.tolist(), scores.tolist())]
+
+    # ---- 持久化 ----
+
+    def save(self, directory: str) -> None:
+        """压缩后保存到目录（CSR数组为.npy，词表和ID为JSON）"""
+        self.compact()
+        os.makedirs(directory, exist_ok=True)
+        for name in ("indptr", "indices", "data", "doc_len", "alive"):
+            np.save(os.path.join(directory, f"{name}.npy"), getattr(self, f"_{name}"))
+        with open(os.path.join(directory, "bm25.json"), "w", encoding="utf-8") as f:
+            json.dump({
+                "k1": self.k1, "b": self.b, "epsilon": self.epsilon,
+                "vocab": list(self.vocab), "ids": self.ids,
+            }, f, ensure_ascii=False)
+
+    @classmethod
+    def load(cls, directory: str, tokenizer: Callable[[str], List[str]] = tokenize,
+             mmap: bool = True) -> "BM25Index":
+        """
+        从目录加载
+
+        Args:
+            directory (str): save写入的目录
+            tokenizer (Callable): 分词函数，必须与构建时相同
+            mmap (bool): 是否以内存映射方式加载倒排数组（只读，首次合并新增文档时复制）
+        """
+        with open(os.path.join(directory, "bm25.json"), encoding="utf-8") as f:
+            meta = json.load(f)
+        index = cls(k1=meta["k1"], b=meta["b"], epsilon=meta["epsilon"], tokenizer=tokenizer)
+        index.vocab = {token: term for term, token in enumerate(meta["vocab"])}
+        index.ids = meta["ids"]
+        mmap_mode = "r" if mmap else None
+        for name in ("indptr", "indices", "data"):
+            setattr(index, f"_{name}", np.load(os.path.join(directory, f"{name}.npy"), mmap_mode=mmap_mode))
+        index._doc_len = np.load(os.path.join(directory, "doc_len.npy"))
+        index._alive = np.load(os.path.join(directory, "alive.npy"))
+        index._id_to_doc = {doc_id: doc for doc, doc_id in enumerate(index.ids) if index._alive[doc]}
+        index._dirty = True
+        return index
+
+    @classmethod
+    def exists(cls, directory: str) -> bool:
+        return os.path.exists(os.path.join(directory, "bm25.json"))
@@ -0,0 +1,354 @@
+"""
+嵌入向量缓存模块
+
+重复嵌入同样的片段和查询是重建索引、调试检索时的主要开销。该模块把向量按
+(嵌入模型, 文本哈希) 持久化到磁盘，入库和查询共用：
+
+- 存储：每个模型一个目录，条目保存在内存映射文件（entries.bin）中，每个槽位是
+  16字节的文本哈希（BLAKE2b 128位）加 dim × 4 字节的 float32 向量；
+  哈希到槽位的索引常驻内存，打开缓存时由槽位头部的哈希重建
+- 批量读写：get_many / put_many 一次处理一批哈希，哈希和向量按槽位整体读写
+- 按大小淘汰：条目数超过 max_bytes 对应的容量时，按最近使用时间淘汰最旧的约10%
+- 命中率：进程内统计命中和未命中次数，并导出为指标
+
+槽位的哈希和向量同时写入，读取时校验槽位头部的哈希与查找的哈希一致，因此被淘汰后复用的槽位
+不会把新文本的向量返回给旧文本。最近使用时间（last_used.npy）按 flush_every 次写入刷新一次，
+进程退出时也会刷新；进程被杀死时丢失的只是LRU顺序，不影响正确性。
+
+同一目录只允许一个进程写入：打开缓存时对目录中的 lock 文件加排他锁，锁被其他进程
+（例如另一个uvicorn worker或命令行入库）持有时以只读方式打开，只查找不写入；
+只读缓存在写入方刷新后的下一次未命中时重新加载索引，写入方退出后接管写入。
+
+导出指标：
+- embedding_cache_requests_total: 按模型和结果（hit/miss）统计的查找次数
+- embedding_cache_entries: 各模型缓存的条目数
+"""
+
+import atexit
+import hashlib
+import json
+import logging
+import os
+import threading
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from ..services.metrics import metrics
+
+try:
+    import fcntl
+except ImportError:  # 非POSIX平台没有 flock，按单进程写入处理
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+CACHE_REQUESTS = metrics.counter(
+    "embedding_cache_requests_total", "嵌入缓存查找次数", ["model", "result"]
+)
+CACHE_ENTRIES = metrics.gauge("embedding_cache_entries", "嵌入缓存条目数", ["model"])
+
+KEY_BYTES = 16
+# 缓存文件格式版本，格式不兼容的旧缓存被丢弃
+_FORMAT_VERSION = 2
+
+
+def text_key(text: str) -> bytes:
+    """文本内容的128位哈希"""
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=KEY_BYTES).digest()
+
+
+class EmbeddingCache:
+    """
+    单个嵌入模型的持久化向量缓存
+
+    Attributes:
+        directory: 缓存目录
+        max_entries: 按 max_bytes 和槽位大小换算的最大条目数（维度未知前为None）
+        readonly: 写锁被其他进程持有时为True，此时 put_many 不写入
+        hits / misses: 进程内的命中和未命中次数
+
+    使用示例：
+        >>> cache = EmbeddingCache(".cache/embeddings/nomic-embed-text", max_bytes=256 << 20)
+        >>> keys = [text_key(t) for t in texts]
+        >>> cached = cache.get_many(keys)            # 未命中的位置为None
+        >>> cache.put_many(missing_keys, vectors)
+    """
+
+    def __init__(self, directory: str, max_bytes: int, flush_every: int = 1024, label: str = ""):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.flush_every = flush_every
+        self.label = label or os.path.basename(directory)
+        self.hits = 0
+        self.misses = 0
+
+        self._lock = threading.RLock()
+        self._lock_file = None
+        self.readonly = True
+
+        os.makedirs(directory, exist_ok=True)
+        self._reset()
+        self._acquire_write_lock()
+        self._load()
+        atexit.register(self.flush)
+
+    def _reset(self) -> None:
+        self._dim: Optional[int] = None
+        self._capacity = 0
+        self._count = 0                      # 已使用过的槽位数（含被淘汰后空出的槽位）
+        self._clock = 0                      # 逻辑时钟，用于近似LRU
+        self._index: Dict[bytes, int] = {}
+        self._free: List[int] = []
+        self._last_used = np.zeros(0, dtype=np.uint64)    # 0表示空槽位
+        self._entries: Optional[np.memmap] = None
+        self._dirty = 0
+        self._loaded_mtime: Optional[float] = None
+
+    # ---- 持久化 ----
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    def _record_dtype(self, dim: int) -> np.dtype:
+        return np.dtype([("key", np.uint8, (KEY_BYTES,)), ("vector", np.float32, (dim,))])
+
+    def _acquire_write_lock(self) -> None:
+        """尝试获取目录的写锁，获取不到时保持只读"""
+        if fcntl is None:
+            self.readonly = False
+            return
+        lock_file = open(self._path("lock"), "a+")
+        try:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            if self._lock_file is None:
+                logger.info(f"嵌入缓存 {self.directory} 正被其他进程写入，以只读方式打开")
+            self._lock_file = False
+            return
+        # 持有文件对象直到进程退出，锁随之释放
+        self._lock_file = lock_file
+        self.readonly = False
+
+    def _meta_mtime(self) -> Optional[float]:
+        try:
+            return os.stat(self._path("meta.json")).st_mtime
+        except OSError:
+            return None
+
+    def _load(self) -> None:
+        """从槽位头部的哈希重建索引"""
+        self._loaded_mtime = self._meta_mtime()
+        if self._loaded_mtime is None:
+            return
+        try:
+            with open(self._path("meta.json"), encoding="utf-8") as f:
+                meta = json.load(f)
+            if meta.get("version") != _FORMAT_VERSION or not os.path.exists(self._path("entries.bin")):
+                raise ValueError("缓存格式不兼容")
+            last_used = np.load(self._path("last_used.npy"))
+            dim = meta["dim"]
+            capacity = os.path.getsize(self._path("entries.bin")) // self._record_dtype(dim).itemsize
+        except (OSError, ValueError, KeyError):
+            # 缓存损坏或格式不兼容时丢弃，重新开始
+            if not self.readonly:
+                for name in ("meta.json", "entries.bin", "last_used.npy", "keys.npy", "vectors.f32"):
+                    if os.path.exists(self._path(name)):
+                        os.remove(self._path(name))
+            return
+        if capacity == 0:
+            return
+
+        self._dim = dim
+        self._clock = meta.get("clock", 0)
+        self._open_entries(capacity)
+        keys = np.array(self._entries["key"])
+        occupied = keys.any(axis=1)
+        self._count = int(np.flatnonzero(occupied)[-1]) + 1 if occupied.any() else 0
+        # 上次刷新之后写入或被淘汰过的槽位，按最旧处理（哈希和向量仍然一致，可以继续使用）
+        restored = np.ones(self._count, dtype=np.uint64)
+        known = min(len(last_used), self._count)
+        restored[:known] = np.maximum(last_used[:known], 1)
+        self._last_used[:self._count] = restored
+        for slot in range(self._count):
+            key = keys[slot].tobytes()
+            if occupied[slot] and key not in self._index:
+                self._index[key] = slot
+            else:
+                self._last_used[slot] = 0
+                self._free.append(slot)
+        CACHE_ENTRIES.set(len(self._index), model=self.label)
+
+    def _maybe_reload(self) -> None:
+        """只读缓存在写入方刷新后重新加载；写入方已退出时接管写锁"""
+        mtime = self._meta_mtime()
+        self._acquire_write_lock()
+        if mtime != self._loaded_mtime or not self.readonly:
+            self._reset()
+            self._load()
+
+    def _open_entries(self, capacity: int) -> None:
+        """按容量打开（或扩大）条目文件"""
+        record = self._record_dtype(self._dim)
+        if self.readonly:
+            self._entries = np.memmap(self._path("entries.bin"), dtype=record, mode="r", shape=(capacity,))
+        else:
+            size = capacity * record.itemsize
+            mode = "r+b" if os.path.exists(self._path("entries.bin")) else "w+b"
+            with open(self._path("entries.bin"), mode) as f:
+                if os.fstat(f.fileno()).st_size < size:
+                    f.truncate(size)
+            self._entries = np.memmap(self._path("entries.bin"), dtype=record, mode="r+", shape=(capacity,))
+        last_used = np.zeros(capacity, dtype=np.uint64)
+        last_used[:len(self._last_used)] = self._last_used[:capacity]
+        self._last_used, self._capacity = last_used, capacity
+
+    def flush(self) -> None:
+        """把条目和最近使用时间写回磁盘"""
+        with self._lock:
+            if self.readonly or self._entries is None or not self._dirty:
+                return
+            self._entries.flush()
+            np.save(self._path("last_used.npy"), self._last_used[:self._count])
+            # meta.json 最后写入，只读方按它的修改时间判断是否需要重新加载
+            with open(self._path("meta.json"), "w", encoding="utf-8") as f:
+                json.dump({"version": _FORMAT_VERSION, "dim": self._dim, "clock": self._clock}, f)
+            self._loaded_mtime = self._meta_mtime()
+            self._dirty = 0
+
+    # ---- 读写 ----
+
+    @property
+    def max_entries(self) -> Optional[int]:
+        return max(1, self.max_bytes // self._record_dtype(self._dim).itemsize) if self._dim else None
+
+    def get_many(self, keys: Sequence[bytes]) -> List[Optional[np.ndarray]]:
+        """
+        批量查找
+
+        槽位头部的哈希与查找的哈希不一致时（只读方的索引过期）按未命中处理。
+
+        Args:
+            keys (Sequence[bytes]): 文本哈希
+
+        Returns:
+            List[Optional[np.ndarray]]: 与keys一一对应的向量，未命中为None
+        """
+        with self._lock:
+            if self.readonly and any(key not in self._index for key in keys):
+                self._maybe_reload()
+            results: List[Optional[np.ndarray]] = [None] * len(keys)
+            positions, slots = [], []
+            for position, key in enumerate(keys):
+                slot = self._index.get(key)
+                if slot is not None:
+                    positions.append(position)
+                    slots.append(slot)
+            hits = 0
+            if slots:
+                slot_array = np.asarray(slots)
+                records = np.array(self._entries[slot_array])
+                expected = np.frombuffer(b"".join(keys[p] for p in positions), dtype=np.uint8)
+                valid = (records["key"] == expected.reshape(-1, KEY_BYTES)).all(axis=1)
+                for position, slot, record, ok in zip(positions, slots, records, valid):
+                    if ok:
+                        results[position] = record["vector"]
+                    else:
+                        del self._index[keys[position]]
+                hits = int(valid.sum())
+                if hits:
+                    self._clock += 1
+                    self._last_used[slot_array[valid]] = self._clock
+
+            self.hits += hits
+            self.misses += len(keys) - hits
+            if hits:
+                CACHE_REQUESTS.inc(hits, model=self.label, result="hit")
+            if len(keys) - hits:
+                CACHE_REQUESTS.inc(len(keys) - hits, model=self.label, result="miss")
+            return results
+
+    def put_many(self, keys: Sequence[bytes], vectors: Sequence[Sequence[float]]) -> None:
+        """
+        批量写入，只读时不写入
+
+        Raises:
+            ValueError: 向量维度与缓存中已有的维度不一致
+        """
+        if not keys or self.readonly:
+            return
+        array = np.asarray(vectors, dtype=np.float32)
+        with self._lock:
+            if self._dim is None:
+                self._dim = array.shape[1]
+                self._open_entries(min(1024, self.max_entries))
+            elif array.shape[1] != self._dim:
+                raise ValueError(f"向量维度 {array.shape[1]} 与缓存维度 {self._dim} 不一致")
+
+            new = {}
+            for key, vector in zip(keys, array):
+                if key not in self._index:
+                    new[key] = vector
+            if not new:
+                return
+            if len(new) > self.max_entries:
+                # 一批就超过容量时只保留最后的部分
+                new = dict(list(new.items())[-self.max_entries:])
+            slots = self._allocate(len(new))
+            self._clock += 1
+            slot_array = np.asarray(slots)
+            records = np.empty(len(new), dtype=self._entries.dtype)
+            records["key"] = np.frombuffer(b"".join(new), dtype=np.uint8).reshape(-1, KEY_BYTES)
+            records["vector"] = np.stack(list(new.values()))
+            # 哈希和向量在同一条记录中一起写入
+            self._entries[slot_array] = records
+            self._last_used[slot_array] = self._clock
+            for key, slot in zip(new, slots):
+                self._index[key] = slot
+            CACHE_ENTRIES.set(len(self._index), model=self.label)
+
+            self._dirty += len(new)
+            if self._dirty >= self.flush_every:
+                self.flush()
+
+    def _allocate(self, n: int) -> List[int]:
+        """分配n个槽位：优先复用空槽位，其次扩容，达到上限时淘汰最久未使用的条目"""
+        max_entries = self.max_entries
+        n = min(n, max_entries)
+        if len(self._free) + (max_entries - self._count) < n:
+            self._evict(max(n - len(self._free) - (max_entries - self._count), max_entries // 10))
+
+        slots = [self._free.pop() for _ in range(min(n, len(self._free)))]
+        grow = n - len(slots)
+        if grow:
+            if self._count + grow > self._capacity:
+                self._open_entries(min(max_entries, max(self._count + grow, self._capacity * 2)))
+            slots.extend(range(self._count, self._count + grow))
+            self._count += grow
+        return slots
+
+    def _evict(self, k: int) -> None:
+        """淘汰最近最少使用的k个条目"""
+        occupied = np.flatnonzero(self._last_used[:self._count])
+        k = min(k, len(occupied))
+        if k <= 0:
+            return
+        victims = occupied[np.argpartition(self._last_used[occupied], k - 1)[:k]]
+        for key in self._entries["key"][victims]:
+            self._index.pop(key.tobytes(), None)
+        self._last_used[victims] = 0
+        self._free.extend(victims.tolist())
+
+    def get_stats(self) -> Dict[str, object]:
+        """返回条目数、占用字节数和命中率"""
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._index),
+            "bytes": len(self._index) * self._record_dtype(self._dim).itemsize if self._dim else 0,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else None,
+            "readonly": self.readonly,
+        }
@@ -0,0 +1,148 @@
+"""
+嵌入模型模块
+
+统一创建检索使用的嵌入模型实例，查询和入库使用同一个模型，保证向量空间一致。
+启用嵌入缓存时，模型被 CachedEmbeddings 包装，已经嵌入过的文本直接从磁盘缓存读取。
+HashingEmbeddings 是不依赖模型服务的确定性嵌入，用于离线评估和CI。
+"""
+
+import asyncio
+import hashlib
+import os
+import re
+from functools import lru_cache
+from typing import Dict, List, Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from langchain_ollama import OllamaEmbeddings
+
+from ..config.retrieval_config import RETRIEVAL_CONFIG
+from .bm25 import tokenize
+from .embedding_cache import EmbeddingCache, text_key
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    带持久化缓存的嵌入模型包装
+
+    批量嵌入时先批量查缓存，只把未命中且去重后的文本发给底层模型，结果写回缓存。
+
+    使用示例：
+        >>> embeddings = CachedEmbeddings(OllamaEmbeddings(model="nomic-embed-text"), cache)
+        >>> embeddings.embed_documents(["你好", "你好"])   # 只请求一次
+    """
+
+    def __init__(self, underlying: Embeddings, cache: EmbeddingCache):
+        self.underlying = underlying
+        self.cache = cache
+
+    @property
+    def model(self) -> str:
+        """底层模型ID（索引清单用它判断嵌入模型是否变化）"""
+        return getattr(self.underlying, "model", type(self.underlying).__name__)
+
+    def _lookup(self, texts: List[str]):
+        keys = [text_key(text) for text in texts]
+        vectors = self.cache.get_many(keys)
+        missing: Dict[bytes, str] = {}
+        for key, text, vector in zip(keys, texts, vectors):
+            if vector is None:
+                missing.setdefault(key, text)
+        return keys, vectors, missing
+
+    def _merge(self, keys, vectors, missing: Dict[bytes, str], computed: List[List[float]]) -> List[List[float]]:
+        self.cache.put_many(list(missing), computed)
+        fresh = dict(zip(missing, computed))
+        return [list(map(float, vector)) if vector is not None else list(fresh[key])
+                for key, vector in zip(keys, vectors)]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys, vectors, missing = self._lookup(texts)
+        computed = self.underlying.embed_documents(list(missing.values())) if missing else []
+        return self._merge(keys, vectors, missing, computed)
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys, vectors, missing = await asyncio.to_thread(self._lookup, texts)
+        computed = await self.underlying.aembed_documents(list(missing.values())) if missing else []
+        return await asyncio.to_thread(self._merge, keys, vectors, missing, computed)
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return (await self.aembed_documents([text]))[0]
+
+    def flush(self) -> None:
+        """把缓存写回磁盘"""
+        self.cache.flush()
+
+    def get_stats(self) -> Dict[str, object]:
+        """缓存的条目数和命中率"""
+        return self.cache.get_stats()
+
+
+class HashingEmbeddings(Embeddings):
+    """
+    基于特征哈希的确定性嵌入
+
+    文本按BM25的分词函数切分，每个词哈希到一个维度（另取一位哈希决定正负号）后按词频累加，
+    再做L2归一化。相同文本在任何机器上得到相同向量，共享词语的文本向量相近，
+    不需要Ollama，适合离线评估和CI中可复现的检索测试。
+
+    使用示例：
+        >>> embeddings = HashingEmbeddings(size=256)
+        >>> embeddings.embed_query("机器学习")[:3]
+    """
+
+    def __init__(self, size: int = 256):
+        self.size = size
+
+    @property
+    def model(self) -> str:
+        return f"hashing-{self.size}"
+
+    def _embed(self, text: str) -> List[float]:
+        vector = np.zeros(self.size, dtype=np.float32)
+        for token in tokenize(text):
+            digest = int.from_bytes(hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest(), "little")
+            vector[digest % self.size] += 1.0 if (digest >> 63) & 1 else -1.0
+        norm = np.linalg.norm(vector)
+        return (vector / norm if norm else vector).tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed(text)
+
+
+def _cache_directory(model: str) -> str:
+    """模型ID转换为缓存子目录名，例如 nomic-embed-text:latest -> nomic-embed-text_latest"""
+    return os.path.join(RETRIEVAL_CONFIG.embedding_cache_dir, re.sub(r"[^\w.-]", "_", model))
+
+
+@lru_cache(maxsize=None)
+def get_embeddings(model: str = RETRIEVAL_CONFIG.embedding_model,
+                   base_url: str = RETRIEVAL_CONFIG.embedding_base_url) -> Embeddings:
+    """
+    获取嵌入模型实例（按模型和地址缓存）
+
+    Args:
+        model (str): Ollama中的嵌入模型ID
+        base_url (str): Ollama服务地址
+
+    Returns:
+        Embeddings: 嵌入模型实例；启用缓存时为 CachedEmbeddings
+    """
+    embeddings = OllamaEmbeddings(model=model, base_url=base_url)
+    if not RETRIEVAL_CONFIG.embedding_cache_enabled:
+        return embeddings
+    cache = EmbeddingCache(_cache_directory(model), RETRIEVAL_CONFIG.embedding_cache_max_bytes, label=model)
+    return CachedEmbeddings(embeddings, cache)
+
+
+def embedding_cache_stats(embeddings: Embeddings) -> Optional[Dict[str, object]]:
+    """返回嵌入模型的缓存统计，未启用缓存时返回None"""
+    get_stats = getattr(embeddings, "get_stats", None)
+    return get_stats() if get_stats is not None else None
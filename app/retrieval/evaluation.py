@@ -0,0 +1,334 @@
+"""
+检索离线评估模块
+
+对同一份语料和标注查询，比较不同检索配置（切分参数、服务索引类型、检索模式、
+融合权重、MMR等）的效果和延迟：
+
+1. 按 (text_splitter, chunk_size, chunk_overlap, index_type) 把语料入库到临时目录，相同切分的配置共用一份索引
+2. 对每个配置逐条执行查询，检索结果按标注的粒度（片段ID或相对语料目录的文件路径）去重
+3. 计算 recall@k、MRR、nDCG@k 和检索延迟的 p50/p95/p99，输出对比表
+
+查询文件为JSONL，每行一个查询：
+    {"query": "技术2的详细信息", "relevant": ["doc_1.txt"]}
+    {"query": "...", "relevant": {"a.md": 2, "b.md": 1}, "filter": {"store": "store1"}}
+relevant 为列表时相关度都为1，为字典时是分级相关度（用于nDCG）。
+
+完全在本地运行：--embedder stub 使用确定性的 HashingEmbeddings，不需要Ollama，
+同样的输入在任何机器上得到同样的指标，适合在CI中比较配置。
+
+命令行用法：
+    python -m app.retrieval.evaluation langchain/dataConnection/docs benchmarks/retrieval_queries.jsonl --embedder stub
+    python -m app.retrieval.evaluation docs/ queries.jsonl --configs configs.json --k 5 --output results.json
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import shutil
+import statistics
+import tempfile
+import time
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from langchain_core.embeddings import Embeddings
+from pydantic import BaseModel
+
+from ..config.retrieval_config import RETRIEVAL_CONFIG
+from .embeddings import HashingEmbeddings, get_embeddings
+from .ingestion import IngestionPipeline
+from .keyword_store import KeywordIndex
+from .retriever import RetrievedChunk, Retriever
+from .vector_store import VectorIndex
+
+
+class EvalConfig(BaseModel):
+    """
+    一个待评估的检索配置
+
+    Attributes:
+        name: 配置名称，出现在对比表中
+        mode: 检索模式，"vector"、"bm25" 或 "hybrid"
+        text_splitter: 切分方式，"token" 或 "recursive"
+        chunk_size: 切分的片段长度（token切分按token计，recursive按字符计）
+        chunk_overlap: 相邻片段的重叠长度（单位同chunk_size）
+        index_type: 服务索引类型，"auto"、"flat"、"ivf" 或 "hnsw"
+        fetch_k: 每一路召回的候选数，None表示评估深度k的两倍
+        rrf_k: 倒数排名融合的平滑常数
+        hybrid_weights: 向量检索和BM25检索的融合权重
+        mmr: 是否用MMR挑选多样化的结果
+        mmr_lambda: MMR的相关性权重
+    """
+    name: str
+    mode: str = RETRIEVAL_CONFIG.retrieval_mode
+    text_splitter: str = RETRIEVAL_CONFIG.text_splitter
+    chunk_size: int = RETRIEVAL_CONFIG.chunk_size
+    chunk_overlap: int = RETRIEVAL_CONFIG.chunk_overlap
+    index_type: str = RETRIEVAL_CONFIG.index_type
+    fetch_k: Optional[int] = None
+    rrf_k: int = RETRIEVAL_CONFIG.rrf_k
+    hybrid_weights: List[float] = RETRIEVAL_CONFIG.hybrid_weights
+    mmr: bool = False
+    mmr_lambda: float = RETRIEVAL_CONFIG.mmr_lambda
+
+    @property
+    def index_key(self) -> Tuple[str, int, int, str]:
+        """决定索引内容的参数，相同的配置共用一份索引"""
+        return self.text_splitter, self.chunk_size, self.chunk_overlap, self.index_type
+
+
+# 未指定配置文件时比较的配置
+DEFAULT_CONFIGS = [
+    EvalConfig(name="vector", mode="vector"),
+    EvalConfig(name="bm25", mode="bm25"),
+    EvalConfig(name="hybrid", mode="hybrid"),
+    EvalConfig(name="hybrid+mmr", mode="hybrid", mmr=True),
+]
+
+
+@dataclass
+class EvalQuery:
+    """一条标注查询：relevant 为相关条目到相关度的映射"""
+    query: str
+    relevant: Dict[str, float]
+    filter: Optional[Dict[str, Any]] = None
+
+
+@dataclass
+class EvalResult:
+    """
+    一个配置的评估结果
+
+    Attributes:
+        name: 配置名称
+        k: 评估深度
+        recall: 平均 recall@k
+        mrr: 平均倒数排名（第一个相关结果排名的倒数，前k个中没有相关结果时为0）
+        ndcg: 平均 nDCG@k
+        latency_p50, latency_p95, latency_p99: 单次检索耗时的分位数（秒）
+        queries: 查询数
+        index_seconds: 建立索引的耗时（秒），与其他配置共用索引时为0
+        config: 配置参数
+    """
+    name: str
+    k: int
+    recall: float
+    mrr: float
+    ndcg: float
+    latency_p50: float
+    latency_p95: float
+    latency_p99: float
+    queries: int
+    index_seconds: float = 0.0
+    config: Dict[str, Any] = field(default_factory=dict)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+def recall_at_k(ranked: Sequence[str], relevant: Dict[str, float], k: int) -> float:
+    """前k个结果覆盖的相关条目比例"""
+    if not relevant:
+        return 0.0
+    return len(set(ranked[:k]) & set(relevant)) / len(relevant)
+
+
+def reciprocal_rank(ranked: Sequence[str], relevant: Dict[str, float], k: int) -> float:
+    """前k个结果中第一个相关条目名次的倒数"""
+    for rank, key in enumerate(ranked[:k], start=1):
+        if key in relevant:
+            return 1.0 / rank
+    return 0.0
+
+
+def ndcg_at_k(ranked: Sequence[str], relevant: Dict[str, float], k: int) -> float:
+    """归一化折损累计增益，增益为 2^相关度 - 1"""
+    dcg = sum((2 ** relevant.get(key, 0.0) - 1) / math.log2(rank + 1)
+              for rank, key in enumerate(ranked[:k], start=1))
+    ideal = sorted(relevant.values(), reverse=True)[:k]
+    idcg = sum((2 ** grade - 1) / math.log2(rank + 1) for rank, grade in enumerate(ideal, start=1))
+    return dcg / idcg if idcg > 0 else 0.0
+
+
+def percentile(values: Sequence[float], q: float) -> float:
+    """线性插值的分位数，q取0~100"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    position = (len(ordered) - 1) * q / 100
+    lower = math.floor(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+def _mean(values: Sequence[float]) -> float:
+    return statistics.fmean(values) if values else 0.0
+
+
+def load_queries(path: str) -> List[EvalQuery]:
+    """
+    读取JSONL格式的标注查询
+
+    Raises:
+        ValueError: 某一行缺少query或relevant
+    """
+    queries = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line_number, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            item = json.loads(line)
+            if "query" not in item or "relevant" not in item:
+                raise ValueError(f"{path} 第{line_number}行缺少 query 或 relevant")
+            relevant = item["relevant"]
+            if isinstance(relevant, list):
+                relevant = {key: 1.0 for key in relevant}
+            queries.append(EvalQuery(query=item["query"], relevant={k: float(v) for k, v in relevant.items()},
+                                     filter=item.get("filter")))
+    return queries
+
+
+def load_configs(path: str) -> List[EvalConfig]:
+    """读取配置文件（JSON数组，每项为 EvalConfig 的字段）"""
+    with open(path, "r", encoding="utf-8") as f:
+        return [EvalConfig(**item) for item in json.load(f)]
+
+
+class RetrievalEvaluator:
+    """
+    检索配置评估器
+
+    使用示例：
+        >>> evaluator = RetrievalEvaluator("docs/", load_queries("queries.jsonl"), HashingEmbeddings())
+        >>> results = evaluator.run(DEFAULT_CONFIGS)
+        >>> print(format_table(results))
+    """
+
+    def __init__(self, corpus: str, queries: List[EvalQuery], embeddings: Embeddings, k: int = 10,
+                 work_dir: Optional[str] = None, workers: Optional[int] = RETRIEVAL_CONFIG.ingest_workers):
+        self.corpus = os.path.abspath(corpus)
+        self.queries = queries
+        self.embeddings = embeddings
+        self.k = k
+        self.workers = workers
+        self._owns_work_dir = work_dir is None
+        self.work_dir = work_dir or tempfile.mkdtemp(prefix="retrieval-eval-")
+        self._indexes: Dict[Tuple[str, int, int, str], str] = {}
+
+    def _index(self, config: EvalConfig) -> Tuple[str, float]:
+        """返回配置对应的索引目录和本次建立索引的耗时（已建立时为0）"""
+        if config.index_key in self._indexes:
+            return self._indexes[config.index_key], 0.0
+        text_splitter, chunk_size, chunk_overlap, index_type = config.index_key
+        index_path = os.path.join(self.work_dir, f"index-{text_splitter}-{chunk_size}-{chunk_overlap}-{index_type}")
+        started = time.perf_counter()
+        pipeline = IngestionPipeline(
+            index_path=index_path, embeddings=self.embeddings, workers=self.workers,
+            text_splitter=text_splitter, chunk_size=chunk_size, chunk_overlap=chunk_overlap,
+            index_type=index_type,
+        )
+        pipeline.run(self.corpus, full=True)
+        self._indexes[config.index_key] = index_path
+        return index_path, time.perf_counter() - started
+
+    def _ranked_keys(self, chunks: List[RetrievedChunk], relevant: Dict[str, float]) -> List[str]:
+        """检索结果转换为标注粒度的条目：片段ID被标注时按片段计，否则按相对路径计，去重后保持顺序"""
+        keys = []
+        for chunk in chunks:
+            key = chunk.document.id
+            if key not in relevant:
+                source = chunk.document.metadata.get("source", "")
+                key = os.path.relpath(os.path.abspath(source), self.corpus).replace(os.sep, "/")
+            if key not in keys:
+                keys.append(key)
+        return keys
+
+    async def _evaluate(self, config: EvalConfig) -> EvalResult:
+        index_path, index_seconds = self._index(config)
+        retriever = Retriever(VectorIndex(index_path, self.embeddings), KeywordIndex(index_path),
+                              rrf_k=config.rrf_k, hybrid_weights=config.hybrid_weights,
+                              mmr_lambda=config.mmr_lambda)
+        # 按文件计算时多个片段会合并成一个条目，多取一些候选
+        fetch_k = config.fetch_k or self.k * 2
+
+        async def retrieve(query: EvalQuery):
+            return await retriever.aretrieve(query.query, k=fetch_k, mode=config.mode, fetch_k=fetch_k,
+                                             mmr=config.mmr, filter=query.filter)
+
+        if self.queries:
+            # 预热：加载索引、构建元数据索引，不计入延迟
+            await retrieve(self.queries[0])
+
+        recalls, mrrs, ndcgs, latencies = [], [], [], []
+        for query in self.queries:
+            started = time.perf_counter()
+            result = await retrieve(query)
+            latencies.append(time.perf_counter() - started)
+            ranked = self._ranked_keys(result.chunks, query.relevant)
+            recalls.append(recall_at_k(ranked, query.relevant, self.k))
+            mrrs.append(reciprocal_rank(ranked, query.relevant, self.k))
+            ndcgs.append(ndcg_at_k(ranked, query.relevant, self.k))
+
+        return EvalResult(
+            name=config.name, k=self.k, recall=_mean(recalls), mrr=_mean(mrrs), ndcg=_mean(ndcgs),
+            latency_p50=percentile(latencies, 50), latency_p95=percentile(latencies, 95),
+            latency_p99=percentile(latencies, 99), queries=len(self.queries),
+            index_seconds=index_seconds, config=config.model_dump(),
+        )
+
+    def run(self, configs: Sequence[EvalConfig]) -> List[EvalResult]:
+        """依次评估每个配置，结束后删除自己创建的临时索引目录"""
+        try:
+            return [asyncio.run(self._evaluate(config)) for config in configs]
+        finally:
+            if self._owns_work_dir:
+                shutil.rmtree(self.work_dir, ignore_errors=True)
+
+
+def format_table(results: Sequence[EvalResult]) -> str:
+    """评估结果格式化为Markdown表格"""
+    if not results:
+        return ""
+    k = results[0].k
+    lines = [
+        f"| config | recall@{k} | MRR | nDCG@{k} | p50 (ms) | p95 (ms) | p99 (ms) | index (s) |",
+        "|---|---:|---:|---:|---:|---:|---:|---:|",
+    ]
+    for result in results:
+        lines.append(
+            f"| {result.name} | {result.recall:.3f} | {result.mrr:.3f} | {result.ndcg:.3f} "
+            f"| {result.latency_p50 * 1000:.2f} | {result.latency_p95 * 1000:.2f} | {result.latency_p99 * 1000:.2f} "
+            f"| {result.index_seconds:.1f} |"
+        )
+    return "\n".join(lines)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="检索离线评估：比较不同检索配置的召回、排序质量和延迟")
+    parser.add_argument("corpus", help="语料目录")
+    parser.add_argument("queries", help="标注查询（JSONL，每行 {\"query\", \"relevant\"}）")
+    parser.add_argument("--configs", help="检索配置（JSON数组），默认比较 vector/bm25/hybrid/hybrid+mmr")
+    parser.add_argument("--k", type=int, default=10, help="评估深度")
+    parser.add_argument("--embedder", choices=["stub", "ollama"], default="stub",
+                        help="stub为确定性的哈希嵌入（不需要Ollama），ollama使用 --embedding-model")
+    parser.add_argument("--embedding-model", default=RETRIEVAL_CONFIG.embedding_model, help="Ollama嵌入模型")
+    parser.add_argument("--stub-dim", type=int, default=256, help="哈希嵌入的维度")
+    parser.add_argument("--workers", type=int, default=RETRIEVAL_CONFIG.ingest_workers, help="入库解析进程数")
+    parser.add_argument("--output", help="把结果写入JSON文件")
+    args = parser.parse_args(argv)
+
+    embeddings = HashingEmbeddings(args.stub_dim) if args.embedder == "stub" else get_embeddings(args.embedding_model)
+    configs = load_configs(args.configs) if args.configs else DEFAULT_CONFIGS
+    evaluator = RetrievalEvaluator(args.corpus, load_queries(args.queries), embeddings, k=args.k,
+                                   workers=args.workers)
+    results = evaluator.run(configs)
+    print(format_table(results))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump([result.to_dict() for result in results], f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,238 @@
+"""
+FAISS索引管理模块
+
+FAISS.load_local 把整个索引读进进程私有内存，每个worker进程各持有一份。该模块负责：
+
+1. 选型：按向量数量和召回率目标选择索引类型
+   - 向量数不超过 flat_max_vectors：Flat（精确检索，暴力扫描已经足够快）
+   - 召回率目标不低于 0.97：HNSW32（高召回、低延迟，图结构常驻内存）
+   - 其余：IVF{nlist},Flat（倒排表可以完全内存映射，nlist约为 4√n）
+   IVF的nprobe和HNSW的efSearch从小到大尝试，取第一个在抽样查询上达到召回率目标的值
+2. 构建：入库流水线写出可增量修改的Flat索引（index.faiss），在此基础上构建只读的
+   服务索引（serving.faiss，位置与Flat索引一致，index_to_docstore_id无需改动），
+   选型结果和实测召回率写在 serving.json 中；选中Flat时不另写服务索引
+3. 加载：用 IO_FLAG_MMAP_IFC 内存映射读取向量数据，多个worker进程共享页缓存，
+   加载耗时与索引大小基本无关；docstore（index.pkl）仍按pickle加载
+
+导出指标：
+- faiss_index_load_seconds: 索引加载耗时分布
+- faiss_index_vectors: 当前服务索引的向量数
+"""
+
+import json
+import logging
+import math
+import os
+import pickle
+import time
+from dataclasses import asdict, dataclass
+from typing import Optional, Tuple
+
+import faiss
+import numpy as np
+from langchain_community.vectorstores import FAISS
+from langchain_core.embeddings import Embeddings
+
+from ..config.retrieval_config import RETRIEVAL_CONFIG
+from ..services.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+FAISS_INDEX_LOAD_SECONDS = metrics.histogram(
+    "faiss_index_load_seconds", "FAISS索引加载耗时（秒）", ["kind"]
+)
+FAISS_INDEX_VECTORS = metrics.gauge(
+    "faiss_index_vectors", "当前服务索引的向量数", ["kind"]
+)
+
+SERVING_INDEX = "serving.faiss"
+SERVING_META = "serving.json"
+INDEX_TYPES = ("auto", "flat", "ivf", "hnsw")
+
+# 校准召回率时的抽样查询数和评估深度
+_CALIBRATION_QUERIES = 200
+_CALIBRATION_K = 10
+
+
+@dataclass
+class IndexSpec:
+    """
+    服务索引的选型结果
+
+    Attributes:
+        kind: "flat"、"ivf" 或 "hnsw"
+        factory: faiss.index_factory 的描述字符串，例如 "IVF1024,Flat"
+        nprobe: IVF每次查询扫描的倒排表数
+        ef_search: HNSW查询时的候选队列长度
+        recall: 校准时在抽样查询上实测的 recall@10（Flat为1.0）
+        vectors: 构建时的向量数
+    """
+    kind: str
+    factory: str
+    nprobe: Optional[int] = None
+    ef_search: Optional[int] = None
+    recall: float = 1.0
+    vectors: int = 0
+
+
+def choose_index_spec(n: int, recall_target: float = RETRIEVAL_CONFIG.recall_target,
+                      index_type: str = RETRIEVAL_CONFIG.index_type,
+                      flat_max_vectors: int = RETRIEVAL_CONFIG.flat_max_vectors) -> IndexSpec:
+    """
+    按向量数量和召回率目标选择索引类型
+
+    Args:
+        n (int): 向量数
+        recall_target (float): 召回率目标（recall@10）
+        index_type (str): "auto" 或强制指定 "flat"、"ivf"、"hnsw"
+        flat_max_vectors (int): 自动选型时使用Flat的最大向量数
+
+    Returns:
+        IndexSpec: 选型结果（尚未校准搜索参数）
+
+    Raises:
+        ValueError: 不支持的索引类型
+    """
+    if index_type not in INDEX_TYPES:
+        raise ValueError(f"不支持的索引类型: {index_type}。支持的类型: {list(INDEX_TYPES)}")
+    kind = index_type
+    if kind == "auto":
+        if n <= flat_max_vectors:
+            kind = "flat"
+        elif recall_target >= 0.97:
+            kind = "hnsw"
+        else:
+            kind = "ivf"
+    if kind == "ivf":
+        # 每个倒排表至少需要39个训练样本，向量太少时减少nlist
+        nlist = int(min(max(16, 4 * math.sqrt(n)), max(1, n // 39), 65536))
+        return IndexSpec(kind="ivf", factory=f"IVF{nlist},Flat", vectors=n)
+    if kind == "hnsw":
+        return IndexSpec(kind="hnsw", factory="HNSW32", vectors=n)
+    return IndexSpec(kind="flat", factory="Flat", vectors=n)
+
+
+def _recall(index: faiss.Index, queries: np.ndarray, truth: np.ndarray) -> float:
+    _, found = index.search(queries, truth.shape[1])
+    hits = sum(len(set(row) & set(expected)) for row, expected in zip(found.tolist(), truth.tolist()))
+    return hits / truth.size
+
+
+def _calibrate(index: faiss.Index, spec: IndexSpec, vectors: np.ndarray, recall_target: float) -> None:
+    """从小到大尝试搜索参数，取第一个达到召回率目标的值"""
+    rng = np.random.default_rng(0)
+    sample = rng.choice(len(vectors), size=min(_CALIBRATION_QUERIES, len(vectors)), replace=False)
+    # 以库中向量加少量噪声作为查询，精确结果用暴力检索得到
+    queries = vectors[sample] + rng.normal(0, 1e-3, size=(len(sample), vectors.shape[1])).astype(np.float32)
+    k = min(_CALIBRATION_K, len(vectors))
+    _, truth = faiss.knn(queries, vectors, k)
+
+    if spec.kind == "ivf":
+        ivf = faiss.extract_index_ivf(index)
+        candidates = [2 ** i for i in range(int(math.log2(ivf.nlist)) + 1)] + [ivf.nlist]
+        for nprobe in candidates:
+            ivf.nprobe = nprobe
+            spec.nprobe, spec.recall = nprobe, _recall(index, queries, truth)
+            if spec.recall >= recall_target:
+                break
+    elif spec.kind == "hnsw":
+        for ef_search in (16, 32, 64, 128, 256, 512, 1024):
+            index.hnsw.efSearch = ef_search
+            spec.ef_search, spec.recall = ef_search, _recall(index, queries, truth)
+            if spec.recall >= recall_target:
+                break
+    if spec.recall < recall_target:
+        logger.warning(f"{spec.factory} 在最大搜索参数下的召回率 {spec.recall:.3f} 仍低于目标 {recall_target}")
+
+
+def build_serving_index(flat_index: faiss.Index, recall_target: float = RETRIEVAL_CONFIG.recall_target,
+                        index_type: str = RETRIEVAL_CONFIG.index_type) -> Tuple[IndexSpec, Optional[faiss.Index]]:
+    """
+    从Flat索引构建服务索引
+
+    Args:
+        flat_index (faiss.Index): 入库流水线维护的Flat索引
+        recall_target (float): 召回率目标
+        index_type (str): "auto" 或强制指定的索引类型
+
+    Returns:
+        Tuple[IndexSpec, Optional[faiss.Index]]: 选型结果和服务索引；选中Flat时服务索引为None，直接使用Flat索引
+    """
+    spec = choose_index_spec(flat_index.ntotal, recall_target, index_type)
+    if spec.kind == "flat":
+        return spec, None
+
+    vectors = flat_index.reconstruct_n(0, flat_index.ntotal)
+    index = faiss.index_factory(flat_index.d, spec.factory, flat_index.metric_type)
+    if spec.kind == "ivf":
+        # 训练样本取每个倒排表约64个向量，足够得到稳定的聚类中心，训练耗时与语料规模无关
+        sample_size = 64 * faiss.extract_index_ivf(index).nlist
+        rng = np.random.default_rng(0)
+        train = vectors if len(vectors) <= sample_size else vectors[rng.choice(len(vectors), sample_size, replace=False)]
+        index.train(train)
+    index.add(vectors)
+    _calibrate(index, spec, vectors, recall_target)
+    return spec, index
+
+
+def write_serving_index(flat_index: faiss.Index, directory: str,
+                        recall_target: float = RETRIEVAL_CONFIG.recall_target,
+                        index_type: str = RETRIEVAL_CONFIG.index_type) -> IndexSpec:
+    """构建服务索引并写入索引目录（serving.faiss 和 serving.json）"""
+    started = time.perf_counter()
+    spec, index = build_serving_index(flat_index, recall_target, index_type)
+    if index is not None:
+        faiss.write_index(index, os.path.join(directory, SERVING_INDEX))
+    with open(os.path.join(directory, SERVING_META), "w", encoding="utf-8") as f:
+        json.dump(asdict(spec), f, ensure_ascii=False)
+    logger.info(f"服务索引 {spec.factory}: {spec.vectors} 个向量，recall@10={spec.recall:.3f}，"
+                f"构建耗时 {time.perf_counter() - started:.1f}秒")
+    return spec
+
+
+def read_serving_spec(directory: str) -> Optional[IndexSpec]:
+    """读取索引目录中的选型结果，没有时返回None（例如notebook直接生成的索引）"""
+    path = os.path.join(directory, SERVING_META)
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return IndexSpec(**json.load(f))
+
+
+def read_index(path: str, mmap: bool = RETRIEVAL_CONFIG.index_mmap) -> faiss.Index:
+    """读取FAISS索引，mmap为True时向量数据和倒排表以只读内存映射方式加载"""
+    return faiss.read_index(path, faiss.IO_FLAG_MMAP_IFC if mmap else 0)
+
+
+def load_store(directory: str, embeddings: Embeddings, mmap: bool = RETRIEVAL_CONFIG.index_mmap) -> FAISS:
+    """
+    加载用于检索的FAISS向量库
+
+    优先加载服务索引，没有时加载 FAISS.save_local 写出的 index.faiss。
+
+    Args:
+        directory (str): 索引目录
+        embeddings (Embeddings): 查询使用的嵌入模型
+        mmap (bool): 是否内存映射加载
+
+    Returns:
+        FAISS: 向量库，其索引为只读，不能再调用 add_texts/delete
+    """
+    started = time.perf_counter()
+    spec = read_serving_spec(directory)
+    serving_path = os.path.join(directory, SERVING_INDEX)
+    kind = spec.kind if spec is not None and os.path.exists(serving_path) else "flat"
+    index = read_index(serving_path if kind != "flat" else os.path.join(directory, "index.faiss"), mmap)
+    if kind == "ivf":
+        # 按位置重建向量（MMR使用）需要直接映射；nprobe随索引一起保存
+        faiss.extract_index_ivf(index).make_direct_map()
+
+    # 索引由本项目自己生成，允许反序列化其中的docstore
+    with open(os.path.join(directory, "index.pkl"), "rb") as f:
+        docstore, index_to_docstore_id = pickle.load(f)
+    store = FAISS(embeddings, index, docstore, index_to_docstore_id)
+
+    FAISS_INDEX_LOAD_SECONDS.observe(time.perf_counter() - started, kind=kind)
+    FAISS_INDEX_VECTORS.set(index.ntotal, kind=kind)
+    return store
+
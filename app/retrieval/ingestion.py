@@ -0,0 +1,591 @@
+"""
+文档入库流水线模块
+
+把一个目录下的文件解析、切分、嵌入后写入持久化的FAISS索引，替代在notebook中
+逐个文档运行单元格的方式。流水线分三段并行执行：
+
+1. 解析和切分：在进程池中执行，每个任务处理一小批文件（摊薄进程通信开销）
+2. 嵌入：片段凑满 embed_batch_size 后作为一个批次请求嵌入模型，
+   最多 embed_concurrency 个批次同时进行
+3. 写入：嵌入完成的批次按顺序追加到向量索引，同时加入同目录下的BM25索引（bm25/）
+
+内存有界：目录按需遍历，进程池中最多有 2 × workers 个任务在途，
+等待嵌入的片段不超过 embed_concurrency + 1 个批次；嵌入跟不上时主循环阻塞，
+不再向进程池提交新任务。常驻内存的只有索引本身（向量和片段文本）。
+
+增量入库：索引目录中的清单（manifest.json）记录每个文件的内容哈希和片段ID。
+再次入库时，大小和修改时间未变的文件直接跳过，内容哈希未变的文件只更新清单，
+只有变化的文件被解析、嵌入和替换，已删除文件的片段从索引中移除，
+嵌入开销与变化量而不是语料规模成正比。嵌入模型或切分参数变化时自动全量重建。
+
+切分：默认按token数切分（见 splitter.TokenTextSplitter），片段长度与嵌入模型的token上限一致；
+--splitter recursive 使用按字符数的 RecursiveCharacterTextSplitter。
+
+服务索引：写入时在Flat索引之外按向量数和召回率目标构建只读的IVF/HNSW服务索引
+（见 index_manager），检索时内存映射加载。
+
+命令行用法：
+    python -m app.retrieval.ingestion docs/ --index langchain/dataConnection/faiss_index --workers 8
+    python -m app.retrieval.ingestion docs/ --full     # 忽略清单，全量重建
+    python -m app.retrieval.ingestion docs/ --index-type hnsw --recall-target 0.99
+    python -m app.retrieval.ingestion docs/ --chunk-size 512 --chunk-overlap 64
+
+导出指标：
+- ingest_files_total: 按结果（ok/unchanged/removed/failed）统计的入库文件数
+- ingest_chunks_total: 写入索引的片段数
+- ingest_chunks_deleted_total: 因文件变化或删除而从索引移除的片段数
+"""
+
+import argparse
+import hashlib
+import logging
+import os
+import shutil
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from functools import lru_cache
+from itertools import islice
+from multiprocessing import get_context
+from typing import Any, Callable, Deque, Dict, Iterator, List, Optional, Set, Tuple
+
+from langchain_community.vectorstores import FAISS
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+from ..config.retrieval_config import RETRIEVAL_CONFIG
+from ..services.metrics import metrics
+from .embeddings import embedding_cache_stats, get_embeddings
+from .loaders import iter_files, load_file
+from .manifest import MANIFEST_FILE, IndexManifest, FileEntry, file_hash
+from .pdf_loader import get_extractor
+from .bm25 import BM25_DIR, BM25Index
+from .index_manager import INDEX_TYPES, write_serving_index
+from .splitter import TokenTextSplitter
+
+logger = logging.getLogger(__name__)
+
+INGEST_FILES = metrics.counter("ingest_files_total", "入库处理的文件数", ["status"])
+INGEST_CHUNKS = metrics.counter("ingest_chunks_total", "写入索引的片段数")
+INGEST_CHUNKS_DELETED = metrics.counter("ingest_chunks_deleted_total", "从索引移除的片段数")
+
+# 一个待嵌入的片段：(片段ID, 文本, 元数据)
+Chunk = Tuple[str, str, Dict[str, Any]]
+
+TEXT_SPLITTERS = ("token", "recursive")
+
+
+@dataclass
+class ParsedFile:
+    """
+    工作进程的解析结果，只包含可序列化的纯数据
+
+    Attributes:
+        content_hash: 文件内容的SHA-256
+        unchanged: 内容哈希与清单一致，未解析
+    """
+    path: str
+    content_hash: str = ""
+    size: int = 0
+    mtime_ns: int = 0
+    chunks: List[Chunk] = field(default_factory=list)
+    unchanged: bool = False
+    error: Optional[str] = None
+
+
+@dataclass
+class IngestionReport:
+    """
+    入库进度和吞吐统计
+
+    Attributes:
+        files: 已处理的文件数（含失败和未变化的文件）
+        failed: 解析失败的文件数
+        unchanged: 未变化而跳过的文件数
+        updated: 新增或内容变化而重新入库的文件数
+        removed: 已删除而从索引移除的文件数
+        chunks: 已写入索引的片段数
+        deleted_chunks: 从索引移除的旧片段数
+        elapsed: 已用时间（秒）
+        embed_seconds: 嵌入请求的累计耗时（秒，并发请求分别计入）
+        cache_hits / cache_misses: 本次入库中嵌入缓存的命中和未命中次数
+        errors: 失败文件及原因（最多保留前100个）
+    """
+    files: int = 0
+    failed: int = 0
+    unchanged: int = 0
+    updated: int = 0
+    removed: int = 0
+    chunks: int = 0
+    deleted_chunks: int = 0
+    elapsed: float = 0.0
+    embed_seconds: float = 0.0
+    cache_hits: int = 0
+    cache_misses: int = 0
+    errors: List[Tuple[str, str]] = field(default_factory=list)
+
+    @property
+    def docs_per_sec(self) -> float:
+        return self.files / self.elapsed if self.elapsed > 0 else 0.0
+
+    @property
+    def chunks_per_sec(self) -> float:
+        return self.chunks / self.elapsed if self.elapsed > 0 else 0.0
+
+    @property
+    def cache_hit_rate(self) -> Optional[float]:
+        total = self.cache_hits + self.cache_misses
+        return self.cache_hits / total if total else None
+
+    def summary(self) -> str:
+        return (f"文件 {self.files}（更新 {self.updated}，未变 {self.unchanged}，删除 {self.removed}，"
+                f"失败 {self.failed}），写入片段 {self.chunks}，移除片段 {self.deleted_chunks}，"
+                f"耗时 {self.elapsed:.1f}s，{self.docs_per_sec:.1f} docs/s，"
+                f"{self.chunks_per_sec:.1f} chunks/s"
+                + (f"，嵌入缓存命中率 {self.cache_hit_rate:.1%}" if self.cache_hit_rate is not None else ""))
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "files": self.files,
+            "failed": self.failed,
+            "unchanged": self.unchanged,
+            "updated": self.updated,
+            "removed": self.removed,
+            "chunks": self.chunks,
+            "deleted_chunks": self.deleted_chunks,
+            "elapsed_seconds": round(self.elapsed, 3),
+            "embed_seconds": round(self.embed_seconds, 3),
+            "docs_per_sec": round(self.docs_per_sec, 2),
+            "chunks_per_sec": round(self.chunks_per_sec, 2),
+            "cache_hits": self.cache_hits,
+            "cache_misses": self.cache_misses,
+            "cache_hit_rate": round(self.cache_hit_rate, 4) if self.cache_hit_rate is not None else None,
+            "errors": [{"path": path, "error": error} for path, error in self.errors],
+        }
+
+
+def chunk_id(path: str, index: int) -> str:
+    """片段ID：由文件路径和片段序号确定，同一文件重新入库时ID稳定"""
+    return f"{hashlib.sha1(path.encode('utf-8')).hexdigest()[:16]}-{index}"
+
+
+@lru_cache(maxsize=4)
+def _get_splitter(text_splitter: str, chunk_size: int, chunk_overlap: int):
+    if text_splitter == "token":
+        return TokenTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+    if text_splitter == "recursive":
+        return RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+    raise ValueError(f"不支持的切分方式: {text_splitter}。支持的方式: {list(TEXT_SPLITTERS)}")
+
+
+def split_documents(documents: Iterator[Document], text_splitter: str, chunk_size: int,
+                    chunk_overlap: int) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    """逐个产出(片段文本, 元数据)：token切分按批编码后惰性产出，recursive切分逐个文档切分"""
+    splitter = _get_splitter(text_splitter, chunk_size, chunk_overlap)
+    if isinstance(splitter, TokenTextSplitter):
+        for chunk in splitter.split_documents(documents):
+            yield chunk.page_content, chunk.metadata
+        return
+    for document in documents:
+        for text in splitter.split_text(document.page_content):
+            yield text, document.metadata
+
+
+def parse_file(path: str, text_splitter: str, chunk_size: int, chunk_overlap: int, jq_schema: str,
+               known_hash: Optional[str] = None) -> ParsedFile:
+    """
+    解析并切分单个文件，异常记录在结果中而不是抛出
+
+    Args:
+        text_splitter (str): 切分方式，"token" 或 "recursive"
+        known_hash (str, optional): 清单中记录的内容哈希，与当前内容一致时跳过解析
+    """
+    parsed = ParsedFile(path=path)
+    try:
+        stat = os.stat(path)
+        parsed.size, parsed.mtime_ns = stat.st_size, stat.st_mtime_ns
+        parsed.content_hash = file_hash(path)
+        if parsed.content_hash == known_hash:
+            parsed.unchanged = True
+            return parsed
+        chunks = split_documents(load_file(path, jq_schema, parsed.content_hash), text_splitter, chunk_size, chunk_overlap)
+        for index, (text, metadata) in enumerate(chunks):
+            parsed.chunks.append((chunk_id(path, index), text, dict(metadata, chunk=index)))
+    except Exception as e:
+        parsed.chunks = []
+        parsed.error = f"{type(e).__name__}: {e}"
+    return parsed
+
+
+def _parse_files(tasks: List[Tuple[str, Optional[str]]], text_splitter: str, chunk_size: int,
+                 chunk_overlap: int, jq_schema: str) -> List[ParsedFile]:
+    """工作进程的任务入口：解析一批(文件路径, 清单中的内容哈希)"""
+    return [parse_file(path, text_splitter, chunk_size, chunk_overlap, jq_schema, known_hash)
+            for path, known_hash in tasks]
+
+
+def _batched(iterable: Iterator, size: int) -> Iterator[List]:
+    while True:
+        batch = list(islice(iterable, size))
+        if not batch:
+            return
+        yield batch
+
+
+def check_index_path(index_path: str) -> None:
+    """
+    检查索引目录可以被入库替换：不存在，或者是已有的索引目录（包含清单或FAISS索引文件）
+
+    Raises:
+        ValueError: index_path 是已存在的普通目录或文件，替换会删除其中的内容
+    """
+    if not os.path.exists(index_path):
+        return
+    if not os.path.isdir(index_path) or not any(
+            os.path.exists(os.path.join(index_path, name)) for name in (MANIFEST_FILE, "index.faiss")):
+        raise ValueError(f"{index_path} 不是索引目录，拒绝覆盖")
+
+
+def save_index_atomically(store: FAISS, index_path: str, manifest: Optional[IndexManifest] = None,
+                          bm25: Optional[BM25Index] = None, index_type: Optional[str] = None,
+                          recall_target: float = RETRIEVAL_CONFIG.recall_target) -> None:
+    """
+    先写到临时目录再替换，读取方不会看到写了一半的索引，向量索引、服务索引、BM25索引和清单总是一致
+
+    已经内存映射加载旧索引的进程不受影响：旧文件在替换后仍然有效，直到这些进程热替换到新索引。
+    index_type 为None时不构建服务索引。
+
+    Raises:
+        ValueError: index_path 已存在但不是索引目录
+    """
+    check_index_path(index_path)
+    tmp_path = f"{index_path}.tmp"
+    old_path = f"{index_path}.old"
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    store.save_local(tmp_path)
+    if index_type is not None:
+        write_serving_index(store.index, tmp_path, recall_target, index_type)
+    if bm25 is not None:
+        bm25.save(os.path.join(tmp_path, BM25_DIR))
+    if manifest is not None:
+        manifest.save(tmp_path)
+    if os.path.exists(index_path):
+        shutil.rmtree(old_path, ignore_errors=True)
+        os.replace(index_path, old_path)
+    os.replace(tmp_path, index_path)
+    shutil.rmtree(old_path, ignore_errors=True)
+
+
+class IngestionPipeline:
+    """
+    并行文档入库流水线
+
+    使用示例：
+        >>> pipeline = IngestionPipeline(index_path="langchain/dataConnection/faiss_index")
+        >>> report = pipeline.run("docs/", progress=lambda r: print(r.summary()))
+        >>> report.chunks_per_sec
+        >>> # 再次运行时只处理变化的文件
+        >>> pipeline.run("docs/").updated
+    """
+
+    def __init__(self, index_path: str = RETRIEVAL_CONFIG.index_path,
+                 embeddings: Optional[Embeddings] = None,
+                 workers: Optional[int] = RETRIEVAL_CONFIG.ingest_workers,
+                 files_per_task: int = RETRIEVAL_CONFIG.ingest_files_per_task,
+                 embed_batch_size: int = RETRIEVAL_CONFIG.embed_batch_size,
+                 embed_concurrency: int = RETRIEVAL_CONFIG.embed_concurrency,
+                 text_splitter: str = RETRIEVAL_CONFIG.text_splitter,
+                 chunk_size: int = RETRIEVAL_CONFIG.chunk_size,
+                 chunk_overlap: int = RETRIEVAL_CONFIG.chunk_overlap,
+                 jq_schema: str = RETRIEVAL_CONFIG.json_jq_schema,
+                 index_type: str = RETRIEVAL_CONFIG.index_type,
+                 recall_target: float = RETRIEVAL_CONFIG.recall_target,
+                 report_interval: float = 2.0):
+        self.index_path = index_path
+        self.embeddings = embeddings or get_embeddings()
+        self.workers = workers or os.cpu_count() or 1
+        self.files_per_task = files_per_task
+        self.embed_batch_size = embed_batch_size
+        self.embed_concurrency = max(1, embed_concurrency)
+        if text_splitter not in TEXT_SPLITTERS:
+            raise ValueError(f"不支持的切分方式: {text_splitter}。支持的方式: {list(TEXT_SPLITTERS)}")
+        self.text_splitter = text_splitter
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.jq_schema = jq_schema
+        self.index_type = index_type
+        self.recall_target = recall_target
+        self.report_interval = report_interval
+
+        self._store: Optional[FAISS] = None
+        self._bm25 = BM25Index()
+        self._manifest = IndexManifest()
+        self._pending_deletes: List[str] = []
+        self._touched = False
+        self._report = IngestionReport()
+
+    @property
+    def settings(self) -> Dict[str, Any]:
+        """影响向量内容的设置，记录在清单中"""
+        return {
+            "embedding_model": getattr(self.embeddings, "model", type(self.embeddings).__name__),
+            "text_splitter": self.text_splitter,
+            "chunk_size": self.chunk_size,
+            "chunk_overlap": self.chunk_overlap,
+            "jq_schema": self.jq_schema,
+            "pdf_extractor": get_extractor(RETRIEVAL_CONFIG.pdf_layout),
+        }
+
+    def _open(self, full: bool) -> None:
+        """加载已有索引和清单；没有清单、设置变化或要求全量时从空索引开始"""
+        self._store = None
+        self._bm25 = BM25Index()
+        self._manifest = IndexManifest(settings=self.settings)
+        self._pending_deletes = []
+        self._touched = False
+        if full:
+            return
+        manifest = IndexManifest.load(self.index_path)
+        if manifest is None:
+            return
+        if manifest.settings != self.settings:
+            logger.info(f"索引设置变化（{manifest.settings} -> {self.settings}），全量重建")
+            return
+        self._store = FAISS.load_local(self.index_path, self.embeddings, allow_dangerous_deserialization=True)
+        self._manifest = manifest
+        bm25_path = os.path.join(self.index_path, BM25_DIR)
+        if BM25Index.exists(bm25_path):
+            self._bm25 = BM25Index.load(bm25_path, mmap=False)
+        else:
+            # 早于BM25索引创建的向量索引：从docstore中的片段文本补建
+            documents = self._store.docstore._dict
+            self._bm25.add(list(documents), [doc.page_content for doc in documents.values()])
+
+    def _delete_chunks(self, chunk_ids: List[str]) -> None:
+        """登记要删除的片段，在下一次写入前合并执行（FAISS每次删除都要重建ID映射）"""
+        self._pending_deletes.extend(chunk_ids)
+
+    def _flush_deletes(self) -> None:
+        if not self._pending_deletes or self._store is None:
+            self._pending_deletes = []
+            return
+        existing = set(self._store.index_to_docstore_id.values())
+        ids = [chunk for chunk in self._pending_deletes if chunk in existing]
+        if ids:
+            self._store.delete(ids)
+            self._bm25.delete(ids)
+            self._report.deleted_chunks += len(ids)
+            INGEST_CHUNKS_DELETED.inc(len(ids))
+        self._pending_deletes = []
+
+    def _embed(self, batch: List[Chunk]) -> Tuple[List[Chunk], List[List[float]], float]:
+        """在线程池中执行的嵌入请求"""
+        started = time.perf_counter()
+        vectors = self.embeddings.embed_documents([text for _, text, _ in batch])
+        return batch, vectors, time.perf_counter() - started
+
+    def _write(self, future: Future) -> None:
+        """把一个嵌入完成的批次写入索引（先执行待删除的旧片段）"""
+        batch, vectors, seconds = future.result()
+        self._flush_deletes()
+        text_embeddings = [(text, vector) for (_, text, _), vector in zip(batch, vectors)]
+        metadatas = [metadata for _, _, metadata in batch]
+        ids = [chunk for chunk, _, _ in batch]
+        if self._store is None:
+            self._store = FAISS.from_embeddings(text_embeddings, self.embeddings, metadatas=metadatas, ids=ids)
+        else:
+            self._store.add_embeddings(text_embeddings, metadatas=metadatas, ids=ids)
+        self._bm25.add(ids, [text for _, text, _ in batch])
+        self._report.chunks += len(batch)
+        self._report.embed_seconds += seconds
+        INGEST_CHUNKS.inc(len(batch))
+
+    def _collect(self, parsed: ParsedFile, buffer: List[Chunk]) -> None:
+        self._report.files += 1
+        if parsed.error is not None:
+            # 解析失败时保留旧片段和清单条目，下次入库重试
+            self._report.failed += 1
+            if len(self._report.errors) < 100:
+                self._report.errors.append((parsed.path, parsed.error))
+            INGEST_FILES.inc(status="failed")
+            logger.warning(f"文件解析失败 {parsed.path}: {parsed.error}")
+            return
+
+        entry = self._manifest.files.get(parsed.path)
+        if parsed.unchanged:
+            # 内容未变，只更新修改时间，下次可以直接按stat跳过
+            entry.size, entry.mtime_ns = parsed.size, parsed.mtime_ns
+            self._touched = True
+            self._report.unchanged += 1
+            INGEST_FILES.inc(status="unchanged")
+            return
+
+        if entry is not None:
+            self._delete_chunks(entry.chunk_ids)
+        self._manifest.files[parsed.path] = FileEntry(
+            hash=parsed.content_hash, size=parsed.size, mtime_ns=parsed.mtime_ns,
+            chunk_ids=[chunk for chunk, _, _ in parsed.chunks],
+        )
+        self._report.updated += 1
+        INGEST_FILES.inc(status="ok")
+        buffer.extend(parsed.chunks)
+
+    def _tasks(self, root: str, seen: Set[str]) -> Iterator[Tuple[str, Optional[str]]]:
+        """遍历目录，跳过大小和修改时间都未变的文件，产出(路径, 清单中的内容哈希)"""
+        for path in iter_files(root):
+            seen.add(path)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            if self._manifest.is_unchanged(path, stat):
+                self._report.files += 1
+                self._report.unchanged += 1
+                INGEST_FILES.inc(status="unchanged")
+                continue
+            yield path, self._manifest.known_hash(path)
+
+    def _remove_missing(self, root: str, seen: Set[str]) -> None:
+        """删除清单中位于root下、但本次遍历没有出现的文件的片段"""
+        for path in self._manifest.paths_under(root):
+            if path not in seen:
+                self._delete_chunks(self._manifest.files.pop(path).chunk_ids)
+                self._report.removed += 1
+                INGEST_FILES.inc(status="removed")
+
+    def run(self, root: str, progress: Optional[Callable[[IngestionReport], None]] = None,
+            full: bool = False) -> IngestionReport:
+        """
+        入库目录下的所有支持的文件，完成后原子地写入 index_path
+
+        Args:
+            root (str): 文档目录
+            progress (Callable, optional): 进度回调，每 report_interval 秒调用一次
+            full (bool): 忽略已有索引和清单，全量重建
+
+        Returns:
+            IngestionReport: 最终的吞吐统计
+
+        Raises:
+            ValueError: index_path 已存在但不是索引目录
+        """
+        check_index_path(self.index_path)
+        started = time.perf_counter()
+        last_report = started
+        root = os.path.abspath(root)
+        self._report = IngestionReport()
+        self._open(full)
+        cache_before = embedding_cache_stats(self.embeddings)
+
+        seen: Set[str] = set()
+        tasks = _batched(self._tasks(root, seen), self.files_per_task)
+        buffer: List[Chunk] = []
+        embedding: Deque[Future] = deque()
+        # 使用spawn启动工作进程，避免在多线程的服务进程中fork
+        with ProcessPoolExecutor(self.workers, mp_context=get_context("spawn")) as parsers, \
+                ThreadPoolExecutor(self.embed_concurrency) as embedders:
+
+            def submit_embeddings(flush: bool = False) -> None:
+                while len(buffer) >= self.embed_batch_size or (flush and buffer):
+                    if len(embedding) >= self.embed_concurrency:
+                        # 嵌入跟不上解析：等最早的批次完成后再继续（背压）
+                        self._write(embedding.popleft())
+                    batch = buffer[:self.embed_batch_size]
+                    del buffer[:self.embed_batch_size]
+                    embedding.append(embedders.submit(self._embed, batch))
+
+            pending: Set[Future] = set()
+            exhausted = False
+            while pending or not exhausted:
+                while not exhausted and len(pending) < 2 * self.workers:
+                    batch = next(tasks, None)
+                    if batch is None:
+                        exhausted = True
+                        break
+                    pending.add(parsers.submit(
+                        _parse_files, batch, self.text_splitter, self.chunk_size, self.chunk_overlap, self.jq_schema
+                    ))
+                if not pending:
+                    break
+
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    for parsed in future.result():
+                        self._collect(parsed, buffer)
+                submit_embeddings()
+                while embedding and embedding[0].done():
+                    self._write(embedding.popleft())
+
+                now = time.perf_counter()
+                if progress is not None and now - last_report >= self.report_interval:
+                    self._report.elapsed = now - started
+                    progress(self._report)
+                    last_report = now
+
+            submit_embeddings(flush=True)
+            while embedding:
+                self._write(embedding.popleft())
+
+        self._remove_missing(root, seen)
+        self._flush_deletes()
+        report = self._report
+        if cache_before is not None:
+            self.embeddings.flush()
+            cache_after = embedding_cache_stats(self.embeddings)
+            report.cache_hits = cache_after["hits"] - cache_before["hits"]
+            report.cache_misses = cache_after["misses"] - cache_before["misses"]
+        if self._store is not None and (report.updated or report.removed or full
+                                        or not os.path.exists(self.index_path)):
+            save_index_atomically(self._store, self.index_path, self._manifest, self._bm25,
+                                  self.index_type, self.recall_target)
+        elif self._store is not None and self._touched:
+            # 只有修改时间变化：只更新清单
+            self._manifest.save(self.index_path)
+        report.elapsed = time.perf_counter() - started
+        if progress is not None:
+            progress(report)
+        return report
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="并行文档入库：解析、切分、嵌入并写入FAISS索引")
+    parser.add_argument("directory", help="文档目录（递归遍历 txt/md/csv/json/jsonl/pdf）")
+    parser.add_argument("--index", default=RETRIEVAL_CONFIG.index_path, help="索引输出目录")
+    parser.add_argument("--workers", type=int, default=RETRIEVAL_CONFIG.ingest_workers, help="解析进程数")
+    parser.add_argument("--batch-size", type=int, default=RETRIEVAL_CONFIG.embed_batch_size, help="嵌入批次大小")
+    parser.add_argument("--splitter", default=RETRIEVAL_CONFIG.text_splitter, choices=TEXT_SPLITTERS,
+                        help="切分方式，token按token数在句子和标题边界切分")
+    parser.add_argument("--chunk-size", type=int, default=RETRIEVAL_CONFIG.chunk_size,
+                        help="片段长度（token切分按token计，recursive按字符计）")
+    parser.add_argument("--chunk-overlap", type=int, default=RETRIEVAL_CONFIG.chunk_overlap, help="相邻片段的重叠长度")
+    parser.add_argument("--jq", default=RETRIEVAL_CONFIG.json_jq_schema, help="JSON文件的jq表达式")
+    parser.add_argument("--embedding-model", default=RETRIEVAL_CONFIG.embedding_model, help="嵌入模型")
+    parser.add_argument("--index-type", default=RETRIEVAL_CONFIG.index_type, choices=INDEX_TYPES,
+                        help="服务索引类型，auto按向量数和召回率目标选择")
+    parser.add_argument("--recall-target", type=float, default=RETRIEVAL_CONFIG.recall_target,
+                        help="服务索引的召回率目标（recall@10）")
+    parser.add_argument("--full", action="store_true", help="忽略清单，全量重建索引")
+    args = parser.parse_args(argv)
+
+    pipeline = IngestionPipeline(
+        index_path=args.index,
+        embeddings=get_embeddings(args.embedding_model),
+        workers=args.workers,
+        embed_batch_size=args.batch_size,
+        text_splitter=args.splitter,
+        chunk_size=args.chunk_size,
+        chunk_overlap=args.chunk_overlap,
+        jq_schema=args.jq,
+        index_type=args.index_type,
+        recall_target=args.recall_target,
+    )
+    report = pipeline.run(args.directory, progress=lambda r: print(r.summary(), flush=True), full=args.full)
+    print(f"完成：{report.summary()}，索引已写入 {args.index}")
+    for path, error in report.errors:
+        print(f"  失败 {path}: {error}")
+
+
+if __name__ == "__main__":
+    main()
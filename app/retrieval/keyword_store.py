@@ -0,0 +1,92 @@
+"""
+关键词索引模块
+
+加载入库流水线写在向量索引目录下的BM25索引（bm25/），提供异步检索接口。
+BM25打分是NumPy向量运算，放到线程池中执行，可以与向量检索并行。
+元数据过滤条件（向量位置集合）通过缓存的 位置→BM25文档序号 映射转换为文档掩码，
+只在掩码内打分。
+"""
+
+import asyncio
+import logging
+import os
+import threading
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from ..config.retrieval_config import RETRIEVAL_CONFIG
+from .bm25 import BM25_DIR, BM25Index
+from .vector_store import CompiledFilter
+
+logger = logging.getLogger(__name__)
+
+
+class KeywordIndex:
+    """
+    持久化BM25索引的检索封装
+
+    索引不存在时（例如向量索引由notebook直接生成）检索返回空列表，混合检索退化为向量检索。
+
+    使用示例：
+        >>> results = await keyword_index.asearch("机器学习", k=8)
+        >>> results[0]
+        ('3f2a9c0d1e5b7a64-0', 7.21)
+    """
+
+    def __init__(self, index_path: str):
+        self.directory = os.path.join(index_path, BM25_DIR)
+        self._index: Optional[BM25Index] = None
+        self._missing_logged = False
+        self._rows: Optional[Tuple[BM25Index, np.ndarray, np.ndarray]] = None
+        self._lock = threading.Lock()
+
+    def load(self) -> Optional[BM25Index]:
+        """加载索引（只加载一次），不存在时返回None"""
+        if self._index is None:
+            with self._lock:
+                if self._index is None and BM25Index.exists(self.directory):
+                    self._index = BM25Index.load(self.directory)
+                    # 预先合并和计算idf，避免第一次查询时计入
+                    self._index.get_scores("")
+                elif self._index is None and not self._missing_logged:
+                    logger.warning(f"BM25索引不存在: {self.directory}，混合检索只使用向量检索")
+                    self._missing_logged = True
+        return self._index
+
+    def reload(self) -> None:
+        """从磁盘加载重建后的索引并替换，加载期间的查询继续使用旧索引"""
+        if not BM25Index.exists(self.directory):
+            with self._lock:
+                self._index = None
+                self._missing_logged = False
+            return
+        index = BM25Index.load(self.directory)
+        index.get_scores("")
+        with self._lock:
+            self._index = index
+
+    def _allowed(self, index: BM25Index, where: CompiledFilter) -> np.ndarray:
+        """过滤条件的位置集合转换为BM25文档掩码"""
+        rows = self._rows
+        if rows is None or rows[0] is not index or rows[1] is not where.ids:
+            # 每对(BM25索引, 向量索引快照)只转换一次ID
+            rows = (index, where.ids, index.doc_numbers(where.ids))
+            self._rows = rows
+        docs = rows[2][where.positions]
+        allowed = np.zeros(len(index.ids), dtype=bool)
+        allowed[docs[docs >= 0]] = True
+        return allowed
+
+    def search(self, query: str, k: int, where: Optional[CompiledFilter] = None) -> List[Tuple[str, float]]:
+        index = self.load()
+        if index is None:
+            return []
+        return index.search(query, k, self._allowed(index, where) if where is not None else None)
+
+    async def asearch(self, query: str, k: int, where: Optional[CompiledFilter] = None) -> List[Tuple[str, float]]:
+        """检索，返回(片段ID, BM25分数)列表，按分数从高到低排列；where为元数据过滤条件"""
+        return await asyncio.to_thread(self.search, query, k, where)
+
+# 全局关键词索引（与向量索引位于同一目录）
+keyword_index = KeywordIndex(RETRIEVAL_CONFIG.index_path)
@@ -0,0 +1,122 @@
+"""
+文档加载模块
+
+按扩展名解析单个文件，逐个产出 Document：
+- .txt / .md: 整个文件为一个文档
+- .csv: 每行一个文档，内容为"列名: 值"逐行拼接（与 CSVLoader 一致）
+- .json / .jsonl: 用 jq 表达式选出文本，每个结果一个文档（与 JSONLoader 一致）
+- .pdf: 每页一个文档，见 pdf_loader（页面文本有磁盘缓存；需要版面保真时使用 pdfplumber，否则使用 pypdf）
+
+这些函数在入库流水线的工作进程中执行，只依赖文件路径和纯数据参数，便于跨进程调用。
+"""
+
+import csv
+import json
+import os
+from typing import Any, Dict, Iterator, Optional
+
+from langchain_core.documents import Document
+
+from .pdf_loader import PdfLoader
+
+SUPPORTED_EXTENSIONS = (".txt", ".md", ".csv", ".json", ".jsonl", ".pdf")
+
+
+def load_text(path: str) -> Iterator[Document]:
+    """加载纯文本文件"""
+    with open(path, encoding="utf-8", errors="replace") as f:
+        text = f.read()
+    if text.strip():
+        yield Document(page_content=text, metadata={"source": path})
+
+
+def load_csv(path: str) -> Iterator[Document]:
+    """加载CSV文件，逐行产出文档"""
+    with open(path, newline="", encoding="utf-8", errors="replace") as f:
+        for row_index, row in enumerate(csv.DictReader(f)):
+            content = "\n".join(f"{key.strip()}: {(value or '').strip()}"
+                                for key, value in row.items() if key is not None)
+            yield Document(page_content=content, metadata={"source": path, "row": row_index})
+
+
+def _jq_text(value: Any) -> str:
+    return value if isinstance(value, str) else json.dumps(value, ensure_ascii=False)
+
+
+def load_json(path: str, jq_schema: str = ".") -> Iterator[Document]:
+    """
+    加载JSON或JSON Lines文件
+
+    Args:
+        path (str): 文件路径
+        jq_schema (str): jq表达式，例如 ".[].content"；非字符串的结果序列化为JSON文本
+
+    Raises:
+        ImportError: 未安装jq
+    """
+    try:
+        import jq
+    except ImportError:
+        raise ImportError("加载JSON文件需要jq，请运行 `pip install jq`")
+
+    program = jq.compile(jq_schema)
+    with open(path, encoding="utf-8") as f:
+        if path.endswith(".jsonl"):
+            records = (json.loads(line) for line in f if line.strip())
+        else:
+            records = iter([json.load(f)])
+        seq = 0
+        for record in records:
+            for value in program.input(record).all():
+                if value is None:
+                    continue
+                yield Document(page_content=_jq_text(value), metadata={"source": path, "seq_num": seq})
+                seq += 1
+
+
+def load_pdf(path: str, content_hash: Optional[str] = None) -> Iterator[Document]:
+    """加载PDF文件，逐页产出文档（跳过没有文本的页）"""
+    return PdfLoader(path, content_hash=content_hash).lazy_load()
+
+
+def load_file(path: str, jq_schema: str = ".", content_hash: Optional[str] = None) -> Iterator[Document]:
+    """
+    按扩展名加载文件
+
+    Args:
+        path (str): 文件路径
+        jq_schema (str): JSON文件使用的jq表达式
+        content_hash (str, optional): 已经计算好的文件内容哈希，PDF页面缓存使用
+
+    Returns:
+        Iterator[Document]: 文件中的文档
+
+    Raises:
+        ValueError: 不支持的文件类型
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension in (".txt", ".md"):
+        return load_text(path)
+    if extension == ".csv":
+        return load_csv(path)
+    if extension in (".json", ".jsonl"):
+        return load_json(path, jq_schema)
+    if extension == ".pdf":
+        return load_pdf(path, content_hash)
+    raise ValueError(f"不支持的文件类型: {path}。支持的类型: {list(SUPPORTED_EXTENSIONS)}")
+
+
+def iter_files(root: str, extensions=SUPPORTED_EXTENSIONS) -> Iterator[str]:
+    """递归遍历目录，按需产出支持的文件路径（不一次性列出整个目录树）"""
+    stack = [root]
+    while stack:
+        directory = stack.pop()
+        try:
+            entries = sorted(os.scandir(directory), key=lambda entry: entry.name)
+        except OSError:
+            continue
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                stack.append(entry.path)
+            elif entry.is_file() and entry.name.lower().endswith(extensions):
+                yield entry.path
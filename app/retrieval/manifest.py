@@ -0,0 +1,92 @@
+"""
+索引清单模块
+
+清单与FAISS索引保存在同一目录（manifest.json），记录每个源文件的
+大小、修改时间、内容哈希和它产生的片段ID，用于增量入库：
+
+- 大小和修改时间都没变：视为未变化，不读取文件
+- 内容哈希没变（例如只是touch了文件）：视为未变化，只更新修改时间
+- 内容哈希变化或新文件：重新解析、嵌入，先删除旧片段再写入新片段
+- 清单中有、目录中已不存在的文件：删除其片段
+
+清单同时记录嵌入模型和切分参数，这些设置变化时旧向量不再可比，需要全量重建。
+"""
+
+import hashlib
+import json
+import os
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, List, Optional
+
+MANIFEST_FILE = "manifest.json"
+MANIFEST_VERSION = 1
+
+
+def file_hash(path: str, block_size: int = 1 << 20) -> str:
+    """按块计算文件内容的SHA-256，不把整个文件读入内存"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+@dataclass
+class FileEntry:
+    """清单中的单个源文件"""
+    hash: str
+    size: int
+    mtime_ns: int
+    chunk_ids: List[str] = field(default_factory=list)
+
+
+@dataclass
+class IndexManifest:
+    """
+    索引清单
+
+    Attributes:
+        settings: 影响向量内容的设置（嵌入模型、切分参数），变化时需要全量重建
+        files: 源文件路径到清单条目的映射
+    """
+    settings: Dict[str, Any] = field(default_factory=dict)
+    files: Dict[str, FileEntry] = field(default_factory=dict)
+
+    def is_unchanged(self, path: str, stat: os.stat_result) -> bool:
+        """文件大小和修改时间都与清单一致时视为未变化"""
+        entry = self.files.get(path)
+        return entry is not None and entry.size == stat.st_size and entry.mtime_ns == stat.st_mtime_ns
+
+    def known_hash(self, path: str) -> Optional[str]:
+        entry = self.files.get(path)
+        return entry.hash if entry else None
+
+    def paths_under(self, root: str) -> List[str]:
+        """清单中位于root目录下的文件"""
+        prefix = os.path.join(os.path.abspath(root), "")
+        return [path for path in self.files if os.path.abspath(path).startswith(prefix)]
+
+    @classmethod
+    def load(cls, index_path: str) -> Optional["IndexManifest"]:
+        """读取索引目录中的清单，不存在或版本不符时返回None"""
+        path = os.path.join(index_path, MANIFEST_FILE)
+        if not os.path.exists(path):
+            return None
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("version") != MANIFEST_VERSION:
+            return None
+        return cls(
+            settings=data.get("settings", {}),
+            files={path: FileEntry(**entry) for path, entry in data.get("files", {}).items()},
+        )
+
+    def save(self, index_path: str) -> None:
+        """写入索引目录（由调用方保证目录替换的原子性）"""
+        data = {
+            "version": MANIFEST_VERSION,
+            "settings": self.settings,
+            "files": {path: asdict(entry) for path, entry in self.files.items()},
+        }
+        with open(os.path.join(index_path, MANIFEST_FILE), "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
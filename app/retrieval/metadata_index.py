@@ -0,0 +1,223 @@
+"""
+元数据过滤索引模块
+
+Retrievers.ipynb 中的自查询检索在向量检索之后才按元数据过滤，过滤掉的结果占用了top-k名额，
+只能靠加大fetch_k弥补，过滤条件越严格召回越差。该模块在检索之前把过滤条件编译成
+片段位置（FAISS向量位置）的集合，向量检索和BM25检索只在集合内打分。
+
+索引结构：
+- 每个字段的每个取值对应一个有序的位置数组（倒排列表），列表类型的取值（例如tags）
+  按元素建立倒排；等值、$in、$all 等条件通过有序数组的交集（二分查找）、并集和补集（结果较大时借助位图）组合
+- 范围条件（$gt/$gte/$lt/$lte）使用按取值排序后首尾相接的倒排列表，二分查找出取值区间后
+  只对区间内的位置排序；该数组在字段第一次出现范围条件时构建
+
+过滤表达式（与 langchain FAISS 的 filter 写法一致）：
+    {"source": "docs/a.md"}
+    {"store": {"$in": ["store1", "store2"]}, "date": {"$gte": "2024-01-01"}}
+    {"tags": {"$all": ["faq", "billing"]}}
+    {"$or": [{"store": "store1"}, {"tags": "faq"}]}
+    {"store": {"$ne": "store0"}}
+"""
+
+import bisect
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+_EMPTY = np.zeros(0, dtype=np.int64)
+_RANGE_OPERATORS = {"$gt", "$gte", "$lt", "$lte"}
+
+
+def _values(value: Any) -> Iterable[Any]:
+    """字段取值展开为可建立倒排的元素：列表按元素展开，其他取值原样返回"""
+    if isinstance(value, (list, tuple, set)):
+        return value
+    return (value,)
+
+
+def _sorted_unique(positions: np.ndarray, size: int) -> np.ndarray:
+    """位置去重并排序：元素较多时用位图（O(size)），较少时直接排序"""
+    if len(positions) * max(1, int(np.log2(len(positions) + 1))) > size:
+        mask = np.zeros(size, dtype=bool)
+        mask[positions] = True
+        return np.flatnonzero(mask)
+    return np.unique(positions)
+
+
+def _union(arrays: List[np.ndarray], size: int) -> np.ndarray:
+    if not arrays:
+        return _EMPTY
+    if len(arrays) == 1:
+        return arrays[0]
+    return _sorted_unique(np.concatenate(arrays), size)
+
+
+def _intersect(arrays: List[np.ndarray]) -> np.ndarray:
+    # 从最短的数组开始求交，每一步在较长的有序数组中二分查找较短数组的元素，O(短 × log 长)
+    arrays = sorted(arrays, key=len)
+    result = arrays[0]
+    for array in arrays[1:]:
+        if len(result) == 0:
+            break
+        found = np.searchsorted(array, result)
+        found[found == len(array)] = 0
+        result = result[array[found] == result] if len(array) else _EMPTY
+    return result
+
+
+def _complement(positions: np.ndarray, size: int) -> np.ndarray:
+    mask = np.ones(size, dtype=bool)
+    mask[positions] = False
+    return np.flatnonzero(mask)
+
+
+class MetadataIndex:
+    """
+    片段元数据的倒排索引
+
+    Attributes:
+        fields: 建立索引的字段
+        size: 位置总数（与FAISS索引的向量数一致）
+
+    使用示例：
+        >>> index = MetadataIndex.build(metadatas, fields=["source", "store", "date", "tags"])
+        >>> positions = index.compile({"store": "store1", "date": {"$gte": "2024-06-01"}})
+        >>> positions[:5]
+        array([  3,  17,  42,  56,  91])
+    """
+
+    def __init__(self, fields: Sequence[str], size: int):
+        self.fields = list(fields)
+        self.size = size
+        self._postings: Dict[str, Dict[Any, np.ndarray]] = {field: {} for field in self.fields}
+        self._present: Dict[str, np.ndarray] = {}
+        self._sorted: Dict[str, Tuple[List[Any], np.ndarray, np.ndarray]] = {}
+        self._all = np.arange(size, dtype=np.int64)
+
+    @classmethod
+    def build(cls, metadatas: Sequence[Optional[Dict[str, Any]]], fields: Sequence[str]) -> "MetadataIndex":
+        """
+        从按位置排列的元数据构建索引
+
+        Args:
+            metadatas (Sequence[Optional[Dict[str, Any]]]): 第i项为位置i的片段元数据，缺失的位置为None
+            fields (Sequence[str]): 建立索引的字段
+
+        Returns:
+            MetadataIndex: 元数据索引
+        """
+        index = cls(fields, len(metadatas))
+        lists: Dict[str, Dict[Any, List[int]]] = {field: {} for field in index.fields}
+        for position, metadata in enumerate(metadatas):
+            if not metadata:
+                continue
+            for field in index.fields:
+                if field not in metadata or metadata[field] is None:
+                    continue
+                postings = lists[field]
+                for value in _values(metadata[field]):
+                    postings.setdefault(value, []).append(position)
+        for field, postings in lists.items():
+            # 按位置顺序追加，数组天然有序
+            index._postings[field] = {value: np.asarray(positions, dtype=np.int64)
+                                      for value, positions in postings.items()}
+            index._present[field] = _union(list(index._postings[field].values()), index.size)
+        return index
+
+    def values(self, field: str) -> List[Any]:
+        """字段的所有取值"""
+        return list(self._check_field(field))
+
+    def _check_field(self, field: str) -> Dict[Any, np.ndarray]:
+        if field not in self._postings:
+            raise ValueError(f"字段 {field} 没有建立元数据索引。已索引的字段: {self.fields}")
+        return self._postings[field]
+
+    def _equal(self, field: str, value: Any) -> np.ndarray:
+        return self._check_field(field).get(value, _EMPTY)
+
+    def _range(self, field: str, conditions: Dict[str, Any]) -> np.ndarray:
+        """范围条件：在按取值排序的数组上二分查找区间"""
+        if field not in self._sorted:
+            postings = self._check_field(field)
+            try:
+                keys = sorted(postings)
+            except TypeError:
+                raise ValueError(f"字段 {field} 的取值类型不一致，不能做范围比较")
+            bounds = np.zeros(len(keys) + 1, dtype=np.int64)
+            np.cumsum([len(postings[key]) for key in keys], out=bounds[1:])
+            positions = np.concatenate([postings[key] for key in keys]) if keys else _EMPTY
+            self._sorted[field] = (keys, positions, bounds)
+        keys, positions, bounds = self._sorted[field]
+        lo, hi = 0, len(keys)
+        try:
+            for operator, value in conditions.items():
+                if operator == "$gt":
+                    lo = max(lo, bisect.bisect_right(keys, value))
+                elif operator == "$gte":
+                    lo = max(lo, bisect.bisect_left(keys, value))
+                elif operator == "$lt":
+                    hi = min(hi, bisect.bisect_left(keys, value))
+                elif operator == "$lte":
+                    hi = min(hi, bisect.bisect_right(keys, value))
+        except TypeError:
+            raise ValueError(f"过滤条件 {conditions} 与字段 {field} 的取值类型不一致，不能做范围比较")
+        if lo >= hi:
+            return _EMPTY
+        # 区间内各取值的倒排列表相邻存放，一次切片后排序
+        return _sorted_unique(positions[bounds[lo]:bounds[hi]], self.size)
+
+    def _field(self, field: str, condition: Any) -> np.ndarray:
+        if not isinstance(condition, dict):
+            return self._equal(field, condition)
+        results = []
+        ranges = {op: value for op, value in condition.items() if op in _RANGE_OPERATORS}
+        if ranges:
+            results.append(self._range(field, ranges))
+        for operator, value in condition.items():
+            if operator in _RANGE_OPERATORS:
+                continue
+            if operator == "$eq":
+                results.append(self._equal(field, value))
+            elif operator == "$in":
+                results.append(_union([self._equal(field, v) for v in value], self.size))
+            elif operator == "$all":
+                results.append(_intersect([self._equal(field, v) for v in value]) if value else self._all)
+            elif operator == "$ne":
+                results.append(_complement(self._equal(field, value), self.size))
+            elif operator == "$nin":
+                results.append(_complement(np.concatenate([self._equal(field, v) for v in value] + [_EMPTY]),
+                                           self.size))
+            elif operator == "$exists":
+                self._check_field(field)
+                present = self._present.get(field, _EMPTY)
+                results.append(present if value else _complement(present, self.size))
+            else:
+                raise ValueError(f"不支持的过滤运算符: {operator}")
+        return _intersect(results) if results else self._all
+
+    def compile(self, expression: Dict[str, Any]) -> np.ndarray:
+        """
+        把过滤表达式编译为满足条件的位置集合
+
+        Args:
+            expression (Dict[str, Any]): 过滤表达式，顶层的多个条件为"且"关系
+
+        Returns:
+            np.ndarray: 有序、不重复的位置数组（int64）
+
+        Raises:
+            ValueError: 字段未建立索引、运算符不支持或范围比较的取值类型不一致
+        """
+        results = []
+        for key, condition in expression.items():
+            if key == "$and":
+                results.append(_intersect([self.compile(sub) for sub in condition]) if condition else self._all)
+            elif key == "$or":
+                results.append(_union([self.compile(sub) for sub in condition], self.size))
+            elif key == "$not":
+                results.append(_complement(self.compile(condition), self.size))
+            else:
+                results.append(self._field(key, condition))
+        return _intersect(results) if results else self._all
+
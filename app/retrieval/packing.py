@@ -0,0 +1,290 @@
+"""
+上下文打包模块
+
+把检索到的片段放入提示词的token预算中。直接把前k个片段原样拼进提示词，小模型（例如 qwen3:0.6b）
+的上下文经常溢出，相邻片段的重叠部分和重复内容也白白增加了提示词评估时间。打包分三步：
+
+1. 去重与合并：同一来源（同一文件的同一页）的片段按在原文中的位置排序，被其他片段包含的片段丢弃，
+   相互重叠或首尾相接的相邻片段合并为一段，重叠部分只保留一份。位置取切分时记录的 start_index，
+   没有时按片段序号判断相邻，并按文本首尾匹配去掉重叠
+2. 预算：由模型的上下文长度减去为回答预留的token数和提示词其余部分的token数得到，
+   不超过 context_tokens（见 context_budget）
+3. 贪心打包：相关性按名次计为 1/名次（合并后的片段取各成员之和），相关性最高的一段优先放入，
+   其余按"相关性/token数"从高到低放入剩余预算；合并后超出预算的段拆回单个片段参与打包
+
+打包结果记录候选片段原样拼接的token数、去重合并去掉的token数和实际放入的token数，
+用于报告每次请求节省的token。
+
+导出指标：
+- rag_context_tokens: 每次打包的token数分布，kind为 candidates（候选片段原样拼接）、packed（实际放入）、
+  saved（两者之差）
+"""
+
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+from langchain_core.documents import Document
+
+from ..config.retrieval_config import RETRIEVAL_CONFIG
+from ..services.metrics import metrics
+from .retriever import RetrievedChunk
+from .tokens import count_tokens_batch
+
+RAG_CONTEXT_TOKENS = metrics.histogram(
+    "rag_context_tokens", "RAG上下文打包的token数", ["kind"],
+    buckets=(0, 64, 128, 256, 512, 1024, 2048, 4096, 8192, 16384),
+)
+
+# 合并相邻片段时允许的最大间隔（字符）：切分时去掉的首尾空白
+_MAX_GAP = 2
+# 没有位置信息时，文本首尾匹配的最短重叠长度（字符），更短的匹配视为巧合
+_MIN_OVERLAP = 8
+
+
+@dataclass
+class PackedContext:
+    """
+    一次上下文打包的结果
+
+    Attributes:
+        chunks: 放入上下文的片段（合并后的片段是新的RetrievedChunk），按名次排列
+        used_tokens: 放入的片段占用的token数（含每段的来源标注）
+        candidate_tokens: 全部候选片段原样拼接的token数
+        redundant_tokens: 去重和合并重叠部分去掉的token数
+        budget_tokens: 本次的token预算
+        merged: 被合并进相邻片段的片段数
+        deduplicated: 因被其他片段包含而丢弃的片段数
+        dropped: 因预算不足未放入的片段数
+    """
+    chunks: List[RetrievedChunk]
+    used_tokens: int
+    candidate_tokens: int
+    redundant_tokens: int
+    budget_tokens: int
+    merged: int = 0
+    deduplicated: int = 0
+    dropped: int = 0
+
+    @property
+    def saved_tokens(self) -> int:
+        """与候选片段原样拼接相比节省的token数"""
+        return max(0, self.candidate_tokens - self.used_tokens)
+
+    def to_dict(self) -> Dict[str, int]:
+        return {
+            "budget_tokens": self.budget_tokens,
+            "candidate_tokens": self.candidate_tokens,
+            "used_tokens": self.used_tokens,
+            "saved_tokens": self.saved_tokens,
+            "redundant_tokens": self.redundant_tokens,
+            "merged": self.merged,
+            "deduplicated": self.deduplicated,
+            "dropped": self.dropped,
+        }
+
+
+@dataclass
+class _Span:
+    """同一来源中的一段连续文本，由一个或多个相邻片段合并而成"""
+    members: List[RetrievedChunk]
+    text: str
+    start: Optional[int]
+    end: Optional[int]
+    chunk_index: Optional[int]
+    tokens: int = 0
+    relevance: float = 0.0
+
+    @property
+    def rank(self) -> int:
+        return min(member.rank for member in self.members)
+
+
+def context_budget(context_window: int, prompt_tokens: int,
+                   reserve_tokens: int = RETRIEVAL_CONFIG.answer_reserve_tokens,
+                   max_tokens: int = RETRIEVAL_CONFIG.context_tokens) -> int:
+    """
+    由模型的上下文长度计算检索片段的token预算
+
+    Args:
+        context_window (int): 模型的上下文长度（Ollama的num_ctx）
+        prompt_tokens (int): 提示词中检索片段以外部分（系统提示、问题）的token数
+        reserve_tokens (int): 为模型回答预留的token数
+        max_tokens (int): 预算上限
+
+    Returns:
+        int: 检索片段可用的token数，不小于0
+    """
+    return max(0, min(max_tokens, context_window - reserve_tokens - prompt_tokens))
+
+
+def _header(chunk: RetrievedChunk) -> str:
+    """format_context 中每段的来源标注（编号按两位数估算）"""
+    return f"[10] 来源：{chunk.source}\n"
+
+
+def _overlap_length(left: str, right: str) -> int:
+    """left 的后缀与 right 的前缀重合的最大长度（不足 _MIN_OVERLAP 时为0）"""
+    probe = right[:_MIN_OVERLAP]
+    if len(probe) < _MIN_OVERLAP:
+        return 0
+    position = left.find(probe, max(0, len(left) - len(right)))
+    while position != -1:
+        if right.startswith(left[position:]):
+            return len(left) - position
+        position = left.find(probe, position + 1)
+    return 0
+
+
+def _merge(span: _Span, chunk: RetrievedChunk, start: Optional[int], chunk_index: Optional[int]) -> Optional[str]:
+    """
+    尝试把片段并入span（片段位于span之后），返回合并后的文本；不相邻时返回None
+
+    片段被span完全包含时返回span原文本（即丢弃片段）。span.end 是原文中的结束位置，
+    合并时插入的换行不计入，因此不能用 start + len(text) 代替。
+    """
+    text = chunk.document.page_content
+    if span.start is not None and start is not None:
+        if start > span.end + _MAX_GAP:
+            return None
+        if start + len(text) <= span.end:
+            return span.text
+        if start >= span.end:
+            return span.text + ("\n" if start > span.end else "") + text
+        return span.text + text[span.end - start:]
+    if text in span.text:
+        return span.text
+    if span.chunk_index is None or chunk_index != span.chunk_index + 1:
+        return None
+    overlap = _overlap_length(span.text, text)
+    return span.text + (text[overlap:] if overlap else "\n" + text)
+
+
+def _build_spans(chunks: List[RetrievedChunk]) -> Tuple[List[_Span], int, int]:
+    """按来源分组后合并相邻片段，返回 (span列表, 合并的片段数, 丢弃的片段数)"""
+    groups: Dict[Tuple[Any, Any], List[RetrievedChunk]] = {}
+    for chunk in chunks:
+        metadata = chunk.document.metadata
+        source = metadata.get("source")
+        key = (source, metadata.get("page")) if source is not None else (id(chunk), None)
+        groups.setdefault(key, []).append(chunk)
+
+    spans: List[_Span] = []
+    merged = deduplicated = 0
+    for members in groups.values():
+        positioned = all(member.document.metadata.get("start_index") is not None for member in members)
+        position_key = "start_index" if positioned else "chunk"
+        members.sort(key=lambda member: (member.document.metadata.get(position_key) is None,
+                                         member.document.metadata.get(position_key) or 0, member.rank))
+        current: Optional[_Span] = None
+        for member in members:
+            metadata = member.document.metadata
+            start = metadata.get("start_index") if positioned else None
+            chunk_index = metadata.get("chunk")
+            text = _merge(current, member, start, chunk_index) if current is not None else None
+            end = start + len(member.document.page_content) if start is not None else None
+            if text is None:
+                current = _Span([member], member.document.page_content, start, end, chunk_index)
+                spans.append(current)
+                continue
+            if text == current.text:
+                deduplicated += 1
+            else:
+                merged += 1
+            current.members.append(member)
+            current.text = text
+            current.end = max(current.end, end) if end is not None else None
+            current.chunk_index = chunk_index if chunk_index is not None else current.chunk_index
+    return spans, merged, deduplicated
+
+
+def _to_chunk(span: _Span) -> RetrievedChunk:
+    """span转换为检索片段：单个片段原样返回，合并的片段生成新的文档"""
+    if len(span.members) == 1:
+        return span.members[0]
+    first = min(span.members, key=lambda member: member.rank)
+    metadata = dict(first.document.metadata,
+                    merged_chunks=[member.document.id for member in span.members])
+    if span.start is not None:
+        metadata["start_index"] = span.start
+    document = Document(page_content=span.text, metadata=metadata, id=first.document.id)
+    return RetrievedChunk(
+        document=document,
+        score=max(member.score for member in span.members),
+        rank=first.rank,
+        extra=dict(first.extra, merged_ranks=sorted(member.rank for member in span.members)),
+    )
+
+
+def pack_context(chunks: List[RetrievedChunk], budget_tokens: int,
+                 max_chunks: Optional[int] = None) -> PackedContext:
+    """
+    去重、合并相邻片段后按相关性/token数贪心打包
+
+    Args:
+        chunks (List[RetrievedChunk]): 按相关性从高到低排列的候选片段
+        budget_tokens (int): 上下文的token预算
+        max_chunks (int, optional): 最多放入的段数（合并后的片段算一段）
+
+    Returns:
+        PackedContext: 打包结果，片段按名次排列
+    """
+    candidate_counts = count_tokens_batch([_header(chunk) + chunk.document.page_content for chunk in chunks])
+    candidate_tokens = sum(candidate_counts)
+    single_tokens = {id(chunk): tokens for chunk, tokens in zip(chunks, candidate_counts)}
+
+    spans, merged, deduplicated = _build_spans(chunks)
+    multi = [span for span in spans if len(span.members) > 1]
+    for span, tokens in zip(multi, count_tokens_batch([_header(span.members[0]) + span.text for span in multi])):
+        span.tokens = tokens
+    units: List[_Span] = []
+    for span in spans:
+        if len(span.members) == 1:
+            span.tokens = single_tokens[id(span.members[0])]
+        elif span.tokens > budget_tokens:
+            # 合并后整体放不下：拆回单个片段，各自参与打包
+            units.extend(_Span([member], member.document.page_content, None, None, None,
+                               tokens=single_tokens[id(member)]) for member in span.members)
+            continue
+        units.append(span)
+    redundant_tokens = sum(single_tokens[id(member)] for span in units for member in span.members) \
+        - sum(span.tokens for span in units)
+    for span in units:
+        span.relevance = sum(1.0 / member.rank for member in span.members)
+
+    limit = max_chunks if max_chunks is not None else len(units)
+    selected: List[_Span] = []
+    used = 0
+    units.sort(key=lambda span: span.rank)
+    # 相关性最高的一段优先放入，避免只按密度挑选时被多个短片段挤掉
+    ordered = units[:1] + sorted(units[1:], key=lambda span: span.relevance / max(span.tokens, 1), reverse=True)
+    for span in ordered:
+        if len(selected) >= limit:
+            break
+        if used + span.tokens > budget_tokens:
+            continue
+        selected.append(span)
+        used += span.tokens
+    selected.sort(key=lambda span: span.rank)
+
+    packed = PackedContext(
+        chunks=[_to_chunk(span) for span in selected],
+        used_tokens=used,
+        candidate_tokens=candidate_tokens,
+        redundant_tokens=max(0, redundant_tokens),
+        budget_tokens=budget_tokens,
+        merged=merged,
+        deduplicated=deduplicated,
+        dropped=sum(len(span.members) for span in units) - sum(len(span.members) for span in selected),
+    )
+    RAG_CONTEXT_TOKENS.observe(packed.candidate_tokens, kind="candidates")
+    RAG_CONTEXT_TOKENS.observe(packed.used_tokens, kind="packed")
+    RAG_CONTEXT_TOKENS.observe(packed.saved_tokens, kind="saved")
+    return packed
+
+
+def format_context(chunks: List[RetrievedChunk]) -> str:
+    """把片段格式化为带编号的来源列表，编号与回答中的引用标记[n]对应"""
+    return "\n\n".join(
+        f"[{i}] 来源：{chunk.source}\n{chunk.document.page_content}"
+        for i, chunk in enumerate(chunks, start=1)
+    )
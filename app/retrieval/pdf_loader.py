@@ -0,0 +1,254 @@
+"""
+PDF加载模块
+
+PDF解析是入库中最慢的一步，而且每次入库（例如切分参数变化后的全量重建）都要从头解析。该模块：
+
+1. 缓存：每页提取出的文本按 (文件内容哈希, 页码, 提取器版本) 写入磁盘缓存，
+   再次加载同一文件时直接读取，不再打开PDF；提取器或其版本变化时自动失效
+2. 并行：未命中缓存的页按连续页段分给进程池提取，页数较少时在当前进程提取（省去进程启动开销）
+3. 流式：按页码顺序逐页产出 Document，进程池中最多有 2 × workers 个页段在途，不会一次性持有整本PDF的文本
+4. 提取器：需要版面保真时使用 pdfplumber（保留列、表格的相对位置，但慢得多），
+   不需要或未安装 pdfplumber 时使用更快的 pypdf
+
+缓存目录结构：
+    {cache_dir}/{提取器版本}/{哈希前两位}/{文件哈希}/pages    页数
+    {cache_dir}/{提取器版本}/{哈希前两位}/{文件哈希}/{页码}.txt    页面文本
+
+缓存文件先写临时文件再替换，多个入库工作进程可以同时读写。
+
+使用示例：
+    >>> loader = PdfLoader("docs/manual.pdf", layout=False, workers=4)
+    >>> for document in loader.lazy_load():
+    ...     print(document.metadata["page"], len(document.page_content))
+"""
+
+import logging
+import os
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from multiprocessing import get_context
+from typing import Deque, Iterator, List, Optional, Set, Tuple
+
+from langchain_core.documents import Document
+
+from ..config.retrieval_config import RETRIEVAL_CONFIG
+from .manifest import file_hash
+
+logger = logging.getLogger(__name__)
+
+# 本模块的提取逻辑变化（例如文本后处理）时递增，使旧缓存失效
+_EXTRACTOR_REVISION = 1
+# 未命中缓存的页数少于该值时不启动进程池
+_MIN_PARALLEL_PAGES = 16
+_DEFAULT_CACHE_DIR = RETRIEVAL_CONFIG.pdf_cache_dir if RETRIEVAL_CONFIG.pdf_cache_enabled else None
+
+
+def get_extractor(layout: bool) -> str:
+    """选择提取器：需要版面保真且安装了pdfplumber时为 "pdfplumber"，否则为 "pypdf" """
+    if layout:
+        try:
+            import pdfplumber  # noqa: F401
+            return "pdfplumber"
+        except ImportError:
+            logger.debug("未安装pdfplumber，PDF改用pypdf提取")
+    return "pypdf"
+
+
+def extractor_version(extractor: str) -> str:
+    """提取器版本，作为缓存键的一部分，例如 pypdf-6.1.0-r1"""
+    if extractor == "pdfplumber":
+        import pdfplumber
+        version = pdfplumber.__version__
+    else:
+        import pypdf
+        version = pypdf.__version__
+    return f"{extractor}-{version}-r{_EXTRACTOR_REVISION}"
+
+
+def page_count(path: str, extractor: str) -> int:
+    """PDF的页数（只读取页面树，不提取文本）"""
+    if extractor == "pdfplumber":
+        import pdfplumber
+        with pdfplumber.open(path) as pdf:
+            return len(pdf.pages)
+    from pypdf import PdfReader
+    return len(PdfReader(path).pages)
+
+
+def iter_pages(path: str, extractor: str, pages: List[int]) -> Iterator[Tuple[int, str]]:
+    """
+    逐页提取指定页的文本，PDF只打开一次
+
+    Args:
+        path (str): PDF文件路径
+        extractor (str): "pdfplumber" 或 "pypdf"
+        pages (List[int]): 页码（从0开始）
+
+    Returns:
+        Iterator[Tuple[int, str]]: (页码, 文本)，没有文本的页为空字符串
+    """
+    if extractor == "pdfplumber":
+        import pdfplumber
+        with pdfplumber.open(path) as pdf:
+            for page_number in pages:
+                page = pdf.pages[page_number]
+                yield page_number, page.extract_text() or ""
+                # 释放已解析页面的缓存，避免大文件占满内存
+                page.flush_cache()
+        return
+
+    from pypdf import PdfReader
+    reader = PdfReader(path)
+    for page_number in pages:
+        yield page_number, reader.pages[page_number].extract_text() or ""
+
+
+def extract_pages(path: str, extractor: str, pages: List[int]) -> List[Tuple[int, str]]:
+    """提取指定页的文本（进程池的任务入口）"""
+    return list(iter_pages(path, extractor, pages))
+
+
+class PageCache:
+    """
+    按 (文件哈希, 页码, 提取器版本) 缓存页面文本的磁盘缓存
+
+    Attributes:
+        directory: 缓存根目录
+        version: 提取器版本
+    """
+
+    def __init__(self, directory: str, version: str):
+        self.directory = directory
+        self.version = version
+
+    def _file_dir(self, content_hash: str) -> str:
+        return os.path.join(self.directory, self.version, content_hash[:2], content_hash)
+
+    @staticmethod
+    def _write(path: str, text: str) -> None:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(tmp_path, path)
+
+    def get_page_count(self, content_hash: str) -> Optional[int]:
+        try:
+            with open(os.path.join(self._file_dir(content_hash), "pages"), encoding="utf-8") as f:
+                return int(f.read())
+        except (OSError, ValueError):
+            return None
+
+    def put_page_count(self, content_hash: str, count: int) -> None:
+        self._write(os.path.join(self._file_dir(content_hash), "pages"), str(count))
+
+    def has(self, content_hash: str, page: int) -> bool:
+        return os.path.exists(os.path.join(self._file_dir(content_hash), f"{page}.txt"))
+
+    def get(self, content_hash: str, page: int) -> Optional[str]:
+        try:
+            with open(os.path.join(self._file_dir(content_hash), f"{page}.txt"), encoding="utf-8") as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def put(self, content_hash: str, page: int, text: str) -> None:
+        self._write(os.path.join(self._file_dir(content_hash), f"{page}.txt"), text)
+
+
+class PdfLoader:
+    """
+    带页面缓存的并行PDF加载器
+
+    Attributes:
+        path: PDF文件路径
+        extractor: 实际使用的提取器
+        workers: 提取页面的进程数，1表示在当前进程中提取
+        pages_per_task: 每个进程任务提取的连续页数
+        cache: 页面缓存，未启用时为None
+    """
+
+    def __init__(self, path: str, layout: bool = RETRIEVAL_CONFIG.pdf_layout,
+                 workers: int = RETRIEVAL_CONFIG.pdf_workers,
+                 cache_dir: Optional[str] = _DEFAULT_CACHE_DIR,
+                 pages_per_task: int = 8, content_hash: Optional[str] = None):
+        """
+        Args:
+            path (str): PDF文件路径
+            layout (bool): 是否需要版面保真（使用pdfplumber），False时使用更快的pypdf
+            workers (int): 提取页面的进程数
+            cache_dir (str, optional): 页面缓存目录，None表示不缓存
+            pages_per_task (int): 每个进程任务提取的连续页数
+            content_hash (str, optional): 已经计算好的文件内容哈希，省去再读一遍文件
+        """
+        self.path = path
+        self.extractor = get_extractor(layout)
+        self.workers = max(1, workers)
+        self.pages_per_task = max(1, pages_per_task)
+        self.cache = PageCache(cache_dir, extractor_version(self.extractor)) if cache_dir else None
+        self._content_hash = content_hash
+
+    def _cached_pages(self, content_hash: Optional[str]) -> Tuple[int, Set[int]]:
+        """返回页数和已缓存的页码（页面文本在产出时才读取）"""
+        count = self.cache.get_page_count(content_hash) if self.cache else None
+        if count is None:
+            count = page_count(self.path, self.extractor)
+            if self.cache:
+                self.cache.put_page_count(content_hash, count)
+        if not self.cache:
+            return count, set()
+        return count, {page for page in range(count) if self.cache.has(content_hash, page)}
+
+    def _extract_parallel(self, pages: List[int]) -> Iterator[Tuple[int, str]]:
+        tasks = iter([pages[start:start + self.pages_per_task]
+                      for start in range(0, len(pages), self.pages_per_task)])
+        executor = ProcessPoolExecutor(self.workers, mp_context=get_context("spawn"))
+        try:
+            in_flight: Deque[Future] = deque()
+            for task in tasks:
+                in_flight.append(executor.submit(extract_pages, self.path, self.extractor, task))
+                if len(in_flight) >= 2 * self.workers:
+                    break
+            while in_flight:
+                # 按提交顺序取结果，保证页码有序；取走一个页段后补交一个，在途页段数有界
+                results = in_flight.popleft().result()
+                task = next(tasks, None)
+                if task is not None:
+                    in_flight.append(executor.submit(extract_pages, self.path, self.extractor, task))
+                yield from results
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    def lazy_load(self) -> Iterator[Document]:
+        """
+        按页码顺序逐页产出文档（跳过没有文本的页）
+
+        Returns:
+            Iterator[Document]: 每页一个文档，元数据为 source 和 page（从0开始）
+        """
+        content_hash = None
+        if self.cache:
+            content_hash = self._content_hash or file_hash(self.path)
+        count, cached = self._cached_pages(content_hash)
+        missing = [page for page in range(count) if page not in cached]
+        if self.workers > 1 and len(missing) >= _MIN_PARALLEL_PAGES:
+            extracted = self._extract_parallel(missing)
+        else:
+            extracted = iter_pages(self.path, self.extractor, missing)
+
+        for page in range(count):
+            if page in cached:
+                text = self.cache.get(content_hash, page)
+                if text is None:
+                    # 缓存文件在检查之后被删除（例如被清理）：直接提取
+                    _, text = extract_pages(self.path, self.extractor, [page])[0]
+            else:
+                _, text = next(extracted)
+                if self.cache:
+                    self.cache.put(content_hash, page, text)
+            if text.strip():
+                yield Document(page_content=text, metadata={"source": self.path, "page": page})
+
+    def load(self) -> List[Document]:
+        """加载所有页面"""
+        return list(self.lazy_load())
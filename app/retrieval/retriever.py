@@ -0,0 +1,292 @@
+"""
+检索器模块
+
+对外提供统一的检索入口，返回带排名和分数的文档片段。支持三种模式：
+
+- vector: 只使用持久化的FAISS向量索引
+- bm25: 只使用同目录下的BM25关键词索引
+- hybrid: 两路检索并发执行（查询向量计算+向量检索 与 BM25检索同时进行），
+  用倒数排名融合（RRF）合并，总耗时取决于较慢的一路而不是两路之和
+
+带元数据过滤条件时，条件先编译成片段位置集合，两路检索都只在集合内打分（预过滤），
+不会因为过滤掉的结果占用名额而召回不足。
+
+融合后按片段ID和片段内容去重；可选地用MMR（最大边际相关性）在融合结果中挑选
+内容互不重复的片段，相似度矩阵一次算出，逐个挑选时只做向量化的max更新。
+
+导出指标：
+- retrieval_stage_seconds: 各检索阶段（filter、embed、vector、bm25、fusion、mmr、total）的耗时分布
+"""
+
+import asyncio
+import hashlib
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+
+from ..config.retrieval_config import RETRIEVAL_CONFIG
+from ..services.metrics import metrics
+from .keyword_store import KeywordIndex, keyword_index
+from .vector_store import CompiledFilter, VectorIndex, vector_index
+
+RETRIEVAL_STAGE_SECONDS = metrics.histogram(
+    "retrieval_stage_seconds", "检索各阶段耗时（秒）", ["stage"]
+)
+
+RETRIEVAL_MODES = ("vector", "bm25", "hybrid")
+
+
+@dataclass
+class RetrievedChunk:
+    """
+    一个检索结果片段
+
+    Attributes:
+        document: 文档片段，metadata中通常包含source（来源文件）
+        score: 相关性分数，越大越相关（混合检索时为RRF融合分数）
+        rank: 在检索结果中的名次（从1开始）
+        extra: 各召回方式附加的调试信息，例如原始距离、BM25分数和各路名次
+    """
+    document: Document
+    score: float
+    rank: int
+    extra: Dict[str, Any] = field(default_factory=dict)
+
+    @property
+    def source(self) -> str:
+        metadata = self.document.metadata
+        return str(metadata.get("source") or metadata.get("id") or f"chunk-{self.rank}")
+
+    def to_citation(self, index: int) -> Dict[str, Any]:
+        """转换为响应中的引用信息"""
+        return {
+            "index": index,
+            "source": self.source,
+            "score": round(self.score, 4),
+            "metadata": self.document.metadata,
+            "snippet": self.document.page_content[:200],
+        }
+
+
+@dataclass
+class RetrievalResult:
+    """
+    一次检索的结果
+
+    Attributes:
+        chunks: 按相关性从高到低排列的片段
+        timings: 各阶段耗时（秒），键为 filter、embed、vector、bm25、fusion、mmr、total 中实际执行的阶段；
+            混合检索时 embed+vector 与 bm25 并发执行，total 约为两者中的较大值加上融合耗时
+    """
+    chunks: List[RetrievedChunk]
+    timings: Dict[str, float] = field(default_factory=dict)
+
+
+def reciprocal_rank_fusion(rankings: List[List[str]], k: int = 60,
+                           weights: Optional[Sequence[float]] = None) -> List[Tuple[str, float]]:
+    """
+    倒数排名融合
+
+    每个ID的融合分数为 Σ w / (k + 名次)，只依赖名次，不需要对不同检索方式的分数做归一化。
+
+    Args:
+        rankings (List[List[str]]): 各路检索按相关性排列的ID列表
+        k (int): 平滑常数，越大越弱化头部名次的优势
+        weights (Sequence[float], optional): 各路检索的权重，默认都为1
+
+    Returns:
+        List[Tuple[str, float]]: (ID, 融合分数)，按分数从高到低排列
+    """
+    weights = weights or [1.0] * len(rankings)
+    scores: Dict[str, float] = {}
+    for ranking, weight in zip(rankings, weights):
+        for rank, doc_id in enumerate(ranking, start=1):
+            scores[doc_id] = scores.get(doc_id, 0.0) + weight / (k + rank)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
+
+
+def mmr_select(query_vector: np.ndarray, candidates: np.ndarray, k: int,
+               lambda_mult: float = 0.5) -> List[int]:
+    """
+    最大边际相关性选择（向量化）
+
+    Args:
+        query_vector (np.ndarray): 查询向量，形状 (dim,)
+        candidates (np.ndarray): 候选向量，形状 (n, dim)
+        k (int): 选择数量
+        lambda_mult (float): 相关性权重，1为只看相关性，0为只看多样性
+
+    Returns:
+        List[int]: 选中候选的下标，按选择顺序排列
+    """
+    if len(candidates) == 0:
+        return []
+    normalized = candidates / np.maximum(np.linalg.norm(candidates, axis=1, keepdims=True), 1e-12)
+    query = query_vector / max(np.linalg.norm(query_vector), 1e-12)
+    relevance = normalized @ query
+    similarity = normalized @ normalized.T
+
+    selected = [int(np.argmax(relevance))]
+    # 每个候选与已选集合的最大相似度，每选一个只需与新选中的一列取max
+    redundancy = similarity[selected[0]].copy()
+    available = np.ones(len(candidates), dtype=bool)
+    available[selected[0]] = False
+    while len(selected) < min(k, len(candidates)):
+        mmr = lambda_mult * relevance - (1 - lambda_mult) * redundancy
+        mmr[~available] = -np.inf
+        best = int(np.argmax(mmr))
+        selected.append(best)
+        available[best] = False
+        np.maximum(redundancy, similarity[best], out=redundancy)
+    return selected
+
+
+def _content_key(document: Document) -> str:
+    return hashlib.blake2b(document.page_content.encode("utf-8"), digest_size=16).hexdigest()
+
+
+class Retriever:
+    """
+    文档检索器
+
+    使用示例：
+        >>> result = await retriever.aretrieve("什么是向量数据库？", k=4)
+        >>> [chunk.source for chunk in result.chunks]
+        >>> result.timings
+        {'bm25': 0.004, 'embed': 0.031, 'vector': 0.003, 'fusion': 0.0002, 'total': 0.035}
+    """
+
+    def __init__(self, index: VectorIndex = vector_index, keywords: KeywordIndex = keyword_index,
+                 rrf_k: Optional[int] = None, hybrid_weights: Optional[Sequence[float]] = None,
+                 mmr_lambda: Optional[float] = None):
+        self.index = index
+        self.keywords = keywords
+        self.rrf_k = rrf_k or RETRIEVAL_CONFIG.rrf_k
+        self.hybrid_weights = list(hybrid_weights or RETRIEVAL_CONFIG.hybrid_weights)
+        self.mmr_lambda = RETRIEVAL_CONFIG.mmr_lambda if mmr_lambda is None else mmr_lambda
+
+    async def _timed(self, stage: str, timings: Dict[str, float], awaitable):
+        started = time.perf_counter()
+        try:
+            return await awaitable
+        finally:
+            timings[stage] = time.perf_counter() - started
+
+    async def _vector_search(self, query: str, k: int, timings: Dict[str, float],
+                             where: Optional[CompiledFilter] = None):
+        """计算查询向量并检索，返回(查询向量, [(片段ID, 文档, L2距离)])"""
+        vector = await self._timed("embed", timings, self.index.aembed_query(query))
+        hits = await self._timed("vector", timings, self.index.asearch_by_vector(vector, k, where))
+        # 旧版本保存的索引中文档可能没有id，用内容哈希代替
+        return vector, [(doc.id or _content_key(doc), doc, float(distance)) for doc, distance in hits]
+
+    async def aretrieve(self, query: str, k: Optional[int] = None, mode: Optional[str] = None,
+                        fetch_k: Optional[int] = None, mmr: Optional[bool] = None,
+                        filter: Optional[Dict[str, Any]] = None) -> RetrievalResult:
+        """
+        检索与查询最相关的k个片段
+
+        Args:
+            query (str): 查询文本
+            k (int, optional): 返回的片段数，默认为 RETRIEVAL_CONFIG.top_k
+            mode (str, optional): "vector"、"bm25" 或 "hybrid"，默认为 RETRIEVAL_CONFIG.retrieval_mode
+            fetch_k (int, optional): 每一路召回的候选数，默认为 RETRIEVAL_CONFIG.fetch_k
+            mmr (bool, optional): 是否用MMR挑选多样化的结果，默认为 RETRIEVAL_CONFIG.mmr_enabled
+            filter (Dict[str, Any], optional): 元数据过滤表达式（见 metadata_index），
+                两路检索都只在满足条件的片段中打分
+
+        Returns:
+            RetrievalResult: 片段和各阶段耗时
+
+        Raises:
+            ValueError: 不支持的检索模式或无效的过滤表达式
+        """
+        k = k or RETRIEVAL_CONFIG.top_k
+        mode = mode or RETRIEVAL_CONFIG.retrieval_mode
+        fetch_k = max(fetch_k or RETRIEVAL_CONFIG.fetch_k, k)
+        mmr = RETRIEVAL_CONFIG.mmr_enabled if mmr is None else mmr
+        if mode not in RETRIEVAL_MODES:
+            raise ValueError(f"不支持的检索模式: {mode}。支持的模式: {list(RETRIEVAL_MODES)}")
+
+        timings: Dict[str, float] = {}
+        started = time.perf_counter()
+
+        where = None
+        if filter:
+            where = await self._timed("filter", timings, asyncio.to_thread(self.index.compile_filter, filter))
+            if len(where) == 0:
+                timings["total"] = time.perf_counter() - started
+                return RetrievalResult(chunks=[], timings={stage: round(s, 6) for stage, s in timings.items()})
+
+        # 两路检索并发执行
+        vector_task = self._vector_search(query, fetch_k, timings, where) if mode != "bm25" else None
+        keyword_task = self._timed("bm25", timings, self.keywords.asearch(query, fetch_k, where)) \
+            if mode != "vector" else None
+        tasks = [task for task in (vector_task, keyword_task) if task is not None]
+        results = await asyncio.gather(*tasks)
+        query_vector, vector_hits = results[0] if vector_task is not None else (None, [])
+        keyword_hits = results[-1] if keyword_task is not None else []
+
+        fusion_started = time.perf_counter()
+        documents: Dict[str, Document] = {doc_id: doc for doc_id, doc, _ in vector_hits}
+        extras: Dict[str, Dict[str, Any]] = {}
+        for rank, (doc_id, _, distance) in enumerate(vector_hits, start=1):
+            extras.setdefault(doc_id, {}).update(distance=distance, vector_rank=rank)
+        for rank, (doc_id, score) in enumerate(keyword_hits, start=1):
+            extras.setdefault(doc_id, {}).update(bm25_score=score, bm25_rank=rank)
+        missing = [doc_id for doc_id, _ in keyword_hits if doc_id not in documents]
+        if missing:
+            for doc_id, doc in zip(missing, self.index.get_documents(missing)):
+                if doc is not None:
+                    documents[doc_id] = doc
+
+        if mode == "vector":
+            # FAISS返回L2距离，转换为越大越相关的分数
+            ranked = [(doc_id, 1.0 / (1.0 + distance)) for doc_id, _, distance in vector_hits]
+        elif mode == "bm25":
+            ranked = keyword_hits
+        else:
+            ranked = reciprocal_rank_fusion(
+                [[doc_id for doc_id, _, _ in vector_hits], [doc_id for doc_id, _ in keyword_hits]],
+                self.rrf_k,
+                self.hybrid_weights,
+            )
+
+        # 去重：同一片段只保留一次，不同文件中内容完全相同的片段也只保留名次最高的一个
+        candidates: List[Tuple[str, float]] = []
+        seen_content = set()
+        for doc_id, score in ranked:
+            document = documents.get(doc_id)
+            if document is None:
+                continue
+            content = _content_key(document)
+            if content in seen_content:
+                continue
+            seen_content.add(content)
+            candidates.append((doc_id, score))
+        timings["fusion"] = time.perf_counter() - fusion_started
+
+        if mmr and query_vector is not None and len(candidates) > k:
+            mmr_started = time.perf_counter()
+            vectors = await asyncio.to_thread(self.index.get_vectors, [doc_id for doc_id, _ in candidates])
+            order = mmr_select(np.asarray(query_vector, dtype=np.float32), vectors, k,
+                               self.mmr_lambda)
+            candidates = [candidates[i] for i in order]
+            timings["mmr"] = time.perf_counter() - mmr_started
+
+        timings["total"] = time.perf_counter() - started
+        for stage, seconds in timings.items():
+            RETRIEVAL_STAGE_SECONDS.observe(seconds, stage=stage)
+
+        chunks = [
+            RetrievedChunk(document=documents[doc_id], score=float(score), rank=rank, extra=extras.get(doc_id, {}))
+            for rank, (doc_id, score) in enumerate(candidates[:k], start=1)
+        ]
+        return RetrievalResult(chunks=chunks, timings={stage: round(s, 6) for stage, s in timings.items()})
+
+
+# 全局检索器
+retriever = Retriever()
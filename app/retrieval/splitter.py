@@ -0,0 +1,179 @@
+"""
+按token切分文本的模块
+
+RecursiveCharacterTextSplitter 按字符数衡量片段长度，并且对过长的片段换一个分隔符递归地重新扫描，
+切出的片段经常超过嵌入模型的token上限，大PDF的切分也比较慢。该模块的切分方式：
+
+1. 在句末标点、换行处把文档切成句段（位置只扫描一次），Markdown标题单独成段
+2. 一批文档的所有句段用 tiktoken 的 encode_ordinary_batch 一次编码，得到每个句段的token数，
+   每个字符只编码一次
+3. 按token数把相邻句段装进片段（不超过 chunk_size 个token）；遇到标题且当前片段已有一定长度时
+   提前结束片段，使片段尽量不跨章节
+4. 重叠部分直接复用上一个片段末尾的句段及其token数，不重新编码
+5. 超过 chunk_size 的单个句段按token偏移量硬切（decode_with_offsets 给出每个token的字符位置）
+
+切分结果以生成器逐个产出，按批编码，处理大文件时不需要一次性持有全部片段。
+tiktoken编码文件不可用时按 tokens.estimate_tokens 的规则估算（中文每字一个token，其他字符每4个一个）。
+
+使用示例：
+    >>> splitter = TokenTextSplitter(chunk_size=256, chunk_overlap=32)
+    >>> for chunk in splitter.split_documents(load_file("docs/manual.pdf")):
+    ...     print(chunk.metadata["tokens"], chunk.page_content[:20])
+"""
+
+import re
+from itertools import accumulate, islice
+from typing import Iterable, Iterator, List, Sequence, Tuple
+
+from langchain_core.documents import Document
+
+from .tokens import get_encoding
+
+# 句段边界：连续换行、中英文句末标点（连同其后的右引号、右括号）、后接空白的英文句点；
+# 整体作为捕获组，re.split 的结果中正文和分隔符交替出现
+_BOUNDARY = re.compile(r"(\n+|[。！？；!?;]+[”’\"'）)」』】\]]*|\.+[”’\"')\]]*(?=\s))")
+# Markdown标题行
+_HEADING = re.compile(r"\s*#{1,6}\s")
+# 估算模式下的"token"：一个中文字符，或至多4个其他字符
+_ESTIMATED_TOKEN = re.compile(r"[一-鿿]|[^一-鿿]{1,4}", re.DOTALL)
+
+
+def _estimate(text: str) -> int:
+    """与 tokens.estimate_tokens 相同的估算，中文字符数由UTF-8字节数推算（中文字符占3个字节），避免逐字符扫描"""
+    wide = (len(text.encode("utf-8")) - len(text)) // 2
+    return wide + (len(text) - wide + 3) // 4
+
+
+def split_segments(text: str) -> List[str]:
+    """按句末标点和换行把文本切成首尾相接的句段，拼接后与原文完全一致"""
+    parts = _BOUNDARY.split(text)
+    # 每个分隔符并入它前面的正文；末尾没有分隔符的正文单独成段
+    segments = [body + delimiter for body, delimiter in zip(parts[0::2], parts[1::2])]
+    if parts[-1]:
+        segments.append(parts[-1])
+    return segments
+
+
+class TokenTextSplitter:
+    """
+    按token数切分文本，优先在句子和标题边界处切分
+
+    Attributes:
+        chunk_size: 片段的最大token数
+        chunk_overlap: 相邻片段的最大重叠token数（按句段对齐，实际重叠不超过该值）
+        batch_size: 一次编码的文档数
+    """
+
+    def __init__(self, chunk_size: int = 256, chunk_overlap: int = 32, batch_size: int = 32):
+        if chunk_size <= 0:
+            raise ValueError(f"chunk_size 必须为正数: {chunk_size}")
+        if not 0 <= chunk_overlap < chunk_size:
+            raise ValueError(f"chunk_overlap 必须不小于0且小于 chunk_size: {chunk_overlap}")
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.batch_size = batch_size
+        # 标题前的片段至少达到该长度才提前结束，避免产生只有几个token的碎片
+        self._min_heading_break = chunk_size // 4
+        # 硬切过长句段时每一小段的token数：与重叠长度一致，重叠部分可以按小段对齐
+        self._piece_size = chunk_overlap or chunk_size
+        self._encoding = get_encoding()
+
+    def _count(self, segments: List[str]) -> List[int]:
+        """批量计算句段的token数"""
+        if self._encoding is None:
+            return [_estimate(segment) for segment in segments]
+        return [len(ids) for ids in self._encoding.encode_ordinary_batch(segments)]
+
+    def _offsets(self, segment: str) -> List[int]:
+        """句段中每个token的起始字符位置"""
+        if self._encoding is None:
+            return [match.start() for match in _ESTIMATED_TOKEN.finditer(segment)]
+        _, offsets = self._encoding.decode_with_offsets(self._encoding.encode_ordinary(segment))
+        return offsets
+
+    def _hard_split(self, segment: str) -> Tuple[List[str], List[int]]:
+        """把超长句段按token偏移量切成不超过 _piece_size 个token的小段"""
+        offsets = self._offsets(segment)
+        cuts = [offsets[i] for i in range(self._piece_size, len(offsets), self._piece_size)] + [len(segment)]
+        pieces, counts = [], []
+        start, token_start = 0, 0
+        for index, cut in enumerate(cuts):
+            token_end = min(len(offsets), (index + 1) * self._piece_size)
+            if cut > start:
+                pieces.append(segment[start:cut])
+                counts.append(token_end - token_start)
+                start, token_start = cut, token_end
+        return pieces, counts
+
+    def _pack(self, segments: List[str], counts: List[int]) -> Iterator[Tuple[int, int, int]]:
+        """按token数把句段装进片段，产出 (起始句段, 结束句段, token数)"""
+        n = len(segments)
+        start = 0
+        while start < n:
+            end, total = start, 0
+            while end < n and total + counts[end] <= self.chunk_size:
+                if end > start and total >= self._min_heading_break and _HEADING.match(segments[end]):
+                    break
+                total += counts[end]
+                end += 1
+            yield start, end, total
+            if end >= n:
+                return
+            if _HEADING.match(segments[end]):
+                # 新章节不带上一章节的重叠
+                start = end
+                continue
+            # 重叠：从片段末尾向前取token数合计不超过 chunk_overlap 的句段，且保证向前推进
+            overlap_start, overlap = end, 0
+            while overlap_start - 1 > start and overlap + counts[overlap_start - 1] <= self.chunk_overlap:
+                overlap_start -= 1
+                overlap += counts[overlap_start]
+            start = overlap_start
+
+    def _split_batch(self, documents: Sequence[Document]) -> Iterator[Document]:
+        segmented = [split_segments(document.page_content) for document in documents]
+        counts = self._count([segment for segments in segmented for segment in segments])
+        position = 0
+        for document, segments in zip(documents, segmented):
+            doc_segments, doc_counts = [], []
+            for segment, count in zip(segments, counts[position:position + len(segments)]):
+                if count > self.chunk_size:
+                    pieces, piece_counts = self._hard_split(segment)
+                    doc_segments.extend(pieces)
+                    doc_counts.extend(piece_counts)
+                else:
+                    doc_segments.append(segment)
+                    doc_counts.append(count)
+            position += len(segments)
+
+            starts = list(accumulate(map(len, doc_segments), initial=0))
+            for start, end, tokens in self._pack(doc_segments, doc_counts):
+                raw = "".join(doc_segments[start:end])
+                text = raw.strip()
+                if not text:
+                    continue
+                start_index = starts[start] + len(raw) - len(raw.lstrip())
+                yield Document(page_content=text,
+                               metadata=dict(document.metadata, start_index=start_index, tokens=tokens))
+
+    def split_documents(self, documents: Iterable[Document]) -> Iterator[Document]:
+        """
+        逐个产出切分后的片段
+
+        Args:
+            documents (Iterable[Document]): 待切分的文档，可以是惰性的迭代器，每 batch_size 个文档编码一次
+
+        Returns:
+            Iterator[Document]: 片段，元数据在原文档元数据的基础上增加 start_index（片段在原文中的字符位置）
+                和 tokens（片段的token数）
+        """
+        documents = iter(documents)
+        while True:
+            batch = list(islice(documents, self.batch_size))
+            if not batch:
+                return
+            yield from self._split_batch(batch)
+
+    def split_text(self, text: str) -> List[str]:
+        """切分单个文本"""
+        return [chunk.page_content for chunk in self._split_batch([Document(page_content=text)])]
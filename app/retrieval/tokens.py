@@ -0,0 +1,49 @@
+"""
+token计数模块
+
+检索片段的打包、上下文预算都需要计数token。优先使用 tiktoken 的 cl100k_base 编码；
+编码文件不可用（例如离线环境首次运行无法下载）时退回到按字符估算，
+保证检索流程不会因为计数器不可用而失败。
+"""
+
+import logging
+from functools import lru_cache
+from typing import List, Optional
+
+logger = logging.getLogger(__name__)
+
+ENCODING_NAME = "cl100k_base"
+
+
+@lru_cache(maxsize=1)
+def get_encoding():
+    """返回tiktoken编码器，不可用时返回None（只尝试一次）"""
+    try:
+        import tiktoken
+        return tiktoken.get_encoding(ENCODING_NAME)
+    except Exception as e:
+        logger.warning(f"tiktoken编码 {ENCODING_NAME} 不可用，改用字符估算: {e}")
+        return None
+
+
+def estimate_tokens(text: str) -> int:
+    """粗略估算token数：中文约每字1个token，其他字符约每4个1个token"""
+    cjk = sum(1 for ch in text if "一" <= ch <= "鿿")
+    return cjk + (len(text) - cjk + 3) // 4
+
+
+def count_tokens(text: str) -> int:
+    """计算文本的token数"""
+    encoding = get_encoding()
+    if encoding is None:
+        return estimate_tokens(text)
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def count_tokens_batch(texts: List[str], num_threads: Optional[int] = None) -> List[int]:
+    """批量计算token数，tiktoken可用时使用其多线程批量编码"""
+    encoding = get_encoding()
+    if encoding is None:
+        return [estimate_tokens(text) for text in texts]
+    kwargs = {"num_threads": num_threads} if num_threads else {}
+    return [len(ids) for ids in encoding.encode_ordinary_batch(texts, **kwargs)]
@@ -0,0 +1,220 @@
+"""
+向量索引模块
+
+加载 langchain/dataConnection 中用 FAISS.save_local 持久化的索引（或入库流水线构建的服务索引，
+见 index_manager），提供异步检索接口。查询向量通过Ollama嵌入模型异步计算，
+FAISS搜索是CPU密集操作，放到线程池中执行，不阻塞事件循环。
+
+检索可以带元数据过滤条件：条件先在同一份索引快照上编译成向量位置集合（见 metadata_index），
+集合较小时直接精确计算这些向量的距离，较大时通过 IDSelector 让FAISS只对集合内的向量打分，
+不会出现过滤后结果不足k个的情况。
+
+索引重建后调用 reload() 热替换：新索引加载完成后才替换引用，替换前后的查询
+分别完整地使用旧索引或新索引，检索不会因为重新加载而阻塞。
+"""
+
+import asyncio
+import threading
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import faiss
+import numpy as np
+
+from langchain_community.vectorstores import FAISS
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+from ..config.retrieval_config import RETRIEVAL_CONFIG
+from .embeddings import get_embeddings
+from .index_manager import load_store
+from .metadata_index import MetadataIndex
+
+
+class _LoadedIndex:
+    """一次加载的向量库，以及按需构建的片段ID到位置的映射和元数据索引，热替换时整体替换"""
+
+    __slots__ = ("store", "positions", "ids", "metadata")
+
+    def __init__(self, store: FAISS):
+        self.store = store
+        self.positions: Optional[Dict[str, int]] = None
+        self.ids: Optional[np.ndarray] = None
+        self.metadata: Optional[MetadataIndex] = None
+
+    def build_metadata(self) -> MetadataIndex:
+        if self.metadata is None:
+            mapping = self.store.index_to_docstore_id
+            ids = [mapping.get(position) for position in range(self.store.index.ntotal)]
+            documents = [self.store.docstore.search(doc_id) if doc_id is not None else None for doc_id in ids]
+            metadatas = [doc.metadata if isinstance(doc, Document) else None for doc in documents]
+            self.ids = np.asarray(ids, dtype=object)
+            self.metadata = MetadataIndex.build(metadatas, RETRIEVAL_CONFIG.metadata_fields)
+        return self.metadata
+
+
+class CompiledFilter:
+    """
+    编译后的元数据过滤条件，绑定编译时的索引快照
+
+    Attributes:
+        positions: 满足条件的向量位置（有序、不重复）
+        ids: 位置到片段ID的映射（整个快照），用于把位置集合转换到BM25索引
+    """
+
+    __slots__ = ("positions", "ids", "_loaded")
+
+    def __init__(self, loaded: _LoadedIndex, positions: np.ndarray):
+        self._loaded = loaded
+        self.positions = positions
+        self.ids = loaded.ids
+
+    def __len__(self) -> int:
+        return len(self.positions)
+
+
+class VectorIndex:
+    """
+    持久化FAISS索引的检索封装
+
+    索引在第一次检索时内存映射加载，多个worker进程共享同一份页缓存。
+
+    使用示例：
+        >>> results = await vector_index.asearch("什么是机器学习？", k=4)
+        >>> for doc, distance in results:
+        ...     print(doc.metadata["source"], distance)
+    """
+
+    def __init__(self, index_path: str, embeddings: Optional[Embeddings] = None):
+        self.index_path = index_path
+        self._embeddings = embeddings
+        self._loaded: Optional[_LoadedIndex] = None
+        self._lock = threading.Lock()
+
+    @property
+    def embeddings(self) -> Embeddings:
+        if self._embeddings is None:
+            self._embeddings = get_embeddings()
+        return self._embeddings
+
+    def _current(self) -> _LoadedIndex:
+        loaded = self._loaded
+        if loaded is None:
+            with self._lock:
+                if self._loaded is None:
+                    self._loaded = _LoadedIndex(load_store(self.index_path, self.embeddings))
+                loaded = self._loaded
+        return loaded
+
+    def load(self) -> FAISS:
+        """加载索引（只加载一次）"""
+        return self._current().store
+
+    def reload(self) -> None:
+        """
+        从磁盘加载重建后的索引并原子替换（索引被重建后调用）
+
+        加载在调用方线程中完成，期间的查询继续使用旧索引；尚未加载过时只丢弃状态，
+        留到第一次检索时加载。
+        """
+        with self._lock:
+            if self._loaded is None:
+                return
+        loaded = _LoadedIndex(load_store(self.index_path, self.embeddings))
+        with self._lock:
+            self._loaded = loaded
+
+    def get_documents(self, ids: Sequence[str]) -> List[Optional[Document]]:
+        """按片段ID取文档，不存在的ID返回None"""
+        store = self.load()
+        documents = []
+        for doc_id in ids:
+            document = store.docstore.search(doc_id)
+            documents.append(document if isinstance(document, Document) else None)
+        return documents
+
+    def get_vectors(self, ids: Sequence[str]) -> np.ndarray:
+        """按片段ID取索引中保存的向量，形状为 (len(ids), dim)"""
+        loaded = self._current()
+        if loaded.positions is None:
+            loaded.positions = {doc_id: position for position, doc_id in loaded.store.index_to_docstore_id.items()}
+        positions = np.asarray([loaded.positions[doc_id] for doc_id in ids], dtype=np.int64)
+        return loaded.store.index.reconstruct_batch(positions)
+
+    def compile_filter(self, expression: Dict[str, Any]) -> CompiledFilter:
+        """
+        把元数据过滤表达式编译为向量位置集合（第一次调用时构建元数据索引）
+
+        Raises:
+            ValueError: 过滤表达式无效
+        """
+        loaded = self._current()
+        return CompiledFilter(loaded, loaded.build_metadata().compile(expression))
+
+    def search_by_vector(self, vector: List[float], k: int = 4,
+                         where: Optional[CompiledFilter] = None) -> List[Tuple[Document, float]]:
+        """
+        按查询向量检索，返回(文档, L2距离)列表，距离越小越相关
+
+        Args:
+            vector (List[float]): 查询向量
+            k (int): 返回数量
+            where (CompiledFilter, optional): 元数据过滤条件，只在满足条件的向量中检索
+        """
+        if where is None:
+            return self.load().similarity_search_with_score_by_vector(vector, k)
+        # 使用编译过滤条件时的快照，位置集合与之对应
+        store = where._loaded.store
+        positions = where.positions
+        query = np.asarray(vector, dtype=np.float32)[None, :]
+        if len(positions) == 0:
+            return []
+        if len(positions) <= RETRIEVAL_CONFIG.filter_exact_max:
+            # 候选很少：直接取出这些向量精确计算距离，比在图或倒排表中寻找满足条件的邻居更快也更准
+            vectors = store.index.reconstruct_batch(positions)
+            distances = ((vectors - query) ** 2).sum(axis=1)
+            top = np.argsort(distances, kind="stable")[:k]
+            hits = zip(positions[top].tolist(), distances[top].tolist())
+        else:
+            distances, found = store.index.search(query, k, params=_search_parameters(store.index, positions))
+            hits = ((position, distance) for position, distance in zip(found[0].tolist(), distances[0].tolist())
+                    if position >= 0)
+        results = []
+        for position, distance in hits:
+            document = store.docstore.search(store.index_to_docstore_id[position])
+            if isinstance(document, Document):
+                results.append((document, float(distance)))
+        return results
+
+    async def aembed_query(self, query: str) -> List[float]:
+        """异步计算查询向量"""
+        return await self.embeddings.aembed_query(query)
+
+    async def asearch_by_vector(self, vector: List[float], k: int = 4,
+                                where: Optional[CompiledFilter] = None) -> List[Tuple[Document, float]]:
+        """按查询向量检索，返回(文档, L2距离)列表，距离越小越相关"""
+        return await asyncio.to_thread(self.search_by_vector, vector, k, where)
+
+    async def asearch(self, query: str, k: int = 4) -> List[Tuple[Document, float]]:
+        """按查询文本检索，返回(文档, L2距离)列表"""
+        return await self.asearch_by_vector(await self.aembed_query(query), k)
+
+
+def _search_parameters(index: faiss.Index, positions: np.ndarray) -> faiss.SearchParameters:
+    """只允许位置集合内向量参与打分的搜索参数，保留索引自身的nprobe/efSearch"""
+    mask = np.zeros(index.ntotal, dtype=bool)
+    mask[positions] = True
+    bitmap = np.packbits(mask, bitorder="little")
+    selector = faiss.IDSelectorBitmap(index.ntotal, faiss.swig_ptr(bitmap))
+    if isinstance(index, faiss.IndexHNSW):
+        params = faiss.SearchParametersHNSW(sel=selector, efSearch=index.hnsw.efSearch)
+    elif isinstance(index, faiss.IndexIVF):
+        params = faiss.SearchParametersIVF(sel=selector, nprobe=index.nprobe)
+    else:
+        params = faiss.SearchParameters(sel=selector)
+    # SWIG对象不持有numpy缓冲区，挂在参数对象上保证搜索期间不被回收
+    params.bitmap = bitmap
+    return params
+
+
+# 全局向量索引（notebook中持久化的FAISS索引）
+vector_index = VectorIndex(RETRIEVAL_CONFIG.index_path)
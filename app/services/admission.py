@@ -0,0 +1,280 @@
+"""
+请求准入控制模块
+
+没有准入控制时，流量突增会让所有请求一起变慢，直到超时层层传导。
+该模块在链的前面为每个模型维护一个有界的优先级队列：
+
+1. 并发上限：每个模型同时执行的请求数不超过 ModelConfig.max_concurrency
+2. 优先级：交互式对话 > 批处理任务 > 后台任务（例如对话摘要），
+   许可释放时总是先放行优先级最高的请求
+3. 快速失败：队列已满，或按近期延迟估算的排队时间超过该优先级的时限
+   （或请求剩余的截止时间预算）时，直接抛出 AdmissionRejected，
+   由API层转换为 429 + Retry-After
+4. 挤占：队列满时，高优先级请求会挤掉队尾的低优先级请求
+
+导出指标：
+- admission_queue_depth: 各模型、各优先级排队中的请求数
+- admission_wait_seconds: 获得执行许可前的排队耗时分布
+- admission_rejected_total: 按原因统计的拒绝次数
+"""
+
+import asyncio
+import math
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from enum import IntEnum
+from typing import AsyncIterator, Deque, Dict, Optional
+
+from ..config.model_config import MODEL_CONFIGS
+from ..config.server_config import SERVER_CONFIG, ServerConfig
+from .deadline import remaining
+from .metrics import metrics
+from .model_stats import model_stats
+
+ADMISSION_QUEUE_DEPTH = metrics.gauge(
+    "admission_queue_depth", "准入队列中等待的请求数", ["model", "priority"]
+)
+ADMISSION_WAIT_SECONDS = metrics.histogram(
+    "admission_wait_seconds", "获得执行许可前的排队耗时（秒）", ["model", "priority"]
+)
+ADMISSION_REJECTED = metrics.counter(
+    "admission_rejected_total", "准入控制拒绝的请求数", ["model", "priority", "reason"]
+)
+
+
+class Priority(IntEnum):
+    """请求优先级，数值越小越优先"""
+    INTERACTIVE = 0   # 用户正在等待的交互式对话
+    BATCH = 1         # 批处理任务
+    BACKGROUND = 2    # 后台任务，例如对话摘要
+
+    @property
+    def label(self) -> str:
+        return self.name.lower()
+
+    @classmethod
+    def parse(cls, value: Optional[str]) -> "Priority":
+        """从请求参数解析优先级，未指定时视为交互式"""
+        if not value:
+            return cls.INTERACTIVE
+        try:
+            return cls[value.upper()]
+        except KeyError:
+            raise ValueError(f"不支持的优先级: {value}。支持的优先级: {[p.label for p in cls]}")
+
+
+class AdmissionRejected(Exception):
+    """
+    请求被准入控制拒绝
+
+    Attributes:
+        model_key: 被拒绝请求的目标模型
+        reason: 拒绝原因："queue_full"、"wait_exceeded"、"deadline"、"timeout" 或 "preempted"
+        retry_after: 建议的重试间隔（秒）
+    """
+
+    def __init__(self, model_key: str, reason: str, retry_after: int):
+        super().__init__(f"模型 {model_key} 繁忙（{reason}），请在 {retry_after} 秒后重试")
+        self.model_key = model_key
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class _Waiter:
+    """排队中的单个请求"""
+
+    __slots__ = ("priority", "future", "enqueued_at")
+
+    def __init__(self, priority: Priority, future: asyncio.Future):
+        self.priority = priority
+        self.future = future
+        self.enqueued_at = time.monotonic()
+
+
+class _ModelQueue:
+    """单个模型的并发计数和分优先级的等待队列"""
+
+    def __init__(self, model_key: str):
+        self.model_key = model_key
+        self.in_flight = 0
+        self.queues: Dict[Priority, Deque[_Waiter]] = {p: deque() for p in Priority}
+
+    def depth(self, up_to: Optional[Priority] = None) -> int:
+        """排队请求数；指定up_to时只统计优先级不低于它的请求"""
+        return sum(len(q) for p, q in self.queues.items() if up_to is None or p <= up_to)
+
+
+class AdmissionController:
+    """
+    优先级准入控制器
+
+    使用示例：
+        >>> async with admission_controller.admit("qwen3:4b", Priority.INTERACTIVE):
+        ...     response = await chain.invoke(request, "qwen3:4b")
+    """
+
+    def __init__(self, config: ServerConfig = SERVER_CONFIG):
+        self.config = config
+        self._models: Dict[str, _ModelQueue] = {}
+
+    def _queue_for(self, model_key: str) -> _ModelQueue:
+        if model_key not in self._models:
+            self._models[model_key] = _ModelQueue(model_key)
+        return self._models[model_key]
+
+    def limit(self, model_key: str) -> int:
+        """模型的并发上限"""
+        config = MODEL_CONFIGS.get(model_key)
+        return max(1, config.max_concurrency) if config else 1
+
+    def projected_wait(self, model_key: str, priority: Priority) -> float:
+        """估算一个新请求在该模型上需要排队的时间（秒）"""
+        state = self._queue_for(model_key)
+        limit = self.limit(model_key)
+        if state.in_flight < limit and state.depth() == 0:
+            return 0.0
+        latency = model_stats.mean_latency(model_key) or self.config.admission_default_latency
+        # 排在前面的是同级及更高优先级的请求，每个并发槽位依次处理
+        ahead = state.depth(up_to=priority)
+        return math.ceil((ahead + 1) / limit) * latency
+
+    def _retry_after(self, model_key: str) -> int:
+        """建议的重试间隔：按当前全部排队请求排空所需的时间估算"""
+        state = self._queue_for(model_key)
+        latency = model_stats.mean_latency(model_key) or self.config.admission_default_latency
+        drain = math.ceil((state.depth() + 1) / self.limit(model_key)) * latency
+        return max(1, math.ceil(drain))
+
+    def _reject(self, model_key: str, priority: Priority, reason: str) -> AdmissionRejected:
+        ADMISSION_REJECTED.inc(model=model_key, priority=priority.label, reason=reason)
+        return AdmissionRejected(model_key, reason, self._retry_after(model_key))
+
+    def check(self, model_key: str, priority: Priority = Priority.INTERACTIVE,
+              budget: Optional[float] = None) -> None:
+        """
+        预先检查请求能否被接纳，不能时立即抛出 AdmissionRejected
+
+        流式接口在开始响应前调用，保证拒绝能以429返回而不是中断已开始的响应流。
+
+        Args:
+            model_key (str): 目标模型
+            priority (Priority): 请求优先级
+            budget (float, optional): 请求的时间预算（秒），默认取当前截止时间的剩余预算
+        """
+        if not self.config.admission_enabled:
+            return
+        state = self._queue_for(model_key)
+        if state.in_flight < self.limit(model_key) and state.depth() == 0:
+            return
+        if state.depth() >= self.config.admission_max_queue and self._lowest_below(state, priority) is None:
+            raise self._reject(model_key, priority, "queue_full")
+        projected = self.projected_wait(model_key, priority)
+        if projected > self.config.admission_max_wait[priority.label]:
+            raise self._reject(model_key, priority, "wait_exceeded")
+        budget = remaining() if budget is None else budget
+        if budget is not None and projected >= budget:
+            # 排完队时请求已经超时，不如现在就拒绝
+            raise self._reject(model_key, priority, "deadline")
+
+    @asynccontextmanager
+    async def admit(self, model_key: str, priority: Priority = Priority.INTERACTIVE) -> AsyncIterator[None]:
+        """
+        获取一次请求的执行许可
+
+        Args:
+            model_key (str): 目标模型
+            priority (Priority): 请求优先级
+
+        Raises:
+            AdmissionRejected: 队列已满、预计等待过长、排队超时或被更高优先级请求挤出
+        """
+        if not self.config.admission_enabled:
+            yield
+            return
+
+        state = self._queue_for(model_key)
+        await self._acquire(state, priority)
+        try:
+            yield
+        finally:
+            self._release(state)
+
+    async def _acquire(self, state: _ModelQueue, priority: Priority) -> None:
+        model_key = state.model_key
+        if state.in_flight < self.limit(model_key) and state.depth() == 0:
+            state.in_flight += 1
+            ADMISSION_WAIT_SECONDS.observe(0.0, model=model_key, priority=priority.label)
+            return
+
+        self.check(model_key, priority)
+        if state.depth() >= self.config.admission_max_queue:
+            # 队列已满但存在更低优先级的请求：挤掉其中最晚入队的一个
+            victim = self._lowest_below(state, priority)
+            state.queues[victim.priority].remove(victim)
+            self._update_depth(state, victim.priority)
+            victim.future.set_exception(self._reject(model_key, victim.priority, "preempted"))
+
+        waiter = _Waiter(priority, asyncio.get_running_loop().create_future())
+        state.queues[priority].append(waiter)
+        self._update_depth(state, priority)
+
+        try:
+            await asyncio.wait_for(
+                asyncio.shield(waiter.future), self.config.admission_max_wait[priority.label]
+            )
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            queue = state.queues[priority]
+            if waiter in queue:
+                queue.remove(waiter)
+                self._update_depth(state, priority)
+            elif waiter.future.done() and not waiter.future.cancelled() and waiter.future.exception() is None:
+                # 已被放行但调用方超时或被取消：归还许可
+                self._release(state)
+            if isinstance(e, asyncio.TimeoutError):
+                raise self._reject(model_key, priority, "timeout") from None
+            raise
+        ADMISSION_WAIT_SECONDS.observe(
+            time.monotonic() - waiter.enqueued_at, model=model_key, priority=priority.label
+        )
+
+    def _release(self, state: _ModelQueue) -> None:
+        state.in_flight -= 1
+        # 按优先级从高到低放行等待者，直到并发槽位用完
+        for priority in Priority:
+            queue = state.queues[priority]
+            while queue and state.in_flight < self.limit(state.model_key):
+                waiter = queue.popleft()
+                if waiter.future.done():
+                    continue
+                waiter.future.set_result(None)
+                state.in_flight += 1
+            self._update_depth(state, priority)
+
+    @staticmethod
+    def _lowest_below(state: _ModelQueue, priority: Priority) -> Optional[_Waiter]:
+        """返回优先级低于priority的请求中最该被挤掉的一个（最低优先级里最晚入队的）"""
+        for lower in reversed(Priority):
+            if lower <= priority:
+                break
+            if state.queues[lower]:
+                return state.queues[lower][-1]
+        return None
+
+    def _update_depth(self, state: _ModelQueue, priority: Priority) -> None:
+        ADMISSION_QUEUE_DEPTH.set(len(state.queues[priority]), model=state.model_key, priority=priority.label)
+
+    def get_stats(self) -> Dict[str, Dict[str, object]]:
+        """返回各模型的在途数和分优先级的排队数，便于调试"""
+        return {
+            model_key: {
+                "in_flight": state.in_flight,
+                "limit": self.limit(model_key),
+                "queued": {p.label: len(q) for p, q in state.queues.items()},
+            }
+            for model_key, state in self._models.items()
+        }
+
+
+# 全局准入控制器
+admission_controller = AdmissionController()
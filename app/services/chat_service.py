@@ -8,7 +8,11 @@
 1. 统一的聊天接口：支持有记忆和无记忆两种对话模式
 2. 模型管理：提供模型信息查询和选择功能
 3. 会话管理：支持多会话的历史记录管理
-4. 记忆管理：提供记忆的查询和清除功能
+4. 记忆管理：提供记忆的查询、清除和会话分叉功能
+5. 准入控制：按模型限制并发，繁忙时按优先级排队或快速拒绝
+6. 截止时间：排队和生成都在请求的超时预算内进行，超时即取消
+7. 检索增强：基于持久化向量索引回答问题并返回引用来源
+8. 图对话：基于LangGraph的带记忆对话，会话状态持久化在SQLite检查点中
 
 设计模式：
 - 外观模式：为复杂的链系统提供简化的接口
@@ -16,12 +20,18 @@
 - 服务层模式：封装业务逻辑，与表现层解耦
 """
 
-from typing import Dict, List, Optional, Any
+from typing import Dict, List, Optional, Any, AsyncIterator, Tuple
 from langchain_core.messages import HumanMessage, AIMessage, SystemMessage
 from .model_factory import ModelFactory
+from .model_router import model_router, AUTO_MODEL_KEY, RoutingDecision
+from .admission import admission_controller, AdmissionRejected, Priority
+from .deadline import deadline_scope, resolve_timeout, stream_within_deadline
+from .tool_calling_service import ToolCallingService
 from ..models.chat_models import ChatRequest, ChatResponse
 from ..config.model_config import MODEL_CONFIGS
 from ..chains.chain_factory import ChainFactory
+from ..chains import rag_chain  # noqa: F401  注册"rag"链类型
+from ..chains import graph_chain  # noqa: F401  注册"graph"链类型
 
 
 class ChatService:
@@ -60,6 +70,92 @@ class ChatService:
         # 模型实例缓存（当前版本暂未使用，预留扩展）
         self.models: Dict[str, Any] = {}
 
+    def _route(self, request: ChatRequest, model_key: str,
+               history_length: int = 0) -> Tuple[str, Optional[RoutingDecision]]:
+        """
+        解析实际使用的模型
+
+        model_key为"auto"时交给路由器选择，否则原样返回。
+
+        Returns:
+            Tuple[str, Optional[RoutingDecision]]: (实际模型, 路由决策；非自动路由时为None)
+        """
+        if model_key != AUTO_MODEL_KEY:
+            return model_key, None
+        decision = model_router.route(request, history_length=history_length)
+        return decision.model_key, decision
+
+    async def _invoke_routed(self, chain, request: ChatRequest, model_key: str,
+                             history_length: int = 0, **kwargs) -> ChatResponse:
+        """
+        路由后在截止时间内经准入控制调用链，并为自动路由的请求记录延迟结果
+
+        Raises:
+            AdmissionRejected: 目标模型繁忙，请求被准入控制拒绝
+            DeadlineExceeded: 排队和生成未能在请求的超时时间内完成
+        """
+        model_key, decision = self._route(request, model_key, history_length)
+        priority = Priority.parse(request.priority)
+
+        success = False
+        try:
+            async with deadline_scope(resolve_timeout(request.timeout)):
+                async with admission_controller.admit(model_key, priority):
+                    response = await chain.invoke(request, model_key, **kwargs)
+            success = True
+            return response
+        finally:
+            if decision is not None:
+                model_router.record_outcome(decision, success=success)
+
+    def _stream_routed(self, chain, request: ChatRequest, model_key: str,
+                       history_length: int = 0, **kwargs) -> AsyncIterator[str]:
+        """
+        路由并预检准入后返回流式输出
+
+        准入检查在返回流之前完成，繁忙或预计排队时间超过请求的超时时间时
+        直接抛出 AdmissionRejected，使API层能在响应开始前返回429。
+        """
+        model_key, decision = self._route(request, model_key, history_length)
+        priority = Priority.parse(request.priority)
+        try:
+            admission_controller.check(model_key, priority, budget=resolve_timeout(request.timeout))
+        except AdmissionRejected:
+            if decision is not None:
+                model_router.record_outcome(decision, success=False)
+            raise
+        return self._stream_admitted(chain, request, model_key, decision, priority, **kwargs)
+
+    async def _stream_admitted(self, chain, request: ChatRequest, model_key: str,
+                               decision: Optional[RoutingDecision], priority: Priority,
+                               **kwargs) -> AsyncIterator[str]:
+        """在截止时间和准入许可内流式调用链，流结束时为自动路由的请求记录延迟结果"""
+        success = False
+        try:
+            async for chunk in stream_within_deadline(
+                self._admitted_chunks(chain, request, model_key, priority, **kwargs),
+                resolve_timeout(request.timeout)
+            ):
+                yield chunk
+            success = True
+        finally:
+            if decision is not None:
+                model_router.record_outcome(decision, success=success)
+
+    async def _admitted_chunks(self, chain, request: ChatRequest, model_key: str,
+                               priority: Priority, **kwargs) -> AsyncIterator[str]:
+        """获得准入许可后产出链的流式输出"""
+        async with admission_controller.admit(model_key, priority):
+            async for chunk in chain.astream(request, model_key, **kwargs):
+                yield chunk
+
+    def _history_length(self, request: ChatRequest, model_key: str) -> int:
+        """自动路由时统计会话已有的消息数，作为对话深度信号"""
+        if model_key != AUTO_MODEL_KEY:
+            return 0
+        chain = ChainFactory.create_chain("memory")
+        return chain.get_history_length(request.chat_id, request.memory_type)
+
     def get_or_create_model(self, model_key: str):
         """
         获取或创建模型实例（预留方法）
@@ -86,7 +182,8 @@ class ChatService:
 
         Args:
             request (ChatRequest): 用户的聊天请求
-            model_key (str): 使用的模型标识符，默认为"qwen3:0.6b"
+            model_key (str): 使用的模型标识符，默认为"qwen3:0.6b"；
+                             "auto"表示由路由器自动选择
 
         Returns:
             ChatResponse: AI的回复响应，has_memory字段为False
@@ -99,8 +196,8 @@ class ChatService:
         """
         # 获取无状态链实例
         chain = ChainFactory.create_chain("stateless")
-        # 委托给链处理请求
-        return await chain.invoke(request, model_key)
+        # 委托给链处理请求（model_key为"auto"时先路由）
+        return await self._invoke_routed(chain, request, model_key)
 
     async def chat_with_memory(self, request: ChatRequest, model_key: str = "qwen3:0.6b") -> ChatResponse:
         """
@@ -129,31 +226,159 @@ class ChatService:
         """
         # 获取记忆链实例
         chain = ChainFactory.create_chain("memory")
-        # 委托给链处理请求，传递记忆相关参数
-        return await chain.invoke(
+        # 委托给链处理请求，传递记忆相关参数（model_key为"auto"时先路由）
+        return await self._invoke_routed(
+            chain,
             request,
             model_key,
+            history_length=self._history_length(request, model_key),  # 对话深度
             chat_id=request.chat_id,        # 会话标识符
             memory_type=request.memory_type  # 记忆类型
         )
-    def chat_with_tool(self, request: ChatRequest, model_key: str = "qwen3:0.6b") -> ChatResponse:
+
+    def stream_once(self, request: ChatRequest, model_key: str = "qwen3:0.6b") -> AsyncIterator[str]:
+        """
+        流式执行无记忆单次对话
+
+        Args:
+            request (ChatRequest): 用户的聊天请求
+            model_key (str): 使用的模型标识符
+
+        Returns:
+            AsyncIterator[str]: AI回复的文本片段（已剥离推理块）
+        """
+        chain = ChainFactory.create_chain("stateless")
+        return self._stream_routed(chain, request, model_key)
+
+    def stream_with_memory(self, request: ChatRequest, model_key: str = "qwen3:0.6b") -> AsyncIterator[str]:
+        """
+        流式执行带记忆的对话，完整回复结束后写入记忆
+
+        Args:
+            request (ChatRequest): 用户的聊天请求，应包含chat_id和memory_type
+            model_key (str): 使用的模型标识符
+
+        Returns:
+            AsyncIterator[str]: AI回复的文本片段（已剥离推理块）
+        """
+        chain = ChainFactory.create_chain("memory")
+        return self._stream_routed(
+            chain,
+            request,
+            model_key,
+            history_length=self._history_length(request, model_key),
+            chat_id=request.chat_id,
+            memory_type=request.memory_type
+        )
+
+    async def chat_with_graph(self, request: ChatRequest, model_key: str = "qwen3:0.6b") -> ChatResponse:
+        """
+        执行基于LangGraph的带记忆对话
+
+        会话状态（最近的消息和较早对话的摘要）持久化在SQLite检查点中，服务重启后可以继续对话。
+
+        Args:
+            request (ChatRequest): 用户的聊天请求，chat_id为会话标识符（memory_type不使用）
+            model_key (str): 使用的模型标识符；"auto"表示由路由器自动选择
+
+        Returns:
+            ChatResponse: AI的回复响应，memory_type为"graph"
+        """
+        chain = ChainFactory.create_chain("graph")
+        return await self._invoke_routed(chain, request, model_key, chat_id=request.chat_id)
+
+    def stream_with_graph(self, request: ChatRequest, model_key: str = "qwen3:0.6b") -> AsyncIterator[str]:
+        """
+        流式执行基于LangGraph的带记忆对话
+
+        Args:
+            request (ChatRequest): 用户的聊天请求
+            model_key (str): 使用的模型标识符
+
+        Returns:
+            AsyncIterator[str]: AI回复的文本片段（已剥离推理块）
+        """
+        chain = ChainFactory.create_chain("graph")
+        return self._stream_routed(chain, request, model_key, chat_id=request.chat_id)
+
+    async def get_graph_history(self, chat_id: str) -> Dict[str, Any]:
+        """
+        获取图对话会话的摘要和保留的消息
+
+        Args:
+            chat_id (str): 会话标识符
+
+        Returns:
+            Dict[str, Any]: summary（较早对话的摘要）和 history（role、content 列表）
+        """
+        chain = ChainFactory.create_chain("graph")
+        return await chain.aget_chat_history(chat_id)
+
+    async def clear_graph_memory(self, chat_id: str) -> bool:
+        """
+        删除图对话会话的全部检查点
+
+        Args:
+            chat_id (str): 会话标识符
+
+        Returns:
+            bool: 会话存在并被删除时为True
+        """
+        chain = ChainFactory.create_chain("graph")
+        return await chain.aclear(chat_id)
+
+    async def chat_rag(self, request: ChatRequest, model_key: str = "qwen3:0.6b") -> ChatResponse:
+        """
+        执行检索增强问答
+
+        从持久化向量索引检索相关资料，让模型依据资料回答并标注引用。
+
+        Args:
+            request (ChatRequest): 用户的聊天请求，message为问题
+            model_key (str): 使用的模型标识符；"auto"表示由路由器自动选择
+
+        Returns:
+            ChatResponse: AI的回复响应，包含sources（引用片段）和timings（检索、生成耗时）
+        """
+        chain = ChainFactory.create_chain("rag")
+        return await self._invoke_routed(chain, request, model_key)
+
+    def stream_rag(self, request: ChatRequest, model_key: str = "qwen3:0.6b") -> AsyncIterator[str]:
+        """
+        流式执行检索增强问答
+
+        Args:
+            request (ChatRequest): 用户的聊天请求
+            model_key (str): 使用的模型标识符
+
+        Returns:
+            AsyncIterator[str]: 回答的文本片段，最后一个片段为参考来源列表
+        """
+        chain = ChainFactory.create_chain("rag")
+        return self._stream_routed(chain, request, model_key)
+
+    async def chat_with_tool(self, request: ChatRequest, model_key: str = "qwen3:4b") -> ChatResponse:
         """
         执行带工具的对话
 
-        使用工具链处理用户请求，AI可以根据需要调用外部工具
-        来获取更多信息或执行特定任务。
+        模型可以调用已注册的工具获取信息或执行任务。整个过程（模型调用和工具调用）
+        在请求的截止时间和准入许可内执行，每次工具调用还受 ToolConfig.timeout 约束。
 
         Args:
             request (ChatRequest): 用户的聊天请求
-            model_key (str): 使用的模型标识符，默认为"qwen3:0.6b"
+            model_key (str): 使用的模型标识符，需要支持工具调用，默认为"qwen3:4b"
 
         Returns:
-            ChatResponse: AI的回复响应，包含tool_calls字段
-"""
-        # 获取工具链实例
-        chain = ChainFactory.create_chain("tool")
-        # 委托给链处理请求
-        response = chain.invoke(request, model_key)
+            ChatResponse: AI的回复响应，has_memory字段为False
+
+        Raises:
+            AdmissionRejected: 模型繁忙，请求被准入控制拒绝
+            DeadlineExceeded: 模型调用或工具调用未能在请求的超时时间内完成
+        """
+        service = ToolCallingService(model_key)
+        async with deadline_scope(resolve_timeout(request.timeout)):
+            async with admission_controller.admit(model_key, Priority.parse(request.priority)):
+                response, _ = await service.achat_with_tools(request.message)
         return ChatResponse(
             chat_id=request.chat_id,
             response=response,        # AI生成的回复内容
@@ -170,7 +395,7 @@ class ChatService:
 
         Args:
             chat_id (str): 会话标识符
-            memory_type (str): 记忆类型，"buffer"或"summary"
+            memory_type (str): 记忆类型，"buffer"、"summary"或"retrieval"
 
         Returns:
             List[Dict[str, str]]: 对话历史列表，按时间顺序排列
@@ -194,7 +419,7 @@ class ChatService:
 
         Args:
             chat_id (str): 会话标识符
-            memory_type (str): 记忆类型，"buffer"或"summary"
+            memory_type (str): 记忆类型，"buffer"、"summary"或"retrieval"
 
         Returns:
             bool: 清除是否成功
@@ -210,6 +435,41 @@ class ChatService:
         chain = ChainFactory.create_chain("memory")
         return chain.clear_memory(chat_id, memory_type)
 
+    def fork_session(self, chat_id: str, fork_at: int, new_chat_id: Optional[str] = None,
+                     memory_type: str = "buffer") -> Dict[str, Any]:
+        """
+        从会话的第 fork_at 条消息处分出新会话，新会话与原会话共享前缀
+
+        Args:
+            chat_id (str): 被分叉的会话
+            fork_at (int): 分叉位置，新会话包含原会话的前 fork_at 条消息
+            new_chat_id (str, optional): 新会话的标识符，不指定时自动生成
+            memory_type (str): 记忆类型，目前只有"buffer"支持分叉
+
+        Returns:
+            Dict[str, Any]: 分支记录（chat_id、parent_chat_id、fork_at、created_at）
+
+        Raises:
+            KeyError: 被分叉的会话不存在
+            ValueError: 记忆类型不支持分叉、分叉位置越界或新会话已存在
+        """
+        chain = ChainFactory.create_chain("memory")
+        return chain.fork_session(chat_id, fork_at, new_chat_id, memory_type).to_dict()
+
+    def list_branches(self, chat_id: str, memory_type: str = "buffer") -> List[Dict[str, Any]]:
+        """
+        列出从会话分出的分支
+
+        Args:
+            chat_id (str): 会话标识符
+            memory_type (str): 记忆类型
+
+        Returns:
+            List[Dict[str, Any]]: 分支记录，按创建顺序排列
+        """
+        chain = ChainFactory.create_chain("memory")
+        return [branch.to_dict() for branch in chain.list_branches(chat_id, memory_type)]
+
     def get_available_models(self) -> Dict[str, dict]:
         """
         获取所有可用模型的信息
@@ -0,0 +1,228 @@
+"""
+自适应并发限制模块
+
+固定的并发上限总会对某些模型不合适：同一台机器上 qwen3:0.6b 能承受的并行请求
+远多于 qwen3:4b。该模块为每个(模型, 后端)维护一个自适应的并发上限，
+作为 ModelFactory 的调用守卫包裹每一次模型调用。
+
+算法（AIMD，带慢启动）：
+1. 每次调用完成后记录耗时，维护短期均值 short（近几次调用的指数移动平均）和
+   基线 baseline（最近 long_window 次调用中的最小耗时，近似无排队时的耗时）
+2. short 不超过 tolerance × baseline 时视为延迟平稳，上限加法增长：
+   慢启动阶段每次成功调用 +1（每轮翻倍），之后每次 +1/limit（每轮约 +1）
+3. short 超过 tolerance × baseline 时视为后端开始排队，上限乘以 decrease，
+   每轮（约 limit 次调用）最多收缩一次，避免同一波排队被重复惩罚
+4. 只有在途请求达到上限的一半时才允许增长，避免低负载时上限虚高
+5. 调用出错（超时、连接失败等）同样按 decrease 收缩
+6. 从 min_limit 开始慢启动，保证基线来自低并发时的样本；tolerance 需要容纳
+   回复长度不同带来的耗时差异，默认取2
+
+超过上限的调用在守卫内排队（先到先得），取消时自动退出队列。
+
+导出指标：
+- adaptive_concurrency_limit: 各模型、各后端当前的并发上限
+- adaptive_concurrency_in_flight: 各模型、各后端的在途调用数
+"""
+
+import asyncio
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Deque, Dict, Optional, Tuple
+
+from ..config.model_config import MODEL_CONFIGS
+from .metrics import metrics
+
+CONCURRENCY_LIMIT = metrics.gauge(
+    "adaptive_concurrency_limit", "自适应并发上限", ["model", "backend"]
+)
+CONCURRENCY_IN_FLIGHT = metrics.gauge(
+    "adaptive_concurrency_in_flight", "受自适应并发限制的在途调用数", ["model", "backend"]
+)
+
+
+class _LimitState:
+    """单个(模型, 后端)的并发上限和延迟统计"""
+
+    def __init__(self, model_key: str, backend: str, initial_limit: float, long_window: int):
+        self.model_key = model_key
+        self.backend = backend
+        self.limit = initial_limit
+        self.in_flight = 0
+        self.short_rtt: Optional[float] = None
+        self.baseline: Optional[float] = None
+        self.recent: Deque[float] = deque(maxlen=long_window)
+        self.samples = 0
+        self.slow_start = True
+        self.last_decrease_at = 0     # 上次收缩时的样本序号
+        self.waiters: Deque[asyncio.Future] = deque()
+
+    @property
+    def permits(self) -> int:
+        return max(1, int(self.limit))
+
+
+class AdaptiveConcurrencyLimiter:
+    """
+    自适应并发限制器
+
+    Attributes:
+        min_limit: 并发上限下限，也是慢启动的起点
+        max_limit: 并发上限上限
+        tolerance: 允许短期耗时相对基线上升的倍数，超过后收缩
+        decrease: 收缩时上限的乘性系数
+        short_window: 短期耗时均值的样本窗口
+        long_window: 计算基线（最小耗时）的样本窗口
+
+    使用示例：
+        >>> async with adaptive_limiter.acquire("qwen3:4b"):
+        ...     response = await model.ainvoke(messages)
+        >>> adaptive_limiter.get_limit("qwen3:4b")
+        3.4
+    """
+
+    def __init__(self, min_limit: float = 1.0, max_limit: float = 64.0, tolerance: float = 2.0,
+                 decrease: float = 0.9, short_window: int = 10, long_window: int = 500,
+                 enabled: bool = True):
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.tolerance = tolerance
+        self.decrease = decrease
+        self.short_window = short_window
+        self.long_window = long_window
+        self.enabled = enabled
+        self._states: Dict[Tuple[str, str], _LimitState] = {}
+
+    def _state_for(self, model_key: str, backend: str) -> _LimitState:
+        key = (model_key, backend)
+        if key not in self._states:
+            self._states[key] = _LimitState(model_key, backend, self.min_limit, self.long_window)
+            CONCURRENCY_LIMIT.set(self.min_limit, model=model_key, backend=backend)
+        return self._states[key]
+
+    @staticmethod
+    def _backend(model_key: str, base_url: Optional[str]) -> str:
+        if base_url:
+            return base_url
+        config = MODEL_CONFIGS.get(model_key)
+        return (config.base_url if config else None) or "default"
+
+    @asynccontextmanager
+    async def acquire(self, model_key: str, base_url: Optional[str] = None) -> AsyncIterator[None]:
+        """
+        获取一次模型调用的并发许可，并在调用结束后用其耗时调整上限
+
+        Args:
+            model_key (str): 模型标识符
+            base_url (str, optional): 实际请求的后端地址，默认为模型配置的主地址
+        """
+        if not self.enabled:
+            yield
+            return
+
+        state = self._state_for(model_key, self._backend(model_key, base_url))
+        await self._wait_for_permit(state)
+        started = time.monotonic()
+        try:
+            yield
+        except asyncio.CancelledError:
+            # 取消不反映后端的处理能力，不参与调整
+            raise
+        except Exception:
+            self._on_error(state)
+            raise
+        else:
+            self._on_sample(state, time.monotonic() - started)
+        finally:
+            self._release(state)
+
+    async def _wait_for_permit(self, state: _LimitState) -> None:
+        if state.in_flight < state.permits and not state.waiters:
+            self._take(state)
+            return
+
+        future = asyncio.get_running_loop().create_future()
+        state.waiters.append(future)
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future in state.waiters:
+                state.waiters.remove(future)
+            elif future.done() and not future.cancelled():
+                # 已被放行但调用方被取消：归还许可
+                self._release(state)
+            raise
+
+    def _take(self, state: _LimitState) -> None:
+        state.in_flight += 1
+        CONCURRENCY_IN_FLIGHT.set(state.in_flight, model=state.model_key, backend=state.backend)
+
+    def _release(self, state: _LimitState) -> None:
+        state.in_flight -= 1
+        CONCURRENCY_IN_FLIGHT.set(state.in_flight, model=state.model_key, backend=state.backend)
+        self._wake(state)
+
+    def _wake(self, state: _LimitState) -> None:
+        """上限允许时按先来后到放行等待者"""
+        while state.waiters and state.in_flight < state.permits:
+            future = state.waiters.popleft()
+            if future.done():
+                continue
+            future.set_result(None)
+            self._take(state)
+
+    def _on_sample(self, state: _LimitState, rtt: float) -> None:
+        """用一次成功调用的耗时更新延迟统计和并发上限"""
+        state.samples += 1
+        state.recent.append(rtt)
+        state.baseline = min(state.recent)
+        if state.short_rtt is None:
+            state.short_rtt = rtt
+        else:
+            state.short_rtt += 2.0 / (self.short_window + 1) * (rtt - state.short_rtt)
+
+        if state.short_rtt > self.tolerance * state.baseline:
+            self._decrease(state)
+        elif state.in_flight * 2 >= state.limit:
+            # 在途数接近上限且延迟平稳：后端还有余量
+            step = 1.0 if state.slow_start else 1.0 / state.limit
+            self._set_limit(state, state.limit + step)
+
+    def _on_error(self, state: _LimitState) -> None:
+        self._decrease(state)
+
+    def _decrease(self, state: _LimitState) -> None:
+        """乘性收缩，每轮最多一次"""
+        if state.samples - state.last_decrease_at < state.limit:
+            return
+        state.slow_start = False
+        state.last_decrease_at = state.samples
+        self._set_limit(state, state.limit * self.decrease)
+
+    def _set_limit(self, state: _LimitState, limit: float) -> None:
+        state.limit = max(self.min_limit, min(self.max_limit, limit))
+        CONCURRENCY_LIMIT.set(round(state.limit, 3), model=state.model_key, backend=state.backend)
+        self._wake(state)
+
+    def get_limit(self, model_key: str, base_url: Optional[str] = None) -> float:
+        """返回模型在指定后端上的当前并发上限，尚无调用时返回下限"""
+        state = self._states.get((model_key, self._backend(model_key, base_url)))
+        return state.limit if state else self.min_limit
+
+    def get_stats(self) -> Dict[str, Dict[str, object]]:
+        """返回所有(模型, 后端)的上限、在途数、排队数和延迟统计"""
+        return {
+            f"{state.model_key}@{state.backend}": {
+                "limit": round(state.limit, 3),
+                "in_flight": state.in_flight,
+                "queued": len(state.waiters),
+                "short_rtt": state.short_rtt,
+                "baseline_rtt": state.baseline,
+                "samples": state.samples,
+            }
+            for state in self._states.values()
+        }
+
+
+# 全局自适应并发限制器
+adaptive_limiter = AdaptiveConcurrencyLimiter()
@@ -0,0 +1,160 @@
+"""
+请求截止时间模块
+
+为每个请求设定端到端的截止时间（来自请求头或请求字段，受服务配置上限约束），
+并通过 contextvars 沿调用链传播。排队、模型调用、工具调用都在剩余预算内执行，
+预算耗尽时正在进行的工作被取消（关闭到Ollama的连接），而不是算完再丢弃。
+
+使用方式：
+- deadline_scope(timeout)：开启一个截止时间范围，嵌套时取更早的截止时间；
+  超时后抛出 DeadlineExceeded
+- stream_within_deadline(stream, timeout)：流式输出的截止时间，只在等待上游时计时，
+  不会在客户端消费片段期间取消响应任务
+- remaining()：当前剩余预算（秒），没有截止时间时返回None
+- resolve_timeout(requested)：将请求指定的超时时间约束到服务配置的范围内
+
+导出指标：
+- deadline_exceeded_total: 按阶段统计的超时次数
+"""
+
+import asyncio
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import AsyncIterator, Optional, TypeVar
+
+from ..config.server_config import SERVER_CONFIG
+from .metrics import metrics
+
+DEADLINE_EXCEEDED = metrics.counter(
+    "deadline_exceeded_total", "因超过截止时间而取消的工作数", ["stage"]
+)
+
+T = TypeVar("T")
+
+# 当前请求的截止时间（事件循环时间），None表示没有截止时间
+_deadline: ContextVar[Optional[float]] = ContextVar("request_deadline", default=None)
+
+
+class DeadlineExceeded(Exception):
+    """
+    请求超过截止时间
+
+    Attributes:
+        stage: 超时发生的阶段，例如"request"、"tool"、"summary"
+        timeout: 该范围的超时时间（秒）
+    """
+
+    def __init__(self, stage: str, timeout: Optional[float]):
+        super().__init__(f"{stage} 超过截止时间（{timeout:.1f}秒）" if timeout else f"{stage} 超过截止时间")
+        self.stage = stage
+        self.timeout = timeout
+
+
+def resolve_timeout(requested: Optional[float] = None) -> float:
+    """
+    确定请求的超时时间
+
+    Args:
+        requested (float, optional): 请求头或请求字段指定的超时时间（秒）
+
+    Returns:
+        float: 未指定时使用默认值，超过服务上限时截断为上限
+    """
+    if requested is None or requested <= 0:
+        return SERVER_CONFIG.default_request_timeout
+    return min(requested, SERVER_CONFIG.max_request_timeout)
+
+
+def current_deadline() -> Optional[float]:
+    """当前的截止时间（事件循环时间），没有截止时间时返回None"""
+    return _deadline.get()
+
+
+def remaining() -> Optional[float]:
+    """当前剩余的时间预算（秒），没有截止时间时返回None，已过期时返回0"""
+    deadline = _deadline.get()
+    if deadline is None:
+        return None
+    return max(0.0, deadline - asyncio.get_running_loop().time())
+
+
+@asynccontextmanager
+async def deadline_scope(timeout: Optional[float], stage: str = "request",
+                         detached: bool = False) -> AsyncIterator[None]:
+    """
+    在截止时间范围内执行
+
+    范围内的工作在 min(外层截止时间, 现在 + timeout) 时被取消，并抛出 DeadlineExceeded。
+    外层截止时间先到时，异常同样在外层范围抛出。
+
+    Args:
+        timeout (float, optional): 本范围的超时时间（秒），None表示只继承外层截止时间
+        stage (str): 阶段名称，用于异常信息和指标标签
+        detached (bool): 是否忽略外层截止时间，用于请求结束后仍在运行的后台任务
+
+    Raises:
+        DeadlineExceeded: 超过截止时间
+    """
+    loop = asyncio.get_running_loop()
+    outer = None if detached else _deadline.get()
+    deadline = outer
+    if timeout is not None:
+        own = loop.time() + timeout
+        deadline = own if outer is None or own < outer else outer
+
+    token = _deadline.set(deadline)
+    try:
+        async with asyncio.timeout_at(deadline):
+            yield
+    except TimeoutError:
+        # 外层与本范围同时到期时，取消由外层范围转换为超时，这里只处理本范围的超时
+        DEADLINE_EXCEEDED.inc(stage=stage)
+        raise DeadlineExceeded(stage, timeout) from None
+    finally:
+        _deadline.reset(token)
+
+
+async def stream_within_deadline(stream: AsyncIterator[T], timeout: Optional[float],
+                                 stage: str = "request") -> AsyncIterator[T]:
+    """
+    在截止时间内逐个产出上游流的元素
+
+    截止时间只作用于等待上游产出的过程（上游在此期间可以通过 remaining() 读取剩余预算），
+    产出之后交给消费方处理的时间不会被计时器打断。
+
+    Args:
+        stream (AsyncIterator): 上游流
+        timeout (float, optional): 整个流的超时时间（秒）
+        stage (str): 阶段名称
+
+    Yields:
+        上游产出的元素
+
+    Raises:
+        DeadlineExceeded: 上游未能在截止时间前产出完毕
+    """
+    outer = _deadline.get()
+    deadline = outer
+    if timeout is not None:
+        own = asyncio.get_running_loop().time() + timeout
+        deadline = own if outer is None or own < outer else outer
+
+    iterator = stream.__aiter__()
+    try:
+        while True:
+            token = _deadline.set(deadline)
+            try:
+                async with asyncio.timeout_at(deadline):
+                    item = await iterator.__anext__()
+            except StopAsyncIteration:
+                return
+            except TimeoutError:
+                DEADLINE_EXCEEDED.inc(stage=stage)
+                raise DeadlineExceeded(stage, timeout) from None
+            finally:
+                _deadline.reset(token)
+            yield item
+    finally:
+        aclose = getattr(iterator, "aclose", None)
+        if aclose is not None:
+            await aclose()
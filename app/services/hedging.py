@@ -0,0 +1,238 @@
+"""
+请求对冲模块
+
+当某个Ollama后端卡住时，单次请求只能等到超时。对冲的做法是：如果在该模型
+首token延迟的某个百分位（默认p95）之内还没有收到首个token，就向副本地址或
+备用模型再发一份相同的请求，谁先产出首个token就用谁，另一个立即取消。
+
+关键设计：
+1. 阈值自适应：取 ModelStats 中该模型近期首token延迟的百分位，
+   样本不足时使用默认阈值
+2. 对冲配额：令牌桶限制对冲请求占比（默认不超过10%），
+   避免在整体变慢的故障期间把负载翻倍
+3. 取消失败者：落败的请求任务被取消，底层HTTP连接随之关闭，Ollama停止生成
+
+导出指标：
+- hedge_requests_total: 发出的对冲请求数
+- hedge_wins_total: 按胜出方（primary/hedge）统计的次数
+- hedge_skipped_total: 因配额不足而放弃对冲的次数
+"""
+
+import asyncio
+import logging
+import time
+from typing import AsyncIterator, Callable, List, Optional, Tuple
+
+from ..config.model_config import MODEL_CONFIGS
+from .metrics import metrics
+from .model_stats import model_stats
+
+logger = logging.getLogger(__name__)
+
+HEDGE_REQUESTS = metrics.counter("hedge_requests_total", "发出的对冲请求数", ["model", "target"])
+HEDGE_WINS = metrics.counter("hedge_wins_total", "对冲竞速中各方胜出次数", ["model", "winner"])
+HEDGE_SKIPPED = metrics.counter("hedge_skipped_total", "因配额不足放弃的对冲次数", ["model"])
+
+# 根据(模型键, 后端地址)创建一次流式调用；后端地址为None表示使用模型的主地址
+StreamFactory = Callable[[str, Optional[str]], AsyncIterator[str]]
+
+_DONE = object()
+
+
+class HedgeBudget:
+    """
+    对冲配额（令牌桶）
+
+    每个可对冲的请求向桶中加入 ratio 个令牌，每次对冲消耗1个令牌，
+    桶容量为 burst。长期来看对冲请求数不超过 ratio × 请求数 + burst。
+    """
+
+    def __init__(self, ratio: float = 0.1, burst: float = 5.0):
+        self.ratio = ratio
+        self.burst = burst
+        self._tokens = burst
+
+    def on_request(self) -> None:
+        """登记一个可对冲的请求"""
+        self._tokens = min(self.burst, self._tokens + self.ratio)
+
+    def try_acquire(self) -> bool:
+        """尝试消耗一个令牌，成功返回True"""
+        if self._tokens >= 1.0:
+            self._tokens -= 1.0
+            return True
+        return False
+
+
+class _Attempt:
+    """一次流式调用尝试，在后台任务中把输出搬运到队列"""
+
+    def __init__(self, label: str, model_key: str, stream: AsyncIterator[str]):
+        self.label = label
+        self.model_key = model_key
+        self.started_at = time.monotonic()
+        self.first_token_at: Optional[float] = None
+        self.error: Optional[BaseException] = None
+        self.settled = asyncio.Event()   # 收到首个token、出错或结束时置位
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self.task = asyncio.create_task(self._run(stream))
+
+    @property
+    def has_token(self) -> bool:
+        return self.first_token_at is not None
+
+    async def _run(self, stream: AsyncIterator[str]) -> None:
+        try:
+            async for chunk in stream:
+                if self.first_token_at is None:
+                    self.first_token_at = time.monotonic()
+                    self.settled.set()
+                self._queue.put_nowait(chunk)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self.error = e
+        finally:
+            self.settled.set()
+            self._queue.put_nowait(_DONE)
+
+    async def chunks(self) -> AsyncIterator[str]:
+        """依次产出该尝试的输出，出错时抛出原始异常"""
+        try:
+            while True:
+                item = await self._queue.get()
+                if item is _DONE:
+                    if self.error is not None:
+                        raise self.error
+                    return
+                yield item
+        finally:
+            # 消费方提前退出（例如客户端断开）时取消底层调用
+            self.cancel()
+
+    def cancel(self) -> None:
+        if not self.task.done():
+            self.task.cancel()
+
+
+class RequestHedger:
+    """
+    请求对冲执行器
+
+    Attributes:
+        budget: 对冲配额
+        default_threshold: 首token样本不足时使用的对冲阈值（秒）
+        min_threshold: 阈值下限，避免延迟很低时频繁对冲
+
+    使用示例：
+        >>> winner, stream = await request_hedger.race("qwen3:4b", factory)
+        >>> text = "".join([chunk async for chunk in stream])
+    """
+
+    def __init__(self, budget: Optional[HedgeBudget] = None,
+                 default_threshold: float = 3.0, min_threshold: float = 0.3):
+        self.budget = budget or HedgeBudget()
+        self.default_threshold = default_threshold
+        self.min_threshold = min_threshold
+
+    def alternatives(self, model_key: str) -> List[Tuple[str, Optional[str]]]:
+        """返回可用于对冲的目标：先是同一模型的副本，然后是备用模型"""
+        config = MODEL_CONFIGS[model_key]
+        targets: List[Tuple[str, Optional[str]]] = [(model_key, url) for url in config.replica_urls]
+        if config.fallback_model and config.fallback_model in MODEL_CONFIGS:
+            targets.append((config.fallback_model, None))
+        return targets
+
+    def is_enabled(self, model_key: str) -> bool:
+        """模型开启了对冲且存在可用的对冲目标"""
+        config = MODEL_CONFIGS.get(model_key)
+        return bool(config and config.hedge and self.alternatives(model_key))
+
+    def threshold(self, model_key: str) -> float:
+        """当前的对冲阈值（秒）"""
+        config = MODEL_CONFIGS[model_key]
+        observed = model_stats.first_token_percentile(model_key, config.hedge_percentile)
+        if observed is None:
+            return self.default_threshold
+        return max(self.min_threshold, observed)
+
+    async def race(self, model_key: str, factory: StreamFactory) -> Tuple[str, AsyncIterator[str]]:
+        """
+        发起（可能被对冲的）流式调用
+
+        等到某一方产出首个token后返回，之后的输出只来自胜出方。
+
+        Args:
+            model_key (str): 主模型标识符
+            factory (StreamFactory): 根据(模型键, 后端地址)创建流式调用的函数
+
+        Returns:
+            Tuple[str, AsyncIterator[str]]: (胜出方实际使用的模型键, 胜出方的输出流)
+
+        Raises:
+            Exception: 所有尝试都在产出首个token之前失败时，抛出主请求的异常
+        """
+        if not self.is_enabled(model_key):
+            return model_key, factory(model_key, None)
+
+        primary = _Attempt("primary", model_key, factory(model_key, None))
+        self.budget.on_request()
+        attempts = [primary]
+        target_model, target_url = self.alternatives(model_key)[0]
+
+        try:
+            try:
+                await asyncio.wait_for(primary.settled.wait(), self.threshold(model_key))
+            except asyncio.TimeoutError:
+                if self.budget.try_acquire():
+                    HEDGE_REQUESTS.inc(model=model_key, target=target_url or target_model)
+                    logger.info(f"模型 {model_key} 首token超时，对冲到 {target_url or target_model}")
+                    attempts.append(_Attempt("hedge", target_model, factory(target_model, target_url)))
+                else:
+                    HEDGE_SKIPPED.inc(model=model_key)
+
+            winner = await self._first_with_token(attempts)
+        except BaseException:
+            # 调用方在竞速期间被取消（例如客户端断开）：取消所有尝试
+            for attempt in attempts:
+                attempt.cancel()
+            raise
+
+        for attempt in attempts:
+            if attempt is not winner:
+                attempt.cancel()
+
+        if winner.has_token:
+            # 主请求落败时它的首token耗时未知，以落败时已等待的时间作为下界样本，
+            # 避免阈值只由"快"的样本决定而越来越低
+            first_token = (winner.first_token_at if winner is primary else time.monotonic()) - primary.started_at
+            model_stats.observe_first_token(model_key, first_token)
+            if len(attempts) > 1:
+                HEDGE_WINS.inc(model=model_key, winner=winner.label)
+        return winner.model_key, winner.chunks()
+
+    async def _first_with_token(self, attempts: List[_Attempt]) -> _Attempt:
+        """等待第一个产出token的尝试；全部失败时返回主请求（由其chunks抛出异常）"""
+        remaining = list(attempts)
+        while remaining:
+            for attempt in remaining:
+                if attempt.has_token:
+                    return attempt
+            remaining = [attempt for attempt in remaining if not attempt.settled.is_set()]
+            if not remaining:
+                break
+            waiters = [asyncio.ensure_future(attempt.settled.wait()) for attempt in remaining]
+            try:
+                await asyncio.wait(waiters, return_when=asyncio.FIRST_COMPLETED)
+            finally:
+                for waiter in waiters:
+                    waiter.cancel()
+            # 只有已置位且拿到token的尝试才能胜出；出错或空输出的尝试被剔除
+            for attempt in attempts:
+                if attempt.has_token:
+                    return attempt
+        return attempts[0]
+
+
+# 全局对冲执行器
+request_hedger = RequestHedger()
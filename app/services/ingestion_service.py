@@ -0,0 +1,124 @@
+"""
+文档入库服务模块
+
+在后台线程中运行入库流水线，API层提交任务后立即返回任务ID，
+通过任务状态接口查询进度和吞吐。默认按索引清单增量入库。接口提交的任务只能读取
+RETRIEVAL_CONFIG.ingest_root 下的目录，并且只写入检索使用的索引；其他索引目录通过命令行入库。
+入库完成后，如果写入的是检索使用的索引，通知向量索引和BM25索引在下次检索时重新加载。
+"""
+
+import logging
+import os
+import threading
+import uuid
+from typing import Dict, Optional
+
+from ..config.retrieval_config import RETRIEVAL_CONFIG
+from ..models.ingest_models import IngestJobResponse, IngestRequest
+from ..retrieval.ingestion import IngestionPipeline, IngestionReport
+from ..retrieval.keyword_store import keyword_index
+from ..retrieval.vector_store import vector_index
+
+logger = logging.getLogger(__name__)
+
+
+class IngestionInProgress(Exception):
+    """目标索引已有入库任务在运行"""
+
+
+class IngestionJob:
+    """一个入库任务的状态"""
+
+    def __init__(self, job_id: str, directory: str, index_path: str):
+        self.job_id = job_id
+        self.directory = directory
+        self.index_path = index_path
+        self.status = "running"
+        self.report = IngestionReport()
+        self.error: Optional[str] = None
+
+    def to_response(self) -> IngestJobResponse:
+        return IngestJobResponse(
+            job_id=self.job_id,
+            status=self.status,
+            directory=self.directory,
+            index_path=self.index_path,
+            report=self.report.to_dict(),
+            error=self.error,
+        )
+
+
+class IngestionService:
+    """
+    入库任务管理
+
+    同一个索引目录同一时刻只允许一个任务写入。
+
+    使用示例：
+        >>> job = ingestion_service.submit(IngestRequest(directory="manuals"))
+        >>> ingestion_service.get_job(job.job_id).status
+        'running'
+    """
+
+    def __init__(self):
+        self.jobs: Dict[str, IngestionJob] = {}
+        self._lock = threading.Lock()
+
+    def submit(self, request: IngestRequest) -> IngestionJob:
+        """
+        提交入库任务
+
+        Raises:
+            ValueError: 目录不存在或不在入库根目录下
+            IngestionInProgress: 目标索引已有任务在运行
+        """
+        directory = self._resolve_directory(request.directory)
+        index_path = RETRIEVAL_CONFIG.index_path
+        with self._lock:
+            if any(job.status == "running" and job.index_path == index_path for job in self.jobs.values()):
+                raise IngestionInProgress(f"索引 {index_path} 已有入库任务在运行")
+            job = IngestionJob(uuid.uuid4().hex[:12], directory, index_path)
+            self.jobs[job.job_id] = job
+
+        pipeline = IngestionPipeline(
+            index_path=index_path,
+            workers=request.workers,
+            jq_schema=request.jq_schema or RETRIEVAL_CONFIG.json_jq_schema,
+        )
+        threading.Thread(target=self._run, args=(job, pipeline, request.full), daemon=True,
+                         name=f"ingest-{job.job_id}").start()
+        return job
+
+    @staticmethod
+    def _resolve_directory(directory: str) -> str:
+        """解析文档目录（含符号链接），要求位于入库根目录下"""
+        root = os.path.realpath(RETRIEVAL_CONFIG.ingest_root)
+        resolved = os.path.realpath(os.path.join(root, directory))
+        if os.path.commonpath([root, resolved]) != root:
+            raise ValueError(f"只能入库 {root} 下的目录: {directory}")
+        if not os.path.isdir(resolved):
+            raise ValueError(f"目录不存在: {directory}")
+        return resolved
+
+    def _run(self, job: IngestionJob, pipeline: IngestionPipeline, full: bool) -> None:
+        def on_progress(report: IngestionReport) -> None:
+            job.report = report
+            logger.info(f"入库任务 {job.job_id}: {report.summary()}")
+
+        try:
+            job.report = pipeline.run(job.directory, progress=on_progress, full=full)
+            job.status = "succeeded"
+            if job.index_path == vector_index.index_path:
+                vector_index.reload()
+                keyword_index.reload()
+        except Exception as e:
+            job.status = "failed"
+            job.error = f"{type(e).__name__}: {e}"
+            logger.exception(f"入库任务 {job.job_id} 失败")
+
+    def get_job(self, job_id: str) -> Optional[IngestionJob]:
+        return self.jobs.get(job_id)
+
+
+# 全局入库服务
+ingestion_service = IngestionService()
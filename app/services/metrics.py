@@ -0,0 +1,307 @@
+"""
+运行指标模块
+
+该模块提供了一个轻量级的进程内指标注册表，用于统计服务运行期间的
+计数、瞬时值和耗时分布，并以Prometheus文本格式或字典格式导出。
+
+主要功能：
+1. Counter：单调递增的计数器，例如模型切换次数
+2. Gauge：可增可减的瞬时值，例如排队深度
+3. Histogram：按桶统计的分布，例如模型加载耗时
+4. 统一导出：render() 输出Prometheus文本，snapshot() 输出字典
+5. LatencyWindow：最近样本的滑动窗口，在线计算均值和分位数
+
+设计特点：
+- 零外部依赖：不引入prometheus_client，避免增加部署负担
+- 线程安全：所有写操作都在锁内完成
+- 标签支持：同一指标可以按模型、后端等维度拆分
+"""
+
+import bisect
+import threading
+from typing import Dict, List, Optional, Sequence, Tuple
+
+
+# 默认的耗时分布桶（秒），覆盖从毫秒级的首token到数十秒的模型加载
+DEFAULT_BUCKETS: Tuple[float, ...] = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0
+)
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def _label_key(labelnames: Sequence[str], labels: Dict[str, str]) -> LabelKey:
+    """将标签字典规范化为可哈希的元组，缺失的标签以空字符串补齐"""
+    unknown = set(labels) - set(labelnames)
+    if unknown:
+        raise ValueError(f"未声明的标签: {sorted(unknown)}")
+    return tuple((name, str(labels.get(name, ""))) for name in labelnames)
+
+
+def _format_labels(key: LabelKey, extra: Optional[Tuple[str, str]] = None) -> str:
+    """格式化为Prometheus标签字符串，例如 {model="qwen3:4b"}"""
+    pairs = list(key) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    body = ",".join(f'{name}="{value}"' for name, value in pairs)
+    return "{" + body + "}"
+
+
+class _Metric:
+    """指标基类，保存名称、说明和标签定义"""
+
+    metric_type = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def render(self) -> List[str]:
+        raise NotImplementedError
+
+    def snapshot(self) -> Dict[str, object]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    """单调递增计数器"""
+
+    metric_type = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelKey, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        """增加计数，amount必须为非负数"""
+        if amount < 0:
+            raise ValueError("Counter只能增加")
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def get(self, **labels: str) -> float:
+        """读取指定标签组合的当前值"""
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            return self._values.get(key, 0.0)
+
+    def render(self) -> List[str]:
+        with self._lock:
+            return [f"{self.name}{_format_labels(k)} {v}" for k, v in self._values.items()]
+
+    def snapshot(self) -> Dict[str, object]:
+        with self._lock:
+            return {_format_labels(k) or "_": v for k, v in self._values.items()}
+
+
+class Gauge(_Metric):
+    """可增可减的瞬时值"""
+
+    metric_type = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelKey, float] = {}
+
+    def set(self, value: float, **labels: str) -> None:
+        """设置为指定值"""
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            self._values[key] = float(value)
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        """增加指定值"""
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels: str) -> None:
+        """减少指定值"""
+        self.inc(-amount, **labels)
+
+    def get(self, **labels: str) -> float:
+        """读取指定标签组合的当前值"""
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            return self._values.get(key, 0.0)
+
+    def render(self) -> List[str]:
+        with self._lock:
+            return [f"{self.name}{_format_labels(k)} {v}" for k, v in self._values.items()]
+
+    def snapshot(self) -> Dict[str, object]:
+        with self._lock:
+            return {_format_labels(k) or "_": v for k, v in self._values.items()}
+
+
+class Histogram(_Metric):
+    """
+    分桶直方图
+
+    每个标签组合维护各桶的累计计数、总和与样本数，
+    与Prometheus的histogram语义保持一致（桶为累计的 le 上界）。
+    """
+
+    metric_type = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # 键：标签组合，值：[各桶计数..., +Inf桶计数]、总和、样本数
+        self._counts: Dict[LabelKey, List[int]] = {}
+        self._sums: Dict[LabelKey, float] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        """记录一个样本"""
+        key = _label_key(self.labelnames, labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts = self._counts.setdefault(key, [0] * (len(self.buckets) + 1))
+            counts[index] += 1
+            self._sums[key] = self._sums.get(key, 0.0) + value
+
+    def count(self, **labels: str) -> int:
+        """返回指定标签组合的样本数"""
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            return sum(self._counts.get(key, ()))
+
+    def sum(self, **labels: str) -> float:
+        """返回指定标签组合的样本总和"""
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            return self._sums.get(key, 0.0)
+
+    def render(self) -> List[str]:
+        lines = []
+        with self._lock:
+            for key, counts in self._counts.items():
+                cumulative = 0
+                for bound, count in zip(self.buckets, counts):
+                    cumulative += count
+                    lines.append(f"{self.name}_bucket{_format_labels(key, ('le', str(bound)))} {cumulative}")
+                cumulative += counts[-1]
+                lines.append(f"{self.name}_bucket{_format_labels(key, ('le', '+Inf'))} {cumulative}")
+                lines.append(f"{self.name}_sum{_format_labels(key)} {self._sums[key]}")
+                lines.append(f"{self.name}_count{_format_labels(key)} {cumulative}")
+        return lines
+
+    def snapshot(self) -> Dict[str, object]:
+        with self._lock:
+            return {
+                _format_labels(key) or "_": {
+                    "count": sum(counts),
+                    "sum": self._sums[key],
+                    "buckets": dict(zip([str(b) for b in self.buckets] + ["+Inf"], counts)),
+                }
+                for key, counts in self._counts.items()
+            }
+
+
+class LatencyWindow:
+    """
+    滑动窗口延迟统计
+
+    保存最近 size 个样本，用于在线计算均值和分位数，供路由、对冲等
+    需要"当前"延迟水平的策略使用。与Histogram不同，它只反映近期状态。
+    """
+
+    def __init__(self, size: int = 200):
+        self.size = size
+        self._samples: List[float] = []
+        self._next = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        """记录一个样本，窗口满后覆盖最旧的样本"""
+        with self._lock:
+            if len(self._samples) < self.size:
+                self._samples.append(value)
+            else:
+                self._samples[self._next] = value
+                self._next = (self._next + 1) % self.size
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def mean(self) -> Optional[float]:
+        """返回窗口均值，无样本时返回None"""
+        with self._lock:
+            if not self._samples:
+                return None
+            return sum(self._samples) / len(self._samples)
+
+    def percentile(self, p: float) -> Optional[float]:
+        """返回窗口内第p百分位（0-100），无样本时返回None"""
+        with self._lock:
+            if not self._samples:
+                return None
+            ordered = sorted(self._samples)
+        index = min(len(ordered) - 1, max(0, int(round(p / 100.0 * (len(ordered) - 1)))))
+        return ordered[index]
+
+
+class MetricsRegistry:
+    """
+    指标注册表
+
+    按名称管理所有指标实例。counter/gauge/histogram 方法采用
+    "获取或创建"语义，不同模块可以安全地重复声明同一指标。
+
+    使用示例：
+        >>> swaps = metrics.counter("ollama_model_swaps_total", "模型加载次数", ["model"])
+        >>> swaps.inc(model="qwen3:4b")
+        >>> print(metrics.render())
+    """
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, cls, name: str, documentation: str, labelnames: Sequence[str], **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = cls(name, documentation, labelnames, **kwargs)
+                self._metrics[name] = metric
+            elif not isinstance(metric, cls):
+                raise ValueError(f"指标 {name} 已注册为 {metric.metric_type}")
+            return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        """获取或创建计数器"""
+        return self._get_or_create(Counter, name, documentation, labelnames)
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        """获取或创建瞬时值指标"""
+        return self._get_or_create(Gauge, name, documentation, labelnames)
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        """获取或创建直方图"""
+        return self._get_or_create(Histogram, name, documentation, labelnames, buckets=buckets)
+
+    def render(self) -> str:
+        """以Prometheus文本格式导出全部指标"""
+        with self._lock:
+            items = list(self._metrics.values())
+        lines: List[str] = []
+        for metric in items:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.metric_type}")
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self) -> Dict[str, Dict[str, object]]:
+        """以字典格式导出全部指标，便于JSON接口返回"""
+        with self._lock:
+            items = list(self._metrics.values())
+        return {metric.name: metric.snapshot() for metric in items}
+
+
+# 全局指标注册表
+metrics = MetricsRegistry()
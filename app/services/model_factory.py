@@ -14,29 +14,97 @@
 - 策略模式：根据不同提供商使用不同的创建策略
 """
 
-from typing import Dict, Any, List, Optional
+from contextlib import AsyncExitStack, asynccontextmanager
+from typing import Dict, Any, List, Optional, Callable, AsyncContextManager, AsyncIterator
 from langchain_ollama import ChatOllama
 from langchain_core.tools import BaseTool
 from ..config.model_config import MODEL_CONFIGS, ModelProvider, ModelConfig
 from ..tools.tool_manager import tool_manager
+from .model_scheduler import model_scheduler
+from .model_stats import model_stats
+from .concurrency_limiter import adaptive_limiter
+
+# 调用守卫：接收model_key和实际请求的后端地址，返回包裹单次模型调用的异步上下文管理器
+CallGuard = Callable[[str, Optional[str]], AsyncContextManager[None]]
+
+
+class ManagedChatOllama(ChatOllama):
+    """
+    受管理的Ollama聊天模型
+
+    在ChatOllama的异步生成和异步流式接口外包裹ModelFactory注册的调用守卫，
+    使调度、限流等策略对链代码透明。同步调用不经过守卫。
+    """
+
+    model_key: str = ""
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        async with ModelFactory.guard(self.model_key, self.base_url):
+            return await super()._agenerate(messages, stop=stop, run_manager=run_manager, **kwargs)
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        async with ModelFactory.guard(self.model_key, self.base_url):
+            async for chunk in super()._astream(messages, stop=stop, run_manager=run_manager, **kwargs):
+                yield chunk
 
 
 class ModelFactory:
     """模型工厂类 - 支持工具绑定"""
 
+    # 调用守卫列表，按注册顺序由外向内嵌套
+    _call_guards: List[CallGuard] = []
+
+    @classmethod
+    def register_call_guard(cls, guard: CallGuard) -> None:
+        """注册模型调用守卫，例如调度器的slot方法"""
+        cls._call_guards.append(guard)
+
+    @classmethod
+    @asynccontextmanager
+    async def guard(cls, model_key: str, base_url: Optional[str] = None) -> AsyncIterator[None]:
+        """依次进入所有调用守卫，包裹一次模型调用"""
+        async with AsyncExitStack() as stack:
+            for call_guard in cls._call_guards:
+                await stack.enter_async_context(call_guard(model_key, base_url))
+            yield
+
     @staticmethod
-    def create_model(model_key: str, tools: Optional[List[BaseTool]] = None) -> Any:
-        """创建模型实例，支持工具绑定"""
+    def resolve_fast_mode(model_key: str, fast: Optional[bool] = None) -> bool:
+        """
+        确定本次调用是否使用快速模式
+
+        请求显式指定时以请求为准，否则使用模型配置的默认值；
+        非思考型模型始终返回False。
+        """
+        config = MODEL_CONFIGS.get(model_key)
+        if config is None or not config.supports_thinking:
+            return False
+        return config.fast_mode if fast is None else fast
+
+    @staticmethod
+    def create_model(model_key: str, tools: Optional[List[BaseTool]] = None, fast: bool = False,
+                     base_url: Optional[str] = None) -> Any:
+        """
+        创建模型实例，支持工具绑定
+
+        fast为True时关闭思考型模型的推理；base_url用于指定副本地址，
+        不指定时使用模型配置中的主地址。
+        """
         if model_key not in MODEL_CONFIGS:
             raise ValueError(f"未知的模型: {model_key}。可用模型: {list(MODEL_CONFIGS.keys())}")
 
         config = MODEL_CONFIGS[model_key]
 
         if config.provider == ModelProvider.OLLAMA:
-            model = ChatOllama(
-                base_url=config.base_url,
+            model = ManagedChatOllama(
+                model_key=model_key,
+                base_url=base_url or config.base_url,
                 model=config.model_id,
-                temperature=config.temperature
+                temperature=config.temperature,
+                keep_alive=config.keep_alive,
+                num_ctx=config.context_window,
+                # False：关闭思考；None：保持模型默认行为（推理块由输出解析器剥离）
+                reasoning=False if fast and config.supports_thinking else None
             )
             
             # 如果提供了工具，则绑定到模型
@@ -116,4 +184,12 @@ class ModelFactory:
                 f"未知的模型: {model_key}。"
                 f"可用模型: {available_models}"
             )
-        return MODEL_CONFIGS[model_key]
\ No newline at end of file
+        return MODEL_CONFIGS[model_key]
+
+
+# 模型驻留调度器：按模型分组排队，减少Ollama反复加载模型
+ModelFactory.register_call_guard(model_scheduler.slot)
+# 自适应并发限制：按观测到的延迟调整每个模型、每个后端的并发上限
+ModelFactory.register_call_guard(adaptive_limiter.acquire)
+# 模型运行统计：在调度之后采集，延迟样本不含排队时间
+ModelFactory.register_call_guard(model_stats.track)
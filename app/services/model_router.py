@@ -0,0 +1,220 @@
+"""
+模型路由模块
+
+当请求的 model_key 为 "auto" 时，由路由器根据请求特征和各模型的实时负载
+选择一个模型，而不是让所有请求都落到默认的 qwen3:0.6b 上。
+
+路由信号（全部为本地可得的廉价信号）：
+1. 提示长度：按字符数粗略估算token数
+2. 工具意图：通过关键词判断是否可能需要调用工具（计算、天气、时间等）
+3. 对话深度：记忆模式下已有的历史消息数
+4. 实时负载：调度器中的排队数、在途调用数以及近期平均延迟
+
+路由策略：
+- 先由请求特征推出所需的最低能力等级（ModelConfig.capability）
+- 在满足能力要求（以及工具支持）的模型中，选择预计完成时间最短的一个
+  预计完成时间 = 近期平均延迟 × (排队数 + 在途数 + 1) + 未驻留模型的加载代价
+- 预计时间相同时优先选择能力等级更低（更便宜）的模型
+
+每次路由决策和其最终的延迟结果都以JSON格式写入日志（logger: app.services.model_router），
+便于离线分析并调整策略参数。
+"""
+
+import json
+import logging
+import re
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+from ..config.model_config import MODEL_CONFIGS
+from ..models.chat_models import ChatRequest
+from .metrics import metrics
+from .model_scheduler import model_scheduler
+from .model_stats import model_stats
+
+logger = logging.getLogger(__name__)
+
+AUTO_MODEL_KEY = "auto"
+
+ROUTER_DECISIONS = metrics.counter(
+    "router_decisions_total", "自动路由决策次数", ["model", "reason"]
+)
+ROUTER_OUTCOME_SECONDS = metrics.histogram(
+    "router_outcome_seconds", "自动路由请求的端到端耗时（秒）", ["model"]
+)
+
+# 可能需要调用工具的提问：与tools/base_tools.py中的工具对应。只匹配提问形式，
+# 避免"我今天没时间""计算机""sometimes"这类普通对话被路由到更贵的工具模型
+_TOOL_INTENT_PATTERN = re.compile(
+    # 计算器：算式（减号两侧需有空格，前后不能是日期的一部分，如 2024-01-05、2024/01/05）
+    r"(计算(?!机)|算一下|等于多少|等于几|\bsqrt\b|\bcalculate\b|"
+    r"(?<![\d/.\-])\d+(?:\.\d+)?\s*(?:[+*/×÷^]|\s-\s)\s*\d+(?:\.\d+)?(?!\d|[/.\-]\d)|"
+    # 天气
+    r"天气(?:怎么样|如何|预报|好吗)|会下雨吗|气温(?:多少|几度)|\bweather\b|\bforecast\b|"
+    # 时间和日期
+    r"现在几点|几点了|现在是?什么时间|今天是?(?:几号|几月几[号日]|星期几|周几|什么日子)|什么日期|"
+    r"\bwhat time\b|\bcurrent time\b|\bwhat(?:'s| is) the date\b|\btoday's date\b)",
+    re.IGNORECASE
+)
+# 通常需要更强推理能力的关键词
+_COMPLEX_PATTERN = re.compile(
+    r"(分析|推理|证明|比较|为什么|步骤|代码|程序|算法|设计|总结|翻译|explain|analy[sz]e|prove|code)",
+    re.IGNORECASE
+)
+
+
+@dataclass
+class RoutingDecision:
+    """
+    一次路由决策
+
+    Attributes:
+        decision_id: 决策唯一标识，用于关联决策日志和结果日志
+        model_key: 选中的模型
+        reason: 选择原因的简短描述
+        required_capability: 根据请求特征推出的最低能力等级
+        features: 参与决策的请求特征
+        candidates: 各候选模型的预计完成时间（秒）
+    """
+    decision_id: str
+    model_key: str
+    reason: str
+    required_capability: int
+    features: Dict[str, object]
+    candidates: Dict[str, float]
+    started_at: float = field(default_factory=time.monotonic)
+
+
+class ModelRouter:
+    """
+    成本/延迟感知的模型路由器
+
+    Attributes:
+        long_prompt_tokens: 超过该估算token数视为长提示，至少需要能力等级2
+        very_long_prompt_tokens: 超过该估算token数至少需要能力等级3
+        deep_conversation: 历史消息数超过该值视为深度对话，至少需要能力等级2
+        default_latency: 没有延迟样本时，每个能力等级假设的延迟（秒）
+        swap_penalty: 模型未驻留、需要Ollama重新加载时附加的代价（秒）
+
+    使用示例：
+        >>> decision = model_router.route(request, history_length=6)
+        >>> response = await chain.invoke(request, decision.model_key)
+        >>> model_router.record_outcome(decision, success=True)
+    """
+
+    def __init__(self, long_prompt_tokens: int = 300, very_long_prompt_tokens: int = 1500,
+                 deep_conversation: int = 10, default_latency: float = 1.0,
+                 swap_penalty: float = 3.0):
+        self.long_prompt_tokens = long_prompt_tokens
+        self.very_long_prompt_tokens = very_long_prompt_tokens
+        self.deep_conversation = deep_conversation
+        self.default_latency = default_latency
+        self.swap_penalty = swap_penalty
+
+    @staticmethod
+    def estimate_tokens(text: str) -> int:
+        """粗略估算token数：中文约每字1个token，其他字符约每4个1个token"""
+        cjk = sum(1 for ch in text if "一" <= ch <= "鿿")
+        return cjk + (len(text) - cjk) // 4
+
+    def extract_features(self, request: ChatRequest, history_length: int = 0) -> Dict[str, object]:
+        """提取路由所需的请求特征"""
+        message = request.message
+        return {
+            "prompt_tokens": self.estimate_tokens(message),
+            "tool_intent": bool(_TOOL_INTENT_PATTERN.search(message)),
+            "complex": bool(_COMPLEX_PATTERN.search(message)),
+            "history_length": history_length,
+        }
+
+    def required_capability(self, features: Dict[str, object]) -> int:
+        """根据请求特征推出所需的最低能力等级"""
+        required = 1
+        if features["prompt_tokens"] > self.long_prompt_tokens or features["history_length"] > self.deep_conversation:
+            required = 2
+        if features["complex"] or features["prompt_tokens"] > self.very_long_prompt_tokens:
+            required = 3
+        return required
+
+    def expected_seconds(self, model_key: str) -> float:
+        """估算该模型上一个新请求的完成时间"""
+        config = MODEL_CONFIGS[model_key]
+        latency = model_stats.mean_latency(model_key)
+        if latency is None:
+            latency = self.default_latency * config.capability
+        load = model_scheduler.queue_depth(model_key) + model_stats.in_flight(model_key)
+        expected = latency * (load + 1)
+        if not model_scheduler.is_resident(model_key):
+            expected += self.swap_penalty
+        return expected
+
+    def route(self, request: ChatRequest, history_length: int = 0,
+              candidates: Optional[List[str]] = None) -> RoutingDecision:
+        """
+        为请求选择模型
+
+        Args:
+            request (ChatRequest): 用户的聊天请求
+            history_length (int): 已有的历史消息数
+            candidates (List[str], optional): 候选模型，默认为全部已配置模型
+
+        Returns:
+            RoutingDecision: 路由决策
+        """
+        candidates = candidates or list(MODEL_CONFIGS.keys())
+        features = self.extract_features(request, history_length)
+        required = self.required_capability(features)
+
+        eligible = [
+            key for key in candidates
+            if MODEL_CONFIGS[key].capability >= required
+            and (MODEL_CONFIGS[key].supports_tools or not features["tool_intent"])
+        ]
+        reason = f"capability>={required}"
+        if not eligible:
+            # 没有模型满足要求时退回到能力最强的模型
+            best = max(MODEL_CONFIGS[key].capability for key in candidates)
+            eligible = [key for key in candidates if MODEL_CONFIGS[key].capability == best]
+            reason = "fallback_strongest"
+
+        estimates = {key: round(self.expected_seconds(key), 4) for key in eligible}
+        model_key = min(eligible, key=lambda key: (estimates[key], MODEL_CONFIGS[key].capability))
+
+        decision = RoutingDecision(
+            decision_id=uuid.uuid4().hex[:12],
+            model_key=model_key,
+            reason=reason,
+            required_capability=required,
+            features=features,
+            candidates=estimates,
+        )
+        ROUTER_DECISIONS.inc(model=model_key, reason=reason)
+        logger.info(json.dumps({
+            "event": "route",
+            "decision_id": decision.decision_id,
+            "model": model_key,
+            "reason": reason,
+            "required_capability": required,
+            "features": features,
+            "candidates": estimates,
+        }, ensure_ascii=False))
+        return decision
+
+    def record_outcome(self, decision: RoutingDecision, success: bool = True) -> None:
+        """记录路由决策的最终结果（端到端耗时和是否成功）"""
+        elapsed = time.monotonic() - decision.started_at
+        ROUTER_OUTCOME_SECONDS.observe(elapsed, model=decision.model_key)
+        logger.info(json.dumps({
+            "event": "route_outcome",
+            "decision_id": decision.decision_id,
+            "model": decision.model_key,
+            "latency": round(elapsed, 4),
+            "predicted": decision.candidates.get(decision.model_key),
+            "success": success,
+        }, ensure_ascii=False))
+
+
+# 全局路由器实例
+model_router = ModelRouter()
@@ -0,0 +1,300 @@
+"""
+模型驻留调度器模块
+
+单个Ollama实例在交替处理不同模型的请求时（例如 qwen3:0.6b、qwen3:4b、gemma3:4b），
+会反复卸载和加载模型，每次切换都要付出数秒的代价。该模块在 ModelFactory 创建的
+模型客户端前面加了一层调度，按模型对排队请求分组，尽量让同一模型的请求连续执行。
+
+调度策略：
+1. 每个后端（base_url）同一时刻只有一个"活跃模型"，其请求直接放行
+2. 其他模型的请求按模型分组排队，等待活跃模型的在途请求全部完成后再切换
+3. 有界不公平：活跃模型连续放行 max_batch 个请求，或其他模型最早的请求
+   已等待超过 max_wait 秒后，停止放行活跃模型的新请求，转而切换到等待最久的模型
+4. 切换前通过 /api/ps 查询驻留模型；目标模型未驻留时先用 keep_alive 预加载，
+   并计入模型切换次数和加载耗时
+
+导出指标：
+- ollama_model_swaps_total: 需要加载模型的切换次数
+- ollama_model_load_seconds: 模型加载耗时分布
+- ollama_scheduler_switches_total: 活跃模型分组切换次数
+- ollama_scheduler_queue_depth: 各模型排队中的请求数
+"""
+
+import asyncio
+import logging
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Deque, Dict, Optional, Set
+
+import httpx
+
+from ..config.model_config import MODEL_CONFIGS, ModelConfig, ModelProvider
+from .metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+MODEL_SWAPS = metrics.counter(
+    "ollama_model_swaps_total", "需要加载模型的切换次数", ["backend", "model"]
+)
+MODEL_LOAD_SECONDS = metrics.histogram(
+    "ollama_model_load_seconds", "模型加载耗时（秒）", ["backend", "model"],
+    buckets=(0.5, 1.0, 2.0, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0)
+)
+GROUP_SWITCHES = metrics.counter(
+    "ollama_scheduler_switches_total", "活跃模型分组切换次数", ["backend", "model"]
+)
+QUEUE_DEPTH = metrics.gauge(
+    "ollama_scheduler_queue_depth", "调度器中排队等待的请求数", ["backend", "model"]
+)
+
+
+class _Waiter:
+    """排队中的单个请求"""
+
+    __slots__ = ("model_key", "future", "enqueued_at")
+
+    def __init__(self, model_key: str, future: asyncio.Future):
+        self.model_key = model_key
+        self.future = future
+        self.enqueued_at = time.monotonic()
+
+
+class _BackendState:
+    """单个Ollama后端的调度状态"""
+
+    def __init__(self, base_url: str):
+        self.base_url = base_url
+        self.active: Optional[str] = None          # 当前活跃模型的model_key
+        self.in_flight = 0                         # 活跃模型的在途请求数
+        self.served_in_turn = 0                    # 本轮已放行的请求数
+        self.switching = False                     # 是否正在切换（预加载中）
+        # 键：model_key，值：该模型的等待队列；保持插入顺序便于遍历
+        self.waiters: "OrderedDict[str, Deque[_Waiter]]" = OrderedDict()
+        # /api/ps 查询结果缓存
+        self.resident: Set[str] = set()
+        self.resident_checked_at = 0.0
+
+    def oldest_waiter(self, exclude: Optional[str] = None) -> Optional[_Waiter]:
+        """返回除exclude外等待最久的请求"""
+        oldest = None
+        for model_key, queue in self.waiters.items():
+            if model_key == exclude or not queue:
+                continue
+            if oldest is None or queue[0].enqueued_at < oldest.enqueued_at:
+                oldest = queue[0]
+        return oldest
+
+
+class ModelScheduler:
+    """
+    模型驻留调度器
+
+    通过 slot(model_key) 异步上下文管理器包裹每一次模型调用，
+    由调度器决定请求何时真正发往Ollama。非Ollama模型直接放行。
+
+    Attributes:
+        max_batch: 存在其他模型等待时，活跃模型单轮最多放行的请求数
+        max_wait: 其他模型请求的最长等待时间（秒），超过后强制切换
+        ps_ttl: /api/ps 查询结果的缓存时间（秒）
+        preload: 切换到未驻留模型时是否先预加载
+
+    使用示例：
+        >>> async with model_scheduler.slot("qwen3:4b"):
+        ...     response = await model.ainvoke(messages)
+    """
+
+    def __init__(self, max_batch: int = 8, max_wait: float = 10.0,
+                 ps_ttl: float = 5.0, preload: bool = True, enabled: bool = True):
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.ps_ttl = ps_ttl
+        self.preload = preload
+        self.enabled = enabled
+        self._backends: Dict[str, _BackendState] = {}
+
+    def _state_for(self, base_url: str) -> _BackendState:
+        if base_url not in self._backends:
+            self._backends[base_url] = _BackendState(base_url)
+        return self._backends[base_url]
+
+    @asynccontextmanager
+    async def slot(self, model_key: str, base_url: Optional[str] = None) -> AsyncIterator[None]:
+        """
+        获取一次模型调用的执行许可
+
+        Args:
+            model_key (str): 模型标识符，必须在MODEL_CONFIGS中注册
+            base_url (str, optional): 实际请求的后端地址（副本），默认为模型配置的主地址
+
+        Note:
+            - 等待期间被取消时会自动退出队列，不会占用许可
+            - 退出上下文时释放许可，并视情况触发分组切换
+        """
+        config = MODEL_CONFIGS.get(model_key)
+        if not self.enabled or config is None or config.provider != ModelProvider.OLLAMA:
+            yield
+            return
+
+        state = self._state_for(base_url or config.base_url)
+        await self._acquire(state, model_key)
+        try:
+            yield
+        finally:
+            self._release(state)
+
+    async def _acquire(self, state: _BackendState, model_key: str) -> None:
+        if state.active == model_key and not state.switching and not self._fairness_exceeded(state):
+            state.in_flight += 1
+            state.served_in_turn += 1
+            return
+
+        waiter = _Waiter(model_key, asyncio.get_running_loop().create_future())
+        state.waiters.setdefault(model_key, deque()).append(waiter)
+        self._update_queue_gauge(state, model_key)
+        self._schedule(state)
+
+        try:
+            await waiter.future
+        except asyncio.CancelledError:
+            queue = state.waiters.get(model_key)
+            if queue and waiter in queue:
+                queue.remove(waiter)
+                self._update_queue_gauge(state, model_key)
+                self._schedule(state)
+            elif waiter.future.done() and not waiter.future.cancelled():
+                # 已被放行但调用方被取消：归还许可
+                self._release(state)
+            raise
+
+    def _release(self, state: _BackendState) -> None:
+        state.in_flight -= 1
+        self._schedule(state)
+
+    def _fairness_exceeded(self, state: _BackendState) -> bool:
+        """判断活跃模型是否已用完本轮的不公平额度"""
+        oldest = state.oldest_waiter(exclude=state.active)
+        if oldest is None:
+            return False
+        waited = time.monotonic() - oldest.enqueued_at
+        return state.served_in_turn >= self.max_batch or waited >= self.max_wait
+
+    def _schedule(self, state: _BackendState) -> None:
+        """在活跃模型排空后选择下一个分组"""
+        if state.switching or state.in_flight > 0:
+            return
+
+        oldest = state.oldest_waiter()
+        if oldest is None:
+            return
+
+        next_model = oldest.model_key
+        if next_model == state.active:
+            self._admit_group(state, next_model)
+            return
+
+        state.switching = True
+        asyncio.get_running_loop().create_task(self._switch(state, next_model))
+
+    async def _switch(self, state: _BackendState, model_key: str) -> None:
+        config = MODEL_CONFIGS[model_key]
+        try:
+            if self.preload:
+                resident = await self._resident_models(state)
+                if config.model_id not in resident:
+                    await self._load_model(state, model_key, config)
+        except Exception as e:
+            # 预加载失败不影响请求本身，真正的调用会触发加载或返回错误
+            logger.warning(f"模型 {model_key} 预加载失败: {e}")
+        finally:
+            GROUP_SWITCHES.inc(backend=state.base_url, model=model_key)
+            state.active = model_key
+            state.served_in_turn = 0
+            state.switching = False
+            self._admit_group(state, model_key)
+
+    def _admit_group(self, state: _BackendState, model_key: str) -> None:
+        """放行指定模型当前排队的全部请求"""
+        queue = state.waiters.get(model_key)
+        while queue:
+            waiter = queue.popleft()
+            if waiter.future.done():
+                continue
+            waiter.future.set_result(None)
+            state.in_flight += 1
+            state.served_in_turn += 1
+        self._update_queue_gauge(state, model_key)
+
+    async def _resident_models(self, state: _BackendState) -> Set[str]:
+        """通过 /api/ps 查询已驻留的模型，结果带缓存"""
+        now = time.monotonic()
+        if now - state.resident_checked_at < self.ps_ttl:
+            return state.resident
+
+        async with httpx.AsyncClient(base_url=state.base_url, timeout=5.0) as client:
+            response = await client.get("/api/ps")
+            response.raise_for_status()
+            models = response.json().get("models", [])
+
+        state.resident = {item.get("model") or item.get("name") for item in models}
+        state.resident_checked_at = now
+        return state.resident
+
+    async def _load_model(self, state: _BackendState, model_key: str, config: ModelConfig) -> None:
+        """用空提示调用 /api/generate 预加载模型，并记录加载耗时"""
+        MODEL_SWAPS.inc(backend=state.base_url, model=model_key)
+        started = time.monotonic()
+        payload = {"model": config.model_id}
+        if config.keep_alive is not None:
+            payload["keep_alive"] = config.keep_alive
+
+        async with httpx.AsyncClient(base_url=state.base_url, timeout=120.0) as client:
+            response = await client.post("/api/generate", json=payload)
+            response.raise_for_status()
+
+        MODEL_LOAD_SECONDS.observe(time.monotonic() - started, backend=state.base_url, model=model_key)
+        # 加载新模型可能挤出其他模型，下次切换时重新查询
+        state.resident.add(config.model_id)
+        state.resident_checked_at = 0.0
+
+    def _update_queue_gauge(self, state: _BackendState, model_key: str) -> None:
+        queue = state.waiters.get(model_key, ())
+        QUEUE_DEPTH.set(len(queue), backend=state.base_url, model=model_key)
+
+    def queue_depth(self, model_key: str) -> int:
+        """返回指定模型当前排队中的请求数"""
+        config = MODEL_CONFIGS.get(model_key)
+        if config is None or config.base_url not in self._backends:
+            return 0
+        return len(self._backends[config.base_url].waiters.get(model_key, ()))
+
+    def is_resident(self, model_key: str) -> bool:
+        """
+        判断模型当前是否驻留（无需加载即可执行）
+
+        调度器尚无该后端的状态时无法判断，按驻留处理。
+        """
+        config = MODEL_CONFIGS.get(model_key)
+        if config is None or config.base_url not in self._backends:
+            return True
+        state = self._backends[config.base_url]
+        if state.active is None:
+            return True
+        return state.active == model_key or config.model_id in state.resident
+
+    def get_stats(self) -> Dict[str, dict]:
+        """返回各后端的调度状态，便于调试和监控"""
+        return {
+            base_url: {
+                "active": state.active,
+                "in_flight": state.in_flight,
+                "switching": state.switching,
+                "resident": sorted(state.resident),
+                "queued": {key: len(queue) for key, queue in state.waiters.items() if queue},
+            }
+            for base_url, state in self._backends.items()
+        }
+
+
+# 全局调度器实例
+model_scheduler = ModelScheduler()
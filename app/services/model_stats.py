@@ -0,0 +1,96 @@
+"""
+模型运行统计模块
+
+记录每个模型近期的调用延迟、首token延迟和在途请求数，为模型路由、
+请求对冲等需要"实时负载"信息的策略提供数据。调用延迟通过ModelFactory
+的调用守卫自动采集，首token延迟由流式调用方上报。
+
+导出指标：
+- model_call_seconds: 单次模型调用耗时分布（不含调度排队）
+- model_first_token_seconds: 流式调用的首token耗时分布（含排队）
+- model_in_flight: 各模型在途调用数
+"""
+
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, Optional
+
+from .metrics import LatencyWindow, metrics
+
+MODEL_CALL_SECONDS = metrics.histogram(
+    "model_call_seconds", "单次模型调用耗时（秒）", ["model"]
+)
+MODEL_FIRST_TOKEN_SECONDS = metrics.histogram(
+    "model_first_token_seconds", "从发起请求到收到首个token的耗时（秒）", ["model"]
+)
+MODEL_IN_FLIGHT = metrics.gauge(
+    "model_in_flight", "在途模型调用数", ["model"]
+)
+
+
+class ModelStats:
+    """
+    模型运行统计
+
+    Attributes:
+        window_size: 每个模型保留的最近延迟样本数
+    """
+
+    def __init__(self, window_size: int = 200):
+        self.window_size = window_size
+        self._latency: Dict[str, LatencyWindow] = {}
+        self._first_token: Dict[str, LatencyWindow] = {}
+        self._in_flight: Dict[str, int] = {}
+
+    def _window(self, model_key: str) -> LatencyWindow:
+        if model_key not in self._latency:
+            self._latency[model_key] = LatencyWindow(self.window_size)
+        return self._latency[model_key]
+
+    @asynccontextmanager
+    async def track(self, model_key: str, base_url: Optional[str] = None) -> AsyncIterator[None]:
+        """包裹一次模型调用，记录在途数和成功调用的耗时"""
+        self._in_flight[model_key] = self._in_flight.get(model_key, 0) + 1
+        MODEL_IN_FLIGHT.inc(model=model_key)
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self._in_flight[model_key] -= 1
+            MODEL_IN_FLIGHT.dec(model=model_key)
+        # 只统计正常完成的调用，失败和取消不计入延迟样本
+        elapsed = time.monotonic() - started
+        self._window(model_key).observe(elapsed)
+        MODEL_CALL_SECONDS.observe(elapsed, model=model_key)
+
+    def observe_first_token(self, model_key: str, seconds: float) -> None:
+        """记录一次从发起请求到收到首个token的耗时"""
+        if model_key not in self._first_token:
+            self._first_token[model_key] = LatencyWindow(self.window_size)
+        self._first_token[model_key].observe(seconds)
+        MODEL_FIRST_TOKEN_SECONDS.observe(seconds, model=model_key)
+
+    def first_token_percentile(self, model_key: str, p: float, min_samples: int = 20) -> Optional[float]:
+        """返回首token延迟的第p百分位，样本数不足min_samples时返回None"""
+        window = self._first_token.get(model_key)
+        if window is None or len(window) < min_samples:
+            return None
+        return window.percentile(p)
+
+    def in_flight(self, model_key: str) -> int:
+        """返回指定模型的在途调用数"""
+        return self._in_flight.get(model_key, 0)
+
+    def mean_latency(self, model_key: str) -> Optional[float]:
+        """返回指定模型近期的平均调用耗时，无样本时返回None"""
+        window = self._latency.get(model_key)
+        return window.mean() if window else None
+
+    def latency_percentile(self, model_key: str, p: float) -> Optional[float]:
+        """返回指定模型近期调用耗时的第p百分位，无样本时返回None"""
+        window = self._latency.get(model_key)
+        return window.percentile(p) if window else None
+
+
+# 全局模型统计实例
+model_stats = ModelStats()
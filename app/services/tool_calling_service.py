@@ -2,13 +2,18 @@
 工具调用服务
 
 处理大模型的工具调用流程，包括工具执行、结果处理和错误管理。
+异步接口在请求的截止时间内执行：模型调用受剩余预算约束，
+每次工具调用还受 ToolConfig.timeout 约束，超时的调用会被取消。
 """
 
+import asyncio
 from typing import List, Dict, Any, Optional, Tuple
 from langchain_core.messages import HumanMessage, AIMessage, ToolMessage, BaseMessage
 from langchain_core.tools import BaseTool
 from ..services.model_factory import ModelFactory
+from ..services.deadline import deadline_scope, DeadlineExceeded
 from ..tools.tool_manager import tool_manager
+from ..config.tool_config import TOOL_CONFIGS
 import logging
 import json
 
@@ -52,6 +57,52 @@ class ToolCallingService:
             self.logger.error(error_msg)
             return error_msg
     
+    async def aexecute_tool_call(self, tool_call: Dict[str, Any]) -> str:
+        """
+        异步执行单个工具调用
+
+        在 min(ToolConfig.timeout, 请求剩余预算) 内执行，工具自身超时时返回错误信息
+        交给模型处理；请求的截止时间到期时向上抛出 DeadlineExceeded。
+        """
+        tool_name = tool_call.get("name")
+        tool_args = tool_call.get("args", {})
+        config = TOOL_CONFIGS.get(tool_name)
+        try:
+            if not tool_name:
+                raise ValueError("工具调用缺少名称")
+
+            tool = tool_manager.get_tool(tool_name)
+            async with deadline_scope(config.timeout if config else None, stage="tool"):
+                # 同步工具在线程池中运行，超时后不再等待其结果
+                result = await tool.ainvoke(tool_args)
+
+            self.logger.info(f"工具 {tool_name} 执行成功: {tool_args}")
+            return str(result)
+
+        except DeadlineExceeded as e:
+            if e.stage != "tool":
+                raise
+            error_msg = f"工具 {tool_name} 执行超时: {e}"
+            self.logger.error(error_msg)
+            return error_msg
+        except Exception as e:
+            error_msg = f"工具 {tool_name} 执行失败: {str(e)}"
+            self.logger.error(error_msg)
+            return error_msg
+
+    async def aprocess_tool_calls(self, ai_message: AIMessage) -> List[ToolMessage]:
+        """并发执行AI消息中的所有工具调用"""
+        tool_calls = getattr(ai_message, "tool_calls", None) or []
+        results = await asyncio.gather(*[self.aexecute_tool_call(call) for call in tool_calls])
+        return [
+            ToolMessage(
+                content=result,
+                tool_call_id=call.get("id", "unknown"),
+                name=call.get("name", "unknown")
+            )
+            for call, result in zip(tool_calls, results)
+        ]
+
     def process_tool_calls(self, ai_message: AIMessage) -> List[ToolMessage]:
         """处理AI消息中的所有工具调用"""
         tool_messages = []
@@ -138,6 +189,60 @@ class ToolCallingService:
             self.logger.error(error_msg)
             return error_msg, messages
     
+    async def achat_with_tools(
+        self,
+        user_input: str,
+        conversation_history: Optional[List[BaseMessage]] = None,
+        tool_names: Optional[List[str]] = None,
+        timeout: Optional[float] = None
+    ) -> Tuple[str, List[BaseMessage]]:
+        """
+        带工具的对话处理（异步，受截止时间约束）
+
+        Args:
+            user_input: 用户输入
+            conversation_history: 对话历史
+            tool_names: 要使用的工具名称列表
+            timeout: 整个处理过程的超时时间（秒），与外层请求的截止时间取更早者
+
+        Returns:
+            (最终回复, 更新后的对话历史)
+
+        Raises:
+            DeadlineExceeded: 模型调用或工具调用未能在截止时间内完成，进行中的调用已被取消
+        """
+        if conversation_history is None:
+            conversation_history = []
+
+        model_with_tools = self.create_model_with_tools(tool_names)
+        messages = conversation_history + [HumanMessage(content=user_input)]
+
+        async with deadline_scope(timeout):
+            try:
+                # 第一步：模型生成回复（可能包含工具调用）
+                ai_response = await model_with_tools.ainvoke(messages)
+                messages.append(ai_response)
+
+                if not getattr(ai_response, "tool_calls", None):
+                    return ai_response.content, messages
+
+                # 第二步：在剩余预算内执行所有工具调用
+                self.logger.info(f"检测到 {len(ai_response.tool_calls)} 个工具调用")
+                messages.extend(await self.aprocess_tool_calls(ai_response))
+
+                # 第三步：基于工具结果生成最终回复
+                final_model = ModelFactory.create_model(self.model_key)
+                final_response = await final_model.ainvoke(messages)
+                messages.append(final_response)
+                return final_response.content, messages
+
+            except DeadlineExceeded:
+                raise
+            except Exception as e:
+                error_msg = f"对话处理失败: {str(e)}"
+                self.logger.error(error_msg)
+                return error_msg, messages
+
     def get_available_tools(self) -> Dict[str, str]:
         """获取可用工具列表"""
         return tool_manager.list_tools()
\ No newline at end of file
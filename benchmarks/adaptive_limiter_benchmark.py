@@ -0,0 +1,122 @@
+"""
+自适应并发限制基准测试
+
+启动Ollama桩服务，用大量并发客户端持续向两个并行能力不同的模型发请求，
+每秒打印一次各模型的并发上限、在途数、调用耗时的短期均值/基线和客户端近一秒的延迟/吞吐，
+观察上限是否收敛并与模型并行能力成比例（qwen3:0.6b 的capacity为12，qwen3:4b 为3）。
+由于桩服务的回复长度有差异且tolerance默认为2，稳定后的上限通常在capacity的1.3~2倍之间，
+此时后端耗时约为基线的两倍，多出的请求在限制器中排队而不是挤进后端。
+为单独观察限流效果，测试期间关闭模型驻留调度器（桩服务没有模型切换代价）。
+
+运行：
+    python benchmarks/adaptive_limiter_benchmark.py --clients 48 --duration 30
+"""
+
+import argparse
+import asyncio
+import multiprocessing
+import os
+import socket
+import statistics
+import sys
+import time
+from typing import Dict, List
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+import uvicorn
+
+from app.services.concurrency_limiter import adaptive_limiter
+from app.services.model_factory import ModelFactory
+from app.services.model_scheduler import model_scheduler
+from benchmarks.stub_ollama import DEFAULT_MODELS, create_app
+
+MODELS = ["qwen3:0.6b", "qwen3:4b"]
+
+
+def _serve(port: int) -> None:
+    uvicorn.run(create_app(), host="127.0.0.1", port=port, log_level="warning")
+
+
+async def _wait_until_ready(base_url: str) -> None:
+    async with httpx.AsyncClient(base_url=base_url) as client:
+        for _ in range(100):
+            try:
+                await client.get("/api/tags")
+                return
+            except httpx.TransportError:
+                await asyncio.sleep(0.1)
+    raise RuntimeError("桩服务启动失败")
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def _client(model, latencies: List[float], stop_at: float) -> None:
+    """闭环客户端：收到回复后立即发下一个请求"""
+    while time.monotonic() < stop_at:
+        started = time.monotonic()
+        try:
+            await model.ainvoke("你好")
+        except Exception as e:
+            print(f"请求失败: {e}")
+            await asyncio.sleep(0.1)
+            continue
+        latencies.append(time.monotonic() - started)
+
+
+async def main(clients: int, duration: float) -> None:
+    model_scheduler.enabled = False
+    port = _free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    # 桩服务运行在独立进程中，避免与客户端争用同一个事件循环
+    server = multiprocessing.Process(target=_serve, args=(port,), daemon=True)
+    server.start()
+    await _wait_until_ready(base_url)
+
+    latencies: Dict[str, List[float]] = {key: [] for key in MODELS}
+    stop_at = time.monotonic() + duration
+    tasks = []
+    for model_key in MODELS:
+        model = ModelFactory.create_model(model_key, base_url=base_url, fast=True)
+        tasks += [asyncio.create_task(_client(model, latencies[model_key], stop_at)) for _ in range(clients)]
+
+    header = "  ".join(f"{key:>10} limit/run   rtt/baseline   p50  rps" for key in MODELS)
+    print(f"{'t':>4}  {header}")
+    seen = {key: 0 for key in MODELS}
+    elapsed = 0
+    while time.monotonic() < stop_at:
+        await asyncio.sleep(1.0)
+        elapsed += 1
+        columns = []
+        for model_key in MODELS:
+            recent = latencies[model_key][seen[model_key]:]
+            seen[model_key] = len(latencies[model_key])
+            stats = adaptive_limiter.get_stats().get(f"{model_key}@{base_url}", {})
+            p50 = statistics.median(recent) if recent else 0.0
+            columns.append(
+                f"{model_key:>10} {stats.get('limit', 0):5.1f}/{stats.get('in_flight', 0):3d}"
+                f"  {stats.get('short_rtt') or 0:5.2f}s/{stats.get('baseline_rtt') or 0:5.2f}s"
+                f"  {p50:5.2f}s {len(recent):4d}"
+            )
+        print(f"{elapsed:>4}  " + "  ".join(columns))
+
+    await asyncio.gather(*tasks)
+    server.terminate()
+
+    print("\n最终并发上限（桩服务并行能力）：")
+    for model_key in MODELS:
+        print(f"  {model_key}: {adaptive_limiter.get_limit(model_key, base_url):.1f} "
+              f"(capacity={DEFAULT_MODELS[model_key].capacity})")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="自适应并发限制基准测试")
+    parser.add_argument("--clients", type=int, default=48, help="每个模型的并发客户端数")
+    parser.add_argument("--duration", type=float, default=30.0, help="测试时长（秒）")
+    args = parser.parse_args()
+    asyncio.run(main(args.clients, args.duration))
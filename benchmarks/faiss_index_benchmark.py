@@ -0,0 +1,112 @@
+"""
+FAISS索引加载基准测试
+
+对不同规模的聚簇随机向量（模拟嵌入向量按主题聚集的分布）分别构建 Flat / IVF / HNSW
+服务索引（index_manager.build_serving_index），
+在全新的子进程中分别以完整读入（FAISS.load_local 的方式）和内存映射两种方式加载，
+报告构建耗时、校准后的recall@10、加载耗时、加载并查询后的进程内存和查询延迟。
+
+内存分两列：RssAnon 是进程私有的匿名内存，每个worker各占一份；
+RssFile 是文件映射页，属于页缓存，多个worker映射同一个索引文件时共享同一份物理内存。
+完整读入时索引全部计入RssAnon，内存映射时向量数据只出现在RssFile中。
+
+运行：
+    python benchmarks/faiss_index_benchmark.py --sizes 10000,100000,1000000 --dim 128
+"""
+
+import argparse
+import multiprocessing
+import os
+import statistics
+import sys
+import tempfile
+import time
+from typing import Dict, List
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import faiss
+import numpy as np
+
+from app.retrieval.index_manager import build_serving_index, read_index
+
+
+def _memory_mb() -> Dict[str, float]:
+    """读取当前进程的匿名内存和文件映射内存（MB）"""
+    values = {}
+    with open("/proc/self/status") as f:
+        for line in f:
+            key, _, rest = line.partition(":")
+            if key in ("RssAnon", "RssFile"):
+                values[key] = int(rest.split()[0]) / 1024
+    return values
+
+
+def _load_worker(path: str, mmap: bool, queries: np.ndarray, result_queue) -> None:
+    """子进程：加载索引、执行查询并报告耗时和内存"""
+    before = _memory_mb()
+    started = time.perf_counter()
+    index = read_index(path, mmap)
+    load_seconds = time.perf_counter() - started
+    latencies = []
+    for query in queries:
+        started = time.perf_counter()
+        index.search(query[None, :], 10)
+        latencies.append(time.perf_counter() - started)
+    after = _memory_mb()
+    result_queue.put({
+        "load_ms": load_seconds * 1000,
+        "anon_mb": after["RssAnon"] - before["RssAnon"],
+        "file_mb": after["RssFile"] - before["RssFile"],
+        "p50_ms": statistics.median(latencies) * 1000,
+    })
+
+
+def _measure(path: str, mmap: bool, queries: np.ndarray) -> Dict[str, float]:
+    # 每次在全新进程中加载，避免前一次加载的内存影响统计
+    context = multiprocessing.get_context("spawn")
+    result_queue = context.Queue()
+    process = context.Process(target=_load_worker, args=(path, mmap, queries, result_queue))
+    process.start()
+    result = result_queue.get()
+    process.join()
+    return result
+
+
+def main(sizes: List[int], dim: int, kinds: List[str], recall_target: float, queries: int) -> None:
+    rng = np.random.default_rng(0)
+    print(f"{'vectors':>9} {'type':>16} {'build':>8} {'recall':>6} {'load':>6} "
+          f"{'load(ms)':>9} {'RssAnon(MB)':>12} {'RssFile(MB)':>12} {'p50(ms)':>8}")
+    with tempfile.TemporaryDirectory() as directory:
+        for n in sizes:
+            centers = rng.standard_normal((max(16, n // 100), dim), dtype=np.float32)
+            vectors = centers[rng.integers(0, len(centers), n)] + 0.3 * rng.standard_normal((n, dim), dtype=np.float32)
+            sample = vectors[rng.choice(n, size=queries, replace=False)] + 0.01
+            flat = faiss.IndexFlatL2(dim)
+            flat.add(vectors)
+            for kind in kinds:
+                started = time.perf_counter()
+                spec, index = build_serving_index(flat, recall_target, kind)
+                build_seconds = time.perf_counter() - started
+                path = os.path.join(directory, f"{kind}-{n}.faiss")
+                faiss.write_index(index if index is not None else flat, path)
+                del index
+                for mmap in (False, True):
+                    result = _measure(path, mmap, sample)
+                    print(f"{n:>9} {spec.factory:>16} {build_seconds:>7.1f}s {spec.recall:>6.3f} "
+                          f"{'mmap' if mmap else 'read':>6} {result['load_ms']:>9.1f} "
+                          f"{result['anon_mb']:>12.1f} {result['file_mb']:>12.1f} {result['p50_ms']:>8.3f}")
+                os.remove(path)
+            del flat, vectors, centers
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="FAISS索引加载基准测试")
+    parser.add_argument("--sizes", default="10000,100000,1000000", help="向量数，逗号分隔")
+    parser.add_argument("--dim", type=int, default=128, help="向量维度")
+    parser.add_argument("--types", default="flat,ivf,hnsw", help="索引类型，逗号分隔")
+    parser.add_argument("--recall-target", type=float, default=0.95, help="IVF/HNSW校准的召回率目标")
+    parser.add_argument("--queries", type=int, default=100, help="每次加载后执行的查询数")
+    args = parser.parse_args()
+    main([int(n) for n in args.sizes.split(",")], args.dim, args.types.split(","),
+         args.recall_target, args.queries)
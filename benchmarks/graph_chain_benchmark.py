@@ -0,0 +1,137 @@
+"""
+图对话链基准测试
+
+启动Ollama桩服务（固定长度回复、不模拟生成耗时），在同一个会话中连续对话，比较每轮耗时：
+
+- model: 直接调用模型（HTTP往返和消息解析，作为基线）
+- memory: MemoryChain（buffer记忆，进程内存）
+- graph: GraphChain（LangGraph + SQLite检查点，消息数超过上限时执行摘要节点）
+
+每隔若干轮报告最近一段的平均每轮耗时和相对基线的额外开销；流式输出同样按每轮耗时统计。
+摘要节点会额外调用一次模型，报告中单独列出摘要轮数。
+
+运行：
+    python benchmarks/graph_chain_benchmark.py --turns 200
+"""
+
+import argparse
+import asyncio
+import multiprocessing
+import os
+import socket
+import sys
+import tempfile
+import time
+from typing import Awaitable, Callable, List
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+import uvicorn
+
+from app.chains.graph_chain import GRAPH_SUMMARIES, GraphChain
+from app.chains.memory_chain import MemoryChain
+from app.config.model_config import MODEL_CONFIGS
+from app.models.chat_models import ChatRequest
+from app.services.model_factory import ModelFactory
+from app.services.model_scheduler import model_scheduler
+from benchmarks.stub_ollama import StubModel, create_app
+
+MODEL = "qwen3:0.6b"
+
+
+def _serve(port: int) -> None:
+    models = {MODEL: StubModel(capacity=64, per_token=0.0, min_tokens=16, max_tokens=16)}
+    uvicorn.run(create_app(models), host="127.0.0.1", port=port, log_level="warning")
+
+
+async def _wait_until_ready(base_url: str) -> None:
+    async with httpx.AsyncClient(base_url=base_url) as client:
+        for _ in range(100):
+            try:
+                await client.get("/api/tags")
+                return
+            except httpx.TransportError:
+                await asyncio.sleep(0.1)
+    raise RuntimeError("桩服务启动失败")
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def _run(turns: int, step: Callable[[int], Awaitable[None]]) -> List[float]:
+    """逐轮执行，返回每轮耗时（秒）"""
+    seconds = []
+    for turn in range(turns):
+        started = time.perf_counter()
+        await step(turn)
+        seconds.append(time.perf_counter() - started)
+    return seconds
+
+
+async def main(turns: int, report_every: int) -> None:
+    model_scheduler.enabled = False
+    port = _free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    server = multiprocessing.Process(target=_serve, args=(port,), daemon=True)
+    server.start()
+    await _wait_until_ready(base_url)
+    MODEL_CONFIGS[MODEL].base_url = base_url
+
+    model = ModelFactory.create_model(MODEL, fast=True)
+    memory_chain = MemoryChain()
+    with tempfile.TemporaryDirectory() as directory:
+        graph_chain = GraphChain(os.path.join(directory, "checkpoints.sqlite"))
+
+        def request(turn: int) -> ChatRequest:
+            return ChatRequest(message=f"第{turn}轮：请继续介绍检索增强生成。", fast=True)
+
+        async def model_step(turn: int) -> None:
+            await model.ainvoke(request(turn).message)
+
+        async def memory_step(turn: int) -> None:
+            await memory_chain.invoke(request(turn), MODEL, chat_id="bench", memory_type="buffer")
+
+        async def graph_step(turn: int) -> None:
+            await graph_chain.invoke(request(turn), MODEL, chat_id="bench")
+
+        async def graph_stream_step(turn: int) -> None:
+            async for _ in graph_chain.astream(request(turn), MODEL, chat_id="bench-stream"):
+                pass
+
+        # 预热：建立连接、编译图、创建检查点表
+        await model_step(0)
+        await graph_chain.invoke(request(0), MODEL, chat_id="warmup")
+        summaries_before = GRAPH_SUMMARIES.get(model=MODEL, outcome="success")
+
+        results = {
+            "model": await _run(turns, model_step),
+            "memory": await _run(turns, memory_step),
+            "graph": await _run(turns, graph_step),
+            "graph stream": await _run(turns, graph_stream_step),
+        }
+        summaries = GRAPH_SUMMARIES.get(model=MODEL, outcome="success") - summaries_before
+        checkpoint_size = os.path.getsize(graph_chain.checkpoint_path)
+        await graph_chain.aclose()
+
+    server.terminate()
+
+    names = list(results)
+    print(f"{'turns':>7} " + " ".join(f"{name + '(ms)':>17}" for name in names)
+          + " " + " ".join(f"{name + ' +ms':>17}" for name in names[1:]))
+    for end in range(report_every, turns + 1, report_every):
+        means = {name: sum(values[end - report_every:end]) / report_every * 1000 for name, values in results.items()}
+        print(f"{end:>7} " + " ".join(f"{means[name]:>17.2f}" for name in names)
+              + " " + " ".join(f"{means[name] - means['model']:>17.2f}" for name in names[1:]))
+    print(f"\n摘要节点执行 {summaries:.0f} 次（两个图对话会话合计），检查点文件 {checkpoint_size / 1e6:.1f}MB")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="图对话链基准测试")
+    parser.add_argument("--turns", type=int, default=200, help="每种方式的对话轮数")
+    parser.add_argument("--report-every", type=int, default=50, help="每隔多少轮报告一次")
+    args = parser.parse_args()
+    asyncio.run(main(args.turns, args.report_every))
@@ -0,0 +1,94 @@
+"""
+对话历史内存占用基准测试
+
+模拟大量活跃会话（每个会话若干轮对话，回复有短有长，部分短回复重复出现），
+用 tracemalloc 统计保存全部历史新增的内存，比较：
+
+- messages: InMemoryChatMessageHistory，每条消息一个pydantic消息对象（ConversationBufferMemory的默认存储）
+- compact: ForkableChatMessageHistory，每条消息一个 __slots__ 紧凑记录，短内容驻留、长内容压缩
+- compact (no zlib): 同上，但不压缩长内容
+
+消息内容在测试前以UTF-8编码保存，写入时才解码为字符串（与请求到达时新建字符串相同），
+因此内容本身计入两种存储。报告每条消息的平均字节数（含内容），以及构建一次提示（读取一个会话的全部消息）的耗时。
+
+运行：
+    python benchmarks/history_footprint_benchmark.py --sessions 2000 --turns 25
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+import tracemalloc
+from typing import Callable, List
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from langchain_core.chat_history import BaseChatMessageHistory, InMemoryChatMessageHistory
+from langchain_core.messages import AIMessage, HumanMessage
+
+from app.config.memory_config import MEMORY_CONFIG
+from app.memory.forkable_history import ForkableChatMessageHistory
+
+_SHORT_REPLIES = ["好的。", "明白了，请继续。", "没问题！", "还有其他问题吗？", "收到。"]
+_WORDS = ["检索", "生成", "向量", "索引", "片段", "重排序", "召回率", "嵌入模型", "上下文", "提示词", "引用", "知识库",
+          "相似度", "分块", "元数据", "过滤", "评估", "延迟", "吞吐", "缓存", "The retriever", "returns", "top-k chunks"]
+
+
+def _turns(rng: random.Random, turns: int) -> List[tuple]:
+    """生成一个会话的对话：用户问题各不相同；回复三成是重复的短句，其余为一到十几句的长回复"""
+    conversation = []
+    for turn in range(turns):
+        question = f"第{turn}个问题（{rng.randrange(10 ** 6)}）：检索增强生成里的重排序有什么作用？"
+        if rng.random() < 0.3:
+            reply = rng.choice(_SHORT_REPLIES)
+        else:
+            reply = f"回答{rng.randrange(10 ** 6)}：" + "".join(
+                "、".join(rng.choices(_WORDS, k=rng.randint(4, 12))) + "。" for _ in range(rng.randint(1, 15)))
+        conversation.append((question.encode("utf-8"), reply.encode("utf-8")))
+    return conversation
+
+
+def _measure(name: str, conversations: List[List[tuple]],
+             factory: Callable[[], BaseChatMessageHistory]) -> None:
+    tracemalloc.start()
+    before, _ = tracemalloc.get_traced_memory()
+    histories = []
+    for conversation in conversations:
+        history = factory()
+        for question, reply in conversation:
+            history.add_messages([HumanMessage(content=question.decode("utf-8")),
+                                  AIMessage(content=reply.decode("utf-8"))])
+        histories.append(history)
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+
+    messages = sum(len(conversation) * 2 for conversation in conversations)
+    started = time.perf_counter()
+    for history in histories[:200]:
+        history.messages
+    build_us = (time.perf_counter() - started) / min(200, len(histories)) * 1e6
+    print(f"{name:>17} {used / messages:>18.0f} {used / 1e6:>10.1f} {build_us:>16.0f}")
+
+
+def main(sessions: int, turns: int) -> None:
+    rng = random.Random(0)
+    conversations = [_turns(rng, turns) for _ in range(sessions)]
+    content_bytes = sum(len(text) for conversation in conversations
+                        for turn in conversation for text in turn)
+    messages = sessions * turns * 2
+    print(f"{sessions} 个会话 × {turns} 轮 = {messages} 条消息，内容平均 {content_bytes / messages:.0f} 字节（UTF-8）\n")
+    print(f"{'store':>17} {'bytes per message':>18} {'total MB':>10} {'prompt build us':>16}")
+    _measure("messages", conversations, InMemoryChatMessageHistory)
+    _measure("compact", conversations, ForkableChatMessageHistory)
+    MEMORY_CONFIG.history_compress_min_chars = 0
+    _measure("compact (no zlib)", conversations, ForkableChatMessageHistory)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="对话历史内存占用基准测试")
+    parser.add_argument("--sessions", type=int, default=2000, help="会话数")
+    parser.add_argument("--turns", type=int, default=25, help="每个会话的对话轮数")
+    args = parser.parse_args()
+    main(args.sessions, args.turns)
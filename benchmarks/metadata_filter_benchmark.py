@@ -0,0 +1,129 @@
+"""
+元数据过滤基准测试
+
+在合成语料（每个片段带 source/store/date/tags 元数据）上比较两种带过滤条件的向量检索：
+
+- 后过滤：langchain FAISS 的 similarity_search_with_score_by_vector(filter=..., fetch_k=...)，
+  即 Retrievers.ipynb 中自查询检索的方式，先取fetch_k个最近邻再按元数据筛选
+- 预过滤：VectorIndex.compile_filter 把条件编译成位置集合，检索只在集合内打分
+
+分别测试选择性强（命中约0.1%）、中等和宽泛（命中约80%）的过滤条件，报告编译耗时、
+单次检索耗时、返回结果数（不足k个说明名额被过滤掉了）和相对精确结果的recall@k。
+
+运行：
+    python benchmarks/metadata_filter_benchmark.py --size 100000 --index-type ivf
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+from langchain_community.vectorstores import FAISS
+from langchain_core.embeddings import FakeEmbeddings
+
+from app.retrieval.ingestion import save_index_atomically
+from app.retrieval.vector_store import VectorIndex
+
+FILTERS: Dict[str, Dict[str, Any]] = {
+    "selective": {"source": "doc-7.md"},
+    "medium": {"store": "store1", "date": {"$gte": "2024-04-01", "$lt": "2024-07-01"}},
+    "broad": {"store": {"$in": ["store1", "store2", "store3", "store4"]}},
+}
+
+# langchain FAISS 的过滤语法不支持在同一字段上组合多个范围运算符，后过滤改用等价的 $in
+POST_FILTERS: Dict[str, Dict[str, Any]] = {
+    "selective": FILTERS["selective"],
+    "medium": {"store": "store1", "date": {"$in": ["2024-04-01", "2024-05-01", "2024-06-01"]}},
+    "broad": FILTERS["broad"],
+}
+
+
+def _metadata(i: int) -> Dict[str, Any]:
+    return {
+        "source": f"doc-{i % 1000}.md",
+        "store": f"store{i % 5}",
+        "date": f"2024-{1 + i % 12:02d}-01",
+        "tags": [f"tag{i % 7}", f"tag{(i // 7) % 11}"],
+    }
+
+
+def _timed(fn, repeat: int) -> List[float]:
+    latencies = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        latencies.append(time.perf_counter() - started)
+    return latencies
+
+
+def main(size: int, dim: int, k: int, fetch_k: int, queries: int, index_type: str) -> None:
+    rng = np.random.default_rng(0)
+    vectors = rng.standard_normal((size, dim), dtype=np.float32)
+    metadatas = [_metadata(i) for i in range(size)]
+    embeddings = FakeEmbeddings(size=dim)
+    store = FAISS.from_embeddings(
+        [(f"chunk {i}", vector) for i, vector in enumerate(vectors.tolist())],
+        embeddings, metadatas=metadatas, ids=[f"c{i}" for i in range(size)],
+    )
+    query_vectors = rng.standard_normal((queries, dim), dtype=np.float32)
+
+    with tempfile.TemporaryDirectory() as directory:
+        save_index_atomically(store, directory, index_type=index_type)
+        index = VectorIndex(directory, embeddings)
+        started = time.perf_counter()
+        index.compile_filter({})
+        print(f"{size} 个片段，服务索引 {type(index.load().index).__name__}，"
+              f"元数据索引构建 {time.perf_counter() - started:.2f}秒\n")
+
+        print(f"{'filter':>10} {'matched':>8} {'method':>24} {'compile(ms)':>12} {'search(ms)':>11} "
+              f"{'returned':>9} {'recall@k':>9}")
+        for name, expression in FILTERS.items():
+            compile_ms = statistics.median(_timed(lambda: index.compile_filter(expression), 20)) * 1000
+            where = index.compile_filter(expression)
+            positions = where.positions
+            exact = []
+            for query in query_vectors:
+                distances = ((vectors[positions] - query) ** 2).sum(axis=1)
+                exact.append({f"c{p}" for p in positions[np.argsort(distances)[:k]].tolist()})
+
+            def evaluate(search):
+                returned, recall = [], []
+                for query, expected in zip(query_vectors, exact):
+                    hits = search(query.tolist())
+                    returned.append(len(hits))
+                    recall.append(len({doc.id for doc, _ in hits} & expected) / len(expected))
+                latency = statistics.median(_timed(lambda: search(query_vectors[0].tolist()), 20)) * 1000
+                return latency, statistics.mean(returned), statistics.mean(recall)
+
+            rows = [
+                (f"post-filter fetch_k={fetch_k}", 0.0,
+                 lambda q: store.similarity_search_with_score_by_vector(q, k, filter=POST_FILTERS[name],
+                                                                        fetch_k=fetch_k)),
+                (f"post-filter fetch_k={fetch_k * 10}", 0.0,
+                 lambda q: store.similarity_search_with_score_by_vector(q, k, filter=POST_FILTERS[name],
+                                                                        fetch_k=fetch_k * 10)),
+                ("pre-filter", compile_ms, lambda q: index.search_by_vector(q, k, where)),
+            ]
+            for method, compile_cost, search in rows:
+                latency, returned, recall = evaluate(search)
+                print(f"{name:>10} {len(positions):>8} {method:>24} {compile_cost:>12.3f} {latency:>11.2f} "
+                      f"{returned:>9.1f} {recall:>9.3f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="元数据过滤基准测试")
+    parser.add_argument("--size", type=int, default=100000, help="片段数")
+    parser.add_argument("--dim", type=int, default=64, help="向量维度")
+    parser.add_argument("--k", type=int, default=10, help="返回数量")
+    parser.add_argument("--fetch-k", type=int, default=20, help="后过滤的候选数（langchain默认值）")
+    parser.add_argument("--queries", type=int, default=50, help="评估召回率的查询数")
+    parser.add_argument("--index-type", default="flat", choices=["flat", "ivf", "hnsw"], help="服务索引类型")
+    args = parser.parse_args()
+    main(args.size, args.dim, args.k, args.fetch_k, args.queries, args.index_type)
@@ -0,0 +1,102 @@
+"""
+PDF加载基准测试
+
+生成一个多页的文本PDF，比较：
+
+- 原加载方式：pdfplumber（已安装时）或 pypdf 逐页提取，不缓存（即每次入库的开销）
+- PdfLoader 冷缓存：逐页提取并写入页面缓存，workers > 1 时按页段并行
+- PdfLoader 热缓存：直接读取页面缓存，不打开PDF
+
+报告总耗时、每秒页数和产出第一页的延迟（流式产出时远小于总耗时）。
+
+运行：
+    python benchmarks/pdf_loader_benchmark.py --pages 400 --workers 4
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from typing import Callable, Iterator
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from langchain_core.documents import Document
+
+from app.retrieval.pdf_loader import PdfLoader, get_extractor, iter_pages, page_count
+
+_LINE = "Retrieval augmented generation combines a retriever with a language model, page {page} line {line}."
+
+
+def make_pdf(path: str, pages: int, lines: int = 45) -> None:
+    """写出每页 lines 行文本的PDF（Helvetica字体，仅ASCII）"""
+    objects = [b"<< /Type /Catalog /Pages 2 0 R >>", None, b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids = []
+    for page in range(pages):
+        text = "".join(f"({_LINE.format(page=page, line=line)}) Tj T* " for line in range(lines))
+        stream = f"BT /F1 9 Tf 11 TL 40 800 Td {text}ET".encode("ascii")
+        objects.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream))
+        objects.append(b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+                       b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % len(objects))
+        kids.append(len(objects))
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (" ".join(f"{k} 0 R" for k in kids).encode(), pages)
+
+    with open(path, "wb") as f:
+        f.write(b"%PDF-1.4\n")
+        offsets = []
+        for number, body in enumerate(objects, start=1):
+            offsets.append(f.tell())
+            f.write(b"%d 0 obj\n%s\nendobj\n" % (number, body))
+        xref = f.tell()
+        f.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1))
+        for offset in offsets:
+            f.write(b"%010d 00000 n \n" % offset)
+        f.write(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref))
+
+
+def _baseline(path: str, layout: bool) -> Iterator[Document]:
+    """原 loaders.load_pdf 的方式：打开PDF逐页提取，没有缓存"""
+    extractor = get_extractor(layout)
+    for page, text in iter_pages(path, extractor, list(range(page_count(path, extractor)))):
+        if text.strip():
+            yield Document(page_content=text, metadata={"source": path, "page": page})
+
+
+def _measure(name: str, load: Callable[[], Iterator[Document]]) -> None:
+    started = time.perf_counter()
+    first = None
+    count = 0
+    for _ in load():
+        if first is None:
+            first = time.perf_counter() - started
+        count += 1
+    seconds = time.perf_counter() - started
+    print(f"{name:>28} {seconds:>9.2f} {count / seconds:>10.1f} {first * 1000:>15.1f}")
+
+
+def main(pages: int, workers: int, layout: bool) -> None:
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "bench.pdf")
+        make_pdf(path, pages)
+        cache_dir = os.path.join(directory, "cache")
+        print(f"{pages} 页，{os.path.getsize(path) / 1e6:.1f}MB，提取器 {get_extractor(layout)}\n")
+        print(f"{'loader':>28} {'total(s)':>9} {'pages/s':>10} {'first page(ms)':>15}")
+        _measure("baseline (no cache)", lambda: _baseline(path, layout))
+        _measure("PdfLoader cold, workers=1",
+                 lambda: PdfLoader(path, layout=layout, workers=1, cache_dir=cache_dir).lazy_load())
+        if workers > 1:
+            parallel_cache = os.path.join(directory, "cache-parallel")
+            _measure(f"PdfLoader cold, workers={workers}",
+                     lambda: PdfLoader(path, layout=layout, workers=workers, cache_dir=parallel_cache).lazy_load())
+        _measure("PdfLoader warm",
+                 lambda: PdfLoader(path, layout=layout, workers=workers, cache_dir=cache_dir).lazy_load())
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="PDF加载基准测试")
+    parser.add_argument("--pages", type=int, default=400, help="PDF页数")
+    parser.add_argument("--workers", type=int, default=4, help="并行提取的进程数")
+    parser.add_argument("--fast", action="store_true", help="不需要版面保真，使用pypdf")
+    args = parser.parse_args()
+    main(args.pages, args.workers, not args.fast)
@@ -0,0 +1,69 @@
+"""
+检索记忆基准测试
+
+模拟一个持续数千轮的会话（使用确定性的 HashingEmbeddings，不需要Ollama），
+每隔若干轮比较缓冲记忆和检索记忆放入提示的历史长度（估算token数），
+以及检索记忆每轮的索引和召回耗时。第0轮提到的事实在之后被询问，检查检索记忆能否召回。
+
+运行：
+    python benchmarks/retrieval_memory_benchmark.py --turns 5000
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.memory.retrieval_memory import RetrievalMemory
+from app.retrieval.embeddings import HashingEmbeddings
+from app.retrieval.tokens import estimate_tokens
+
+_TOPICS = ["天气", "旅行计划", "Python 代码", "晚餐菜谱", "健身安排", "读书笔记", "项目进度", "电影推荐"]
+_FACT = ("我养了一只叫豆豆的橘猫，它三岁了", "记住了，豆豆是一只三岁的橘猫。")
+_QUESTION = "我的猫叫什么名字，几岁了？"
+
+
+def _turn(index: int):
+    topic = _TOPICS[index % len(_TOPICS)]
+    return (f"第{index}轮：关于{topic}，我还有一个问题想请教。",
+            f"关于{topic}的第{index}个问题，建议先整理已知信息，再逐步排查。")
+
+
+def _tokens(messages) -> int:
+    return sum(estimate_tokens(message.content) for message in messages)
+
+
+async def main(turns: int, report_every: int) -> None:
+    memory = RetrievalMemory(HashingEmbeddings(size=256))
+    buffer_tokens = 0
+    index_seconds = load_seconds = 0.0
+
+    print(f"{'turns':>6} {'buffer tokens':>14} {'retrieval tokens':>17} {'messages':>9} "
+          f"{'index(ms/turn)':>15} {'load(ms)':>9} {'fact recalled':>14}")
+    for index in range(turns):
+        user, assistant = _FACT if index == 0 else _turn(index)
+        memory.add_turn(user, assistant)
+        buffer_tokens += estimate_tokens(user) + estimate_tokens(assistant)
+        started = time.perf_counter()
+        await memory.aindex_pending()
+        index_seconds += time.perf_counter() - started
+
+        if (index + 1) % report_every == 0:
+            started = time.perf_counter()
+            messages = await memory.aload_messages(_QUESTION)
+            load = time.perf_counter() - started
+            load_seconds += load
+            recalled = any("豆豆" in message.content for message in messages)
+            print(f"{index + 1:>6} {buffer_tokens:>14} {_tokens(messages):>17} {len(messages):>9} "
+                  f"{index_seconds / (index + 1) * 1000:>15.3f} {load * 1000:>9.2f} {str(recalled):>14}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="检索记忆基准测试")
+    parser.add_argument("--turns", type=int, default=5000, help="模拟的对话轮数")
+    parser.add_argument("--report-every", type=int, default=500, help="每隔多少轮报告一次")
+    args = parser.parse_args()
+    asyncio.run(main(args.turns, args.report_every))
@@ -0,0 +1,83 @@
+"""
+会话分叉基准测试
+
+在一个长对话上反复分叉（每个分支再追加一轮对话），用 tracemalloc 统计新增内存，比较：
+
+- copy: 把消息列表复制到新会话（原来的做法，InMemoryChatMessageHistory）
+- fork: MemoryChain.fork_session，分支与原会话共享前缀
+
+报告每个分支的平均内存开销和分叉耗时；fork 的开销应与历史长度和分支数无关。
+
+运行：
+    python benchmarks/session_fork_benchmark.py --messages 2000 --branches 500
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+import tracemalloc
+import warnings
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from langchain_core.chat_history import InMemoryChatMessageHistory
+from langchain_core.messages import AIMessage, HumanMessage
+
+from app.chains.memory_chain import MemoryChain
+
+
+def _populate(chain: MemoryChain, chat_id: str, messages: int) -> None:
+    memory = chain._get_or_create_memory(chat_id, "buffer")
+    for turn in range(messages // 2):
+        memory.save_context({"input": f"第{turn}轮：请介绍一下检索增强生成的第{turn}个要点。"},
+                            {"output": f"第{turn}个要点：检索器先召回相关片段，模型再依据片段作答。"})
+
+
+def _measure(name: str, messages: int, branches: int, fork) -> None:
+    rng = random.Random(0)
+    positions = [rng.randrange(messages + 1) for _ in range(branches)]
+    tracemalloc.start()
+    before, _ = tracemalloc.get_traced_memory()
+    started = time.perf_counter()
+    checkpoints = {}
+    for index, position in enumerate(positions, start=1):
+        fork(index, position)
+        if index in (1, branches // 10, branches // 2, branches):
+            checkpoints[index] = tracemalloc.get_traced_memory()[0] - before
+    seconds = time.perf_counter() - started
+    tracemalloc.stop()
+    growth = "  ".join(f"{count}:{size / 1e6:.2f}MB" for count, size in checkpoints.items())
+    print(f"{name:>6} {checkpoints[branches] / branches / 1024:>14.1f} {seconds / branches * 1e6:>13.1f}   {growth}")
+
+
+def main(messages: int, branches: int) -> None:
+    warnings.filterwarnings("ignore")
+    chain = MemoryChain()
+    _populate(chain, "main", messages)
+    source = chain.memory_storage["main_buffer"].chat_memory.messages
+    copies = []
+
+    def copy_fork(index: int, position: int) -> None:
+        history = InMemoryChatMessageHistory(messages=list(source[:position]))
+        history.add_messages([HumanMessage(content="换一种说法"), AIMessage(content="好的，换一种说法。")])
+        copies.append(history)
+
+    def cow_fork(index: int, position: int) -> None:
+        branch = chain.fork_session("main", position, f"branch-{index}")
+        chain.memory_storage[f"{branch.chat_id}_buffer"].save_context(
+            {"input": "换一种说法"}, {"output": "好的，换一种说法。"})
+
+    print(f"原会话 {messages} 条消息，{branches} 个分支（随机分叉位置，每个分支追加一轮）\n")
+    print(f"{'method':>6} {'KB per branch':>14} {'us per fork':>13}   memory after N branches")
+    _measure("copy", messages, branches, copy_fork)
+    _measure("fork", messages, branches, cow_fork)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="会话分叉基准测试")
+    parser.add_argument("--messages", type=int, default=2000, help="原会话的消息数")
+    parser.add_argument("--branches", type=int, default=500, help="分支数")
+    args = parser.parse_args()
+    main(args.messages, args.branches)
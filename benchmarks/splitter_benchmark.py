@@ -0,0 +1,136 @@
+"""
+文本切分基准测试
+
+在合成语料（TextSplitters.ipynb 中的中文长文本、Markdown文档和英文段落混排，重复到指定大小）上比较：
+
+- RecursiveCharacterTextSplitter：按字符数，chunk_size 按语料的平均每token字符数换算
+- CharacterTextSplitter：按段落分隔符，chunk_size 同上
+- langchain TokenTextSplitter 和 RecursiveCharacterTextSplitter.from_tiktoken_encoder：
+  需要tiktoken编码文件，不可用时跳过
+- TokenTextSplitter（app.retrieval.splitter）：按token数在句子和标题边界切分
+
+报告切分吞吐（MB/秒）、片段数、片段token数的p50和最大值、超过token上限的片段比例，
+以及在句子边界结束的片段比例。token数统一用 tokens.count_tokens 计算
+（tiktoken不可用时为估算值）。
+
+运行：
+    python benchmarks/splitter_benchmark.py --size-mb 20 --chunk-tokens 256 --overlap 32
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+from typing import Callable, Dict, List
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from langchain_core.documents import Document
+from langchain_text_splitters import CharacterTextSplitter, RecursiveCharacterTextSplitter
+from langchain_text_splitters import TokenTextSplitter as LangchainTokenTextSplitter
+
+from app.retrieval.splitter import TokenTextSplitter
+from app.retrieval.tokens import ENCODING_NAME, count_tokens_batch
+
+CHINESE = """人工智能的发展历程可以追溯到20世纪50年代。当时，计算机科学家开始探索让机器模拟人类智能的可能性。
+
+在1956年的达特茅斯会议上，人工智能这个术语首次被正式提出。这标志着AI作为一个独立学科的诞生。
+
+随后的几十年里，AI经历了多次起伏。60-70年代是第一个AI春天，专家系统得到了广泛应用。
+
+80年代末到90年代初，由于技术限制和过高期望，AI进入了所谓的"AI冬天"。
+
+21世纪以来，随着大数据、云计算和深度学习的发展，AI迎来了新的春天。
+
+今天，AI已经在图像识别、自然语言处理、推荐系统等领域取得了突破性进展。
+"""
+
+MARKDOWN = """# 人工智能技术指南
+
+## 1. 机器学习基础
+
+### 1.1 监督学习
+监督学习是机器学习的一个重要分支，使用标记的训练数据来学习输入到输出的映射。
+
+### 1.2 无监督学习
+无监督学习从未标记的数据中发现隐藏的模式。
+
+## 2. 深度学习
+神经网络是深度学习的基础，模拟人脑神经元的工作方式。CNN主要用于图像处理和计算机视觉任务。
+"""
+
+ENGLISH = """Retrieval augmented generation combines a retriever with a language model. The retriever finds
+relevant passages in a document collection, and the model conditions its answer on them. Chunking decides
+what a passage is: chunks that are too long exceed the embedding model's context window and get truncated,
+while chunks that are too short lose the surrounding context. Splitting on sentence boundaries keeps each
+chunk self-contained! Does overlap help? Usually a little, at the cost of a larger index.
+"""
+
+_SENTENCE_ENDS = ("。", "！", "？", "；", ".", "!", "?", ";", "\"", "”")
+
+
+def make_documents(size_mb: float) -> List[Document]:
+    """生成约 size_mb MB 的文档，每个文档约 100KB"""
+    unit = CHINESE + "\n" + MARKDOWN + "\n" + ENGLISH + "\n"
+    per_document = max(1, 100_000 // len(unit.encode("utf-8")))
+    count = max(1, int(size_mb * 1_000_000 / (per_document * len(unit.encode("utf-8")))))
+    return [Document(page_content=unit * per_document, metadata={"source": f"doc-{i}.md"}) for i in range(count)]
+
+
+def _tiktoken_splitters(chunk_tokens: int, overlap: int) -> Dict[str, Callable[[List[Document]], List[Document]]]:
+    """langchain中依赖tiktoken编码文件的切分器，编码不可用时返回空"""
+    try:
+        token = LangchainTokenTextSplitter(encoding_name=ENCODING_NAME, chunk_size=chunk_tokens,
+                                           chunk_overlap=overlap)
+        recursive = RecursiveCharacterTextSplitter.from_tiktoken_encoder(
+            encoding_name=ENCODING_NAME, chunk_size=chunk_tokens, chunk_overlap=overlap)
+    except Exception as e:
+        print(f"跳过langchain的tiktoken切分器（编码 {ENCODING_NAME} 不可用: {type(e).__name__}）")
+        return {}
+    return {
+        "langchain Token": token.split_documents,
+        "Recursive(tiktoken)": recursive.split_documents,
+    }
+
+
+def main(size_mb: float, chunk_tokens: int, overlap: int) -> None:
+    documents = make_documents(size_mb)
+    total_bytes = sum(len(doc.page_content.encode("utf-8")) for doc in documents)
+    sample = documents[0].page_content
+    chars_per_token = len(sample) / sum(count_tokens_batch([sample]))
+    chunk_chars = int(chunk_tokens * chars_per_token)
+    overlap_chars = int(overlap * chars_per_token)
+    print(f"{len(documents)} 个文档，{total_bytes / 1e6:.1f}MB，平均每token {chars_per_token:.2f} 个字符，"
+          f"token上限 {chunk_tokens}（字符切分器换算为 {chunk_chars} 个字符）\n")
+
+    token_splitter = TokenTextSplitter(chunk_size=chunk_tokens, chunk_overlap=overlap)
+    splitters: Dict[str, Callable[[List[Document]], List[Document]]] = {
+        "RecursiveCharacter": RecursiveCharacterTextSplitter(
+            chunk_size=chunk_chars, chunk_overlap=overlap_chars).split_documents,
+        "Character(\\n\\n)": CharacterTextSplitter(
+            chunk_size=chunk_chars, chunk_overlap=overlap_chars, separator="\n\n").split_documents,
+        **_tiktoken_splitters(chunk_tokens, overlap),
+        "TokenTextSplitter(app)": lambda docs: list(token_splitter.split_documents(docs)),
+    }
+
+    print(f"{'splitter':>24} {'MB/s':>8} {'chunks':>8} {'p50 tok':>8} {'max tok':>8} "
+          f"{'over limit':>11} {'sentence end':>13}")
+    for name, split in splitters.items():
+        started = time.perf_counter()
+        chunks = split(documents)
+        seconds = time.perf_counter() - started
+        tokens = count_tokens_batch([chunk.page_content for chunk in chunks])
+        over = sum(1 for n in tokens if n > chunk_tokens) / len(chunks)
+        sentence_end = sum(1 for chunk in chunks if chunk.page_content.rstrip().endswith(_SENTENCE_ENDS)) / len(chunks)
+        print(f"{name:>24} {total_bytes / 1e6 / seconds:>8.2f} {len(chunks):>8} {statistics.median(tokens):>8.0f} "
+              f"{max(tokens):>8} {over:>11.1%} {sentence_end:>13.1%}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="文本切分基准测试")
+    parser.add_argument("--size-mb", type=float, default=20, help="语料大小（MB）")
+    parser.add_argument("--chunk-tokens", type=int, default=256, help="片段的token上限")
+    parser.add_argument("--overlap", type=int, default=32, help="重叠token数")
+    args = parser.parse_args()
+    main(args.size_mb, args.chunk_tokens, args.overlap)
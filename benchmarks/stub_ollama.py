@@ -0,0 +1,132 @@
+"""
+Ollama桩服务
+
+模拟Ollama的HTTP接口，用于在没有GPU的环境下对调度、限流等策略做基准测试。
+每个模型有固定的"并行处理能力"capacity：在途请求数不超过capacity时每个token
+耗时 per_token 秒，超过后按处理器共享模型等比例变慢（耗时 × 在途数 / capacity），
+与真实推理服务在过载时的排队表现一致。
+
+支持的接口：
+- POST /api/chat: 流式（NDJSON）或非流式聊天
+- POST /api/generate: 空提示时视为预加载模型
+- GET /api/ps: 已驻留的模型
+- GET /api/tags: 可用模型列表
+
+单独运行：
+    python benchmarks/stub_ollama.py --port 11435
+"""
+
+import argparse
+import asyncio
+import json
+import random
+from dataclasses import dataclass
+from typing import Dict
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+
+@dataclass
+class StubModel:
+    """桩模型的性能参数"""
+    capacity: int = 4           # 不变慢的最大并行请求数
+    per_token: float = 0.01     # 单个token的基础耗时（秒）
+    min_tokens: int = 20        # 回复的最少token数
+    max_tokens: int = 40        # 回复的最多token数
+
+
+# 默认的模型性能参数：小模型并行能力强，大模型弱
+DEFAULT_MODELS: Dict[str, StubModel] = {
+    "qwen3:0.6b": StubModel(capacity=12, per_token=0.005),
+    "qwen2.5:3b": StubModel(capacity=6, per_token=0.01),
+    "gemma3:4b": StubModel(capacity=4, per_token=0.012),
+    "qwen3:4b": StubModel(capacity=3, per_token=0.015),
+}
+
+
+def create_app(models: Dict[str, StubModel] = None, seed: int = 0) -> FastAPI:
+    """
+    创建桩服务应用
+
+    Args:
+        models (Dict[str, StubModel], optional): 模型ID到性能参数的映射，默认为DEFAULT_MODELS
+        seed (int): 回复长度的随机种子
+
+    Returns:
+        FastAPI: 桩服务应用，app.state.in_flight 记录各模型的在途请求数
+    """
+    models = models or DEFAULT_MODELS
+    rng = random.Random(seed)
+    app = FastAPI(title="Ollama Stub")
+    app.state.in_flight = {name: 0 for name in models}
+    app.state.resident = set()
+
+    def _spec(name: str) -> StubModel:
+        return models.get(name) or StubModel()
+
+    async def _tokens(name: str):
+        """按处理器共享模型逐个产出token"""
+        spec = _spec(name)
+        app.state.in_flight[name] = app.state.in_flight.get(name, 0) + 1
+        app.state.resident.add(name)
+        try:
+            for i in range(rng.randint(spec.min_tokens, spec.max_tokens)):
+                slowdown = max(1.0, app.state.in_flight[name] / spec.capacity)
+                await asyncio.sleep(spec.per_token * slowdown)
+                yield f"t{i} "
+        finally:
+            app.state.in_flight[name] -= 1
+
+    @app.post("/api/chat")
+    async def chat(request: Request):
+        body = await request.json()
+        name = body.get("model", "")
+
+        def _message(content: str, done: bool) -> Dict:
+            message = {
+                "model": name,
+                "created_at": "2024-01-01T00:00:00Z",
+                "message": {"role": "assistant", "content": content},
+                "done": done,
+            }
+            if done:
+                message.update({"done_reason": "stop", "total_duration": 0, "eval_count": 0})
+            return message
+
+        if not body.get("stream", True):
+            text = "".join([token async for token in _tokens(name)])
+            return JSONResponse(_message(text, True))
+
+        async def _stream():
+            async for token in _tokens(name):
+                yield json.dumps(_message(token, False)) + "\n"
+            yield json.dumps(_message("", True)) + "\n"
+
+        return StreamingResponse(_stream(), media_type="application/x-ndjson")
+
+    @app.post("/api/generate")
+    async def generate(request: Request):
+        body = await request.json()
+        app.state.resident.add(body.get("model", ""))
+        return {"model": body.get("model", ""), "response": "", "done": True}
+
+    @app.get("/api/ps")
+    async def ps():
+        return {"models": [{"name": name, "model": name} for name in sorted(app.state.resident)]}
+
+    @app.get("/api/tags")
+    async def tags():
+        return {"models": [{"name": name, "model": name} for name in models]}
+
+    return app
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Ollama桩服务")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11435)
+    args = parser.parse_args()
+    uvicorn.run(create_app(), host=args.host, port=args.port, log_level="warning")
@@ -0,0 +1,105 @@
+"""
+摘要记忆基准测试
+
+在一个长会话中连续写入对话（每轮一问一答），写入后按 MemoryChain 的方式检查并执行摘要压缩，
+统计每轮记忆维护（计数、判断、移出消息）的耗时，比较：
+
+- langchain: ConversationSummaryBufferMemory，每轮重新计数整个缓冲区，超出上限时每移出一条消息再计数一遍
+- incremental: SummaryBufferMemory，每条消息写入时计数一次，缓冲区token总数增量维护
+
+两者使用同一个本地分词器（见 app.retrieval.tokens）计数，摘要模型是立即返回固定摘要的假模型，
+因此耗时差异只来自计数方式（超出上限后两者几乎每轮都调用一次假模型，这部分开销计入两者）。
+每隔若干轮报告最近一段的平均每轮耗时；incremental 的每轮耗时应与对话轮数和token上限无关。
+
+运行：
+    python benchmarks/summary_memory_benchmark.py --turns 1000 --limits 1000 8000
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+import warnings
+from typing import List
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from langchain.memory import ConversationSummaryBufferMemory
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+from langchain_core.messages import AIMessage, HumanMessage
+
+from app.memory.summary_memory import SummaryBufferMemory
+from app.retrieval.tokens import count_tokens
+
+_WORDS = ["检索", "生成", "向量", "索引", "片段", "重排序", "召回率", "嵌入模型", "上下文", "提示词",
+          "The retriever", "returns", "top-k chunks", "before", "generation"]
+
+
+class _SummaryModel(FakeListChatModel):
+    """立即返回固定摘要、用本地分词器计数的假模型"""
+
+    def get_num_tokens(self, text: str) -> int:
+        return count_tokens(text)
+
+
+def _conversation(turns: int) -> List[tuple]:
+    rng = random.Random(0)
+    return [(f"第{turn}个问题：" + "、".join(rng.choices(_WORDS, k=rng.randint(5, 20))) + "？",
+             f"回答{turn}：" + "、".join(rng.choices(_WORDS, k=rng.randint(20, 80))) + "。")
+            for turn in range(turns)]
+
+
+def _model() -> _SummaryModel:
+    return _SummaryModel(responses=["用户在询问检索增强生成的各个环节，助手逐一做了解释。"])
+
+
+async def _langchain(conversation: List[tuple], limit: int) -> List[float]:
+    memory = ConversationSummaryBufferMemory(llm=_model(), return_messages=True,
+                                             memory_key="chat_history", max_token_limit=limit)
+    seconds = []
+    for question, reply in conversation:
+        started = time.perf_counter()
+        memory.chat_memory.add_messages([HumanMessage(content=question), AIMessage(content=reply)])
+        await memory.aprune()
+        seconds.append(time.perf_counter() - started)
+    return seconds
+
+
+async def _incremental(conversation: List[tuple], limit: int) -> List[float]:
+    memory = SummaryBufferMemory(_model(), max_token_limit=limit)
+    seconds = []
+    for question, reply in conversation:
+        started = time.perf_counter()
+        memory.add_messages([HumanMessage(content=question), AIMessage(content=reply)])
+        if memory.needs_pruning:
+            await memory.aprune()
+        seconds.append(time.perf_counter() - started)
+    return seconds
+
+
+async def main(turns: int, limits: List[int], report_every: int) -> None:
+    warnings.filterwarnings("ignore")
+    conversation = _conversation(turns)
+    print(f"{turns} 轮对话，每隔 {report_every} 轮报告平均每轮耗时（us）\n")
+    for limit in limits:
+        results = {"langchain": await _langchain(conversation, limit),
+                   "incremental": await _incremental(conversation, limit)}
+        print(f"token上限 {limit}")
+        print(f"{'turns':>7} " + " ".join(f"{name:>12}" for name in results) + f" {'speedup':>8}")
+        for end in range(report_every, turns + 1, report_every):
+            means = {name: sum(values[end - report_every:end]) / report_every * 1e6
+                     for name, values in results.items()}
+            print(f"{end:>7} " + " ".join(f"{means[name]:>12.0f}" for name in results)
+                  + f" {means['langchain'] / means['incremental']:>7.1f}x")
+        print()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="摘要记忆基准测试")
+    parser.add_argument("--turns", type=int, default=1000, help="对话轮数")
+    parser.add_argument("--limits", type=int, nargs="+", default=[1000, 8000], help="缓冲区token上限")
+    parser.add_argument("--report-every", type=int, default=100, help="每隔多少轮报告一次")
+    args = parser.parse_args()
+    asyncio.run(main(args.turns, args.limits, args.report_every))